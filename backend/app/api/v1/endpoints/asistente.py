@@ -9,10 +9,11 @@ from uuid import UUID
 from typing import Optional, List
 
 from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, desc, func
 
-from app.db.session import get_db
+from app.db.session import AsyncSessionLocal, get_db
 from app.db.models.asistente import (
     Conversacion,
     Mensaje,
@@ -43,6 +44,7 @@ from app.schemas.asistente import (
 from app.services.asistente import (
     get_asistente_service,
     AsistenteService,
+    SanitizadorEntrada,
     registro_herramientas,
     get_tools_count,
 )
@@ -89,6 +91,48 @@ async def enviar_mensaje(
         )
 
 
+@router.post("/chat/stream")
+async def enviar_mensaje_stream(request: ChatRequest):
+    """
+    Envia un mensaje al asistente y recibe la respuesta como server-sent events.
+
+    Cada evento lleva en `event` el tipo del chunk y en `data` un
+    ChatStreamChunk en JSON:
+    - texto: delta de texto generado por el modelo
+    - tool_start / tool_end: inicio y fin de cada herramienta
+    - done: ChatResponse completo (fuentes, accion pendiente, sugerencias)
+    - error: el turno fallo y no se guardo la respuesta
+
+    Args:
+        request: Solicitud de chat con mensaje y contexto
+
+    Returns:
+        StreamingResponse con media type text/event-stream
+    """
+    # Validar antes de abrir el stream para responder 400 como /chat
+    try:
+        SanitizadorEntrada.sanitizar(request.mensaje)
+    except ValueError as e:
+        logger.warning(f"Error de validacion en chat: {e}")
+        raise HTTPException(status_code=400, detail=f"Mensaje invalido: {e}")
+
+    async def eventos():
+        # Sesion propia: la de get_db se cierra antes de enviar el cuerpo
+        async with AsyncSessionLocal() as db:
+            servicio = get_asistente_service(db)
+            async for chunk in servicio.chat_stream(request):
+                yield f"event: {chunk.tipo}\ndata: {chunk.model_dump_json(exclude_none=True)}\n\n"
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # Evitar buffering en nginx
+        },
+    )
+
+
 @router.post("/confirm", response_model=ResultadoAccion)
 async def confirmar_accion(
     confirmacion: ConfirmacionAccion,
@@ -10,6 +10,7 @@ import time
 
 from app.db.session import get_db
 from app.services.rag.busqueda import BuscadorLegal, ResultadoBusqueda
+from app.services.rag.cache_busqueda import get_cache_busqueda, obtener_version_corpus
 
 
 router = APIRouter()
@@ -139,6 +140,42 @@ async def estadisticas_corpus(
         )
 
 
+@router.get(
+    "/cache/metricas",
+    summary="Métricas de la caché de búsqueda",
+    description="Aciertos, fallos, invalidaciones por cambio de corpus y tasa de aciertos de la caché de resultados."
+)
+async def metricas_cache(
+    db: AsyncSession = Depends(get_db),
+) -> dict[str, Any]:
+    """Métricas de la caché de búsqueda de este proceso."""
+
+    try:
+        version = await obtener_version_corpus(db)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error obteniendo versión del corpus: {str(e)}"
+        )
+
+    return {
+        "version_corpus": version,
+        **get_cache_busqueda().metricas(),
+    }
+
+
+@router.delete(
+    "/cache",
+    summary="Vaciar la caché de búsqueda",
+    description="Elimina las entradas de la caché de resultados de este proceso y reinicia sus métricas."
+)
+async def vaciar_cache() -> dict[str, Any]:
+    """Vacía la caché de búsqueda."""
+
+    get_cache_busqueda().limpiar()
+    return {"mensaje": "Caché de búsqueda vaciada"}
+
+
 @router.get(
     "/temas",
     summary="Listar temas disponibles",
@@ -61,6 +61,10 @@ async def compilar_documento(
     - **proyecto_id**: ID del proyecto
     - **incluir_capitulos**: Lista de capítulos a generar (1-11). Si no se especifica, genera todos.
     - **regenerar_existentes**: Si True, regenera capítulos que ya existen.
+    - **reanudar**: Si True, retoma la última compilación incompleta sin repetir sus capítulos completados.
+
+    Para compilar en segundo plano, con reintentos, encole un trabajo
+    `compilacion_eia` con POST /trabajos.
     """
     try:
         resultado = await generacion_service.compilar_documento(
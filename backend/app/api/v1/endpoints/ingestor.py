@@ -7,19 +7,25 @@ from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Q
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, Field
 from typing import Optional, List
-from datetime import date
-import tempfile
+from datetime import date, datetime
+from pathlib import Path
+from uuid import uuid4
 import os
 
+import aiofiles
+import aiofiles.os
+
+from app.core.config import settings
 from app.db.session import get_db
 from app.services.rag.ingestor import (
     IngestorLegal,
     DocumentoAIngestar,
     ResultadoIngestion,
-    extraer_texto_pdf,
-    extraer_texto_docx,
     get_ingestor_legal,
 )
+from app.services.trabajos import get_cola_trabajos
+from app.services.trabajos.cola import ESTADOS_TERMINALES
+from app.services.trabajos.ingestion import TIPO_INGESTION_PDF
 
 
 router = APIRouter()
@@ -72,6 +78,23 @@ class IngestorResponse(BaseModel):
     errores: List[str] = []
 
 
+class TrabajoIngestionResponse(BaseModel):
+    """Estado de un trabajo de ingestión en segundo plano."""
+    id: int
+    tipo: str
+    estado: str
+    etapa_actual: Optional[str] = None
+    etapas_completadas: List[str] = []
+    progreso: int
+    resultado: Optional[IngestorResponse] = None
+    error: Optional[str] = None
+    cancelacion_solicitada: bool = False
+    intentos: int = 0
+    created_at: Optional[str] = None
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+
+
 class ReprocesarResponse(BaseModel):
     """Respuesta de reprocesamiento."""
     documento_id: int
@@ -147,17 +170,19 @@ async def ingestar_documento(
 
 @router.post(
     "/pdf",
-    response_model=IngestorResponse,
+    response_model=TrabajoIngestionResponse,
+    status_code=202,
     summary="Ingestar documento PDF",
     description="""
-    Ingesta un documento legal en formato PDF.
+    Encola la ingestión de un documento legal en formato PDF.
 
-    El PDF será:
-    1. Procesado para extraer texto
-    2. Clasificado automáticamente con LLM
-    3. Segmentado en artículos/secciones
-    4. Convertido a embeddings para búsqueda semántica
-    5. Almacenado con relaciones fragmento-tema
+    La respuesta es inmediata y contiene el trabajo creado. Un proceso
+    worker (`python -m app.services.trabajos.worker`) ejecuta las etapas:
+    1. extraccion: texto del PDF (OCR si es necesario)
+    2. clasificacion: categoría, temas y triggers con LLM
+    3. indexacion: embeddings y fragmentos en el corpus
+
+    Consulte el avance en `GET /ingestor/trabajos/{trabajo_id}`.
     """
 )
 async def ingestar_pdf(
@@ -170,9 +195,8 @@ async def ingestar_pdf(
     url_fuente: Optional[str] = Form(None, description="URL de la fuente"),
     categoria_id: Optional[int] = Form(None, description="ID de categoría"),
     usar_llm: bool = Form(True, description="Usar LLM para clasificación"),
-    db: AsyncSession = Depends(get_db),
-) -> IngestorResponse:
-    """Ingesta un documento PDF."""
+) -> TrabajoIngestionResponse:
+    """Encola la ingestión de un documento PDF."""
 
     # Validar tipo de archivo
     if not archivo.filename.lower().endswith('.pdf'):
@@ -181,77 +205,107 @@ async def ingestar_pdf(
             detail="El archivo debe ser un PDF"
         )
 
-    # Guardar archivo temporal
-    try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
-            contenido = await archivo.read()
-            tmp.write(contenido)
-            tmp_path = tmp.name
-
-        # Extraer texto del PDF
-        texto = extraer_texto_pdf(tmp_path)
-
-        if len(texto.strip()) < 100:
+    # Validar fecha si se proporcionó
+    if fecha_publicacion:
+        try:
+            datetime.strptime(fecha_publicacion, "%Y-%m-%d")
+        except ValueError:
             raise HTTPException(
                 status_code=400,
-                detail="No se pudo extraer suficiente texto del PDF"
+                detail="Formato de fecha inválido. Use YYYY-MM-DD"
             )
 
-        # Parsear fecha si se proporcionó
-        fecha_pub = None
-        if fecha_publicacion:
-            try:
-                from datetime import datetime
-                fecha_pub = datetime.strptime(fecha_publicacion, "%Y-%m-%d").date()
-            except ValueError:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Formato de fecha inválido. Use YYYY-MM-DD"
-                )
-
-        # Crear documento e ingestar
-        ingestor = get_ingestor_legal(usar_llm=usar_llm)
-
-        doc = DocumentoAIngestar(
-            titulo=titulo,
-            tipo=tipo,
-            numero=numero,
-            fecha_publicacion=fecha_pub,
-            organismo=organismo,
-            contenido=texto,
-            url_fuente=url_fuente,
-            categoria_id=categoria_id,
-        )
-
-        resultado: ResultadoIngestion = await ingestor.ingestar_documento(db, doc)
-
-        return IngestorResponse(
-            documento_id=resultado.documento_id,
-            titulo=resultado.titulo,
-            fragmentos_creados=resultado.fragmentos_creados,
-            temas_detectados=resultado.temas_detectados,
-            triggers_detectados=resultado.triggers_detectados,
-            componentes_detectados=resultado.componentes_detectados,
-            categoria_asignada=resultado.categoria_asignada,
-            clasificacion_llm_usada=resultado.clasificacion_llm_usada,
-            tiempo_procesamiento_ms=resultado.tiempo_procesamiento_ms,
-            errores=resultado.errores,
+    # Guardar archivo donde el worker pueda leerlo
+    directorio = Path(settings.UPLOAD_DIR) / "ingestor"
+    ruta_archivo = directorio / f"{uuid4()}.pdf"
+    try:
+        await aiofiles.os.makedirs(directorio, exist_ok=True)
+        async with aiofiles.open(ruta_archivo, 'wb') as f:
+            while chunk := await archivo.read(1024 * 1024):
+                await f.write(chunk)
+
+        trabajo = await get_cola_trabajos().encolar(
+            TIPO_INGESTION_PDF,
+            {
+                "ruta_archivo": str(ruta_archivo),
+                "nombre_archivo": archivo.filename,
+                "titulo": titulo,
+                "tipo": tipo,
+                "organismo": organismo,
+                "numero": numero,
+                "fecha_publicacion": fecha_publicacion,
+                "url_fuente": url_fuente,
+                "categoria_id": categoria_id,
+                "usar_llm": usar_llm,
+            }
         )
+        return TrabajoIngestionResponse(**trabajo.to_dict())
 
-    except HTTPException:
-        raise
     except Exception as e:
+        try:
+            os.unlink(ruta_archivo)
+        except OSError:
+            pass
         raise HTTPException(
             status_code=500,
-            detail=f"Error procesando PDF: {str(e)}"
+            detail=f"Error encolando PDF: {str(e)}"
+        )
+
+
+@router.get(
+    "/trabajos",
+    response_model=List[TrabajoIngestionResponse],
+    summary="Listar trabajos de ingestión",
+)
+async def listar_trabajos_ingestion(
+    estado: Optional[str] = Query(None, description="Filtrar por estado"),
+    limite: int = Query(50, ge=1, le=200),
+) -> List[TrabajoIngestionResponse]:
+    """Lista los trabajos de ingestión más recientes."""
+    trabajos = await get_cola_trabajos().listar(
+        tipo=TIPO_INGESTION_PDF, estado=estado, limite=limite
+    )
+    return [TrabajoIngestionResponse(**t.to_dict()) for t in trabajos]
+
+
+@router.get(
+    "/trabajos/{trabajo_id}",
+    response_model=TrabajoIngestionResponse,
+    summary="Estado de un trabajo de ingestión",
+    description="Retorna estado, etapa actual, progreso (%) y, al terminar, el resultado."
+)
+async def obtener_trabajo_ingestion(trabajo_id: int) -> TrabajoIngestionResponse:
+    """Obtiene el estado de un trabajo de ingestión."""
+    trabajo = await get_cola_trabajos().obtener(trabajo_id)
+    if not trabajo or trabajo.tipo != TIPO_INGESTION_PDF:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return TrabajoIngestionResponse(**trabajo.to_dict())
+
+
+@router.post(
+    "/trabajos/{trabajo_id}/cancelar",
+    response_model=TrabajoIngestionResponse,
+    summary="Cancelar un trabajo de ingestión",
+    description="""
+    Cancela un trabajo. Si está pendiente se cancela de inmediato; si está en
+    proceso, el worker lo interrumpe en su siguiente latido y descarta la
+    etapa en curso.
+    """
+)
+async def cancelar_trabajo_ingestion(trabajo_id: int) -> TrabajoIngestionResponse:
+    """Solicita la cancelación de un trabajo de ingestión."""
+    cola = get_cola_trabajos()
+    trabajo = await cola.obtener(trabajo_id)
+    if not trabajo or trabajo.tipo != TIPO_INGESTION_PDF:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    if trabajo.estado in ESTADOS_TERMINALES:
+        raise HTTPException(
+            status_code=409,
+            detail=f"El trabajo ya terminó (estado: {trabajo.estado})"
         )
-    finally:
-        # Limpiar archivo temporal
-        if 'tmp_path' in locals():
-            try:
-                os.unlink(tmp_path)
-            except OSError:
-                pass
+
+    trabajo = await cola.solicitar_cancelacion(trabajo_id)
+    return TrabajoIngestionResponse(**trabajo.to_dict())
 
 
 @router.post(
@@ -445,6 +499,8 @@ class ActualizacionSEAResponse(BaseModel):
     4. Genera embeddings para búsqueda semántica
 
     Este endpoint puede tardar varios minutos si hay muchas guías nuevas.
+    Para no esperar la respuesta, encole un trabajo `actualizacion_guias_sea`
+    con POST /trabajos.
     """
 )
 async def actualizar_guias_sea(
@@ -5,18 +5,27 @@ Permite administrar la configuración del modelo LLM en runtime:
 - Listar modelos disponibles
 - Ver/cambiar modelo activo
 - Health check del servicio
-- Búsqueda web actualizada (Perplexity)
+- Búsqueda web actualizada (Perplexity) y su caché
+- Telemetría de llamadas (tokens, latencia, costo) por funcionalidad
 """
 
 from typing import Any, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel, Field
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import get_db
 
 from app.services.llm.gestor import get_gestor_modelos, GestorModelos, CATALOGO_MODELOS
 from app.services.llm.cliente import get_cliente_llm
 from app.services.llm.router import get_llm_router, LLMRouter, TipoTarea
 from app.services.llm.perplexity_client import is_perplexity_enabled
+from app.services.llm.cache_perplexity import get_cache_perplexity
+from app.services.llm.limitador import get_limitador_llm
+from app.services.llm.telemetria import get_telemetria_llm
 
 router = APIRouter()
 
@@ -294,6 +303,17 @@ class RouterInfoResponse(BaseModel):
     """Información del enrutamiento LLM."""
     routing: dict[str, str] = Field(..., description="Mapeo tipo_tarea -> proveedor")
     perplexity_habilitado: bool = Field(..., description="Si Perplexity está habilitado")
+    modo: str = Field("estatico", description="Modo de enrutamiento: estatico o latencia")
+    modelos: dict[str, str] = Field(default_factory=dict, description="Tareas desviadas a otro modelo")
+    estadisticas: list[dict[str, Any]] = Field(
+        default_factory=list, description="Latencia p50/p95 y tasa de error recientes por modelo"
+    )
+    decisiones_recientes: list[dict[str, Any]] = Field(
+        default_factory=list, description="Últimas decisiones del modo latencia"
+    )
+    conteo_decisiones: dict[str, int] = Field(
+        default_factory=dict, description="Decisiones por tipo_tarea:motivo"
+    )
 
 
 # ===== DEPENDENCIAS ROUTER =====
@@ -372,6 +392,30 @@ async def buscar_web_actualizada(
         )
 
 
+@router.get(
+    "/buscar-web/cache",
+    summary="Métricas de la caché de búsqueda web",
+    description="""
+    Aciertos, respuestas obsoletas servidas, búsquedas coalescidas y
+    revalidaciones de la caché de Perplexity de este proceso.
+    """
+)
+async def metricas_cache_busqueda_web() -> dict[str, Any]:
+    """Métricas de la caché de Perplexity de este proceso."""
+    return get_cache_perplexity().metricas()
+
+
+@router.delete(
+    "/buscar-web/cache",
+    summary="Vaciar la caché de búsqueda web",
+    description="Elimina las respuestas cacheadas de Perplexity de este proceso y reinicia sus métricas."
+)
+async def vaciar_cache_busqueda_web() -> dict[str, Any]:
+    """Vacía la caché de Perplexity."""
+    get_cache_perplexity().limpiar()
+    return {"mensaje": "Caché de búsqueda web vaciada"}
+
+
 @router.get(
     "/router/health",
     response_model=RouterHealthResponse,
@@ -399,7 +443,9 @@ async def health_check_router(
     description="""
     Retorna información sobre el enrutamiento configurado.
 
-    Muestra qué proveedor se usa para cada tipo de tarea.
+    Muestra qué proveedor se usa para cada tipo de tarea. En modo latencia
+    incluye la latencia y errores recientes de cada modelo y las últimas
+    decisiones de enrutamiento (de este proceso).
     """
 )
 async def obtener_info_router(
@@ -407,6 +453,78 @@ async def obtener_info_router(
 ) -> RouterInfoResponse:
     """Obtiene información del enrutamiento LLM."""
     return RouterInfoResponse(
-        routing=llm_router.get_routing_info(),
+        **llm_router.get_routing_info(),
         perplexity_habilitado=is_perplexity_enabled(),
     )
+
+
+@router.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    summary="Métricas LLM en formato Prometheus",
+    description="""
+    Contadores de llamadas, errores, reintentos, tokens (incluida la caché
+    de prompts) y costo, e histograma de latencia, por sitio, proveedor y
+    modelo. Los valores son del proceso que atiende la petición.
+    """
+)
+async def metricas_prometheus() -> str:
+    """Exporta la telemetría LLM del proceso para Prometheus."""
+    return get_telemetria_llm().exportar_prometheus()
+
+
+@router.get(
+    "/telemetria",
+    summary="Telemetría LLM por funcionalidad",
+    description="""
+    Retorna los totales del proceso desde su arranque, el estado de su
+    limitador de tasa y los agregados persistidos de todos los procesos en
+    las últimas `horas`, por sitio.
+    """
+)
+async def obtener_telemetria(
+    horas: int = Query(24, ge=1, le=24 * 90, description="Ventana de los agregados persistidos"),
+    db: AsyncSession = Depends(get_db),
+) -> dict[str, Any]:
+    """Obtiene la telemetría LLM del proceso y los agregados por sitio."""
+    result = await db.execute(
+        text("""
+            SELECT sitio,
+                   SUM(llamadas) AS llamadas,
+                   SUM(errores) AS errores,
+                   SUM(reintentos) AS reintentos,
+                   SUM(tokens_input) AS tokens_input,
+                   SUM(tokens_output) AS tokens_output,
+                   SUM(tokens_cache_lectura) AS tokens_cache_lectura,
+                   SUM(tokens_cache_escritura) AS tokens_cache_escritura,
+                   SUM(costo_usd) AS costo_usd,
+                   SUM(latencia_total_ms) AS latencia_total_ms
+            FROM telemetria.llm_rollups
+            WHERE periodo >= NOW() - make_interval(hours => :horas)
+            GROUP BY sitio
+            ORDER BY SUM(costo_usd) DESC
+        """),
+        {"horas": horas},
+    )
+    por_sitio = []
+    for fila in result.mappings():
+        llamadas = int(fila["llamadas"])
+        por_sitio.append({
+            "sitio": fila["sitio"],
+            "llamadas": llamadas,
+            "errores": int(fila["errores"]),
+            "reintentos": int(fila["reintentos"]),
+            "tokens_input": int(fila["tokens_input"]),
+            "tokens_output": int(fila["tokens_output"]),
+            "tokens_cache_lectura": int(fila["tokens_cache_lectura"]),
+            "tokens_cache_escritura": int(fila["tokens_cache_escritura"]),
+            "costo_usd": float(fila["costo_usd"]),
+            "latencia_media_ms": round(int(fila["latencia_total_ms"]) / llamadas) if llamadas else 0,
+        })
+
+    return {
+        "proceso": get_telemetria_llm().instantanea(),
+        "limitador": get_limitador_llm().metricas(),
+        "horas": horas,
+        "por_sitio": por_sitio,
+    }
@@ -9,30 +9,25 @@ Endpoint principal que integra:
 """
 
 import logging
-import time
 from typing import Any, Optional
 from datetime import datetime
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query
 from fastapi.responses import StreamingResponse
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from geoalchemy2.shape import to_shape
-from shapely.geometry import mapping
 
-from app.db.session import get_db
+from app.db.session import AsyncSessionLocal, get_db
 from app.db.models.proyecto import Proyecto, Analisis
 from app.db.models.auditoria import AuditoriaAnalisis
-from app.services.gis.analisis import analizar_proyecto_espacial
 from app.services.rag.busqueda import BuscadorLegal
 from app.services.reglas import MotorReglasSSEIA, SistemaAlertas
-from app.services.llm import GeneradorInformes, SeccionInforme
+from app.services.llm import GeneradorInformes, SeccionInforme, get_cache_secciones
 from app.schemas.auditoria import (
     AnalisisIntegradoInput,
     AnalisisIntegradoResponse,
     AuditoriaAnalisisResponse,
-    MetricasEjecucion,
 )
 from app.schemas.prefactibilidad import (
     DatosProyectoInput,
@@ -43,19 +38,17 @@ from app.schemas.prefactibilidad import (
     ClasificacionResponse,
     SeccionInformeResponse,
     AnalisisPrefactibilidadResponse,
+    AnalisisStreamChunk,
     AnalisisRapidoResponse,
     EliminarAnalisisResponse,
 )
 from app.services.prefactibilidad import (
+    EventoAnalisis,
     ServicioPrefactibilidad,
     construir_datos_proyecto,
-    calcular_checksum,
-    extraer_capas_usadas,
-    extraer_normativa_citada,
     descripcion_seccion,
 )
 from app.services.documentacion import DocumentacionService
-from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
@@ -163,6 +156,7 @@ def _resultado_a_response(resultado, generar_informe_llm: bool) -> AnalisisPrefa
     5. **Generación de informe**: Informe estructurado con LLM (opcional)
 
     El tiempo de respuesta depende de si se genera el informe con LLM (~30-60s) o solo el análisis automático (~2-5s).
+    Para mostrar resultados a medida que están listos use `POST /analisis/stream`.
     """,
 )
 async def analizar_prefactibilidad(
@@ -197,6 +191,77 @@ async def analizar_prefactibilidad(
         )
 
 
+def _evento_a_chunk(evento: EventoAnalisis, generar_informe_llm: bool) -> AnalisisStreamChunk:
+    """Convierte un EventoAnalisis del servicio al chunk que se envía por SSE."""
+    if evento.tipo in ("analisis", "done"):
+        return AnalisisStreamChunk(
+            tipo=evento.tipo,
+            analisis=_resultado_a_response(evento.resultado, generar_informe_llm),
+        )
+    if evento.tipo == "normativa":
+        return AnalisisStreamChunk(tipo="normativa", normativa=evento.normativa[:20])
+    return AnalisisStreamChunk(
+        tipo="seccion",
+        seccion=SeccionInformeResponse(
+            seccion=evento.seccion.seccion.value,
+            titulo=evento.seccion.titulo,
+            contenido=evento.seccion.contenido,
+        ),
+    )
+
+
+@router.post(
+    "/analisis/stream",
+    summary="Análisis de prefactibilidad con resultados progresivos",
+    description="""
+    Mismo análisis que `POST /analisis`, entregado como server-sent events.
+
+    Cada evento lleva en `event` su tipo y en `data` un AnalisisStreamChunk en JSON:
+    - **analisis**: GIS, clasificación SEIA y alertas (~1s), sin normativa ni informe
+    - **normativa**: normativa relevante del corpus legal (RAG)
+    - **seccion**: cada sección del informe LLM apenas termina, en orden de llegada
+    - **done**: respuesta completa, igual a la de `POST /analisis`
+    - **error**: el análisis falló; no se envían más eventos
+    """,
+)
+async def analizar_prefactibilidad_stream(
+    input_data: AnalisisPrefactibilidadInput,
+    servicio: ServicioPrefactibilidad = Depends(get_servicio_prefactibilidad),
+) -> StreamingResponse:
+    """Análisis de prefactibilidad con las secciones LLM en streaming."""
+    geojson = {
+        "type": input_data.geometria.type,
+        "coordinates": input_data.geometria.coordinates,
+    }
+
+    async def eventos():
+        # Sesion propia: la de get_db se cierra antes de enviar el cuerpo
+        async with AsyncSessionLocal() as db:
+            try:
+                async for evento in servicio.ejecutar_analisis_stream(
+                    db=db,
+                    geojson=geojson,
+                    datos_proyecto=input_data.proyecto.model_dump(),
+                    generar_informe=input_data.generar_informe_llm,
+                    secciones=input_data.secciones,
+                ):
+                    chunk = _evento_a_chunk(evento, input_data.generar_informe_llm)
+                    yield f"event: {chunk.tipo}\ndata: {chunk.model_dump_json(exclude_none=True)}\n\n"
+            except Exception as e:
+                logger.error(f"Error en análisis de prefactibilidad (stream): {e}", exc_info=True)
+                chunk = AnalisisStreamChunk(tipo="error", error=f"Error en el análisis: {str(e)}")
+                yield f"event: error\ndata: {chunk.model_dump_json(exclude_none=True)}\n\n"
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # Evitar buffering en nginx
+        },
+    )
+
+
 @router.post(
     "/analisis-rapido",
     response_model=AnalisisPrefactibilidadResponse,
@@ -261,6 +326,38 @@ async def obtener_secciones_disponibles() -> dict[str, Any]:
     }
 
 
+@router.get(
+    "/cache-secciones/metricas",
+    summary="Métricas de la caché de secciones del informe",
+    description="Aciertos, fallos y tokens ahorrados por la caché de secciones LLM en este proceso.",
+)
+async def metricas_cache_secciones() -> dict[str, Any]:
+    """Métricas de la caché de secciones."""
+    return get_cache_secciones().metricas()
+
+
+@router.delete(
+    "/cache-secciones",
+    summary="Invalidar la caché de secciones del informe",
+    description="""
+    Elimina las secciones LLM cacheadas, de una sección o de todas.
+
+    Úselo tras cambios que no se reflejan en el prompt renderizado
+    (p.ej. correcciones manuales de un informe ya generado).
+    """,
+)
+async def invalidar_cache_secciones(
+    seccion: Optional[SeccionInforme] = Query(None, description="Sección a invalidar (todas si se omite)"),
+) -> dict[str, Any]:
+    """Invalida la caché de secciones."""
+    eliminadas = await get_cache_secciones().invalidar(seccion.value if seccion else None)
+    return {
+        "mensaje": "Caché de secciones invalidada",
+        "seccion": seccion.value if seccion else None,
+        "eliminadas": eliminadas,
+    }
+
+
 @router.get(
     "/matriz-decision",
     summary="Obtiene configuración de la matriz de decisión",
@@ -353,54 +450,6 @@ async def obtener_formatos_exportacion() -> dict[str, Any]:
     return {"formatos": exportador.obtener_formatos_disponibles()}
 
 
-# === Helpers para endpoint integrado ===
-
-async def _buscar_normativa_contextual(
-    db: AsyncSession,
-    buscador: BuscadorLegal,
-    clasificacion,
-    alertas: list,
-) -> list[dict]:
-    """
-    Busca normativa relevante basada en el contexto del análisis.
-    """
-    try:
-        normativa = []
-
-        # Buscar por triggers detectados
-        for trigger in clasificacion.triggers[:3]:
-            query = f"Art. 11 letra {trigger.letra.value} {trigger.descripcion}"
-            resultados = await buscador.buscar(db, query, limite=3)
-            for r in resultados:
-                normativa.append({
-                    "contenido": r.contenido,
-                    "documento": r.documento_titulo,
-                    "seccion": r.seccion,
-                    "relevancia": f"Trigger {trigger.letra.value}",
-                })
-
-        # Buscar por componentes ambientales afectados
-        componentes_query = set()
-        for alerta in alertas[:5]:
-            for comp in alerta.componentes_afectados:
-                componentes_query.add(comp.value.replace("_", " "))
-
-        for comp in list(componentes_query)[:3]:
-            resultados = await buscador.buscar(db, f"normativa {comp}", limite=2)
-            for r in resultados:
-                normativa.append({
-                    "contenido": r.contenido,
-                    "documento": r.documento_titulo,
-                    "seccion": r.seccion,
-                    "relevancia": f"Componente: {comp}",
-                })
-
-        return normativa
-    except Exception as e:
-        logger.warning(f"Error buscando normativa contextual: {e}")
-        return []
-
-
 # === Endpoint Integrado con Persistencia y Auditoria ===
 
 @router.post(
@@ -437,241 +486,23 @@ async def _buscar_normativa_contextual(
 async def analisis_integrado(
     input_data: AnalisisIntegradoInput,
     db: AsyncSession = Depends(get_db),
-    buscador: BuscadorLegal = Depends(get_buscador_legal),
-    motor_reglas: MotorReglasSSEIA = Depends(get_motor_reglas),
-    sistema_alertas: SistemaAlertas = Depends(get_sistema_alertas),
-    generador: GeneradorInformes = Depends(get_generador_informes),
+    servicio: ServicioPrefactibilidad = Depends(get_servicio_prefactibilidad),
 ) -> AnalisisIntegradoResponse:
     """
     Endpoint de analisis integrado con persistencia y auditoria.
-    """
-    inicio_total = time.time()
-    logger.info(f"Iniciando analisis integrado para proyecto_id={input_data.proyecto_id}")
-
-    # 1. Cargar proyecto desde BD
-    result = await db.execute(
-        select(Proyecto).where(Proyecto.id == input_data.proyecto_id)
-    )
-    proyecto = result.scalar()
-
-    if not proyecto:
-        raise HTTPException(404, f"Proyecto con id={input_data.proyecto_id} no encontrado")
-
-    if not proyecto.geom:
-        raise HTTPException(
-            400,
-            "El proyecto no tiene geometria definida. Dibuje un poligono antes de analizar."
-        )
-
-    if proyecto.estado == "archivado":
-        raise HTTPException(400, "No se puede analizar un proyecto archivado")
 
-    # 2. Convertir geometria a GeoJSON
+    Para ejecutarlo en segundo plano, encole un trabajo `analisis_integrado`
+    con POST /trabajos.
+    """
     try:
-        geom_shape = to_shape(proyecto.geom)
-        geojson = mapping(geom_shape)
-    except Exception as e:
-        logger.error(f"Error convirtiendo geometria: {e}")
-        raise HTTPException(500, f"Error procesando geometria: {e}")
-
-    # 3. Ejecutar analisis espacial GIS
-    inicio_gis = time.time()
-    logger.info("Ejecutando analisis GIS...")
-    resultado_gis = await analizar_proyecto_espacial(db, geojson)
-    tiempo_gis = int((time.time() - inicio_gis) * 1000)
-
-    # 3.1 Extraer ubicacion real desde el analisis GIS (basado en coordenadas)
-    ubicacion_gis = resultado_gis.get("ubicacion", {}) or {}
-    region_detectada = ubicacion_gis.get("region") or proyecto.region
-    comuna_detectada = ubicacion_gis.get("comuna") or proyecto.comuna
-
-    # 4. Preparar datos del proyecto para el motor de reglas
-    # IMPORTANTE: Usar region/comuna detectadas del GIS, no las manuales del proyecto
-    datos_proyecto = {
-        "nombre": proyecto.nombre,
-        "tipo_mineria": proyecto.tipo_mineria,
-        "mineral_principal": proyecto.mineral_principal,
-        "fase": proyecto.fase,
-        "titular": proyecto.titular,
-        "region": region_detectada,
-        "comuna": comuna_detectada,
-        "superficie_ha": float(proyecto.superficie_ha) if proyecto.superficie_ha else None,
-        "produccion_estimada": proyecto.produccion_estimada,
-        "vida_util_anos": proyecto.vida_util_anos,
-        "uso_agua_lps": float(proyecto.uso_agua_lps) if proyecto.uso_agua_lps else None,
-        "fuente_agua": proyecto.fuente_agua,
-        "energia_mw": float(proyecto.energia_mw) if proyecto.energia_mw else None,
-        "trabajadores_construccion": proyecto.trabajadores_construccion,
-        "trabajadores_operacion": proyecto.trabajadores_operacion,
-        "inversion_musd": float(proyecto.inversion_musd) if proyecto.inversion_musd else None,
-        "descripcion": proyecto.descripcion,
-        "requiere_reasentamiento": proyecto.requiere_reasentamiento,
-        "afecta_patrimonio": proyecto.afecta_patrimonio,
-    }
-
-    # 5. Ejecutar motor de reglas SEIA
-    logger.info("Ejecutando motor de reglas SEIA...")
-    clasificacion = motor_reglas.clasificar_proyecto(resultado_gis, datos_proyecto)
-
-    # 6. Generar alertas
-    logger.info("Generando alertas...")
-    alertas = sistema_alertas.generar_alertas(resultado_gis, datos_proyecto)
-    alertas_dict = [a.to_dict() for a in alertas]
-
-    alertas_criticas = sum(1 for a in alertas_dict if a["nivel"] == "CRITICA")
-    alertas_altas = sum(1 for a in alertas_dict if a["nivel"] == "ALTA")
-
-    # 7. Buscar normativa relevante (RAG)
-    inicio_rag = time.time()
-    logger.info("Buscando normativa relevante...")
-    normativa_relevante = await _buscar_normativa_contextual(
-        db, buscador, clasificacion, alertas
-    )
-    tiempo_rag = int((time.time() - inicio_rag) * 1000)
-
-    # 8. Generar informe con LLM (solo si tipo=completo)
-    informe_dict = None
-    tiempo_llm = 0
-    tokens_usados = 0
-
-    if input_data.tipo == "completo":
-        inicio_llm = time.time()
-        logger.info("Generando informe con LLM...")
-
-        secciones_a_generar = None
-        if input_data.secciones:
-            try:
-                secciones_a_generar = [SeccionInforme(s) for s in input_data.secciones]
-            except ValueError as e:
-                raise HTTPException(400, f"Seccion invalida: {e}")
-
-        try:
-            informe = await generador.generar_informe(
-                datos_proyecto=datos_proyecto,
-                resultado_gis=resultado_gis,
-                normativa_relevante=normativa_relevante,
-                secciones_a_generar=secciones_a_generar,
-            )
-            informe_dict = {
-                "secciones": [
-                    {
-                        "seccion": s.seccion.value,
-                        "titulo": s.titulo,
-                        "contenido": s.contenido,
-                    }
-                    for s in informe.secciones
-                ],
-                "texto_completo": informe.to_texto_plano(),
-            }
-            # Estimar tokens (aproximado)
-            tokens_usados = len(informe.to_texto_plano()) // 4
-        except Exception as e:
-            logger.error(f"Error generando informe LLM: {e}")
-            # Continuar sin informe
-            informe_dict = {"error": str(e)}
-
-        tiempo_llm = int((time.time() - inicio_llm) * 1000)
-
-    tiempo_total = int((time.time() - inicio_total) * 1000)
-
-    # 9. Persistir analisis en BD
-    logger.info("Persistiendo analisis en BD...")
-
-    nuevo_analisis = Analisis(
-        proyecto_id=proyecto.id,
-        tipo_analisis=input_data.tipo,
-        resultado_gis=resultado_gis,
-        via_ingreso_recomendada=clasificacion.via_ingreso.value,
-        confianza_clasificacion=clasificacion.confianza,
-        triggers_eia=[
-            {
-                "letra": t.letra.value,
-                "descripcion": t.descripcion,
-                "severidad": t.severidad.value,
-                "peso": t.peso,
-            }
-            for t in clasificacion.triggers
-        ],
-        normativa_relevante=normativa_relevante[:20],
-        informe_texto=informe_dict.get("texto_completo") if informe_dict else None,
-        informe_json=informe_dict,
-        version_modelo=getattr(settings, 'LLM_MODEL', 'claude-sonnet-4-20250514'),
-        tiempo_procesamiento_ms=tiempo_total,
-        datos_extra={
-            "alertas": alertas_dict,
-            "metricas": {
-                "tiempo_gis_ms": tiempo_gis,
-                "tiempo_rag_ms": tiempo_rag,
-                "tiempo_llm_ms": tiempo_llm,
-            }
-        }
-    )
-
-    db.add(nuevo_analisis)
-    await db.flush()  # Para obtener el ID
-
-    # 10. Crear registro de auditoria
-    logger.info("Creando registro de auditoria...")
-
-    checksum = calcular_checksum(proyecto)
-    capas_usadas = extraer_capas_usadas(resultado_gis)
-    normativa_citada = extraer_normativa_citada(clasificacion.triggers, normativa_relevante)
-
-    auditoria = AuditoriaAnalisis(
-        analisis_id=nuevo_analisis.id,
-        capas_gis_usadas=capas_usadas,
-        documentos_referenciados=[],
-        normativa_citada=normativa_citada,
-        checksum_datos_entrada=checksum,
-        version_modelo_llm=getattr(settings, 'LLM_MODEL', 'claude-sonnet-4-20250514') if input_data.tipo == "completo" else None,
-        version_sistema="1.0.0",
-        tiempo_gis_ms=tiempo_gis,
-        tiempo_rag_ms=tiempo_rag,
-        tiempo_llm_ms=tiempo_llm if input_data.tipo == "completo" else None,
-        tokens_usados=tokens_usados if input_data.tipo == "completo" else None,
-    )
-
-    db.add(auditoria)
-
-    # 11. Actualizar estado del proyecto
-    estado_anterior = proyecto.estado
-    if proyecto.estado in ["con_geometria", "completo"]:
-        proyecto.estado = "analizado"
-        logger.info(f"Estado del proyecto actualizado: {estado_anterior} -> analizado")
+        respuesta = await servicio.ejecutar_analisis_integrado(db, input_data)
+    except LookupError as e:
+        raise HTTPException(404, str(e))
+    except ValueError as e:
+        raise HTTPException(400, str(e))
 
     await db.commit()
-    await db.refresh(nuevo_analisis)
-    await db.refresh(auditoria)
-
-    logger.info(
-        f"Analisis integrado completado: analisis_id={nuevo_analisis.id}, "
-        f"auditoria_id={auditoria.id}, tiempo={tiempo_total}ms"
-    )
-
-    return AnalisisIntegradoResponse(
-        analisis_id=nuevo_analisis.id,
-        auditoria_id=auditoria.id,
-        proyecto_id=proyecto.id,
-        fecha_analisis=nuevo_analisis.fecha_analisis,
-        tipo_analisis=input_data.tipo,
-        via_ingreso_recomendada=clasificacion.via_ingreso.value,
-        confianza=clasificacion.confianza,
-        nivel_confianza=clasificacion.nivel_confianza.value,
-        justificacion=clasificacion.justificacion,
-        triggers_detectados=len(clasificacion.triggers),
-        alertas_criticas=alertas_criticas,
-        alertas_altas=alertas_altas,
-        alertas_totales=len(alertas),
-        estado_proyecto=proyecto.estado,
-        metricas=MetricasEjecucion(
-            tiempo_gis_ms=tiempo_gis,
-            tiempo_rag_ms=tiempo_rag,
-            tiempo_llm_ms=tiempo_llm,
-            tiempo_total_ms=tiempo_total,
-            tokens_usados=tokens_usados,
-        ),
-        informe=informe_dict,
-    )
+    return respuesta
 
 
 @router.get(
@@ -0,0 +1,125 @@
+"""
+Endpoints de la cola de trabajos en segundo plano.
+
+Los procesos worker (`python -m app.services.trabajos.worker`) ejecutan
+los trabajos; estos endpoints los encolan y consultan su estado.
+"""
+
+from typing import List, Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query
+
+from app.schemas.trabajos import TipoTrabajoResponse, TrabajoCreate, TrabajoResponse
+from app.services.trabajos import get_cola_trabajos
+from app.services.trabajos.cola import ESTADOS_TERMINALES
+from app.services.trabajos.worker import limites_concurrencia, obtener_ejecutores
+
+router = APIRouter()
+
+
+@router.get(
+    "/tipos",
+    response_model=List[TipoTrabajoResponse],
+    summary="Tipos de trabajo",
+)
+async def listar_tipos_trabajo() -> List[TipoTrabajoResponse]:
+    """Tipos de trabajo con sus etapas, reintentos y límite de concurrencia."""
+    ejecutores = obtener_ejecutores()
+    limites = limites_concurrencia(ejecutores)
+    return [
+        TipoTrabajoResponse(
+            tipo=e.tipo,
+            etapas=[etapa for etapa, _ in e.etapas],
+            reintentos=e.reintentos,
+            limite_concurrencia=limites.get(e.tipo),
+            encolable_por_api=e.encolable_por_api,
+        )
+        for e in ejecutores
+    ]
+
+
+@router.post(
+    "",
+    response_model=TrabajoResponse,
+    status_code=202,
+    summary="Encolar un trabajo",
+    description="""
+    Encola un trabajo y responde de inmediato. Consulte el avance en
+    `GET /trabajos/{trabajo_id}`.
+
+    Con el header `Idempotency-Key`, repetir la solicitud retorna el trabajo
+    ya encolado con esa clave (pendiente, en proceso o completado) en lugar
+    de crear otro. Un trabajo fallido o cancelado libera la clave.
+    """,
+)
+async def encolar_trabajo(
+    solicitud: TrabajoCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=200),
+) -> TrabajoResponse:
+    """Valida los parámetros del tipo y encola el trabajo."""
+    ejecutor = next((e for e in obtener_ejecutores() if e.tipo == solicitud.tipo), None)
+    if ejecutor is None:
+        raise HTTPException(status_code=400, detail=f"Tipo de trabajo desconocido: {solicitud.tipo}")
+    if not ejecutor.encolable_por_api:
+        raise HTTPException(status_code=400, detail=f"El tipo {solicitud.tipo} no se encola por este endpoint")
+
+    try:
+        parametros = ejecutor.validar_parametros(solicitud.parametros)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Parámetros inválidos: {e}")
+
+    trabajo = await get_cola_trabajos().encolar(solicitud.tipo, parametros, idempotency_key)
+    return TrabajoResponse(**trabajo.to_dict())
+
+
+@router.get(
+    "",
+    response_model=List[TrabajoResponse],
+    summary="Listar trabajos",
+)
+async def listar_trabajos(
+    tipo: Optional[str] = Query(None),
+    estado: Optional[str] = Query(None),
+    limite: int = Query(50, ge=1, le=200),
+) -> List[TrabajoResponse]:
+    """Lista los trabajos más recientes, opcionalmente por tipo y estado."""
+    trabajos = await get_cola_trabajos().listar(tipo=tipo, estado=estado, limite=limite)
+    return [TrabajoResponse(**t.to_dict()) for t in trabajos]
+
+
+@router.get(
+    "/{trabajo_id}",
+    response_model=TrabajoResponse,
+    summary="Estado de un trabajo",
+)
+async def obtener_trabajo(trabajo_id: int) -> TrabajoResponse:
+    """Obtiene el estado, el progreso y el resultado de un trabajo."""
+    trabajo = await get_cola_trabajos().obtener(trabajo_id)
+    if not trabajo:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return TrabajoResponse(**trabajo.to_dict())
+
+
+@router.post(
+    "/{trabajo_id}/cancelar",
+    response_model=TrabajoResponse,
+    summary="Cancelar un trabajo",
+    description="""
+    Cancela un trabajo. Si está pendiente se cancela de inmediato; si está en
+    proceso, el worker lo interrumpe en su siguiente latido.
+    """,
+)
+async def cancelar_trabajo(trabajo_id: int) -> TrabajoResponse:
+    """Solicita la cancelación de un trabajo."""
+    cola = get_cola_trabajos()
+    trabajo = await cola.obtener(trabajo_id)
+    if not trabajo:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    if trabajo.estado in ESTADOS_TERMINALES:
+        raise HTTPException(
+            status_code=409,
+            detail=f"El trabajo ya terminó (estado: {trabajo.estado})"
+        )
+
+    trabajo = await cola.solicitar_cancelacion(trabajo_id)
+    return TrabajoResponse(**trabajo.to_dict())
@@ -29,6 +29,8 @@ from app.api.v1.endpoints import (
     generacion,
     # Proceso Evaluacion SEIA (Gestor ICSARA/Adendas)
     proceso_evaluacion,
+    # Trabajos en segundo plano
+    trabajos,
 )
 
 api_router = APIRouter()
@@ -186,3 +188,13 @@ api_router.include_router(
     prefix="/proceso-evaluacion",
     tags=["Proceso Evaluacion SEIA"],
 )
+
+# ============================================================================
+# Trabajos en segundo plano (cola persistente y workers)
+# ============================================================================
+
+api_router.include_router(
+    trabajos.router,
+    prefix="/trabajos",
+    tags=["Trabajos en Segundo Plano"],
+)
@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Dict, Literal
 
 
 class Settings(BaseSettings):
@@ -19,6 +20,33 @@ class Settings(BaseSettings):
     ANTHROPIC_API_KEY: str = ""
     LLM_MODEL: str = "claude-sonnet-4-20250514"
     LLM_MAX_TOKENS: int = 4096
+    LLM_BASE_URL: str = ""  # Vacío = API de Anthropic; permite apuntar al stub local
+    TELEMETRIA_LLM_VOLCADO_SEGUNDOS: int = 60  # Cada cuánto se persisten los agregados de uso de LLM
+    # Limitador de tasa compartido (Redis) para las llamadas a Anthropic
+    LLM_LIMITE_HABILITADO: bool = True
+    LLM_LIMITE_RPM: int = 50  # Solicitudes por minuto de la organización
+    LLM_LIMITE_TPM: int = 80000  # Tokens (entrada + salida) por minuto
+    LLM_LIMITE_REINTENTOS_429: int = 2  # Reintentos tras pausar por un 429
+    # Pool HTTP compartido por los clientes asíncronos de Anthropic
+    ANTHROPIC_POOL_CONEXIONES: int = 50
+    ANTHROPIC_POOL_KEEPALIVE: int = 20
+    ANTHROPIC_POOL_KEEPALIVE_SEGUNDOS: float = 60.0
+
+    # Enrutamiento LLM: "estatico" (tabla por tipo de tarea) o "latencia"
+    LLM_ROUTER_MODO: Literal["estatico", "latencia"] = "estatico"
+    LLM_MODELO_RAPIDO: str = "claude-3-5-haiku-20241022"  # Destino de las tareas degradables fuera de presupuesto
+    LLM_ROUTER_VENTANA_SEGUNDOS: float = 300.0  # Ventana móvil de latencia y errores por modelo
+    LLM_ROUTER_MAX_MUESTRAS: int = 200  # Llamadas recordadas por modelo
+    LLM_ROUTER_MIN_MUESTRAS: int = 5  # Bajo esto no se decide con estadísticas
+    LLM_ROUTER_TASA_ERROR_DEGRADADO: float = 0.5  # Tasa de error que marca un modelo como degradado
+    LLM_ROUTER_PRESUPUESTO_BUSQUEDA_MS: int = 60000  # p95 sobre esto degrada Perplexity
+
+    # Informes de prefactibilidad
+    INFORME_CACHE_HABILITADO: bool = True  # Caché en Redis de secciones LLM por hash del prompt
+    INFORME_CACHE_TTL_DIAS: int = 30
+
+    # Generación de documentos EIA
+    GENERACION_EIA_CONCURRENCIA: int = 3  # Capítulos generados en paralelo al compilar
 
     # OCR con Claude Vision
     OCR_VISION_ENABLED: bool = True
@@ -26,12 +54,29 @@ class Settings(BaseSettings):
     OCR_MIN_TEXT_THRESHOLD: int = 100  # Caracteres mínimos antes de usar OCR
     OCR_MAX_PAGES: int = 50  # Máximo de páginas a procesar con OCR
     OCR_IMAGE_DPI: int = 200  # DPI para conversión PDF a imagen
+    OCR_MAX_DIMENSION: int = 1568  # Lado mayor de la imagen enviada a Vision (px)
+    OCR_CONCURRENCIA: int = 4  # Páginas enviadas a Vision en paralelo
+    OCR_REINTENTOS: int = 3  # Reintentos por página ante rate limit o error transitorio
+    OCR_VISION_BASE_URL: str = ""  # Vacío = API de Anthropic; permite apuntar a un stub
+    OCR_CACHE_TTL_DIAS: int = 90  # Vigencia del texto OCR cacheado por hash de imagen
+
+    # Extracción de texto de PDFs
+    PDF_EXTRACCION_PROCESOS: int = 0  # 0 = un proceso por CPU
+    PDF_EXTRACCION_PAGINAS_POR_BLOQUE: int = 16
+    PDF_EXTRACCION_MIN_PAGINAS_PARALELO: int = 32  # Bajo esto se extrae en el mismo proceso
+    PDF_PAGINA_MIN_CARACTERES: int = 20  # Bajo esto la página se considera sin texto
 
     # LLM - Perplexity
     PERPLEXITY_API_KEY: str = ""
     PERPLEXITY_DEFAULT_MODEL: str = "sonar-pro"
+    PERPLEXITY_BASE_URL: str = ""  # Vacío = API de Perplexity; permite apuntar al stub local
     PERPLEXITY_TIMEOUT_SECONDS: int = 120
     PERPLEXITY_ENABLED: bool = True
+    PERPLEXITY_CACHE_HABILITADO: bool = True
+    PERPLEXITY_CACHE_TTL_SEGUNDOS: float = 3600.0
+    PERPLEXITY_CACHE_OBSOLETO_SEGUNDOS: float = 86400.0  # Ventana stale-while-revalidate tras el TTL
+    PERPLEXITY_CACHE_MAX_ENTRADAS: int = 500
+    PERPLEXITY_CACHE_SWR: bool = True
 
     # GIS
     DEFAULT_SRID: int = 4326
@@ -44,7 +89,42 @@ class Settings(BaseSettings):
     # RAG
     EMBEDDING_MODEL: str = "paraphrase-multilingual-MiniLM-L12-v2"
     EMBEDDING_DIMENSION: int = 384
+    # Tipo de las columnas de embeddings: "halfvec" (float16, migración 014) o "vector" (float32)
+    EMBEDDING_ALMACENAMIENTO: Literal["vector", "halfvec"] = "vector"
     RAG_TOP_K: int = 10
+    RAG_FRAGMENTO_MAX_TOKENS: int = 400  # Tamaño máximo de fragmento (tokens estimados)
+    RAG_CLASIFICACION_LOTE: int = 8  # Fragmentos por llamada al LLM al ingestar
+    RAG_CLASIFICACION_CONCURRENCIA: int = 4  # Llamadas simultáneas de clasificación
+    RAG_CLASIFICACION_REINTENTOS: int = 2  # Reintentos por paquete fallido
+    RAG_CACHE_HABILITADO: bool = True  # Caché de resultados de búsqueda por versión del corpus
+    RAG_CACHE_MAX_ENTRADAS: int = 1000
+    RAG_CACHE_TTL_SEGUNDOS: int = 3600
+
+    # Asistente IA
+    ASISTENTE_TOOLS_CONCURRENCIA: int = 4  # Herramientas de solo lectura ejecutadas en paralelo
+    ASISTENTE_TOOL_RESULT_MAX_BYTES: int = 16000  # Tope del JSON de cada resultado de herramienta
+    ASISTENTE_MEMO_HABILITADO: bool = True  # Memo de herramientas de lectura por conversacion
+    ASISTENTE_MEMO_MAX_ENTRADAS: int = 2000
+    ASISTENTE_HISTORIAL_MAX_TOKENS: int = 12000  # Presupuesto del historial enviado por turno
+    ASISTENTE_HISTORIAL_TURNOS_COMPLETOS: int = 3  # Turnos recientes sin truncar resultados de herramientas
+    ASISTENTE_HISTORIAL_TOOL_RESULT_TOKENS: int = 300  # Tope por resultado de herramienta en turnos antiguos
+    ASISTENTE_RESUMEN_MODELO: str = "claude-3-5-haiku-20241022"  # Modelo del resumen acumulado
+    ASISTENTE_RESUMEN_MAX_TOKENS: int = 600
+    ASISTENTE_PRECARGA_HABILITADA: bool = True  # Búsquedas probables del proyecto lanzadas al cargar su contexto
+    ASISTENTE_PRECARGA_MAX_CONSULTAS: int = 8
+    ASISTENTE_PRECARGA_INTERVALO_SEGUNDOS: int = 1800  # No volver a precargar un proyecto antes de esto
+    ASISTENTE_PRESUPUESTO_LATENCIA_MS: int = 0  # Presupuesto de los turnos simples (0 = sin enrutamiento)
+    ASISTENTE_TURNO_SIMPLE_MAX_CARACTERES: int = 200  # Mensajes globales hasta este largo son turnos simples
+
+    # Trabajos en segundo plano (cola en PostgreSQL)
+    TRABAJOS_POLL_SEGUNDOS: float = 2.0  # Espera entre consultas cuando la cola está vacía
+    TRABAJOS_HEARTBEAT_SEGUNDOS: int = 10  # Frecuencia del latido de un trabajo en curso
+    TRABAJOS_TIMEOUT_HEARTBEAT_SEGUNDOS: int = 120  # Sin latido por este tiempo = worker caído
+    TRABAJOS_MAX_INTENTOS: int = 3  # Reclamos máximos de un trabajo antes de marcarlo error
+    TRABAJOS_CONCURRENCIA_WORKER: int = 2  # Trabajos simultáneos por proceso worker
+    TRABAJOS_BACKOFF_BASE_SEGUNDOS: float = 30.0  # Espera del primer reintento; se duplica en cada uno
+    TRABAJOS_BACKOFF_MAX_SEGUNDOS: float = 900.0
+    TRABAJOS_LIMITES_CONCURRENCIA: Dict[str, int] = {}  # Por tipo entre todos los workers (0 = sin límite); reemplaza el del ejecutor
 
     # Uploads
     UPLOAD_DIR: str = "/var/www/mineria/uploads"
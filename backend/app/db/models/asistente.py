@@ -75,6 +75,10 @@ class Conversacion(Base):
     )
     vista_actual = Column(String(50), default="dashboard")
     activa = Column(Boolean, default=True, index=True)
+
+    # Resumen acumulado de los mensajes que ya no entran en el historial
+    resumen = Column(Text, nullable=True)
+    resumen_hasta = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), default=datetime.utcnow)
     updated_at = Column(DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow)
     datos_extra = Column(JSONB, default=dict)
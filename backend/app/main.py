@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
@@ -6,6 +7,10 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
 from app.api.v1.router import api_router
+from app.services.llm.limitador import cerrar_limitador_llm
+from app.services.llm.pool_anthropic import cerrar_pool_anthropic
+from app.services.llm.telemetria import bucle_volcado
+from app.services.pdf import cerrar_pool
 from app.services.startup import inicializar_aplicacion
 
 logger = logging.getLogger(__name__)
@@ -17,10 +22,17 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Iniciando aplicación...")
     await inicializar_aplicacion()
+    detener_telemetria = asyncio.Event()
+    volcado_telemetria = asyncio.create_task(bucle_volcado(detener_telemetria))
     logger.info("Aplicación lista")
     yield
     # Shutdown
     logger.info("Cerrando aplicación...")
+    detener_telemetria.set()
+    await volcado_telemetria
+    await cerrar_pool_anthropic()
+    await cerrar_limitador_llm()
+    cerrar_pool()
 
 
 app = FastAPI(
@@ -248,6 +248,7 @@ class ChatStreamChunk(BaseModel):
     tool_call: Optional[ToolCall] = None
     tool_result: Optional[dict] = None
     error: Optional[str] = None
+    respuesta: Optional[ChatResponse] = None  # Solo en el chunk 'done'
 
 
 # =============================================================================
@@ -317,6 +318,8 @@ class ContextoAsistente(BaseModel):
     proyecto_estado: Optional[str] = None
     proyecto_tiene_geometria: bool = False
     proyecto_tiene_analisis: bool = False
+    # Consultas de buscar_normativa precargadas del ultimo analisis
+    consultas_precargadas: List[str] = []
 
     # Vista actual
     vista_actual: str = "dashboard"
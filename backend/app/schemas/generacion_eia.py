@@ -166,6 +166,7 @@ class CompilarDocumentoRequest(BaseModel):
     """Request para compilar documento completo."""
     incluir_capitulos: Optional[List[int]] = None  # Si es None, incluye todos
     regenerar_existentes: bool = False
+    reanudar: bool = False  # Retoma la última compilación incompleta, omitiendo sus capítulos completados
 
 
 class ProgresoGeneracion(BaseModel):
@@ -184,6 +185,8 @@ class GeneracionResponse(BaseModel):
     documento_id: int
     capitulos_generados: List[int]
     capitulos_con_error: List[int]
+    capitulos_omitidos: List[int] = []  # Completados antes en la compilación reanudada
+    compilacion_id: Optional[str] = None
     tiempo_total_segundos: float
     estadisticas: EstadisticasDocumento
 
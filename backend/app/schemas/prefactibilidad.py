@@ -3,7 +3,7 @@ Schemas Pydantic para Análisis de Prefactibilidad Ambiental.
 
 Extraídos de endpoints/prefactibilidad.py para mejor organización.
 """
-from typing import Any, Optional
+from typing import Any, Literal, Optional
 from pydantic import BaseModel, Field
 
 
@@ -136,6 +136,15 @@ class AnalisisPrefactibilidadResponse(BaseModel):
     metricas: dict
 
 
+class AnalisisStreamChunk(BaseModel):
+    """Evento del análisis de prefactibilidad en streaming."""
+    tipo: Literal["analisis", "normativa", "seccion", "done", "error"]
+    analisis: Optional[AnalisisPrefactibilidadResponse] = None  # Parcial en 'analisis', completo en 'done'
+    normativa: Optional[list[dict]] = None
+    seccion: Optional[SeccionInformeResponse] = None
+    error: Optional[str] = None
+
+
 class AnalisisRapidoResponse(BaseModel):
     """Respuesta del análisis rápido (sin LLM)."""
     via_ingreso_recomendada: str
@@ -0,0 +1,48 @@
+"""
+Schemas Pydantic para la cola de trabajos en segundo plano.
+"""
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, Field
+
+
+class TrabajoCreate(BaseModel):
+    """Solicitud para encolar un trabajo."""
+    tipo: str = Field(..., description="Tipo de trabajo (ver GET /trabajos/tipos)")
+    parametros: Dict[str, Any] = Field(default_factory=dict, description="Entrada del trabajo")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "tipo": "exportacion_eia",
+                "parametros": {"proyecto_id": 12, "formato": "pdf"}
+            }
+        }
+
+
+class TrabajoResponse(BaseModel):
+    """Estado de un trabajo."""
+    id: int
+    tipo: str
+    estado: str
+    etapa_actual: Optional[str] = None
+    etapas_completadas: List[str] = []
+    progreso: int
+    resultado: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    cancelacion_solicitada: bool = False
+    intentos: int = 0
+    reintentos: int = 0
+    clave_idempotencia: Optional[str] = None
+    disponible_desde: Optional[str] = None
+    created_at: Optional[str] = None
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+
+
+class TipoTrabajoResponse(BaseModel):
+    """Tipo de trabajo que ejecutan los workers."""
+    tipo: str
+    etapas: List[str]
+    reintentos: int
+    limite_concurrencia: Optional[int] = None
+    encolable_por_api: bool
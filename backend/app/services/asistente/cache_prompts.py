@@ -0,0 +1,92 @@
+"""
+Prompt caching para las llamadas del asistente.
+
+El prefijo de cada llamada del loop de tool use es estable: definiciones de
+herramientas, system prompt (base + contexto del proyecto) y el historial
+anterior. Se marcan breakpoints de cache en ese orden para que la API
+reutilice el prefijo ya procesado y solo cobre completos los tokens nuevos.
+
+La API admite como maximo 4 breakpoints por llamada: ultima herramienta,
+system base, contexto y ultimo mensaje del historial.
+"""
+import copy
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+CACHE_EFIMERO = {"type": "ephemeral"}
+
+
+def marcar_tools(tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Copia de las herramientas con breakpoint en la ultima (cachea todas)."""
+    if not tools:
+        return tools
+    marcadas = list(tools)
+    marcadas[-1] = {**marcadas[-1], "cache_control": CACHE_EFIMERO}
+    return marcadas
+
+
+def construir_system(base: str, contexto: str) -> List[Dict[str, Any]]:
+    """
+    System prompt en bloques con breakpoint tras cada uno.
+
+    La parte base cambia solo con el proyecto; el contexto (estado del
+    proyecto, acciones pendientes) puede cambiar entre turnos, por lo que
+    va en un bloque aparte para no invalidar la base.
+    """
+    bloques = [{"type": "text", "text": base, "cache_control": CACHE_EFIMERO}]
+    if contexto:
+        bloques.append({"type": "text", "text": contexto, "cache_control": CACHE_EFIMERO})
+    return bloques
+
+
+def marcar_historial(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Copia del historial con breakpoint en el ultimo bloque del ultimo mensaje.
+
+    No modifica la lista original: el loop agrega mensajes en cada
+    iteracion y los breakpoints anteriores excederian el limite de la API.
+    """
+    if not messages:
+        return messages
+    ultimo = messages[-1]
+    contenido = ultimo["content"]
+    if isinstance(contenido, str):
+        bloques = [{"type": "text", "text": contenido}]
+    else:
+        bloques = copy.copy(list(contenido))
+    if not bloques:
+        return messages
+    bloques[-1] = {**bloques[-1], "cache_control": CACHE_EFIMERO}
+    return messages[:-1] + [{**ultimo, "content": bloques}]
+
+
+@dataclass
+class UsoTokens:
+    """Tokens de entrada y salida acumulados de las llamadas de un turno."""
+    input_sin_cache: int = 0
+    cache_escritura: int = 0
+    cache_lectura: int = 0
+    output: int = 0
+    llamadas: int = 0
+
+    def registrar(self, usage: Any):
+        """Suma el `usage` de una respuesta de la API."""
+        self.input_sin_cache += getattr(usage, "input_tokens", 0) or 0
+        self.cache_escritura += getattr(usage, "cache_creation_input_tokens", 0) or 0
+        self.cache_lectura += getattr(usage, "cache_read_input_tokens", 0) or 0
+        self.output += getattr(usage, "output_tokens", 0) or 0
+        self.llamadas += 1
+
+    @property
+    def input_total(self) -> int:
+        """Tokens de entrada procesados, con y sin cache."""
+        return self.input_sin_cache + self.cache_escritura + self.cache_lectura
+
+    def to_dict(self) -> Dict[str, int]:
+        return {
+            "input_sin_cache": self.input_sin_cache,
+            "cache_escritura": self.cache_escritura,
+            "cache_lectura": self.cache_lectura,
+            "output": self.output,
+            "llamadas": self.llamadas,
+        }
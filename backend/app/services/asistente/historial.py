@@ -0,0 +1,200 @@
+"""
+Historial de conversacion acotado por tokens.
+
+El historial se arma por turnos (un mensaje del usuario y los mensajes de
+asistente y herramientas que le siguen), para no separar nunca un tool_use
+de su tool_result. Los turnos recientes van completos; en los anteriores
+los resultados de herramientas se truncan. Los turnos que no caben en el
+presupuesto salen del historial y se incorporan al resumen acumulado de la
+conversacion, de modo que los tokens de entrada por turno quedan acotados
+sin importar el largo de la conversacion.
+"""
+import json
+import math
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+from app.db.models.asistente import Mensaje
+from app.services.rag.segmentador import estimar_tokens
+
+MARCA_TRUNCADO = " [... resultado truncado]"
+
+
+def truncar_tokens(texto: str, max_tokens: int) -> str:
+    """Recorta un texto a aproximadamente `max_tokens` tokens."""
+    tokens = estimar_tokens(texto)
+    if tokens <= max_tokens:
+        return texto
+    return texto[:math.floor(len(texto) * max_tokens / tokens)] + MARCA_TRUNCADO
+
+
+def mensaje_a_anthropic(msg: Mensaje, max_tokens_tool: int = 0) -> Dict[str, Any]:
+    """
+    Convierte un Mensaje guardado al formato de mensajes de Anthropic.
+
+    Args:
+        msg: Mensaje de la base de datos
+        max_tokens_tool: Si es mayor que 0, trunca los resultados de herramientas
+    """
+    if msg.rol == "user":
+        return {"role": "user", "content": msg.contenido}
+
+    if msg.rol == "assistant":
+        # Si hay tool_calls, siempre usar el formato de lista para content
+        # para asegurar que los tool_use blocks se incluyan correctamente
+        if not msg.tool_calls:
+            return {"role": "assistant", "content": msg.contenido or ""}
+        content = []
+        if msg.contenido:
+            content.append({"type": "text", "text": msg.contenido})
+        for tc in msg.tool_calls:
+            content.append({
+                "type": "tool_use",
+                "id": tc.get("id"),
+                "name": tc.get("name"),
+                "input": tc.get("input", {}),
+            })
+        return {"role": "assistant", "content": content}
+
+    contenido = msg.contenido
+    if max_tokens_tool:
+        contenido = truncar_tokens(contenido, max_tokens_tool)
+    return {
+        "role": "user",
+        "content": [{
+            "type": "tool_result",
+            "tool_use_id": msg.tool_call_id,
+            "content": contenido,
+        }],
+    }
+
+
+def tokens_mensaje(mensaje: Dict[str, Any]) -> int:
+    """Tokens estimados de un mensaje en formato Anthropic."""
+    contenido = mensaje["content"]
+    if isinstance(contenido, str):
+        return estimar_tokens(contenido)
+    total = 0
+    for bloque in contenido:
+        if bloque["type"] == "text":
+            total += estimar_tokens(bloque["text"])
+        elif bloque["type"] == "tool_use":
+            total += estimar_tokens(json.dumps(bloque["input"], ensure_ascii=False)) + 10
+        else:
+            total += estimar_tokens(str(bloque.get("content", "")))
+    return total
+
+
+@dataclass
+class Turno:
+    """Mensaje del usuario y los mensajes que le siguen hasta el proximo."""
+    mensajes: List[Mensaje] = field(default_factory=list)
+
+    def a_anthropic(self, max_tokens_tool: int = 0) -> List[Dict[str, Any]]:
+        return [mensaje_a_anthropic(m, max_tokens_tool) for m in self.mensajes]
+
+    def tokens(self, max_tokens_tool: int = 0) -> int:
+        return sum(tokens_mensaje(m) for m in self.a_anthropic(max_tokens_tool))
+
+    def como_texto(self, max_tokens_tool: int) -> str:
+        """Transcripcion legible del turno, para el resumidor."""
+        lineas = []
+        for msg in self.mensajes:
+            if msg.rol == "user":
+                lineas.append(f"Usuario: {msg.contenido}")
+            elif msg.rol == "assistant":
+                if msg.contenido:
+                    lineas.append(f"Asistente: {msg.contenido}")
+                for tc in msg.tool_calls or []:
+                    lineas.append(
+                        f"Asistente usa {tc.get('name')}: "
+                        f"{json.dumps(tc.get('input', {}), ensure_ascii=False)}"
+                    )
+            else:
+                lineas.append(f"Resultado {msg.tool_name}: {truncar_tokens(msg.contenido, max_tokens_tool)}")
+        return "\n".join(lineas)
+
+
+def agrupar_turnos(mensajes: List[Mensaje]) -> List[Turno]:
+    """
+    Agrupa mensajes en orden cronologico por turno.
+
+    Los mensajes previos al primer mensaje de usuario (p.ej. si el limite de
+    filas corto un turno) se descartan: sin su tool_use, los tool_result
+    serian rechazados por la API.
+    """
+    turnos: List[Turno] = []
+    for msg in mensajes:
+        if msg.rol == "user":
+            turnos.append(Turno())
+        if turnos:
+            turnos[-1].mensajes.append(msg)
+    return turnos
+
+
+@dataclass
+class SeleccionHistorial:
+    """Turnos que entran en el prompt y turnos que pasan al resumen."""
+    mensajes: List[Dict[str, Any]]
+    salientes: List[Turno]
+    tokens: int
+
+
+def seleccionar_turnos(
+    turnos: List[Turno],
+    max_tokens: int,
+    turnos_completos: int,
+    max_tokens_tool: int,
+    fraccion_objetivo: float = 1.0,
+) -> SeleccionHistorial:
+    """
+    Elige, de mas reciente a mas antiguo, los turnos que caben en el presupuesto.
+
+    Los ultimos `turnos_completos` turnos van completos; los anteriores con
+    resultados de herramientas truncados. El ultimo turno siempre se incluye
+    (truncado si no cabe completo). Si el historial no cabe, solo se
+    conservan turnos hasta `fraccion_objetivo` del presupuesto: dejar margen
+    evita que cada turno nuevo vuelva a desbordar y dispare otro resumen.
+
+    Args:
+        turnos: Turnos en orden cronologico
+        max_tokens: Presupuesto de tokens del historial
+        turnos_completos: Turnos recientes sin truncar
+        max_tokens_tool: Tokens maximos por resultado de herramienta truncado
+        fraccion_objetivo: Fraccion del presupuesto a ocupar tras desbordar
+
+    Returns:
+        SeleccionHistorial con los mensajes en formato Anthropic y los
+        turnos salientes en orden cronologico
+    """
+    costos = []
+    for indice, turno in enumerate(turnos):
+        reciente = indice >= len(turnos) - turnos_completos
+        costo = turno.tokens() if reciente else turno.tokens(max_tokens_tool)
+        costos.append((costo, 0 if reciente else max_tokens_tool))
+
+    limite = max_tokens
+    if sum(c for c, _ in costos) > max_tokens:
+        limite = int(max_tokens * fraccion_objetivo)
+
+    usados = 0
+    inicio = len(turnos)
+    for indice in range(len(turnos) - 1, -1, -1):
+        costo = costos[indice][0]
+        if usados + costo > limite and indice < len(turnos) - 1:
+            break
+        usados += costo
+        inicio = indice
+
+    mensajes = []
+    for indice in range(inicio, len(turnos)):
+        truncado = costos[indice][1]
+        if indice == len(turnos) - 1 and costos[indice][0] > limite:
+            truncado = max_tokens_tool
+        mensajes.extend(turnos[indice].a_anthropic(truncado))
+
+    return SeleccionHistorial(
+        mensajes=mensajes,
+        salientes=turnos[:inicio],
+        tokens=sum(tokens_mensaje(m) for m in mensajes),
+    )
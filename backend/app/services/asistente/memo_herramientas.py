@@ -0,0 +1,207 @@
+"""
+Memo de resultados de herramientas de solo lectura por conversacion.
+
+Dentro de una conversacion el modelo repite llamadas identicas (el mismo
+proyecto, la misma configuracion de industria). El memo guarda el
+resultado por (conversacion, herramienta, parametros canonicos) con el TTL
+que declara cada herramienta.
+
+Cada entrada se sella con las generaciones de los recursos que la
+herramienta lee (Herramienta.recursos_memo). Las generaciones viven en la
+conversacion (datos_extra.memo_generaciones) y una herramienta de
+escritura incrementa las de los recursos que modifica; asi la invalidacion
+vale para todos los procesos del backend, aunque el memo sea local a cada
+uno. La generacion COMODIN se incluye en todas las entradas: la
+incrementan las escrituras que no declaran que recursos modifican.
+"""
+
+import copy
+import inspect
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+
+from .tools import Herramienta, ResultadoHerramienta
+
+logger = logging.getLogger(__name__)
+
+COMODIN = "*"
+
+
+async def obtener_generaciones(db: AsyncSession, conversacion_id: UUID) -> Dict[str, int]:
+    """Generaciones actuales de los recursos de una conversacion."""
+    result = await db.execute(
+        text("SELECT datos_extra->'memo_generaciones' FROM asistente.conversaciones WHERE id = :id"),
+        {"id": conversacion_id},
+    )
+    return dict(result.scalar() or {})
+
+
+async def incrementar_generaciones(
+    db: AsyncSession,
+    conversacion_id: UUID,
+    recursos: Iterable[str],
+) -> Dict[str, int]:
+    """
+    Incrementa en la base las generaciones de los recursos dados.
+
+    El incremento es atomico (se calcula en el mismo UPDATE), por lo que
+    escrituras concurrentes no pierden invalidaciones.
+
+    Returns:
+        Generaciones resultantes de la conversacion
+    """
+    result = await db.execute(
+        text("""
+            UPDATE asistente.conversaciones
+            SET datos_extra = jsonb_set(
+                COALESCE(datos_extra, '{}'::jsonb),
+                '{memo_generaciones}',
+                COALESCE(datos_extra->'memo_generaciones', '{}'::jsonb) || (
+                    SELECT jsonb_object_agg(
+                        recurso,
+                        COALESCE((datos_extra->'memo_generaciones'->>recurso)::bigint, 0) + 1
+                    )
+                    FROM unnest(CAST(:recursos AS text[])) AS recurso
+                )
+            )
+            WHERE id = :id
+            RETURNING datos_extra->'memo_generaciones'
+        """),
+        {"id": conversacion_id, "recursos": sorted(set(recursos))},
+    )
+    return dict(result.scalar() or {})
+
+
+def clave_memo(herramienta: Herramienta, parametros: Dict[str, Any]) -> str:
+    """
+    Clave canonica de una llamada.
+
+    Completa los valores por defecto de `ejecutar` y omite los None, para
+    que `{"top_k": 8}` y `{}` (con top_k=8 por defecto) sean la misma
+    llamada; el orden de claves no importa.
+    """
+    defaults = {
+        nombre: p.default
+        for nombre, p in inspect.signature(type(herramienta).ejecutar).parameters.items()
+        if p.default is not inspect.Parameter.empty and nombre != "db"
+    }
+    canonicos = {k: v for k, v in {**defaults, **parametros}.items() if v is not None}
+    return f"{herramienta.nombre}:{json.dumps(canonicos, sort_keys=True, ensure_ascii=False, default=str)}"
+
+
+def es_memoizable(herramienta: Herramienta) -> bool:
+    return bool(herramienta.ttl_memo_segundos) and herramienta.es_solo_lectura()
+
+
+@dataclass
+class _Entrada:
+    resultado: ResultadoHerramienta
+    generaciones: Dict[str, int]
+    expira_en: float
+
+
+class MemoHerramientas:
+    """Memo LRU con TTL por entrada, invalidado por generaciones de recursos."""
+
+    def __init__(self, max_entradas: Optional[int] = None):
+        self.max_entradas = max_entradas or settings.ASISTENTE_MEMO_MAX_ENTRADAS
+        self._entradas: "OrderedDict[Tuple[UUID, str], _Entrada]" = OrderedDict()
+        self._metricas = {
+            "aciertos": 0,
+            "fallos": 0,
+            "expiradas": 0,
+            "invalidadas": 0,
+            "desalojadas": 0,
+        }
+
+    @staticmethod
+    def _sello(recursos: List[str], generaciones: Dict[str, int]) -> Dict[str, int]:
+        return {r: generaciones.get(r, 0) for r in [COMODIN, *recursos]}
+
+    def obtener(
+        self,
+        conversacion_id: UUID,
+        herramienta: Herramienta,
+        clave: str,
+        generaciones: Dict[str, int],
+    ) -> Optional[ResultadoHerramienta]:
+        """Copia del resultado memoizado si sigue vigente."""
+        entrada = self._entradas.get((conversacion_id, clave))
+        if entrada is None:
+            self._metricas["fallos"] += 1
+            return None
+
+        if entrada.generaciones != self._sello(herramienta.recursos_memo, generaciones):
+            motivo = "invalidadas"
+        elif entrada.expira_en <= time.monotonic():
+            motivo = "expiradas"
+        else:
+            self._entradas.move_to_end((conversacion_id, clave))
+            self._metricas["aciertos"] += 1
+            resultado = copy.deepcopy(entrada.resultado)
+            resultado.metadata["memo"] = True
+            return resultado
+
+        del self._entradas[(conversacion_id, clave)]
+        self._metricas[motivo] += 1
+        self._metricas["fallos"] += 1
+        return None
+
+    def guardar(
+        self,
+        conversacion_id: UUID,
+        herramienta: Herramienta,
+        clave: str,
+        generaciones: Dict[str, int],
+        resultado: ResultadoHerramienta,
+    ):
+        """Guarda un resultado exitoso sellado con las generaciones leidas antes de ejecutar."""
+        if not resultado.exito:
+            return
+        self._entradas[(conversacion_id, clave)] = _Entrada(
+            resultado=copy.deepcopy(resultado),
+            generaciones=self._sello(herramienta.recursos_memo, generaciones),
+            expira_en=time.monotonic() + herramienta.ttl_memo_segundos,
+        )
+        self._entradas.move_to_end((conversacion_id, clave))
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+            self._metricas["desalojadas"] += 1
+
+    def limpiar(self):
+        """Elimina todas las entradas y reinicia las metricas."""
+        self._entradas.clear()
+        for nombre in self._metricas:
+            self._metricas[nombre] = 0
+
+    def metricas(self) -> Dict[str, Any]:
+        """Contadores de uso y tasa de aciertos."""
+        consultas = self._metricas["aciertos"] + self._metricas["fallos"]
+        return {
+            **self._metricas,
+            "consultas": consultas,
+            "tasa_aciertos": round(self._metricas["aciertos"] / consultas, 4) if consultas else 0.0,
+            "entradas": len(self._entradas),
+            "max_entradas": self.max_entradas,
+        }
+
+
+_memo_herramientas: Optional[MemoHerramientas] = None
+
+
+def get_memo_herramientas() -> MemoHerramientas:
+    """Obtiene la instancia singleton del memo de herramientas."""
+    global _memo_herramientas
+    if _memo_herramientas is None:
+        _memo_herramientas = MemoHerramientas()
+    return _memo_herramientas
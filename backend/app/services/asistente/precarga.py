@@ -0,0 +1,156 @@
+"""
+Precarga especulativa de normativa para conversaciones de proyecto.
+
+Con un proyecto activo, lo primero que suele hacer el modelo es llamar
+buscar_normativa por los triggers del Art. 11 y los componentes del
+checklist del ultimo analisis. Al cargar el contexto del proyecto se
+lanzan esas busquedas en segundo plano con la misma herramienta, asi sus
+resultados quedan en la cache de busqueda (espacio "asistente", sellada
+con la version del corpus) y cuando el modelo pide la misma consulta la
+respuesta ya esta. Las consultas se listan en el contexto del prompt para
+que el modelo use el mismo texto.
+
+Un proyecto no se vuelve a precargar antes de
+ASISTENTE_PRECARGA_INTERVALO_SEGUNDOS. Como la cache que llena, la
+precarga es local a cada proceso.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.services.componentes_eia.service import COMPONENTES_EIA
+
+from .tools import registro_herramientas
+
+logger = logging.getLogger(__name__)
+
+
+def consultas_precarga(
+    triggers: Optional[List[Dict[str, Any]]],
+    componentes: Optional[List[str]],
+    max_consultas: Optional[int] = None,
+) -> List[str]:
+    """
+    Consultas de buscar_normativa probables para un proyecto.
+
+    Args:
+        triggers: Triggers del ultimo analisis (Analisis.triggers_eia)
+        componentes: Claves de los componentes pendientes del checklist
+
+    Returns:
+        Consultas sin repetir: primero los triggers de mayor peso, luego
+        la primera consulta RAG de cada componente
+    """
+    max_consultas = max_consultas or settings.ASISTENTE_PRECARGA_MAX_CONSULTAS
+    consultas: List[str] = []
+
+    for trigger in sorted(triggers or [], key=lambda t: -(t.get("peso") or 0)):
+        letra = trigger.get("letra")
+        if letra:
+            consultas.append(f"Art. 11 letra {letra} Ley 19.300 {trigger.get('descripcion', '')}".strip())
+
+    for componente in componentes or []:
+        definicion = COMPONENTES_EIA.get(componente)
+        if definicion and definicion.get("queries_rag"):
+            consultas.append(definicion["queries_rag"][0])
+
+    return list(dict.fromkeys(consultas))[:max_consultas]
+
+
+class PrecargaNormativa:
+    """Lanza en segundo plano las busquedas probables de cada proyecto."""
+
+    def __init__(self, session_factory=None, intervalo_segundos: Optional[float] = None):
+        self.session_factory = session_factory or AsyncSessionLocal
+        self.intervalo_segundos = (
+            intervalo_segundos if intervalo_segundos is not None else settings.ASISTENTE_PRECARGA_INTERVALO_SEGUNDOS
+        )
+        self._ultima: Dict[int, float] = {}
+        self._tareas: Set[asyncio.Task] = set()
+        self._metricas = {
+            "lanzadas": 0,
+            "omitidas": 0,
+            "consultas": 0,
+            "errores": 0,
+        }
+
+    def lanzar(self, proyecto_id: int, consultas: List[str]) -> bool:
+        """
+        Precarga las consultas del proyecto si no se hizo hace poco.
+
+        Returns:
+            True si se lanzo la precarga
+        """
+        if not consultas:
+            return False
+        ultima = self._ultima.get(proyecto_id)
+        if ultima is not None and time.monotonic() - ultima < self.intervalo_segundos:
+            self._metricas["omitidas"] += 1
+            return False
+
+        self._ultima[proyecto_id] = time.monotonic()
+        self._metricas["lanzadas"] += 1
+        tarea = asyncio.create_task(self._precargar(proyecto_id, consultas))
+        self._tareas.add(tarea)
+        tarea.add_done_callback(self._tareas.discard)
+        return True
+
+    async def _precargar(self, proyecto_id: int, consultas: List[str]):
+        """Ejecuta buscar_normativa por cada consulta, cada una con su sesion."""
+        semaforo = asyncio.Semaphore(settings.ASISTENTE_TOOLS_CONCURRENCIA)
+
+        async def buscar(query: str):
+            async with semaforo, self.session_factory() as db:
+                herramienta = registro_herramientas.crear_instancia("buscar_normativa")
+                try:
+                    resultado = await herramienta.ejecutar(query=query, db=db)
+                finally:
+                    await db.rollback()
+            self._metricas["consultas"] += 1
+            if not resultado.exito:
+                self._metricas["errores"] += 1
+                logger.warning(f"Precarga de normativa fallida (proyecto {proyecto_id}): {resultado.error}")
+
+        inicio = time.perf_counter()
+        resultados = await asyncio.gather(*(buscar(q) for q in consultas), return_exceptions=True)
+        for query, resultado in zip(consultas, resultados):
+            if isinstance(resultado, Exception):
+                self._metricas["consultas"] += 1
+                self._metricas["errores"] += 1
+                logger.warning(
+                    f"Precarga de normativa fallida (proyecto {proyecto_id}, consulta '{query}'): {resultado}"
+                )
+        logger.info(
+            f"Normativa precargada para proyecto {proyecto_id}: {len(consultas)} consultas "
+            f"en {int((time.perf_counter() - inicio) * 1000)}ms"
+        )
+
+    async def esperar(self):
+        """Espera las precargas en curso."""
+        if self._tareas:
+            await asyncio.gather(*self._tareas, return_exceptions=True)
+
+    def limpiar(self):
+        """Olvida los proyectos precargados y reinicia las metricas (no cancela las en curso)."""
+        self._ultima.clear()
+        for nombre in self._metricas:
+            self._metricas[nombre] = 0
+
+    def metricas(self) -> Dict[str, Any]:
+        """Contadores de precargas y consultas."""
+        return {**self._metricas, "en_curso": len(self._tareas), "proyectos": len(self._ultima)}
+
+
+_precarga_normativa: Optional[PrecargaNormativa] = None
+
+
+def get_precarga_normativa() -> PrecargaNormativa:
+    """Obtiene la instancia singleton de la precarga de normativa."""
+    global _precarga_normativa
+    if _precarga_normativa is None:
+        _precarga_normativa = PrecargaNormativa()
+    return _precarga_normativa
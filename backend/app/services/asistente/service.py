@@ -4,11 +4,13 @@ Servicio principal del Asistente IA.
 Implementa el agente conversacional con soporte para tool use,
 manejo de contexto, memoria y confirmacion de acciones.
 """
+import asyncio
 import logging
 import time
 import re
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Union
 from uuid import UUID, uuid4
 
 import anthropic
@@ -18,6 +20,10 @@ from sqlalchemy import select, desc, func, update
 from sqlalchemy.orm import selectinload
 
 from app.core.config import settings
+from app.services.llm.pool_anthropic import get_cliente_anthropic
+from app.services.llm.router import TipoTarea, get_llm_router
+from app.services.llm.telemetria import operacion_llm
+from app.db.session import AsyncSessionLocal
 from app.db.models.asistente import (
     Conversacion,
     Mensaje,
@@ -32,6 +38,7 @@ from app.db.models import Proyecto, Cliente
 from app.schemas.asistente import (
     ChatRequest,
     ChatResponse,
+    ChatStreamChunk,
     MensajeResponse,
     AccionPendienteResponse,
     ConfirmacionAccion,
@@ -42,6 +49,18 @@ from app.schemas.asistente import (
     ToolResult,
     TipoAccion,
 )
+from .cache_prompts import UsoTokens, construir_system, marcar_historial, marcar_tools
+from .historial import agrupar_turnos, mensaje_a_anthropic, seleccionar_turnos, truncar_tokens
+from .memo_herramientas import (
+    COMODIN,
+    MemoHerramientas,
+    clave_memo,
+    es_memoizable,
+    get_memo_herramientas,
+    incrementar_generaciones,
+    obtener_generaciones,
+)
+from .precarga import consultas_precarga, get_precarga_normativa
 from .tools import (
     registro_herramientas,
     ResultadoHerramienta,
@@ -174,8 +193,22 @@ Estos documentos contienen la interpretacion OFICIAL del SEA con datos especific
 NUNCA respondas sobre normativa desde tu conocimiento general.
 """
 
+PROMPT_RESUMEN_HISTORIAL = """Actualiza el resumen de una conversacion entre un usuario y el asistente de evaluacion ambiental.
+
+RESUMEN ACTUAL:
+{resumen_previo}
+
+MENSAJES NUEVOS A INCORPORAR:
+{transcripcion}
+
+Escribe el resumen actualizado en espanol, en maximo 250 palabras. Conserva los datos concretos
+(proyectos, IDs, ubicaciones, normas citadas, decisiones y acciones ejecutadas o pendientes) y
+omite saludos y detalles ya irrelevantes. Responde solo con el resumen."""
+
 MAX_TOOL_ITERATIONS = 10
 MAX_CONTEXT_MESSAGES = 20
+MAX_HISTORIAL_FILAS = 200  # Mensajes no resumidos leidos por turno
+HISTORIAL_FRACCION_TRAS_RESUMEN = 0.6  # Margen que deja el resumen para los turnos siguientes
 CONTEXT_WINDOW_TOKENS = 150000  # Reservar margen del limite de 200k
 
 # Patrones de seguridad para sanitizacion
@@ -284,14 +317,27 @@ class GestorContexto:
                 contexto.proyecto_estado = proyecto.estado
                 contexto.proyecto_tiene_geometria = proyecto.geom is not None
 
-                # Verificar si tiene analisis
+                # Ultimo analisis: triggers y componentes pendientes del checklist
                 from sqlalchemy import text
                 result = await self.db.execute(
-                    text("SELECT COUNT(*) FROM proyectos.analisis WHERE proyecto_id = :id"),
+                    text("""
+                        SELECT a.triggers_eia,
+                               ARRAY(
+                                   SELECT c.componente FROM proyectos.componentes_eia_checklist c
+                                   WHERE c.proyecto_id = a.proyecto_id AND c.estado <> 'completado'
+                                   ORDER BY c.capitulo, c.id
+                               ) AS componentes
+                        FROM proyectos.analisis a
+                        WHERE a.proyecto_id = :id
+                        ORDER BY a.fecha_analisis DESC, a.id DESC
+                        LIMIT 1
+                    """),
                     {"id": proyecto_id}
                 )
-                count = result.scalar()
-                contexto.proyecto_tiene_analisis = count > 0
+                ultimo_analisis = result.first()
+                contexto.proyecto_tiene_analisis = ultimo_analisis is not None
+                if ultimo_analisis is not None:
+                    self._precargar_normativa(contexto, ultimo_analisis.triggers_eia, ultimo_analisis.componentes)
 
         # Contar acciones pendientes
         result = await self.db.execute(
@@ -303,6 +349,20 @@ class GestorContexto:
 
         return contexto
 
+    def _precargar_normativa(
+        self,
+        contexto: ContextoAsistente,
+        triggers: Optional[List[Dict[str, Any]]],
+        componentes: Optional[List[str]],
+    ):
+        """Lanza la precarga de las busquedas probables y las anota en el contexto."""
+        if not (settings.ASISTENTE_PRECARGA_HABILITADA and settings.RAG_CACHE_HABILITADO):
+            return
+        consultas = consultas_precarga(triggers, componentes)
+        if consultas:
+            get_precarga_normativa().lanzar(contexto.proyecto_id, consultas)
+            contexto.consultas_precargadas = consultas
+
     def construir_prompt_contexto(self, contexto: ContextoAsistente) -> str:
         """
         Construye la seccion de contexto para el system prompt.
@@ -326,6 +386,13 @@ class GestorContexto:
 
             if not contexto.proyecto_tiene_geometria:
                 partes.append("  NOTA: El proyecto necesita geometria para ejecutar analisis")
+
+            if contexto.consultas_precargadas:
+                partes.append(
+                    "  - Normativa ya consultada para el ultimo analisis "
+                    "(buscar_normativa con estas consultas exactas responde de inmediato):"
+                )
+                partes.extend(f"    - {consulta}" for consulta in contexto.consultas_precargadas)
         else:
             partes.append("- No hay proyecto activo seleccionado")
 
@@ -345,10 +412,124 @@ class GestorContexto:
 # =============================================================================
 
 class GestorMemoria:
-    """Gestiona la memoria de conversacion a corto y largo plazo."""
+    """
+    Gestiona la memoria de conversacion a corto y largo plazo.
+
+    Los mensajes del turno no se escriben uno a uno: guardar_mensaje los
+    acumula en orden y volcar() los inserta en un solo flush (al confirmar
+    la transaccion o antes de pausar por una confirmacion). Cada mensaje
+    recibe su id y un created_at estrictamente creciente al encolarse, de
+    modo que el orden del historial (tool_use antes de su tool_result) no
+    depende del momento de la escritura.
+    """
 
-    def __init__(self, db: AsyncSession):
+    def __init__(
+        self,
+        db: AsyncSession,
+        resumidor: Optional[Callable[[Optional[str], str], Awaitable[str]]] = None,
+    ):
+        """
+        Args:
+            db: Sesion de base de datos
+            resumidor: Funcion (resumen_previo, transcripcion) -> resumen nuevo;
+                sin ella los turnos antiguos se descartan sin resumir
+        """
         self.db = db
+        self.resumidor = resumidor
+        self._pendientes: List[Mensaje] = []
+        self._ultima_marca: Optional[datetime] = None
+
+    def _marca_tiempo(self) -> datetime:
+        """created_at estrictamente creciente dentro del proceso."""
+        marca = datetime.utcnow()
+        if self._ultima_marca is not None and marca <= self._ultima_marca:
+            marca = self._ultima_marca + timedelta(microseconds=1)
+        self._ultima_marca = marca
+        return marca
+
+    @property
+    def pendientes(self) -> List[Mensaje]:
+        """Mensajes encolados que aun no se escribieron."""
+        return list(self._pendientes)
+
+    async def volcar(self) -> int:
+        """
+        Escribe los mensajes pendientes en un solo flush.
+
+        Los ids y created_at ya vienen asignados, por lo que SQLAlchemy los
+        agrupa en un INSERT multi-fila en lugar de un round-trip por mensaje.
+
+        Returns:
+            Numero de mensajes escritos
+        """
+        if not self._pendientes:
+            return 0
+        pendientes, self._pendientes = self._pendientes, []
+        self.db.add_all(pendientes)
+        await self.db.flush()
+        logger.debug(f"Mensajes escritos en lote: {len(pendientes)}")
+        return len(pendientes)
+
+    async def construir_historial(self, conversacion: Conversacion) -> List[Dict[str, Any]]:
+        """
+        Historial en formato Anthropic dentro del presupuesto de tokens.
+
+        Solo lee los mensajes posteriores al resumen de la conversacion. Los
+        turnos que no caben se incorporan al resumen (conversacion.resumen)
+        y dejan de leerse en los turnos siguientes.
+
+        Args:
+            conversacion: Conversacion activa
+
+        Returns:
+            Lista de mensajes en formato Anthropic
+        """
+        filtros = [Mensaje.conversacion_id == conversacion.id]
+        if conversacion.resumen_hasta:
+            filtros.append(Mensaje.created_at > conversacion.resumen_hasta)
+        result = await self.db.execute(
+            select(Mensaje)
+            .where(*filtros)
+            .order_by(desc(Mensaje.created_at))
+            .limit(MAX_HISTORIAL_FILAS)
+        )
+        mensajes_db = list(reversed(result.scalars().all()))
+        # Los mensajes aun no escritos del turno tambien forman parte del historial
+        mensajes_db.extend(m for m in self._pendientes if m.conversacion_id == conversacion.id)
+
+        seleccion = seleccionar_turnos(
+            agrupar_turnos(mensajes_db),
+            max_tokens=settings.ASISTENTE_HISTORIAL_MAX_TOKENS,
+            turnos_completos=settings.ASISTENTE_HISTORIAL_TURNOS_COMPLETOS,
+            max_tokens_tool=settings.ASISTENTE_HISTORIAL_TOOL_RESULT_TOKENS,
+            fraccion_objetivo=HISTORIAL_FRACCION_TRAS_RESUMEN,
+        )
+        if seleccion.salientes:
+            await self._actualizar_resumen(conversacion, seleccion.salientes)
+
+        logger.debug(
+            f"Historial de {conversacion.id}: {len(seleccion.mensajes)} mensajes, "
+            f"~{seleccion.tokens} tokens, {len(seleccion.salientes)} turnos al resumen"
+        )
+        return seleccion.mensajes
+
+    async def _actualizar_resumen(self, conversacion: Conversacion, salientes) -> None:
+        """Incorpora los turnos salientes al resumen acumulado."""
+        if self.resumidor is None:
+            return
+        transcripcion = truncar_tokens(
+            "\n\n".join(t.como_texto(settings.ASISTENTE_HISTORIAL_TOOL_RESULT_TOKENS) for t in salientes),
+            settings.ASISTENTE_HISTORIAL_MAX_TOKENS,
+        )
+        try:
+            resumen = await self.resumidor(conversacion.resumen, transcripcion)
+        except Exception as e:
+            # Sin avanzar resumen_hasta: se reintenta en el proximo turno
+            logger.warning(f"No se pudo resumir el historial de {conversacion.id}: {e}")
+            return
+        if resumen:
+            conversacion.resumen = resumen
+            conversacion.resumen_hasta = salientes[-1].mensajes[-1].created_at
 
     async def obtener_historial(
         self,
@@ -374,55 +555,7 @@ class GestorMemoria:
         mensajes_db = result.scalars().all()
 
         # Invertir para orden cronologico
-        mensajes_db = list(reversed(mensajes_db))
-
-        mensajes = []
-        for msg in mensajes_db:
-            if msg.rol == "user":
-                mensajes.append({
-                    "role": "user",
-                    "content": msg.contenido,
-                })
-            elif msg.rol == "assistant":
-                content = []
-                # Agregar contenido de texto
-                if msg.contenido:
-                    content.append({
-                        "type": "text",
-                        "text": msg.contenido,
-                    })
-                # Agregar tool_use si existe
-                if msg.tool_calls:
-                    for tc in msg.tool_calls:
-                        content.append({
-                            "type": "tool_use",
-                            "id": tc.get("id"),
-                            "name": tc.get("name"),
-                            "input": tc.get("input", {}),
-                        })
-                # Si hay tool_calls, siempre usar el formato de lista para content
-                # para asegurar que los tool_use blocks se incluyan correctamente
-                if msg.tool_calls:
-                    mensajes.append({
-                        "role": "assistant",
-                        "content": content,
-                    })
-                else:
-                    mensajes.append({
-                        "role": "assistant",
-                        "content": msg.contenido or "",
-                    })
-            elif msg.rol == "tool":
-                mensajes.append({
-                    "role": "user",
-                    "content": [{
-                        "type": "tool_result",
-                        "tool_use_id": msg.tool_call_id,
-                        "content": msg.contenido,
-                    }],
-                })
-
-        return mensajes
+        return [mensaje_a_anthropic(msg) for msg in reversed(mensajes_db)]
 
     async def guardar_mensaje(
         self,
@@ -437,9 +570,10 @@ class GestorMemoria:
         tokens_output: Optional[int] = None,
         latencia_ms: Optional[int] = None,
         modelo_usado: Optional[str] = None,
+        datos_extra: Optional[Dict[str, Any]] = None,
     ) -> Mensaje:
         """
-        Guarda un mensaje en la base de datos.
+        Encola un mensaje para guardarlo en la base de datos con volcar().
 
         Args:
             conversacion_id: ID de la conversacion
@@ -453,11 +587,14 @@ class GestorMemoria:
             tokens_output: Tokens de salida generados
             latencia_ms: Latencia en milisegundos
             modelo_usado: Modelo LLM usado
+            datos_extra: Metadatos adicionales (p.ej. desglose de tokens cacheados)
 
         Returns:
-            Mensaje creado
+            Mensaje creado, con id y created_at ya asignados
         """
         mensaje = Mensaje(
+            id=uuid4(),
+            created_at=self._marca_tiempo(),
             conversacion_id=conversacion_id,
             rol=rol,
             contenido=contenido,
@@ -469,9 +606,9 @@ class GestorMemoria:
             tokens_output=tokens_output,
             latencia_ms=latencia_ms,
             modelo_usado=modelo_usado,
+            datos_extra=datos_extra or {},
         )
-        self.db.add(mensaje)
-        await self.db.flush()
+        self._pendientes.append(mensaje)
         return mensaje
 
 
@@ -482,8 +619,134 @@ class GestorMemoria:
 class EjecutorHerramientas:
     """Ejecuta herramientas y maneja acciones pendientes."""
 
-    def __init__(self, db: AsyncSession):
+    def __init__(
+        self,
+        db: AsyncSession,
+        session_factory=None,
+        memo: Optional[MemoHerramientas] = None,
+    ):
         self.db = db
+        # Sesiones propias para herramientas de solo lectura en paralelo
+        self.session_factory = session_factory or AsyncSessionLocal
+        # La sesion principal tiene escrituras sin confirmar: las lecturas
+        # posteriores deben verlas, por lo que ya no se paralelizan
+        self._escrituras_en_turno = False
+        self.memo = memo or (get_memo_herramientas() if settings.ASISTENTE_MEMO_HABILITADO else None)
+        # Generaciones de recursos de la conversacion, leidas una vez por turno
+        self._generaciones: Dict[UUID, Dict[str, int]] = {}
+
+    async def _generaciones_memo(self, conversacion_id: UUID) -> Dict[str, int]:
+        if conversacion_id not in self._generaciones:
+            self._generaciones[conversacion_id] = await obtener_generaciones(self.db, conversacion_id)
+        return self._generaciones[conversacion_id]
+
+    async def _memo_obtener(
+        self, tool_name: str, tool_input: Dict[str, Any], conversacion_id: UUID
+    ) -> Optional[ResultadoHerramienta]:
+        """Resultado memoizado de la llamada, si la herramienta lo admite y sigue vigente."""
+        herramienta = registro_herramientas.obtener(tool_name)
+        if self.memo is None or not herramienta or not es_memoizable(herramienta):
+            return None
+        return self.memo.obtener(
+            conversacion_id, herramienta, clave_memo(herramienta, tool_input),
+            await self._generaciones_memo(conversacion_id),
+        )
+
+    async def _memo_guardar(
+        self,
+        tool_name: str,
+        tool_input: Dict[str, Any],
+        conversacion_id: UUID,
+        generaciones: Dict[str, int],
+        resultado: ResultadoHerramienta,
+    ):
+        herramienta = registro_herramientas.obtener(tool_name)
+        if self.memo is None or not herramienta or not es_memoizable(herramienta):
+            return
+        self.memo.guardar(conversacion_id, herramienta, clave_memo(herramienta, tool_input), generaciones, resultado)
+
+    async def _invalidar_memo(self, tool_name: str, conversacion_id: UUID):
+        """Invalida, para todos los procesos, el memo de los recursos que modifica la herramienta."""
+        if self.memo is None:
+            return
+        herramienta = registro_herramientas.obtener(tool_name)
+        recursos = herramienta.invalida_memo if herramienta and herramienta.invalida_memo is not None else [COMODIN]
+        self._generaciones[conversacion_id] = await incrementar_generaciones(
+            self.db, conversacion_id, recursos
+        )
+
+    async def ejecutar_tools(
+        self,
+        llamadas: List[Tuple[str, Dict[str, Any]]],
+        conversacion_id: UUID,
+        proyecto_id: Optional[int] = None,
+    ) -> List[Tuple[ResultadoHerramienta, Optional[AccionPendiente]]]:
+        """
+        Ejecuta las herramientas pedidas por el modelo en una misma respuesta.
+
+        Las llamadas consecutivas a herramientas de solo lectura se ejecutan
+        en paralelo, cada una con su propia sesion del pool. Las de escritura
+        y las que requieren confirmacion se ejecutan en serie sobre la sesion
+        principal, en su posicion original.
+
+        Args:
+            llamadas: Lista de (tool_name, tool_input) en el orden del modelo
+            conversacion_id: ID de la conversacion
+            proyecto_id: ID del proyecto (desde contexto)
+
+        Returns:
+            Resultados en el mismo orden que las llamadas
+        """
+        resultados: List[Optional[Tuple[ResultadoHerramienta, Optional[AccionPendiente]]]] = [None] * len(llamadas)
+        lote: List[int] = []
+
+        async def ejecutar_lote():
+            if len(lote) == 1:
+                nombre, entrada = llamadas[lote[0]]
+                resultados[lote[0]] = await self.ejecutar_tool(nombre, entrada, conversacion_id, proyecto_id)
+            elif lote:
+                semaforo = asyncio.Semaphore(settings.ASISTENTE_TOOLS_CONCURRENCIA)
+
+                async def ejecutar(indice: int) -> ResultadoHerramienta:
+                    async with semaforo:
+                        return await self._ejecutar_aislada(*llamadas[indice])
+
+                salidas = await asyncio.gather(*(ejecutar(i) for i in lote), return_exceptions=True)
+                for indice, salida in zip(lote, salidas):
+                    if isinstance(salida, BaseException):
+                        raise salida
+                    resultados[indice] = (salida, None)
+                    await self._memo_guardar(*llamadas[indice], conversacion_id, generaciones, salida)
+            lote.clear()
+
+        generaciones: Dict[str, int] = {}
+
+        for indice, (nombre, entrada) in enumerate(llamadas):
+            herramienta = registro_herramientas.obtener(nombre)
+            if herramienta and herramienta.es_solo_lectura() and not self._escrituras_en_turno:
+                memoizado = await self._memo_obtener(nombre, entrada, conversacion_id)
+                if memoizado is not None:
+                    resultados[indice] = (memoizado, None)
+                    continue
+                generaciones = dict(self._generaciones.get(conversacion_id, {}))
+                lote.append(indice)
+                continue
+            await ejecutar_lote()
+            nombre, entrada = llamadas[indice]
+            resultados[indice] = await self.ejecutar_tool(nombre, entrada, conversacion_id, proyecto_id)
+        await ejecutar_lote()
+
+        return resultados
+
+    async def _ejecutar_aislada(self, tool_name: str, tool_input: Dict[str, Any]) -> ResultadoHerramienta:
+        """Ejecuta una herramienta de solo lectura con instancia y sesion propias."""
+        async with self.session_factory() as db:
+            herramienta = registro_herramientas.crear_instancia(tool_name)
+            herramienta.set_db(db)
+            try:
+                return await herramienta.ejecutar(**tool_input, db=db)
+            finally:
+                await db.rollback()
 
     async def ejecutar_tool(
         self,
@@ -566,9 +829,22 @@ class EjecutorHerramientas:
                 metadata={"requiere_confirmacion": True}
             ), accion
 
+        # Lecturas repetidas en la conversacion
+        memoizado = await self._memo_obtener(tool_name, tool_input, conversacion_id)
+        if memoizado is not None:
+            return memoizado, None
+        generaciones = dict(self._generaciones.get(conversacion_id, {}))
+
         # Ejecutar directamente
+        if not herramienta.es_solo_lectura():
+            self._escrituras_en_turno = True
         herramienta.set_db(self.db)
         resultado = await herramienta.ejecutar(**tool_input, db=self.db)
+
+        if herramienta.es_solo_lectura():
+            await self._memo_guardar(tool_name, tool_input, conversacion_id, generaciones, resultado)
+        else:
+            await self._invalidar_memo(tool_name, conversacion_id)
         return resultado, None
 
     async def _crear_accion_pendiente(
@@ -673,6 +949,7 @@ class EjecutorHerramientas:
 
             herramienta.set_db(self.db)
             resultado = await herramienta.ejecutar(**accion.parametros, db=self.db)
+            await self._invalidar_memo(accion.tipo, accion.conversacion_id)
 
             if resultado.exito:
                 accion.estado = "ejecutada"
@@ -708,6 +985,28 @@ class EjecutorHerramientas:
 # Servicio Principal del Asistente
 # =============================================================================
 
+@dataclass
+class _TurnoChat:
+    """Datos de un turno de chat listos para el loop de tool use."""
+    conversacion: Conversacion
+    contexto: ContextoAsistente
+    system_prompt: Union[str, List[Dict[str, Any]]]
+    historial: List[Dict[str, Any]]
+    tools: List[Dict[str, Any]]
+    modelo: str = field(default_factory=lambda: settings.LLM_MODEL)
+
+
+@dataclass
+class _EstadoLoop:
+    """Resultado acumulado del loop de tool use."""
+    modelo: str = field(default_factory=lambda: settings.LLM_MODEL)
+    respuesta: str = ""
+    tool_calls: List[ToolCall] = field(default_factory=list)
+    fuentes: List[FuenteCitada] = field(default_factory=list)
+    accion_pendiente: Optional[AccionPendiente] = None
+    uso: UsoTokens = field(default_factory=UsoTokens)
+
+
 class AsistenteService:
     """
     Servicio principal del Asistente IA.
@@ -725,7 +1024,7 @@ class AsistenteService:
         """
         self.db = db
         self.gestor_contexto = GestorContexto(db)
-        self.gestor_memoria = GestorMemoria(db)
+        self.gestor_memoria = GestorMemoria(db, resumidor=self._resumir_historial)
         self.ejecutor = EjecutorHerramientas(db)
         self._cliente: Optional[anthropic.AsyncAnthropic] = None
 
@@ -736,12 +1035,18 @@ class AsistenteService:
             api_key = settings.ANTHROPIC_API_KEY
             if not api_key:
                 raise ValueError("ANTHROPIC_API_KEY no configurada")
-            self._cliente = anthropic.AsyncAnthropic(
+            self._cliente = get_cliente_anthropic(
+                "asistente.chat",
                 api_key=api_key,
                 timeout=settings.LLM_TIMEOUT_SECONDS if hasattr(settings, 'LLM_TIMEOUT_SECONDS') else 120,
             )
         return self._cliente
 
+    @property
+    def _mensajes(self):
+        """Endpoint de mensajes con soporte de prompt caching (beta en el SDK)."""
+        return self.cliente.beta.prompt_caching.messages
+
     async def chat(self, request: ChatRequest) -> ChatResponse:
         """
         Procesa un mensaje del usuario y genera una respuesta.
@@ -753,7 +1058,75 @@ class AsistenteService:
             ChatResponse con la respuesta del asistente
         """
         inicio = time.time()
+        turno = await self._preparar_turno(request)
+
+        # Ejecutar loop de tool use
+        estado = _EstadoLoop(modelo=turno.modelo)
+        respuesta_final, tool_calls, fuentes, accion_pendiente = await self._ejecutar_loop_tool_use(
+            system_prompt=turno.system_prompt,
+            messages=turno.historial,
+            tools=turno.tools,
+            conversacion_id=turno.conversacion.id,
+            proyecto_id=request.proyecto_contexto_id,
+            estado=estado,
+        )
+
+        return await self._finalizar_turno(
+            request, turno, respuesta_final, tool_calls, fuentes, accion_pendiente, inicio,
+            uso=estado.uso,
+        )
+
+    async def chat_stream(self, request: ChatRequest) -> AsyncIterator[ChatStreamChunk]:
+        """
+        Procesa un mensaje del usuario emitiendo la respuesta a medida que se genera.
+
+        Emite chunks 'texto' con los deltas del modelo, 'tool_start' y
+        'tool_end' alrededor de cada herramienta y un 'done' final con la
+        respuesta completa (fuentes, accion pendiente y sugerencias). Ante un
+        error emite un chunk 'error' y no guarda la respuesta.
+
+        Args:
+            request: Solicitud de chat
+
+        Yields:
+            ChatStreamChunk en orden de generacion
+        """
+        inicio = time.time()
 
+        try:
+            turno = await self._preparar_turno(request)
+            estado = _EstadoLoop(modelo=turno.modelo)
+            async for chunk in self._iterar_loop_tool_use(
+                system_prompt=turno.system_prompt,
+                messages=turno.historial,
+                tools=turno.tools,
+                conversacion_id=turno.conversacion.id,
+                proyecto_id=request.proyecto_contexto_id,
+                estado=estado,
+                streaming=True,
+            ):
+                yield chunk
+
+            respuesta = await self._finalizar_turno(
+                request, turno, estado.respuesta, estado.tool_calls,
+                estado.fuentes, estado.accion_pendiente, inicio,
+                uso=estado.uso,
+            )
+        except ValueError as e:
+            logger.warning(f"Error de validacion en chat: {e}")
+            await self.db.rollback()
+            yield ChatStreamChunk(tipo="error", error=str(e))
+            return
+        except Exception as e:
+            logger.error(f"Error en chat: {e}")
+            await self.db.rollback()
+            yield ChatStreamChunk(tipo="error", error="Error al procesar el mensaje. Intente nuevamente.")
+            return
+
+        yield ChatStreamChunk(tipo="done", respuesta=respuesta)
+
+    async def _preparar_turno(self, request: ChatRequest) -> "_TurnoChat":
+        """Sanitiza el mensaje, lo guarda y arma prompt, historial y herramientas."""
         try:
             # Sanitizar entrada
             mensaje_sanitizado = SanitizadorEntrada.sanitizar(request.mensaje)
@@ -778,6 +1151,10 @@ class AsistenteService:
             vista_actual=request.vista_actual or "dashboard",
         )
 
+        # Obtener historial acotado; los turnos antiguos van resumidos en el contexto
+        historial = await self.gestor_memoria.construir_historial(conversacion)
+        contexto.resumen_conversacion = conversacion.resumen
+
         # Determinar si es contexto de proyecto o global
         es_contexto_proyecto = (
             request.proyecto_contexto_id is not None or
@@ -786,7 +1163,7 @@ class AsistenteService:
 
         # Construir system prompt segun contexto
         if es_contexto_proyecto and contexto.proyecto_id:
-            system_prompt = SYSTEM_PROMPT_PROYECTO.format(
+            prompt_base = SYSTEM_PROMPT_PROYECTO.format(
                 proyecto_nombre=contexto.proyecto_nombre or "Sin nombre",
                 proyecto_id=contexto.proyecto_id,
                 proyecto_estado=contexto.proyecto_estado or "borrador",
@@ -795,14 +1172,14 @@ class AsistenteService:
             ) + REGLAS_COMUNES
             contexto_herramientas = ContextoHerramienta.PROYECTO
         else:
-            system_prompt = SYSTEM_PROMPT_GLOBAL + REGLAS_COMUNES
+            prompt_base = SYSTEM_PROMPT_GLOBAL + REGLAS_COMUNES
             contexto_herramientas = ContextoHerramienta.GLOBAL
 
-        # Agregar contexto adicional
-        system_prompt += self.gestor_contexto.construir_prompt_contexto(contexto)
-
-        # Obtener historial
-        historial = await self.gestor_memoria.obtener_historial(conversacion.id)
+        # Agregar contexto adicional en un bloque aparte: cambia entre turnos
+        # y no debe invalidar la cache del prompt base
+        system_prompt = construir_system(
+            prompt_base, self.gestor_contexto.construir_prompt_contexto(contexto)
+        )
 
         # Agregar mensaje actual si no esta en historial
         if not historial or historial[-1].get("content") != mensaje_sanitizado:
@@ -814,15 +1191,42 @@ class AsistenteService:
         # Obtener herramientas disponibles filtradas por contexto
         tools = registro_herramientas.obtener_tools_anthropic(contexto=contexto_herramientas)
 
-        # Ejecutar loop de tool use
-        respuesta_final, tool_calls, fuentes, accion_pendiente = await self._ejecutar_loop_tool_use(
+        return _TurnoChat(
+            conversacion=conversacion,
+            contexto=contexto,
             system_prompt=system_prompt,
-            messages=historial,
+            historial=historial,
             tools=tools,
-            conversacion_id=conversacion.id,
-            proyecto_id=request.proyecto_contexto_id,
+            modelo=self._modelo_turno(mensaje_sanitizado, es_contexto_proyecto),
         )
 
+    def _modelo_turno(self, mensaje: str, es_contexto_proyecto: bool) -> str:
+        """
+        Modelo del turno: los turnos simples (mensaje corto fuera de un
+        proyecto) se enrutan como respuesta rapida con el presupuesto de
+        latencia del asistente; el resto usa el modelo por defecto.
+        """
+        presupuesto = settings.ASISTENTE_PRESUPUESTO_LATENCIA_MS
+        if not presupuesto or es_contexto_proyecto or len(mensaje) > settings.ASISTENTE_TURNO_SIMPLE_MAX_CARACTERES:
+            return settings.LLM_MODEL
+        decision = get_llm_router().decidir(TipoTarea.RESPUESTA_RAPIDA, presupuesto_ms=presupuesto)
+        return decision.modelo or settings.LLM_MODEL
+
+    async def _finalizar_turno(
+        self,
+        request: ChatRequest,
+        turno: "_TurnoChat",
+        respuesta_final: str,
+        tool_calls: List[ToolCall],
+        fuentes: List[FuenteCitada],
+        accion_pendiente: Optional[AccionPendiente],
+        inicio: float,
+        uso: Optional[UsoTokens] = None,
+    ) -> ChatResponse:
+        """Guarda la respuesta final, confirma la transaccion y arma el ChatResponse."""
+        conversacion = turno.conversacion
+        contexto = turno.contexto
+
         # Recargar contexto si se ejecutaron herramientas que modifican estado
         # Esto asegura que las sugerencias reflejen el estado actual del proyecto
         herramientas_modificadoras = {'crear_proyecto', 'ejecutar_analisis', 'actualizar_proyecto'}
@@ -849,10 +1253,14 @@ class AsistenteService:
             contenido=respuesta_final,
             tool_calls=None,  # Los tool_calls ya fueron guardados en mensajes intermedios
             fuentes=[f.model_dump() for f in fuentes] if fuentes else None,
+            tokens_input=uso.input_total if uso else None,
+            tokens_output=uso.output if uso else None,
             latencia_ms=latencia_ms,
-            modelo_usado=settings.LLM_MODEL,
+            modelo_usado=turno.modelo,
+            datos_extra={"uso_tokens": uso.to_dict()} if uso else None,
         )
 
+        await self.gestor_memoria.volcar()
         await self.db.commit()
 
         # Construir respuesta
@@ -910,6 +1318,22 @@ class AsistenteService:
         await self.db.flush()
         return conversacion
 
+    async def _resumir_historial(self, resumen_previo: Optional[str], transcripcion: str) -> str:
+        """Actualiza el resumen de la conversacion con los turnos que salen del historial."""
+        with operacion_llm("asistente.resumen"):
+            response = await self._mensajes.create(
+                model=settings.ASISTENTE_RESUMEN_MODELO,
+                max_tokens=settings.ASISTENTE_RESUMEN_MAX_TOKENS,
+                messages=[{
+                    "role": "user",
+                    "content": PROMPT_RESUMEN_HISTORIAL.format(
+                        resumen_previo=resumen_previo or "(sin resumen previo)",
+                        transcripcion=transcripcion,
+                    ),
+                }],
+            )
+        return "".join(b.text for b in response.content if b.type == "text").strip()
+
     def _generar_titulo(self, mensaje: str) -> str:
         """Genera un titulo para la conversacion basado en el primer mensaje."""
         # Tomar las primeras palabras
@@ -921,11 +1345,12 @@ class AsistenteService:
 
     async def _ejecutar_loop_tool_use(
         self,
-        system_prompt: str,
+        system_prompt: Union[str, List[Dict[str, Any]]],
         messages: List[Dict],
         tools: List[Dict],
         conversacion_id: UUID,
         proyecto_id: Optional[int] = None,
+        estado: Optional["_EstadoLoop"] = None,
     ) -> Tuple[str, List[ToolCall], List[FuenteCitada], Optional[AccionPendiente]]:
         """
         Ejecuta el loop de tool use hasta obtener respuesta final.
@@ -936,26 +1361,74 @@ class AsistenteService:
             tools: Herramientas disponibles
             conversacion_id: ID de la conversacion
             proyecto_id: ID del proyecto del contexto (opcional)
+            estado: Acumulador del loop, para leer el uso de tokens (opcional)
 
         Returns:
             Tupla con (respuesta_final, tool_calls, fuentes, accion_pendiente)
         """
-        tool_calls_realizados = []
-        fuentes = []
-        accion_pendiente = None
+        estado = estado or _EstadoLoop()
+        async for _ in self._iterar_loop_tool_use(
+            system_prompt, messages, tools, conversacion_id, proyecto_id, estado
+        ):
+            pass
+        return estado.respuesta, estado.tool_calls, estado.fuentes, estado.accion_pendiente
+
+    async def _iterar_loop_tool_use(
+        self,
+        system_prompt: Union[str, List[Dict[str, Any]]],
+        messages: List[Dict],
+        tools: List[Dict],
+        conversacion_id: UUID,
+        proyecto_id: Optional[int],
+        estado: "_EstadoLoop",
+        streaming: bool = False,
+    ) -> AsyncIterator[ChatStreamChunk]:
+        """
+        Loop de tool use que emite eventos a medida que avanza.
+
+        El resultado (respuesta, tool calls, fuentes, accion pendiente) queda
+        en `estado`. Con streaming=True el modelo se invoca con
+        messages.stream y cada delta de texto se emite apenas llega; sin
+        streaming solo se emiten los eventos de herramientas.
+
+        Cada llamada marca breakpoints de prompt caching sobre el prefijo
+        estable (herramientas, system prompt e historial previo) y suma el
+        uso de tokens, cacheados y no cacheados, en `estado.uso`.
+
+        Args:
+            system_prompt: Prompt de sistema
+            messages: Historial de mensajes
+            tools: Herramientas disponibles
+            conversacion_id: ID de la conversacion
+            proyecto_id: ID del proyecto del contexto (opcional)
+            estado: Acumulador del resultado del loop
+            streaming: Si se emiten los deltas de texto del modelo
+
+        Yields:
+            ChatStreamChunk de tipo 'texto', 'tool_start' y 'tool_end'
+        """
         iteracion = 0
+        texto_respuesta = ""
+        tools_cache = marcar_tools(tools)
 
         while iteracion < MAX_TOOL_ITERATIONS:
             iteracion += 1
 
+            parametros = dict(
+                model=estado.modelo,
+                max_tokens=settings.LLM_MAX_TOKENS,
+                system=system_prompt,
+                messages=marcar_historial(messages),
+                tools=tools_cache,
+            )
             try:
-                response = await self.cliente.messages.create(
-                    model=settings.LLM_MODEL,
-                    max_tokens=settings.LLM_MAX_TOKENS,
-                    system=system_prompt,
-                    messages=messages,
-                    tools=tools,
-                )
+                if streaming:
+                    async with self._mensajes.stream(**parametros) as stream:
+                        async for delta in stream.text_stream:
+                            yield ChatStreamChunk(tipo="texto", contenido=delta)
+                        response = await stream.get_final_message()
+                else:
+                    response = await self._mensajes.create(**parametros)
             except RateLimitError as e:
                 logger.warning(f"Rate limit alcanzado: {e}")
                 raise
@@ -963,6 +1436,17 @@ class AsistenteService:
                 logger.error(f"Error API Anthropic: {e}")
                 raise
 
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                estado.uso.registrar(usage)
+                logger.debug(
+                    f"Uso de tokens (iteracion {iteracion}): "
+                    f"sin_cache={usage.input_tokens}, "
+                    f"cache_escritura={getattr(usage, 'cache_creation_input_tokens', 0) or 0}, "
+                    f"cache_lectura={getattr(usage, 'cache_read_input_tokens', 0) or 0}, "
+                    f"output={usage.output_tokens}"
+                )
+
             # Procesar respuesta
             texto_respuesta = ""
             tool_uses = []
@@ -972,7 +1456,7 @@ class AsistenteService:
                     texto_respuesta += block.text
                 elif block.type == "tool_use":
                     tool_uses.append(block)
-                    tool_calls_realizados.append(ToolCall(
+                    estado.tool_calls.append(ToolCall(
                         id=block.id,
                         name=block.name,
                         input=block.input,
@@ -980,10 +1464,11 @@ class AsistenteService:
 
             # Si no hay tool_use, retornar respuesta
             if response.stop_reason == "end_turn" or not tool_uses:
-                return texto_respuesta, tool_calls_realizados, fuentes, accion_pendiente
+                estado.respuesta = texto_respuesta
+                return
 
-            # Primero, guardar el mensaje del asistente con tool_use en la BD
-            # Esto debe hacerse ANTES de guardar los tool results para mantener el orden correcto
+            # Primero, encolar el mensaje del asistente con tool_use
+            # Esto debe hacerse ANTES de los tool results para mantener el orden correcto
             assistant_tool_calls = [
                 {"id": tu.id, "name": tu.name, "input": tu.input}
                 for tu in tool_uses
@@ -995,39 +1480,60 @@ class AsistenteService:
                 tool_calls=assistant_tool_calls,
             )
 
-            # Procesar tool_uses
-            tool_results = []
-            for tool_use in tool_uses:
-                logger.info(f"Ejecutando herramienta: {tool_use.name}")
+            # Procesar tool_uses (las de solo lectura se ejecutan en paralelo)
+            tool_calls = [ToolCall(id=tu.id, name=tu.name, input=tu.input) for tu in tool_uses]
+            for tool_call in tool_calls:
+                logger.info(f"Ejecutando herramienta: {tool_call.name}")
+                yield ChatStreamChunk(tipo="tool_start", tool_call=tool_call)
 
-                resultado, accion = await self.ejecutor.ejecutar_tool(
-                    tool_name=tool_use.name,
-                    tool_input=tool_use.input,
-                    conversacion_id=conversacion_id,
-                    proyecto_id=proyecto_id,
-                )
+            ejecuciones = await self.ejecutor.ejecutar_tools(
+                [(tu.name, tu.input) for tu in tool_uses],
+                conversacion_id=conversacion_id,
+                proyecto_id=proyecto_id,
+            )
 
+            tool_results = []
+            for tool_use, tool_call, (resultado, accion) in zip(tool_uses, tool_calls, ejecuciones):
                 if accion:
-                    accion_pendiente = accion
+                    estado.accion_pendiente = accion
+
+                # JSON compacto con la proyeccion y el tope de la herramienta
+                serializado = registro_herramientas.serializar_resultado(tool_use.name, resultado)
+                tamanos = {
+                    "bytes_original": serializado.bytes_original,
+                    "bytes_enviados": serializado.bytes_final,
+                }
 
                 # Guardar mensaje de tool result
                 await self.gestor_memoria.guardar_mensaje(
                     conversacion_id=conversacion_id,
                     rol="tool",
-                    contenido=str(resultado.to_dict()),
+                    contenido=serializado.texto,
                     tool_call_id=tool_use.id,
                     tool_name=tool_use.name,
+                    datos_extra=tamanos,
                 )
 
                 tool_results.append({
                     "type": "tool_result",
                     "tool_use_id": tool_use.id,
-                    "content": str(resultado.to_dict()),
+                    "content": serializado.texto,
                 })
 
                 # Extraer fuentes de herramientas RAG
                 if resultado.exito and tool_use.name in ["buscar_normativa", "explicar_clasificacion"]:
-                    fuentes.extend(self._extraer_fuentes(tool_use.name, resultado))
+                    estado.fuentes.extend(self._extraer_fuentes(tool_use.name, resultado))
+
+                yield ChatStreamChunk(
+                    tipo="tool_end",
+                    tool_call=tool_call,
+                    tool_result={
+                        "exito": resultado.exito,
+                        "error": resultado.error,
+                        "requiere_confirmacion": accion is not None,
+                        **tamanos,
+                    },
+                )
 
             # Agregar respuesta del asistente y tool results al historial local
             assistant_content = []
@@ -1045,23 +1551,27 @@ class AsistenteService:
             messages.append({"role": "user", "content": tool_results})
 
             # Si hay accion pendiente, detener loop y solicitar confirmacion
-            if accion_pendiente:
+            if estado.accion_pendiente:
+                # Punto seguro: el turno hasta la pausa queda escrito antes de
+                # la llamada que redacta la confirmacion
+                await self.gestor_memoria.volcar()
                 # Agregar mensaje indicando accion pendiente
-                texto_respuesta = await self._generar_mensaje_confirmacion(
-                    accion_pendiente, system_prompt, messages
+                estado.respuesta = await self._generar_mensaje_confirmacion(
+                    estado.accion_pendiente, system_prompt, messages
                 )
-                return texto_respuesta, tool_calls_realizados, fuentes, accion_pendiente
+                yield ChatStreamChunk(tipo="texto", contenido=estado.respuesta)
+                return
 
         # Limite de iteraciones alcanzado - avisar al usuario
         logger.warning("Limite de iteraciones de tool use alcanzado")
         aviso_limite = "\n\n---\n**Nota:** La consulta requirió muchas operaciones y fue simplificada. Si necesitas más información, intenta hacer una pregunta más específica."
-        texto_respuesta = (texto_respuesta or "") + aviso_limite
-        return texto_respuesta, tool_calls_realizados, fuentes, accion_pendiente
+        estado.respuesta = (texto_respuesta or "") + aviso_limite
+        yield ChatStreamChunk(tipo="texto", contenido=aviso_limite)
 
     async def _generar_mensaje_confirmacion(
         self,
         accion: AccionPendiente,
-        system_prompt: str,
+        system_prompt: Union[str, List[Dict[str, Any]]],
         messages: List[Dict],
     ) -> str:
         """Genera mensaje solicitando confirmacion al usuario."""
@@ -1082,12 +1592,13 @@ Genera un mensaje breve y claro explicando lo que se va a hacer y pidiendo confi
                 "content": [{"type": "tool_result", "tool_use_id": "confirm", "content": prompt_confirmacion}]
             })
 
-            response = await self.cliente.messages.create(
-                model=settings.LLM_MODEL,
-                max_tokens=500,
-                system=system_prompt,
-                messages=[{"role": "user", "content": prompt_confirmacion}],
-            )
+            with operacion_llm("asistente.confirmacion"):
+                response = await self._mensajes.create(
+                    model=settings.LLM_MODEL,
+                    max_tokens=500,
+                    system=system_prompt,
+                    messages=[{"role": "user", "content": prompt_confirmacion}],
+                )
 
             for block in response.content:
                 if block.type == "text":
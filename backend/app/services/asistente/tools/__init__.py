@@ -7,6 +7,7 @@ Las herramientas se registran automaticamente al importar este modulo.
 from .base import (
     Herramienta,
     ResultadoHerramienta,
+    ResultadoSerializado,
     DefinicionHerramienta,
     CategoriaHerramienta,
     ContextoHerramienta,
@@ -109,6 +110,7 @@ __all__ = [
     # Base
     "Herramienta",
     "ResultadoHerramienta",
+    "ResultadoSerializado",
     "DefinicionHerramienta",
     "CategoriaHerramienta",
     "ContextoHerramienta",
@@ -38,6 +38,7 @@ IMPORTANTE: Esta accion requiere confirmacion del usuario."""
     contexto_requerido = ContextoHerramienta.PROYECTO
     requiere_confirmacion = True
     permisos = [PermisoHerramienta.ESCRITURA]
+    invalida_memo = ["proyecto", "estructura_eia"]
 
     def __init__(self):
         self._db: Optional[AsyncSession] = None
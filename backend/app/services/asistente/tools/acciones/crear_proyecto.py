@@ -41,6 +41,7 @@ Otros campos opcionales mejoran el analisis posterior."""
     contexto_requerido = ContextoHerramienta.GLOBAL
     requiere_confirmacion = True
     permisos = [PermisoHerramienta.ESCRITURA]
+    invalida_memo = ["proyecto"]
 
     def __init__(self):
         self._db: Optional[AsyncSession] = None
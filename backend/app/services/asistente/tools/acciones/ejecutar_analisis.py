@@ -48,6 +48,7 @@ El proyecto debe tener geometria definida para poder analizarse."""
     contexto_requerido = ContextoHerramienta.PROYECTO
     requiere_confirmacion = True
     permisos = [PermisoHerramienta.ESCRITURA]
+    invalida_memo = ["proyecto", "analisis"]
 
     def __init__(self):
         self._db: Optional[AsyncSession] = None
@@ -328,7 +329,7 @@ El proyecto debe tener geometria definida para poder analizarse."""
                     ],
                     "texto_completo": informe.to_texto_plano(),
                 }
-                tokens_usados = len(informe.to_texto_plano()) // 4
+                tokens_usados = informe.tokens_totales
             except Exception as e:
                 logger.error(f"Error generando informe LLM: {e}")
                 informe_dict = {"error": str(e)}
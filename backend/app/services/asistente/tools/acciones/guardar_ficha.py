@@ -48,6 +48,7 @@ con la categoria y clave apropiadas."""
     contexto_requerido = ContextoHerramienta.PROYECTO
     requiere_confirmacion = False
     permisos = [PermisoHerramienta.ESCRITURA]
+    invalida_memo = ["proyecto", "estructura_eia"]
 
     def __init__(self):
         self._db: Optional[AsyncSession] = None
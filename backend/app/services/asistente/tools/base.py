@@ -1,14 +1,28 @@
 """
 Clase base para herramientas del agente.
 """
+import json
 import logging
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 from typing import Any, Dict, List, Optional, Type
 from enum import Enum
 
+from app.core.config import settings
+
 logger = logging.getLogger(__name__)
 
+# Niveles de recorte, de menor a mayor agresividad: (caracteres maximos por
+# texto, elementos maximos por lista). Las listas conservan sus primeros
+# elementos, que las herramientas entregan ordenados por relevancia.
+NIVELES_RECORTE = [(1000, 50), (500, 20), (300, 10), (150, 5), (80, 3), (40, 1)]
+
+NOTA_RECORTE = (
+    "Resultado recortado por tamano. Los ids (id, fragmento_id, documento_id) "
+    "permiten consultar el detalle de un elemento con otra herramienta."
+)
+CLAVES_ID = ("id", "fragmento_id", "documento_id")
+
 
 class CategoriaHerramienta(str, Enum):
     """Categorias de herramientas."""
@@ -54,6 +68,147 @@ class ResultadoHerramienta:
             "error": self.error or "Error desconocido",
         }
 
+    def serializar(
+        self,
+        proyeccion: Optional[Dict[str, Any]] = None,
+        max_bytes: Optional[int] = None,
+    ) -> "ResultadoSerializado":
+        """
+        Serializa el resultado como JSON compacto para el LLM.
+
+        Args:
+            proyeccion: Campos a omitir del contenido (ver `proyectar`)
+            max_bytes: Tope del JSON en bytes UTF-8; si se excede se recortan
+                textos largos y listas de forma progresiva
+
+        Returns:
+            ResultadoSerializado con el texto y los tamanos antes y despues
+        """
+        datos = self.to_dict()
+        bytes_original = _tamano(_a_json(datos))
+
+        if self.exito and proyeccion:
+            datos = {**datos, "result": proyectar(datos["result"], proyeccion)}
+        texto = _a_json(datos)
+
+        recortado = bool(max_bytes) and _tamano(texto) > max_bytes
+        if recortado:
+            for max_chars, max_items in NIVELES_RECORTE:
+                datos_recortados = {
+                    **_recortar(datos, max_chars, max_items),
+                    "truncado": {"bytes_original": bytes_original, "nota": NOTA_RECORTE},
+                }
+                texto = _a_json(datos_recortados)
+                if _tamano(texto) <= max_bytes:
+                    break
+            else:
+                # Ultimo recurso: solo el estado y los ids, para que siga siendo JSON
+                texto = _resumen_minimo(datos, bytes_original, max_bytes)
+
+        return ResultadoSerializado(
+            texto=texto,
+            bytes_original=bytes_original,
+            bytes_final=_tamano(texto),
+            recortado=recortado,
+        )
+
+
+@dataclass
+class ResultadoSerializado:
+    """Resultado de herramienta listo para enviar al LLM."""
+    texto: str
+    bytes_original: int  # JSON completo, sin proyeccion ni recorte
+    bytes_final: int
+    recortado: bool = False  # Si se aplico el recorte por tamano
+
+
+def _a_json(datos: Any) -> str:
+    return json.dumps(datos, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def _tamano(texto: str) -> int:
+    return len(texto.encode("utf-8"))
+
+
+def proyectar(valor: Any, proyeccion: Dict[str, Any]) -> Any:
+    """
+    Aplica una proyeccion de campos a un valor JSON.
+
+    La proyeccion indica por clave: False para omitir el campo, o una
+    proyeccion anidada para aplicar a su valor (a cada elemento si es una
+    lista). Las claves no mencionadas se conservan.
+
+    Ejemplo: {"fragmentos": {"temas": False}, "nota": False}
+    """
+    if isinstance(valor, list):
+        return [proyectar(v, proyeccion) for v in valor]
+    if not isinstance(valor, dict):
+        return valor
+    salida = {}
+    for clave, v in valor.items():
+        regla = proyeccion.get(clave)
+        if regla is False:
+            continue
+        salida[clave] = proyectar(v, regla) if isinstance(regla, dict) else v
+    return salida
+
+
+def _recolectar_ids(valor: Any, ids: Dict[str, List[Any]]) -> Dict[str, List[Any]]:
+    """Reune, en orden y sin repetir, los valores de CLAVES_ID de un valor JSON."""
+    if isinstance(valor, list):
+        for v in valor:
+            _recolectar_ids(v, ids)
+    elif isinstance(valor, dict):
+        for clave, v in valor.items():
+            if clave in CLAVES_ID and isinstance(v, (int, str)):
+                lista = ids.setdefault(clave, [])
+                if v not in lista:
+                    lista.append(v)
+            else:
+                _recolectar_ids(v, ids)
+    return ids
+
+
+def _resumen_minimo(datos: Dict[str, Any], bytes_original: int, max_bytes: int) -> str:
+    """
+    JSON minimo de un resultado que no cabe ni con el recorte mas agresivo.
+
+    Conserva el estado y tantos ids como quepan; con un tope menor que el
+    propio resumen sin ids, lo retorna igual antes que un JSON invalido.
+    """
+    ids = _recolectar_ids(datos, {})
+    maximo = max((len(v) for v in ids.values()), default=0)
+    for truncado in (
+        {"bytes_original": bytes_original, "nota": NOTA_RECORTE},
+        {"bytes_original": bytes_original},
+    ):
+        cantidad = maximo
+        while True:
+            resumen = {"success": datos["success"], "truncado": truncado}
+            if cantidad:
+                resumen["ids"] = {clave: valores[:cantidad] for clave, valores in ids.items()}
+            texto = _a_json(resumen)
+            if _tamano(texto) <= max_bytes or not cantidad:
+                break
+            cantidad //= 2
+        if _tamano(texto) <= max_bytes:
+            return texto
+    return texto
+
+
+def _recortar(valor: Any, max_chars: int, max_items: int) -> Any:
+    """Acorta textos y listas, dejando constancia de lo omitido."""
+    if isinstance(valor, str) and len(valor) > max_chars:
+        return f"{valor[:max_chars]}... [+{len(valor) - max_chars} caracteres]"
+    if isinstance(valor, list):
+        items = [_recortar(v, max_chars, max_items) for v in valor[:max_items]]
+        if len(valor) > max_items:
+            items.append(f"[+{len(valor) - max_items} elementos omitidos]")
+        return items
+    if isinstance(valor, dict):
+        return {k: _recortar(v, max_chars, max_items) for k, v in valor.items()}
+    return valor
+
 
 @dataclass
 class DefinicionHerramienta:
@@ -86,6 +241,15 @@ class Herramienta(ABC):
     requiere_confirmacion: bool = False
     permisos: List[PermisoHerramienta] = [PermisoHerramienta.LECTURA]
 
+    # Serializacion del resultado para el LLM (ver ResultadoHerramienta.serializar)
+    proyeccion_resultado: Optional[Dict[str, Any]] = None
+    max_bytes_resultado: Optional[int] = None  # None = ASISTENTE_TOOL_RESULT_MAX_BYTES
+
+    # Memo por conversacion (ver asistente.memo_herramientas)
+    ttl_memo_segundos: Optional[int] = None  # Solo lectura; None = no se memoiza
+    recursos_memo: List[str] = []  # Recursos que lee la herramienta
+    invalida_memo: Optional[List[str]] = None  # Recursos que modifica; None = todos
+
     @classmethod
     @abstractmethod
     def get_schema(cls) -> Dict[str, Any]:
@@ -123,6 +287,11 @@ class Herramienta(ABC):
             permisos=cls.permisos,
         )
 
+    @classmethod
+    def es_solo_lectura(cls) -> bool:
+        """Indica si la herramienta solo lee datos y puede ejecutarse en paralelo."""
+        return not cls.requiere_confirmacion and set(cls.permisos) == {PermisoHerramienta.LECTURA}
+
     def __repr__(self) -> str:
         return f"<Herramienta {self.nombre}>"
 
@@ -167,6 +336,46 @@ class RegistroHerramientas:
                 self._instancias[nombre] = herramienta_class()
         return self._instancias.get(nombre)
 
+    def crear_instancia(self, nombre: str) -> Optional[Herramienta]:
+        """
+        Crea una instancia nueva de la herramienta, no compartida.
+
+        Para ejecuciones concurrentes: la instancia de `obtener` es compartida
+        y `set_db` la modifica.
+
+        Args:
+            nombre: Nombre de la herramienta
+
+        Returns:
+            Nueva instancia o None si no existe
+        """
+        herramienta_class = self._herramientas.get(nombre)
+        return herramienta_class() if herramienta_class else None
+
+    def serializar_resultado(self, nombre: str, resultado: ResultadoHerramienta) -> ResultadoSerializado:
+        """
+        Serializa el resultado de una herramienta con su proyeccion y tope.
+
+        Args:
+            nombre: Nombre de la herramienta
+            resultado: Resultado de su ejecucion
+
+        Returns:
+            ResultadoSerializado para el tool_result
+        """
+        herramienta_class = self._herramientas.get(nombre)
+        proyeccion = herramienta_class.proyeccion_resultado if herramienta_class else None
+        max_bytes = (
+            herramienta_class.max_bytes_resultado if herramienta_class else None
+        ) or settings.ASISTENTE_TOOL_RESULT_MAX_BYTES
+        serializado = resultado.serializar(proyeccion, max_bytes)
+        logger.log(
+            logging.INFO if serializado.recortado else logging.DEBUG,
+            f"Resultado de {nombre}: {serializado.bytes_original} -> {serializado.bytes_final} bytes"
+            f"{' (recortado)' if serializado.recortado else ''}",
+        )
+        return serializado
+
     def listar(
         self,
         categoria: Optional[CategoriaHerramienta] = None,
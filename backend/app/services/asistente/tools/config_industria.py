@@ -42,6 +42,8 @@ portuario, forestal, agroindustria"""
     contexto_requerido = ContextoHerramienta.PROYECTO
     requiere_confirmacion = False
     permisos = [PermisoHerramienta.LECTURA]
+    ttl_memo_segundos = 3600
+    recursos_memo = ["config_industria"]
 
     def __init__(self):
         self._db: Optional[AsyncSession] = None
@@ -207,6 +209,8 @@ El resultado indica si el proyecto ingresaría al SEIA por ese parámetro espec
     contexto_requerido = ContextoHerramienta.PROYECTO
     requiere_confirmacion = False
     permisos = [PermisoHerramienta.LECTURA]
+    ttl_memo_segundos = 3600
+    recursos_memo = ["config_industria"]
 
     def __init__(self):
         self._db: Optional[AsyncSession] = None
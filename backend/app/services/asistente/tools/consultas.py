@@ -36,6 +36,8 @@ Usa esta herramienta cuando el usuario pregunte sobre un proyecto especifico:
     contexto_requerido = ContextoHerramienta.PROYECTO
     requiere_confirmacion = False
     permisos = [PermisoHerramienta.LECTURA]
+    ttl_memo_segundos = 120
+    recursos_memo = ["proyecto"]
 
     def __init__(self):
         self._db: Optional[AsyncSession] = None
@@ -169,6 +171,13 @@ Usa esta herramienta para:
     contexto_requerido = ContextoHerramienta.PROYECTO
     requiere_confirmacion = False
     permisos = [PermisoHerramienta.LECTURA]
+    ttl_memo_segundos = 300
+    recursos_memo = ["analisis"]
+
+    # Las alertas guardan las filas GIS completas que las originaron
+    proyeccion_resultado = {
+        "alertas": {"elementos_gis": False, "metadata": False, "fecha_generacion": False},
+    }
 
     def __init__(self):
         self._db: Optional[AsyncSession] = None
@@ -290,6 +299,8 @@ Usa esta herramienta cuando el usuario pregunte:
     contexto_requerido = ContextoHerramienta.GLOBAL
     requiere_confirmacion = False
     permisos = [PermisoHerramienta.LECTURA]
+    ttl_memo_segundos = 60
+    recursos_memo = ["proyecto"]
 
     def __init__(self):
         self._db: Optional[AsyncSession] = None
@@ -61,6 +61,7 @@ NOTA: Esta acción requiere confirmación del usuario."""
     contexto_requerido = ContextoHerramienta.PROYECTO
     requiere_confirmacion = True
     permisos = [PermisoHerramienta.ESCRITURA]
+    invalida_memo = ["estructura_eia"]
 
     def __init__(self):
         self._db: Optional[AsyncSession] = None
@@ -239,6 +240,8 @@ Retorna la lista de los 11 capítulos con:
     contexto_requerido = ContextoHerramienta.PROYECTO
     requiere_confirmacion = False
     permisos = [PermisoHerramienta.LECTURA]
+    ttl_memo_segundos = 300
+    recursos_memo = ["proyecto", "estructura_eia"]
 
     def __init__(self):
         self._db: Optional[AsyncSession] = None
@@ -397,6 +400,8 @@ Retorna los componentes de línea base con:
     contexto_requerido = ContextoHerramienta.PROYECTO
     requiere_confirmacion = False
     permisos = [PermisoHerramienta.LECTURA]
+    ttl_memo_segundos = 300
+    recursos_memo = ["proyecto", "estructura_eia"]
 
     def __init__(self):
         self._db: Optional[AsyncSession] = None
@@ -542,6 +547,8 @@ Retorna:
     contexto_requerido = ContextoHerramienta.PROYECTO
     requiere_confirmacion = False
     permisos = [PermisoHerramienta.LECTURA]
+    ttl_memo_segundos = 300
+    recursos_memo = ["proyecto", "estructura_eia"]
 
     def __init__(self):
         self._db: Optional[AsyncSession] = None
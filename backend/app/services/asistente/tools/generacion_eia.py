@@ -107,6 +107,11 @@ NOTA: Esta acción requiere confirmación del usuario."""
                     "description": "Si es true, regenera capítulos que ya existen",
                     "default": False,
                 },
+                "reanudar": {
+                    "type": "boolean",
+                    "description": "Si es true, retoma la última compilación que terminó con errores, sin repetir los capítulos ya completados",
+                    "default": False,
+                },
             },
             "required": ["proyecto_id"],
         }
@@ -116,6 +121,7 @@ NOTA: Esta acción requiere confirmación del usuario."""
         proyecto_id: int,
         capitulos: Optional[List[int]] = None,
         regenerar_existentes: bool = False,
+        reanudar: bool = False,
         db: Optional[AsyncSession] = None,
         **kwargs
     ) -> ResultadoHerramienta:
@@ -132,7 +138,8 @@ NOTA: Esta acción requiere confirmación del usuario."""
             service = get_generacion_service()
             request = CompilarDocumentoRequest(
                 incluir_capitulos=capitulos,
-                regenerar_existentes=regenerar_existentes
+                regenerar_existentes=regenerar_existentes,
+                reanudar=reanudar
             )
 
             resultado = await service.compilar_documento(
@@ -148,6 +155,7 @@ NOTA: Esta acción requiere confirmación del usuario."""
                     "documento_id": resultado.documento_id,
                     "capitulos_generados": resultado.capitulos_generados,
                     "capitulos_con_error": resultado.capitulos_con_error,
+                    "capitulos_omitidos": resultado.capitulos_omitidos,
                     "tiempo_total_segundos": resultado.tiempo_total_segundos,
                     "estadisticas": {
                         "palabras": resultado.estadisticas.total_palabras,
@@ -2,6 +2,7 @@
 Herramientas RAG del asistente.
 Busqueda semantica en corpus legal y documentacion del sistema.
 """
+import copy
 import logging
 from typing import Any, Dict, List, Optional
 
@@ -16,7 +17,9 @@ from .base import (
     PermisoHerramienta,
     registro_herramientas,
 )
-from app.services.rag.embeddings import get_embedding_service
+from app.core.config import settings
+from app.services.rag.cache_busqueda import get_cache_busqueda, obtener_version_corpus
+from app.services.rag.embeddings import get_embedding_service, vector_sql
 
 logger = logging.getLogger(__name__)
 
@@ -53,6 +56,14 @@ la interpretacion OFICIAL del SEA con datos especificos."""
     contexto_requerido = ContextoHerramienta.AMBOS
     requiere_confirmacion = False
     permisos = [PermisoHerramienta.LECTURA]
+    # Sin memo: la cache de busqueda ya la sirve y valida la version del corpus
+
+    # Conteos redundantes y temas de clasificacion interna
+    proyeccion_resultado = {
+        "fragmentos_prioritarios": False,
+        "fragmentos_base": False,
+        "fragmentos": {"temas": False},
+    }
 
     def __init__(self):
         self.embedding_service = get_embedding_service()
@@ -100,7 +111,7 @@ la interpretacion OFICIAL del SEA con datos especificos."""
     async def _buscar_en_tipos(
         self,
         db: AsyncSession,
-        embedding_str: str,
+        embedding_sql: str,
         tipos: List[str],
         limite: int,
         temas: Optional[List[str]] = None,
@@ -118,7 +129,7 @@ la interpretacion OFICIAL del SEA con datos especificos."""
                 f.seccion,
                 f.contenido,
                 f.temas,
-                1 - (f.embedding <=> '{embedding_str}'::vector) as similitud
+                1 - (f.embedding <=> {embedding_sql}) as similitud
             FROM legal.fragmentos f
             JOIN legal.documentos d ON f.documento_id = d.id
             WHERE d.estado = 'vigente'
@@ -133,7 +144,7 @@ la interpretacion OFICIAL del SEA con datos especificos."""
             params["temas"] = temas
 
         sql += f"""
-            ORDER BY f.embedding <=> '{embedding_str}'::vector
+            ORDER BY f.embedding <=> {embedding_sql}
             LIMIT :limite
         """
 
@@ -178,10 +189,30 @@ la interpretacion OFICIAL del SEA con datos especificos."""
                 error="No hay sesion de base de datos disponible"
             )
 
+        metadata = {
+            "top_k": top_k,
+            "metodo": None,
+            "filtros": {"temas": temas, "tipo": tipo_documento, "solo_prioritarios": solo_prioritarios}
+        }
+
         try:
+            cache = get_cache_busqueda() if settings.RAG_CACHE_HABILITADO else None
+            if cache is not None:
+                version = await obtener_version_corpus(db)
+                clave = cache.clave(
+                    "asistente", query,
+                    top_k=top_k, temas=temas, tipo=tipo_documento, solo_prioritarios=solo_prioritarios,
+                )
+                cacheado = cache.obtener(clave, version)
+                if cacheado is not None:
+                    # Copia: el contenido se recorta o anota aguas abajo
+                    contenido = copy.deepcopy(cacheado)
+                    metadata["metodo"] = contenido["metodo_busqueda"]
+                    return ResultadoHerramienta(exito=True, contenido=contenido, metadata=metadata)
+
             # Generar embedding de la query
             query_embedding = self.embedding_service.embed_text(query)
-            embedding_str = '[' + ','.join(str(x) for x in query_embedding) + ']'
+            embedding_sql = vector_sql(query_embedding)
 
             fragmentos = []
             metodo_busqueda = "dos_pasos"
@@ -190,14 +221,14 @@ la interpretacion OFICIAL del SEA con datos especificos."""
             if tipo_documento:
                 metodo_busqueda = "filtrado"
                 fragmentos = await self._buscar_en_tipos(
-                    db, embedding_str, [tipo_documento], top_k, temas
+                    db, embedding_sql, [tipo_documento], top_k, temas
                 )
 
             # Si solo_prioritarios, buscar solo en Guias/Criterios/Instructivos
             elif solo_prioritarios:
                 metodo_busqueda = "solo_prioritarios"
                 fragmentos = await self._buscar_en_tipos(
-                    db, embedding_str, TIPOS_PRIORITARIOS, top_k, temas
+                    db, embedding_sql, TIPOS_PRIORITARIOS, top_k, temas
                 )
 
             # Busqueda en dos pasos (comportamiento por defecto)
@@ -205,13 +236,13 @@ la interpretacion OFICIAL del SEA con datos especificos."""
                 # Paso 1: Buscar en tipos prioritarios (70% de resultados)
                 limite_prioritarios = max(1, int(top_k * 0.7))
                 fragmentos_prioritarios = await self._buscar_en_tipos(
-                    db, embedding_str, TIPOS_PRIORITARIOS, limite_prioritarios, temas
+                    db, embedding_sql, TIPOS_PRIORITARIOS, limite_prioritarios, temas
                 )
 
                 # Paso 2: Buscar en tipos base (30% de resultados)
                 limite_base = max(1, top_k - len(fragmentos_prioritarios))
                 fragmentos_base = await self._buscar_en_tipos(
-                    db, embedding_str, TIPOS_BASE, limite_base, temas
+                    db, embedding_sql, TIPOS_BASE, limite_base, temas
                 )
 
                 # Combinar: prioritarios primero, luego base
@@ -227,23 +258,20 @@ la interpretacion OFICIAL del SEA con datos especificos."""
             for frag in fragmentos:
                 frag["es_prioritario"] = frag["documento_tipo"] in TIPOS_PRIORITARIOS
 
-            return ResultadoHerramienta(
-                exito=True,
-                contenido={
-                    "query": query,
-                    "metodo_busqueda": metodo_busqueda,
-                    "total_encontrados": len(fragmentos),
-                    "fragmentos_prioritarios": sum(1 for f in fragmentos if f.get("es_prioritario")),
-                    "fragmentos_base": sum(1 for f in fragmentos if not f.get("es_prioritario")),
-                    "fragmentos": fragmentos,
-                    "nota": "Los fragmentos de Guias/Criterios/Instructivos (es_prioritario=true) contienen interpretacion oficial del SEA y datos especificos."
-                },
-                metadata={
-                    "top_k": top_k,
-                    "metodo": metodo_busqueda,
-                    "filtros": {"temas": temas, "tipo": tipo_documento, "solo_prioritarios": solo_prioritarios}
-                }
-            )
+            contenido = {
+                "query": query,
+                "metodo_busqueda": metodo_busqueda,
+                "total_encontrados": len(fragmentos),
+                "fragmentos_prioritarios": sum(1 for f in fragmentos if f.get("es_prioritario")),
+                "fragmentos_base": sum(1 for f in fragmentos if not f.get("es_prioritario")),
+                "fragmentos": fragmentos,
+                "nota": "Los fragmentos de Guias/Criterios/Instructivos (es_prioritario=true) contienen interpretacion oficial del SEA y datos especificos."
+            }
+            if cache is not None:
+                cache.guardar(clave, version, copy.deepcopy(contenido))
+
+            metadata["metodo"] = metodo_busqueda
+            return ResultadoHerramienta(exito=True, contenido=contenido, metadata=metadata)
 
         except Exception as e:
             logger.error(f"Error en busqueda normativa: {e}")
@@ -269,6 +297,8 @@ Usa esta herramienta cuando el usuario pregunte sobre:
     contexto_requerido = ContextoHerramienta.AMBOS
     requiere_confirmacion = False
     permisos = [PermisoHerramienta.LECTURA]
+    ttl_memo_segundos = 600
+    recursos_memo = ["documentacion"]
 
     def __init__(self):
         self.embedding_service = get_embedding_service()
@@ -318,7 +348,7 @@ Usa esta herramienta cuando el usuario pregunte sobre:
         try:
             # Generar embedding
             query_embedding = self.embedding_service.embed_text(query)
-            embedding_str = '[' + ','.join(str(x) for x in query_embedding) + ']'
+            embedding_sql = vector_sql(query_embedding)
 
             sql = f"""
                 SELECT
@@ -327,11 +357,11 @@ Usa esta herramienta cuando el usuario pregunte sobre:
                     titulo,
                     contenido,
                     tags,
-                    1 - (embedding <=> '{embedding_str}'::vector) as similitud
+                    1 - (embedding <=> {embedding_sql}) as similitud
                 FROM asistente.documentacion_sistema
                 WHERE activo = TRUE
                 AND embedding IS NOT NULL
-                ORDER BY embedding <=> '{embedding_str}'::vector
+                ORDER BY embedding <=> {embedding_sql}
                 LIMIT :limite
             """
 
@@ -573,6 +603,8 @@ Usa esta herramienta cuando el usuario pregunte:
     contexto_requerido = ContextoHerramienta.AMBOS
     requiere_confirmacion = False
     permisos = [PermisoHerramienta.LECTURA]
+    ttl_memo_segundos = 300
+    recursos_memo = ["analisis"]
 
     def __init__(self):
         self._db: Optional[AsyncSession] = None
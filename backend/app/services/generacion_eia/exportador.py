@@ -3,6 +3,7 @@ Servicio de Exportación de Documentos EIA.
 
 Genera documentos en formatos PDF, DOCX y e-SEIA XML.
 """
+import asyncio
 import logging
 import os
 import re
@@ -105,8 +106,8 @@ class ExportadorService:
             # 3. Renderizar HTML
             html_content = self._renderizar_html(datos_template, config)
 
-            # 4. Generar PDF con WeasyPrint
-            pdf_bytes = self._generar_pdf_weasyprint(html_content)
+            # 4. Generar PDF con WeasyPrint (síncrono y pesado: fuera del event loop)
+            pdf_bytes = await asyncio.to_thread(self._generar_pdf_weasyprint, html_content)
 
             # 5. Guardar archivo
             filename = self._generar_nombre_archivo(proyecto, documento, "pdf")
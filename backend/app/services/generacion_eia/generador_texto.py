@@ -10,6 +10,7 @@ import anthropic
 from jinja2 import Template
 
 from app.core.config import settings
+from app.services.llm.pool_anthropic import get_cliente_anthropic
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from sqlalchemy.orm import selectinload
@@ -28,19 +29,17 @@ class GeneradorTextoService:
 
     def __init__(self):
         """Inicializa el servicio."""
-        self._anthropic_client: Optional[anthropic.Anthropic] = None
+        self._anthropic_client: Optional[anthropic.AsyncAnthropic] = None
         self.modelo = settings.LLM_MODEL or "claude-sonnet-4-20250514"
         self.max_tokens = 16000  # Claude Sonnet 4 soporta outputs largos
 
     @property
-    def cliente(self) -> anthropic.Anthropic:
+    def cliente(self) -> anthropic.AsyncAnthropic:
         """Cliente Anthropic lazy-loaded."""
         if self._anthropic_client is None:
             if not settings.ANTHROPIC_API_KEY:
                 raise ValueError("ANTHROPIC_API_KEY no configurada")
-            self._anthropic_client = anthropic.Anthropic(
-                api_key=settings.ANTHROPIC_API_KEY
-            )
+            self._anthropic_client = get_cliente_anthropic("generacion_eia.texto")
         return self._anthropic_client
 
     async def generar_texto_capitulo(
@@ -387,7 +386,7 @@ Por favor, genera el contenido del capítulo en formato Markdown."""
         try:
             logger.debug(f"Generando con Claude (contexto: {contexto_adicional})")
 
-            respuesta = self.cliente.messages.create(
+            respuesta = await self.cliente.messages.create(
                 model=self.modelo,
                 max_tokens=self.max_tokens,
                 messages=[
@@ -4,16 +4,20 @@ Servicio Orquestador de Generación de EIA (Fase 4).
 Coordina la generación de documentos EIA completos,
 integrando GeneradorTextoService, ValidadorSEAService y ExportadorService.
 """
+import json
 import logging
 import asyncio
 from datetime import datetime
 from typing import Dict, Any, Optional, List
+from uuid import uuid4
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
+from sqlalchemy import select, text, update
 from sqlalchemy.orm import selectinload
 
+from app.core.config import settings
 from app.db.models import Proyecto
+from app.db.session import AsyncSessionLocal
 from app.db.models.generacion_eia import (
     DocumentoEIA,
     VersionEIA,
@@ -64,6 +68,39 @@ CAPITULOS_EIA = {
 }
 
 
+# Estado de la compilación en curso: metadatos['compilacion'] =
+# {id, estado, iniciada, finalizada, capitulos: {num: {estado, inicio, fin, error}}}
+SQL_GUARDAR_COMPILACION = text("""
+    UPDATE proyectos.documentos_eia
+    SET metadatos = jsonb_set(COALESCE(metadatos, '{}'::jsonb), '{compilacion}', CAST(:compilacion AS jsonb))
+    WHERE id = :id
+""")
+
+SQL_ESTADO_CAPITULO = text("""
+    UPDATE proyectos.documentos_eia
+    SET metadatos = jsonb_set(metadatos, CAST(:ruta AS text[]), CAST(:estado AS jsonb))
+    WHERE id = :id AND metadatos->'compilacion'->>'id' = :compilacion_id
+""")
+
+SQL_GUARDAR_CAPITULO = text("""
+    UPDATE proyectos.documentos_eia
+    SET contenido_capitulos = COALESCE(contenido_capitulos, '{}'::jsonb)
+            || jsonb_build_object(CAST(:capitulo AS text), CAST(:contenido AS jsonb)),
+        metadatos = jsonb_set(metadatos, CAST(:ruta AS text[]), CAST(:estado AS jsonb)),
+        updated_at = :ahora
+    WHERE id = :id AND metadatos->'compilacion'->>'id' = :compilacion_id
+""")
+
+SQL_CERRAR_COMPILACION = text("""
+    UPDATE proyectos.documentos_eia
+    SET metadatos = jsonb_set(
+            jsonb_set(metadatos, '{compilacion,estado}', CAST(:estado AS jsonb)),
+            '{compilacion,finalizada}', CAST(:finalizada AS jsonb)
+        )
+    WHERE id = :id AND metadatos->'compilacion'->>'id' = :compilacion_id
+""")
+
+
 class GeneracionEIAService:
     """
     Servicio orquestador para la generación de documentos EIA.
@@ -76,11 +113,14 @@ class GeneracionEIAService:
     - Integrar validación y exportación
     """
 
-    def __init__(self):
+    def __init__(self, session_factory=None, concurrencia: Optional[int] = None):
         """Inicializa el servicio con sus dependencias."""
         self.generador = GeneradorTextoService()
         self.validador = ValidadorSEAService()
         self.exportador = ExportadorService()
+        # Cada capítulo de una compilación usa su propia sesión
+        self.session_factory = session_factory or AsyncSessionLocal
+        self.concurrencia = concurrencia or settings.GENERACION_EIA_CONCURRENCIA
 
     # =========================================================================
     # MÉTODOS PRINCIPALES - DOCUMENTO
@@ -95,6 +135,14 @@ class GeneracionEIAService:
         """
         Compila un documento EIA completo generando todos los capítulos.
 
+        Los capítulos se generan en paralelo (hasta GENERACION_EIA_CONCURRENCIA
+        a la vez), cada uno con su propia sesión, y se persisten apenas
+        terminan: un error en un capítulo no pierde los demás. El estado de
+        la compilación queda en metadatos['compilacion'] y alimenta
+        get_progreso_generacion mientras corre. Con `reanudar`, una
+        compilación que terminó con errores o se interrumpió continúa
+        omitiendo los capítulos que ya completó.
+
         Args:
             db: Sesión de base de datos
             proyecto_id: ID del proyecto
@@ -108,43 +156,68 @@ class GeneracionEIAService:
 
         # 1. Obtener o crear documento
         documento = await self._get_or_create_documento(db, proyecto_id)
+        contenido_capitulos = dict(documento.contenido_capitulos or {})
+
+        # 2. Determinar capítulos a generar (o retomar la compilación anterior)
+        previa = (documento.metadatos or {}).get('compilacion')
+        if request.reanudar and previa and previa.get('estado') != 'completada':
+            compilacion = previa
+            capitulos_omitidos = sorted(
+                int(num) for num, cap in previa['capitulos'].items() if cap.get('estado') == 'completado'
+            )
+            capitulos_a_generar = sorted(
+                int(num) for num in previa['capitulos'] if int(num) not in capitulos_omitidos
+            )
+            logger.info(
+                f"Reanudando compilación {compilacion['id']}: "
+                f"{len(capitulos_omitidos)} capítulos ya completados"
+            )
+        else:
+            capitulos_a_generar = request.incluir_capitulos or list(range(1, 12))
 
-        # 2. Determinar capítulos a generar
-        capitulos_a_generar = request.incluir_capitulos or list(range(1, 12))
-
-        # Filtrar capítulos ya existentes si no se quiere regenerar
-        if not request.regenerar_existentes and documento.contenido_capitulos:
-            capitulos_existentes = [int(k) for k in documento.contenido_capitulos.keys()]
-            capitulos_a_generar = [c for c in capitulos_a_generar if c not in capitulos_existentes]
-
-        # 3. Generar capítulos
-        capitulos_generados = []
-        capitulos_con_error = []
-        contenido_capitulos = documento.contenido_capitulos or {}
+            # Filtrar capítulos ya existentes si no se quiere regenerar
+            if not request.regenerar_existentes and contenido_capitulos:
+                capitulos_existentes = [int(k) for k in contenido_capitulos.keys()]
+                capitulos_a_generar = [c for c in capitulos_a_generar if c not in capitulos_existentes]
 
-        for num_capitulo in capitulos_a_generar:
-            try:
-                logger.info(f"Generando capítulo {num_capitulo}...")
-                resultado = await self.generador.generar_texto_capitulo(
-                    db=db,
-                    proyecto_id=proyecto_id,
-                    capitulo_numero=num_capitulo
-                )
+            capitulos_omitidos = []
+            compilacion = {
+                'id': uuid4().hex,
+                'capitulos': {str(num): {'estado': 'pendiente'} for num in capitulos_a_generar},
+            }
 
-                contenido_capitulos[str(num_capitulo)] = {
-                    'titulo': resultado.get('titulo', CAPITULOS_EIA.get(num_capitulo, f'Capítulo {num_capitulo}')),
-                    'contenido': resultado.get('contenido', ''),
-                    'subsecciones': resultado.get('subsecciones', {}),
-                    'estadisticas': resultado.get('estadisticas', {})
-                }
-                capitulos_generados.append(num_capitulo)
+        compilacion.update(estado='en_curso', iniciada=datetime.utcnow().isoformat(), finalizada=None)
+        for num in capitulos_a_generar:
+            compilacion['capitulos'][str(num)] = {'estado': 'pendiente'}
+        await db.execute(SQL_GUARDAR_COMPILACION, {
+            'id': documento.id,
+            'compilacion': json.dumps(compilacion),
+        })
+        await db.commit()
 
-            except Exception as e:
-                logger.error(f"Error generando capítulo {num_capitulo}: {e}")
-                capitulos_con_error.append(num_capitulo)
+        # 3. Generar capítulos en paralelo, persistiendo cada uno al terminar
+        semaforo = asyncio.Semaphore(self.concurrencia)
+        resultados = await asyncio.gather(*(
+            self._compilar_capitulo(documento.id, proyecto_id, compilacion['id'], num, semaforo)
+            for num in capitulos_a_generar
+        ))
 
-        # 4. Actualizar documento
-        documento.contenido_capitulos = contenido_capitulos
+        capitulos_generados = []
+        capitulos_con_error = []
+        for num, capitulo in zip(capitulos_a_generar, resultados):
+            if capitulo is None:
+                capitulos_con_error.append(num)
+            else:
+                contenido_capitulos[str(num)] = capitulo
+                capitulos_generados.append(num)
+
+        # 4. Cerrar la compilación y actualizar estadísticas
+        await db.execute(SQL_CERRAR_COMPILACION, {
+            'id': documento.id,
+            'compilacion_id': compilacion['id'],
+            'estado': json.dumps('con_errores' if capitulos_con_error else 'completada'),
+            'finalizada': json.dumps(datetime.utcnow().isoformat()),
+        })
         documento.estadisticas = self._calcular_estadisticas(contenido_capitulos)
         documento.updated_at = datetime.utcnow()
 
@@ -156,17 +229,104 @@ class GeneracionEIAService:
 
         logger.info(
             f"Compilación completada: {len(capitulos_generados)} capítulos generados, "
-            f"{len(capitulos_con_error)} errores, {tiempo_total:.2f}s"
+            f"{len(capitulos_con_error)} errores, {len(capitulos_omitidos)} omitidos, {tiempo_total:.2f}s"
         )
 
         return GeneracionResponse(
             documento_id=documento.id,
             capitulos_generados=capitulos_generados,
             capitulos_con_error=capitulos_con_error,
+            capitulos_omitidos=capitulos_omitidos,
+            compilacion_id=compilacion['id'],
             tiempo_total_segundos=tiempo_total,
             estadisticas=EstadisticasDocumento(**documento.estadisticas)
         )
 
+    async def _compilar_capitulo(
+        self,
+        documento_id: int,
+        proyecto_id: int,
+        compilacion_id: str,
+        num_capitulo: int,
+        semaforo: asyncio.Semaphore
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Genera y persiste un capítulo de una compilación en su propia sesión.
+
+        Returns:
+            Contenido del capítulo guardado, o None si falló
+        """
+        async with semaforo:
+            inicio = datetime.utcnow()
+            async with self.session_factory() as sesion:
+                await self._actualizar_capitulo_compilacion(
+                    sesion, documento_id, compilacion_id, num_capitulo,
+                    {'estado': 'generando', 'inicio': inicio.isoformat()},
+                )
+                try:
+                    logger.info(f"Generando capítulo {num_capitulo}...")
+                    resultado = await self.generador.generar_texto_capitulo(
+                        db=sesion,
+                        proyecto_id=proyecto_id,
+                        capitulo_numero=num_capitulo
+                    )
+                except Exception as e:
+                    logger.error(f"Error generando capítulo {num_capitulo}: {e}")
+                    await sesion.rollback()
+                    await self._actualizar_capitulo_compilacion(
+                        sesion, documento_id, compilacion_id, num_capitulo,
+                        {'estado': 'error', 'inicio': inicio.isoformat(), 'error': str(e)},
+                    )
+                    return None
+
+                capitulo = {
+                    'titulo': resultado.get('titulo', CAPITULOS_EIA.get(num_capitulo, f'Capítulo {num_capitulo}')),
+                    'contenido': resultado.get('contenido', ''),
+                    'subsecciones': resultado.get('subsecciones', {}),
+                    'estadisticas': resultado.get('estadisticas', {})
+                }
+                fin = datetime.utcnow()
+                await self._actualizar_capitulo_compilacion(
+                    sesion, documento_id, compilacion_id, num_capitulo,
+                    {
+                        'estado': 'completado',
+                        'inicio': inicio.isoformat(),
+                        'fin': fin.isoformat(),
+                        'duracion_segundos': round((fin - inicio).total_seconds(), 1),
+                    },
+                    capitulo=capitulo,
+                )
+                return capitulo
+
+    async def _actualizar_capitulo_compilacion(
+        self,
+        db: AsyncSession,
+        documento_id: int,
+        compilacion_id: str,
+        num_capitulo: int,
+        estado: Dict[str, Any],
+        capitulo: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Actualiza el estado de un capítulo (y su contenido) y confirma.
+
+        La actualización es atómica sobre el JSONB, por lo que capítulos que
+        terminan a la vez no se pisan entre sí.
+        """
+        await db.execute(
+            SQL_GUARDAR_CAPITULO if capitulo is not None else SQL_ESTADO_CAPITULO,
+            {
+                'id': documento_id,
+                'compilacion_id': compilacion_id,
+                'ruta': ['compilacion', 'capitulos', str(num_capitulo)],
+                'estado': json.dumps(estado),
+                'capitulo': str(num_capitulo),
+                'contenido': json.dumps(capitulo) if capitulo is not None else None,
+                'ahora': datetime.utcnow(),
+            },
+        )
+        await db.commit()
+
     async def generar_capitulo(
         self,
         db: AsyncSession,
@@ -655,6 +815,10 @@ class GeneracionEIAService:
         """
         Obtiene el progreso de generación por capítulo.
 
+        Durante una compilación refleja el estado de cada capítulo
+        (pendiente, generando, completado, error) tal como lo persisten las
+        tareas de compilar_documento.
+
         Args:
             db: Sesión de base de datos
             proyecto_id: ID del proyecto
@@ -665,17 +829,44 @@ class GeneracionEIAService:
         documento = await self._get_documento_by_proyecto(db, proyecto_id)
 
         progreso = []
-        contenido_capitulos = documento.contenido_capitulos if documento else {}
+        contenido_capitulos = (documento.contenido_capitulos if documento else None) or {}
+        compilacion = ((documento.metadatos if documento else None) or {}).get('compilacion') or {}
+        estados = compilacion.get('capitulos', {}) if compilacion.get('estado') != 'completada' else {}
+
+        # Estimación por capítulo: duración media de los ya completados en la compilación
+        duraciones = [c['duracion_segundos'] for c in estados.values() if c.get('duracion_segundos') is not None]
+        estimado = round(sum(duraciones) / len(duraciones)) if duraciones else 60
 
         for num in range(1, 12):
             capitulo_key = str(num)
             titulo = CAPITULOS_EIA.get(num, f'Capítulo {num}')
+            cap_data = contenido_capitulos.get(capitulo_key)
+            contenido = cap_data.get('contenido', '') if cap_data else ''
+            palabras = len(contenido.split()) if contenido else 0
+            estado = estados.get(capitulo_key, {}).get('estado')
 
-            if capitulo_key in contenido_capitulos:
-                cap_data = contenido_capitulos[capitulo_key]
-                contenido = cap_data.get('contenido', '')
-                palabras = len(contenido.split()) if contenido else 0
-
+            if estado == 'generando':
+                transcurrido = (datetime.utcnow() - datetime.fromisoformat(estados[capitulo_key]['inicio'])).total_seconds()
+                progreso.append(ProgresoGeneracion(
+                    capitulo_numero=num,
+                    titulo=titulo,
+                    estado='generando',
+                    progreso_porcentaje=min(95, int(100 * transcurrido / estimado)),
+                    palabras_generadas=0,
+                    tiempo_estimado_segundos=max(0, round(estimado - transcurrido)),
+                    error=None
+                ))
+            elif estado == 'error':
+                progreso.append(ProgresoGeneracion(
+                    capitulo_numero=num,
+                    titulo=cap_data.get('titulo', titulo) if cap_data else titulo,
+                    estado='error',
+                    progreso_porcentaje=0,
+                    palabras_generadas=palabras,
+                    tiempo_estimado_segundos=None,
+                    error=estados[capitulo_key].get('error')
+                ))
+            elif cap_data is not None and estado != 'pendiente':
                 progreso.append(ProgresoGeneracion(
                     capitulo_numero=num,
                     titulo=cap_data.get('titulo', titulo),
@@ -692,7 +883,7 @@ class GeneracionEIAService:
                     estado='pendiente',
                     progreso_porcentaje=0,
                     palabras_generadas=0,
-                    tiempo_estimado_segundos=60,  # Estimación
+                    tiempo_estimado_segundos=estimado,
                     error=None
                 ))
 
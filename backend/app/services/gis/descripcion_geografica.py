@@ -138,7 +138,8 @@ class ServicioDescripcionGeografica:
         respuesta = await self.llm_client.generar(
             prompt_usuario=prompt,
             temperatura=0.7,  # Un poco más creativo para narrativa
-            max_tokens=1000
+            max_tokens=1000,
+            sitio="gis.descripcion_geografica",
         )
 
         descripcion = respuesta.contenido.strip()
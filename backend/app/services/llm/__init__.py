@@ -18,6 +18,7 @@ from app.services.llm.cliente import (
 )
 from app.services.llm.prompts import GestorPrompts, TipoPrompt
 from app.services.llm.generador import GeneradorInformes, SeccionInforme
+from app.services.llm.cache_secciones import CacheSecciones, get_cache_secciones
 from app.services.llm.perplexity_client import (
     PerplexityClient,
     PerplexityResponse,
@@ -26,12 +27,14 @@ from app.services.llm.perplexity_client import (
     is_perplexity_enabled,
 )
 from app.services.llm.router import (
+    DecisionRouting,
     LLMRouter,
     TipoTarea,
     Proveedor,
     RespuestaRouter,
     get_llm_router,
 )
+from app.services.llm.salud_modelos import MonitorModelos, get_monitor_modelos
 
 __all__ = [
     # Cliente Anthropic
@@ -45,6 +48,8 @@ __all__ = [
     # Generador
     "GeneradorInformes",
     "SeccionInforme",
+    "CacheSecciones",
+    "get_cache_secciones",
     # Cliente Perplexity
     "PerplexityClient",
     "PerplexityResponse",
@@ -52,9 +57,12 @@ __all__ = [
     "get_perplexity_client",
     "is_perplexity_enabled",
     # Router Multi-LLM
+    "DecisionRouting",
     "LLMRouter",
     "TipoTarea",
     "Proveedor",
     "RespuestaRouter",
     "get_llm_router",
+    "MonitorModelos",
+    "get_monitor_modelos",
 ]
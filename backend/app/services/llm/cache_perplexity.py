@@ -0,0 +1,203 @@
+"""
+Caché y coalescencia de búsquedas web en Perplexity.
+
+Una búsqueda puede tardar hasta PERPLEXITY_TIMEOUT_SECONDS y la misma
+consulta normativa ("cambios recientes al reglamento del SEIA") llega de
+varios usuarios a la vez. Aquí:
+
+- single-flight: las búsquedas concurrentes con la misma clave comparten
+  una sola solicitud en vuelo; si un llamador se cancela la solicitud
+  sigue para los demás.
+- caché LRU con TTL por (consulta normalizada, modo, contexto).
+- stale-while-revalidate: pasado el TTL, y dentro de la ventana de
+  obsolescencia, se entrega la respuesta anterior al instante y se
+  refresca en segundo plano (una sola vez por clave).
+
+Los errores no se cachean. La caché es local a cada proceso, como la de
+búsqueda semántica (ver rag.cache_busqueda).
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.services.rag.cache_busqueda import normalizar_query
+
+if TYPE_CHECKING:
+    from app.services.llm.perplexity_client import PerplexityResponse
+
+logger = logging.getLogger(__name__)
+
+# Signos que no cambian la consulta ("¿Qué plazos tiene una DIA?" == "que plazos tiene una dia")
+SIGNOS_IGNORADOS = "¿?¡!.,;:\"'"
+
+Busqueda = Callable[[], Awaitable["PerplexityResponse"]]
+
+
+@dataclass
+class _Entrada:
+    valor: "PerplexityResponse"
+    fresca_hasta: float
+    obsoleta_hasta: float
+
+
+class CachePerplexity:
+    """Caché LRU con TTL, ventana stale-while-revalidate y búsquedas en vuelo compartidas."""
+
+    def __init__(
+        self,
+        max_entradas: Optional[int] = None,
+        ttl_segundos: Optional[float] = None,
+        obsoleto_segundos: Optional[float] = None,
+    ):
+        self.max_entradas = max_entradas or settings.PERPLEXITY_CACHE_MAX_ENTRADAS
+        self.ttl_segundos = ttl_segundos if ttl_segundos is not None else settings.PERPLEXITY_CACHE_TTL_SEGUNDOS
+        self.obsoleto_segundos = (
+            obsoleto_segundos if obsoleto_segundos is not None else settings.PERPLEXITY_CACHE_OBSOLETO_SEGUNDOS
+        )
+        self._entradas: "OrderedDict[Tuple, _Entrada]" = OrderedDict()
+        self._en_vuelo: Dict[Tuple, asyncio.Task] = {}
+        self._revalidaciones: Set[asyncio.Task] = set()
+        self._metricas = {
+            "aciertos": 0,
+            "obsoletas": 0,
+            "fallos": 0,
+            "coalescidas": 0,
+            "revalidaciones": 0,
+            "desalojadas": 0,
+        }
+
+    @staticmethod
+    def clave(
+        query: str,
+        modo: str,
+        contexto_chile: bool = True,
+        contexto_adicional: Optional[str] = None,
+    ) -> Tuple:
+        """Clave de una búsqueda: consulta normalizada sin signos, modo y contexto."""
+        consulta = " ".join(
+            palabra.strip(SIGNOS_IGNORADOS) for palabra in normalizar_query(query).split()
+        ).strip()
+        return (consulta, modo, contexto_chile, normalizar_query(contexto_adicional or ""))
+
+    async def obtener_o_buscar(
+        self,
+        clave: Tuple,
+        buscar: Busqueda,
+        servir_obsoleto: bool = False,
+    ) -> "PerplexityResponse":
+        """
+        Respuesta cacheada o resultado de `buscar`, compartido con las
+        búsquedas concurrentes de la misma clave.
+
+        Args:
+            clave: Clave de `CachePerplexity.clave`
+            buscar: Corrutina sin argumentos que consulta la API
+            servir_obsoleto: Entregar una entrada vencida (dentro de la
+                ventana de obsolescencia) y refrescarla en segundo plano
+
+        Returns:
+            PerplexityResponse; `metadata["cache"]` indica acierto,
+            obsoleto o coalescida cuando no hubo solicitud propia
+        """
+        ahora = time.monotonic()
+        entrada = self._entradas.get(clave)
+        if entrada is not None:
+            if ahora < entrada.fresca_hasta:
+                self._entradas.move_to_end(clave)
+                self._metricas["aciertos"] += 1
+                return _marcar(entrada.valor, "acierto")
+            if servir_obsoleto and ahora < entrada.obsoleta_hasta:
+                self._entradas.move_to_end(clave)
+                self._metricas["obsoletas"] += 1
+                self._revalidar(clave, buscar)
+                return _marcar(entrada.valor, "obsoleto")
+
+        self._metricas["fallos"] += 1
+        tarea = self._en_vuelo.get(clave)
+        if tarea is not None:
+            self._metricas["coalescidas"] += 1
+            return _marcar(await asyncio.shield(tarea), "coalescida")
+        return await asyncio.shield(self._lanzar(clave, buscar))
+
+    def _lanzar(self, clave: Tuple, buscar: Busqueda) -> asyncio.Task:
+        """Crea la búsqueda en vuelo de la clave; al terminar bien se cachea."""
+        async def ejecutar():
+            try:
+                valor = await buscar()
+                self.guardar(clave, valor)
+                return valor
+            finally:
+                self._en_vuelo.pop(clave, None)
+
+        tarea = asyncio.create_task(ejecutar())
+        self._en_vuelo[clave] = tarea
+        return tarea
+
+    def _revalidar(self, clave: Tuple, buscar: Busqueda):
+        """Refresca la entrada en segundo plano si no hay ya una búsqueda en vuelo."""
+        if clave in self._en_vuelo:
+            return
+        self._metricas["revalidaciones"] += 1
+        tarea = self._lanzar(clave, buscar)
+        self._revalidaciones.add(tarea)
+        tarea.add_done_callback(self._fin_revalidacion)
+
+    def _fin_revalidacion(self, tarea: asyncio.Task):
+        self._revalidaciones.discard(tarea)
+        if not tarea.cancelled() and tarea.exception() is not None:
+            logger.warning(f"No se pudo revalidar búsqueda Perplexity, se mantiene la anterior: {tarea.exception()}")
+
+    def guardar(self, clave: Tuple, valor: "PerplexityResponse"):
+        """Guarda una respuesta con su TTL y ventana de obsolescencia."""
+        ahora = time.monotonic()
+        self._entradas[clave] = _Entrada(
+            valor=valor,
+            fresca_hasta=ahora + self.ttl_segundos,
+            obsoleta_hasta=ahora + self.ttl_segundos + self.obsoleto_segundos,
+        )
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+            self._metricas["desalojadas"] += 1
+
+    def limpiar(self):
+        """Elimina todas las entradas y reinicia las métricas (no cancela búsquedas en vuelo)."""
+        self._entradas.clear()
+        for nombre in self._metricas:
+            self._metricas[nombre] = 0
+
+    def metricas(self) -> Dict[str, Any]:
+        """Contadores de uso y tasa de aciertos (frescos u obsoletos)."""
+        consultas = self._metricas["aciertos"] + self._metricas["obsoletas"] + self._metricas["fallos"]
+        servidas = self._metricas["aciertos"] + self._metricas["obsoletas"] + self._metricas["coalescidas"]
+        return {
+            **self._metricas,
+            "consultas": consultas,
+            "tasa_sin_solicitud": round(servidas / consultas, 4) if consultas else 0.0,
+            "en_vuelo": len(self._en_vuelo),
+            "entradas": len(self._entradas),
+            "max_entradas": self.max_entradas,
+            "ttl_segundos": self.ttl_segundos,
+            "obsoleto_segundos": self.obsoleto_segundos,
+        }
+
+
+def _marcar(valor: "PerplexityResponse", origen: str) -> "PerplexityResponse":
+    """Copia de la respuesta con el origen de caché en metadata."""
+    return replace(valor, metadata={**valor.metadata, "cache": origen})
+
+
+_cache_perplexity: Optional[CachePerplexity] = None
+
+
+def get_cache_perplexity() -> CachePerplexity:
+    """Obtiene la instancia singleton de la caché de Perplexity."""
+    global _cache_perplexity
+    if _cache_perplexity is None:
+        _cache_perplexity = CachePerplexity()
+    return _cache_perplexity
@@ -0,0 +1,181 @@
+"""
+Caché de secciones LLM del informe de prefactibilidad.
+
+Una sección generada por el LLM depende solo del prompt renderizado (que
+ya incluye los datos del proyecto, el GIS, la clasificación y la
+normativa), del prompt de sistema y del modelo. Se guarda en Redis bajo
+(sección, modelo, hash del prompt), de modo que re-exportar el mismo
+análisis no vuelve a pagar tokens. Un cambio en las plantillas de
+prompts cambia el hash y no requiere invalidar a mano.
+
+Si Redis no está disponible el generador sigue funcionando sin caché y
+vuelve a intentar conectarse pasado ESPERA_REINTENTO_SEGUNDOS.
+"""
+
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Any, Optional
+
+import redis
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PREFIJO_CLAVE = "informe:seccion:"
+ESPERA_REINTENTO_SEGUNDOS = 30.0  # Tras un error de Redis, sin caché durante este tiempo
+
+
+def hash_prompt(prompt_sistema: str, prompt_usuario: str, parametros: dict[str, Any]) -> str:
+    """Hash estable del prompt renderizado y los parámetros de generación."""
+    material = json.dumps(
+        {"sistema": prompt_sistema, "usuario": prompt_usuario, "parametros": parametros},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def clave_seccion(seccion: str, modelo: str, hash_: str) -> str:
+    return f"{PREFIJO_CLAVE}{seccion}:{modelo}:{hash_}"
+
+
+class CacheSecciones:
+    """
+    Caché asíncrona de secciones del informe en Redis.
+
+    Cada entrada guarda el contenido y los tokens que costó generarla. Las
+    métricas son locales al proceso.
+    """
+
+    def __init__(
+        self,
+        redis_url: Optional[str] = None,
+        ttl_dias: Optional[int] = None,
+        cliente: Optional[aioredis.Redis] = None,
+    ):
+        self.redis_url = redis_url or settings.REDIS_URL
+        self.ttl_segundos = (ttl_dias or settings.INFORME_CACHE_TTL_DIAS) * 86400
+        self._cliente = cliente
+        self._habilitada = settings.INFORME_CACHE_HABILITADO
+        self._reintentar_en = 0.0
+        self._metricas = {"aciertos": 0, "fallos": 0, "tokens_ahorrados": 0}
+
+    def _disponible(self) -> bool:
+        return self._habilitada and time.monotonic() >= self._reintentar_en
+
+    def _get_redis(self) -> Optional[aioredis.Redis]:
+        if not self._disponible():
+            return None
+        if self._cliente is None:
+            self._cliente = aioredis.from_url(
+                self.redis_url,
+                decode_responses=True,
+                socket_connect_timeout=2,
+            )
+        return self._cliente
+
+    def _suspender(self, error: Exception):
+        logger.warning(
+            f"Caché de secciones no disponible, se continúa sin caché por "
+            f"{ESPERA_REINTENTO_SEGUNDOS:.0f}s: {error}"
+        )
+        self._reintentar_en = time.monotonic() + ESPERA_REINTENTO_SEGUNDOS
+
+    async def obtener(self, seccion: str, modelo: str, hash_: str) -> Optional[dict[str, Any]]:
+        """Entrada cacheada ({contenido, tokens_usados, creado_en}) o None."""
+        cliente = self._get_redis()
+        if cliente is None:
+            return None
+        clave = clave_seccion(seccion, modelo, hash_)
+        try:
+            valor = await cliente.get(clave)
+        except (redis.RedisError, OSError) as e:
+            self._suspender(e)
+            return None
+
+        if valor is None:
+            self._metricas["fallos"] += 1
+            return None
+        try:
+            entrada = json.loads(valor)
+        except ValueError:
+            entrada = None
+        if not isinstance(entrada, dict) or not isinstance(entrada.get("contenido"), str):
+            # Entrada corrupta: cuenta como fallo y se elimina para regenerarla
+            logger.warning(f"Entrada inválida en la caché de secciones, se descarta: {clave}")
+            self._metricas["fallos"] += 1
+            try:
+                await cliente.delete(clave)
+            except (redis.RedisError, OSError) as e:
+                self._suspender(e)
+            return None
+        self._metricas["aciertos"] += 1
+        self._metricas["tokens_ahorrados"] += entrada.get("tokens_usados", 0)
+        return entrada
+
+    async def guardar(self, seccion: str, modelo: str, hash_: str, contenido: str, tokens_usados: int):
+        """Guarda una sección generada."""
+        cliente = self._get_redis()
+        if cliente is None:
+            return
+        entrada = {
+            "contenido": contenido,
+            "tokens_usados": tokens_usados,
+            "creado_en": datetime.now().isoformat(),
+        }
+        try:
+            await cliente.set(
+                clave_seccion(seccion, modelo, hash_),
+                json.dumps(entrada, ensure_ascii=False),
+                ex=self.ttl_segundos,
+            )
+        except (redis.RedisError, OSError) as e:
+            self._suspender(e)
+
+    async def invalidar(self, seccion: Optional[str] = None) -> int:
+        """
+        Elimina las entradas de una sección, o todas.
+
+        Returns:
+            Número de entradas eliminadas
+        """
+        cliente = self._get_redis()
+        if cliente is None:
+            return 0
+        patron = f"{PREFIJO_CLAVE}{seccion or '*'}:*"
+        eliminadas = 0
+        try:
+            claves = [clave async for clave in cliente.scan_iter(match=patron, count=500)]
+            if claves:
+                eliminadas = await cliente.delete(*claves)
+        except (redis.RedisError, OSError) as e:
+            self._suspender(e)
+        logger.info(f"Caché de secciones invalidada ({seccion or 'todas'}): {eliminadas} entradas")
+        return eliminadas
+
+    def metricas(self) -> dict[str, Any]:
+        """Aciertos, fallos y tokens ahorrados en este proceso."""
+        consultas = self._metricas["aciertos"] + self._metricas["fallos"]
+        return {
+            **self._metricas,
+            "consultas": consultas,
+            "tasa_aciertos": round(self._metricas["aciertos"] / consultas, 4) if consultas else 0.0,
+            "disponible": self._disponible(),
+        }
+
+
+_cache_secciones: Optional[CacheSecciones] = None
+
+
+def get_cache_secciones() -> CacheSecciones:
+    """Obtiene la instancia singleton de la caché de secciones."""
+    global _cache_secciones
+    if _cache_secciones is None:
+        _cache_secciones = CacheSecciones()
+    return _cache_secciones
@@ -5,6 +5,7 @@ Utiliza Claude para clasificar automáticamente fragmentos de texto legal
 según temas, triggers Art. 11, componentes ambientales y categorías.
 """
 
+import asyncio
 import logging
 from dataclasses import dataclass, field
 from typing import List, Dict, Any, Optional
@@ -13,6 +14,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 
 from app.services.llm.cliente import get_cliente_llm, ClienteLLM, ModeloLLM
+from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
@@ -95,6 +97,38 @@ Responde con JSON:
   "razonamiento": "Breve explicación de la clasificación"
 }}"""
 
+PROMPT_CLASIFICAR_LOTE = """Clasifica cada uno de los siguientes {cantidad} fragmentos de documentos legales chilenos de forma independiente.
+
+{fragmentos}
+
+CATÁLOGO DE TEMAS DISPONIBLES (usa SOLO estos códigos):
+{catalogo_temas}
+
+TRIGGERS ART. 11 LEY 19.300:
+- a: Riesgo para la salud de la población
+- b: Efectos adversos sobre recursos naturales renovables (agua, suelo, aire, flora, fauna, glaciares)
+- c: Reasentamiento de comunidades humanas o alteración significativa de sistemas de vida
+- d: Localización en o próxima a áreas protegidas, sitios prioritarios o glaciares
+- e: Alteración significativa del patrimonio cultural (arqueológico, paleontológico, histórico)
+- f: Alteración significativa de paisaje o sitios con valor turístico
+
+COMPONENTES AMBIENTALES:
+- agua, aire, suelo, flora, fauna, glaciares, ruido, patrimonio, paisaje, social
+
+Responde con JSON, un elemento por fragmento usando su número en "indice":
+{{
+  "fragmentos": [
+    {{
+      "indice": 1,
+      "temas": [{{"codigo": "codigo_tema", "confianza": 0.0-1.0}}],
+      "triggers_art11": ["a", "b", ...],
+      "componentes_ambientales": ["agua", "aire", ...],
+      "confianza_general": 0.0-1.0
+    }},
+    ...
+  ]
+}}"""
+
 PROMPT_CLASIFICAR_DOCUMENTO = """Clasifica el siguiente documento legal chileno para determinar su categoría y metadatos.
 
 TÍTULO: {titulo}
@@ -152,6 +186,9 @@ class ClasificadorLLM:
     según el catálogo de temas, triggers y categorías del sistema.
     """
 
+    # Tokens de salida reservados por fragmento en una clasificación por lotes
+    TOKENS_SALIDA_POR_FRAGMENTO = 350
+
     def __init__(self, cliente_llm: Optional[ClienteLLM] = None):
         """
         Inicializa el clasificador.
@@ -285,6 +322,7 @@ class ClasificadorLLM:
                 prompt_usuario=prompt,
                 prompt_sistema=PROMPT_SISTEMA_CLASIFICACION,
                 modelo=ModeloLLM.CLAUDE_HAIKU.value,  # Usar Haiku para clasificación rápida
+                sitio="clasificador.fragmento",
                 temperatura=0.1,  # Baja temperatura para consistencia
             )
 
@@ -306,6 +344,174 @@ class ClasificadorLLM:
             logger.error(f"Error clasificando fragmento: {e}")
             return self._clasificacion_por_defecto_fragmento(texto, temas)
 
+    async def clasificar_fragmentos_lote(
+        self,
+        db: AsyncSession,
+        textos: List[str],
+        tamano_lote: Optional[int] = None,
+        max_concurrencia: Optional[int] = None,
+        reintentos: Optional[int] = None,
+    ) -> List[Optional[ClasificacionFragmento]]:
+        """
+        Clasifica muchos fragmentos empaquetando varios por llamada al LLM.
+
+        Los paquetes se envían en paralelo bajo un semáforo y sólo los
+        paquetes que fallan completos se reintentan. El catálogo de temas se
+        carga una vez antes de lanzar los paquetes, que no usan la sesión.
+
+        Args:
+            db: Sesión de base de datos
+            textos: Textos de los fragmentos a clasificar
+            tamano_lote: Fragmentos por llamada (default: RAG_CLASIFICACION_LOTE)
+            max_concurrencia: Llamadas simultáneas (default: RAG_CLASIFICACION_CONCURRENCIA)
+            reintentos: Reintentos por paquete fallido (default: RAG_CLASIFICACION_REINTENTOS)
+
+        Returns:
+            Lista alineada con `textos`. Contiene None para los fragmentos que
+            el LLM no pudo clasificar, para que el llamador aplique su fallback.
+        """
+        if not textos:
+            return []
+
+        tamano_lote = max(1, tamano_lote or settings.RAG_CLASIFICACION_LOTE)
+        max_concurrencia = max(1, max_concurrencia or settings.RAG_CLASIFICACION_CONCURRENCIA)
+        if reintentos is None:
+            reintentos = settings.RAG_CLASIFICACION_REINTENTOS
+
+        temas = await self._cargar_catalogo_temas(db)
+        catalogo = self._formatear_catalogo_temas(temas)
+
+        resultados: List[Optional[ClasificacionFragmento]] = [None] * len(textos)
+        pendientes = [
+            list(range(inicio, min(inicio + tamano_lote, len(textos))))
+            for inicio in range(0, len(textos), tamano_lote)
+        ]
+        semaforo = asyncio.Semaphore(max_concurrencia)
+
+        async def procesar(indices: List[int]):
+            async with semaforo:
+                try:
+                    clasificaciones = await self._clasificar_paquete(
+                        [textos[i] for i in indices], catalogo
+                    )
+                    return indices, clasificaciones
+                except Exception as e:
+                    logger.warning(f"Error clasificando paquete de {len(indices)} fragmentos: {e}")
+                    return indices, None
+
+        for intento in range(reintentos + 1):
+            if not pendientes:
+                break
+            if intento > 0:
+                logger.info(f"Reintentando {len(pendientes)} paquetes fallidos (intento {intento + 1})")
+
+            respuestas = await asyncio.gather(*(procesar(p) for p in pendientes))
+
+            pendientes = []
+            for indices, clasificaciones in respuestas:
+                if clasificaciones is None:
+                    pendientes.append(indices)
+                    continue
+                for posicion, indice in enumerate(indices):
+                    resultados[indice] = clasificaciones.get(posicion)
+
+        sin_clasificar = sum(1 for r in resultados if r is None)
+        logger.info(
+            f"Clasificación por lotes: {len(textos) - sin_clasificar}/{len(textos)} fragmentos "
+            f"en {(len(textos) + tamano_lote - 1) // tamano_lote} paquetes"
+        )
+        return resultados
+
+    async def _clasificar_paquete(
+        self,
+        textos: List[str],
+        catalogo: str
+    ) -> Dict[int, ClasificacionFragmento]:
+        """
+        Clasifica un paquete de fragmentos en una sola llamada al LLM.
+
+        Returns:
+            Diccionario posición-en-paquete -> clasificación. Los fragmentos
+            omitidos por el modelo no aparecen.
+
+        Raises:
+            ValueError: Si la respuesta no es un JSON con la lista de fragmentos
+        """
+        bloques = []
+        for i, texto in enumerate(textos, start=1):
+            texto_truncado = texto[:3000] if len(texto) > 3000 else texto
+            bloques.append(f"[FRAGMENTO {i}]\n```\n{texto_truncado}\n```")
+
+        prompt = PROMPT_CLASIFICAR_LOTE.format(
+            cantidad=len(textos),
+            fragmentos="\n\n".join(bloques),
+            catalogo_temas=catalogo
+        )
+
+        resultado = await self.cliente.generar_estructurado(
+            prompt_usuario=prompt,
+            prompt_sistema=PROMPT_SISTEMA_CLASIFICACION,
+            modelo=ModeloLLM.CLAUDE_HAIKU.value,
+            sitio="clasificador.lote",
+            temperatura=0.1,
+            max_tokens=min(8192, self.TOKENS_SALIDA_POR_FRAGMENTO * len(textos) + 256),
+        )
+
+        data = resultado.get("data")
+        if resultado.get("error") or not isinstance(data, dict) \
+                or not isinstance(data.get("fragmentos"), list):
+            raise ValueError(f"Respuesta de lote inválida: {resultado.get('error')}")
+
+        clasificaciones = {}
+        for item in data["fragmentos"]:
+            try:
+                posicion = int(item.get("indice")) - 1
+            except (TypeError, ValueError, AttributeError):
+                continue
+            if not 0 <= posicion < len(textos):
+                continue
+
+            clasificacion = self._clasificacion_de_item(item)
+            if clasificacion is None:
+                # Queda sin clasificar y cae a la detección por keywords
+                logger.warning(f"Clasificación inválida para el fragmento {posicion + 1} del paquete")
+                continue
+            clasificaciones[posicion] = clasificacion
+
+        return clasificaciones
+
+    @staticmethod
+    def _clasificacion_de_item(item: Dict[str, Any]) -> Optional[ClasificacionFragmento]:
+        """
+        Valida un item de la respuesta por lotes.
+
+        Returns:
+            La clasificación, o None si el item está mal formado (temas sin
+            codigo/confianza, listas que no son listas, etc.)
+        """
+        temas = item.get("temas", [])
+        triggers = item.get("triggers_art11", [])
+        componentes = item.get("componentes_ambientales", [])
+        if not all(isinstance(v, list) for v in (temas, triggers, componentes)):
+            return None
+        if not all(isinstance(v, str) for v in triggers + componentes):
+            return None
+        for tema in temas:
+            if not isinstance(tema, dict) or not isinstance(tema.get("codigo"), str) \
+                    or not isinstance(tema.get("confianza"), (int, float)):
+                return None
+        try:
+            confianza_general = float(item.get("confianza_general", 0.5))
+        except (TypeError, ValueError):
+            return None
+
+        return ClasificacionFragmento(
+            temas=temas,
+            triggers_art11=triggers,
+            componentes_ambientales=componentes,
+            confianza_general=confianza_general,
+        )
+
     async def clasificar_documento(
         self,
         db: AsyncSession,
@@ -358,6 +564,7 @@ class ClasificadorLLM:
                 prompt_usuario=prompt,
                 prompt_sistema=PROMPT_SISTEMA_CLASIFICACION,
                 modelo=ModeloLLM.CLAUDE_HAIKU.value,
+                sitio="clasificador.documento",
                 temperatura=0.1,
             )
 
@@ -12,9 +12,11 @@ from enum import Enum
 import asyncio
 
 import anthropic
-from anthropic import APIError, RateLimitError, APIConnectionError
+from anthropic import APIError, APIConnectionError
 
 from app.core.config import settings
+from app.services.llm.pool_anthropic import get_cliente_anthropic
+from app.services.llm.telemetria import operacion_llm
 
 logger = logging.getLogger(__name__)
 
@@ -104,7 +106,8 @@ class ClienteLLM:
                     "ANTHROPIC_API_KEY no configurada. "
                     "Configure la variable de entorno o en el archivo .env"
                 )
-            self._cliente = anthropic.AsyncAnthropic(
+            self._cliente = get_cliente_anthropic(
+                "llm.generar",
                 api_key=api_key,
                 timeout=self.config.timeout_segundos,
             )
@@ -122,7 +125,9 @@ class ClienteLLM:
         Args:
             prompt_usuario: El prompt/mensaje del usuario
             prompt_sistema: Prompt de sistema opcional para contexto
-            **kwargs: Parámetros adicionales para la API
+            **kwargs: Parámetros adicionales para la API (modelo, max_tokens,
+                temperatura, top_p) y `sitio`, la funcionalidad a la que la
+                telemetría atribuye la llamada
 
         Returns:
             RespuestaLLM con el contenido y metadatos
@@ -150,59 +155,55 @@ class ClienteLLM:
 
         logger.debug(f"Enviando solicitud a Claude: {len(prompt_usuario)} chars")
 
-        # Intentar con reintentos
-        ultimo_error = None
-        for intento in range(self.config.reintentos):
-            try:
-                respuesta = await self.cliente.messages.create(**params)
-
-                tiempo_ms = int((time.time() - inicio) * 1000)
-
-                # Extraer contenido de la respuesta
-                contenido = ""
-                if respuesta.content:
-                    contenido = respuesta.content[0].text
-
-                resultado = RespuestaLLM(
-                    contenido=contenido,
-                    tokens_entrada=respuesta.usage.input_tokens,
-                    tokens_salida=respuesta.usage.output_tokens,
-                    modelo=respuesta.model,
-                    tiempo_ms=tiempo_ms,
-                    metadata={
-                        "stop_reason": respuesta.stop_reason,
-                        "intento": intento + 1,
-                    }
-                )
-
-                logger.info(
-                    f"Respuesta generada: {resultado.tokens_totales} tokens, "
-                    f"{tiempo_ms}ms, intento {intento + 1}"
-                )
-                return resultado
-
-            except RateLimitError as e:
-                ultimo_error = e
-                espera = min(2 ** intento * 5, 60)  # Exponential backoff, max 60s
-                logger.warning(f"Rate limit alcanzado. Esperando {espera}s (intento {intento + 1})")
-                await asyncio.sleep(espera)
-
-            except APIConnectionError as e:
-                ultimo_error = e
-                logger.warning(f"Error de conexión: {e} (intento {intento + 1})")
-                await asyncio.sleep(2 ** intento)
-
-            except APIError as e:
-                ultimo_error = e
-                logger.error(f"Error de API: {e} (intento {intento + 1})")
-                if e.status_code and e.status_code >= 500:
+        # Reintentos ante errores de conexión y 5xx; los 429 ya los reintenta el
+        # limitador del cliente instrumentado. La telemetria cuenta cada intento extra
+        with operacion_llm(kwargs.get("sitio")):
+            ultimo_error = None
+            for intento in range(self.config.reintentos):
+                try:
+                    respuesta = await self.cliente.messages.create(**params)
+
+                    tiempo_ms = int((time.time() - inicio) * 1000)
+
+                    # Extraer contenido de la respuesta
+                    contenido = ""
+                    if respuesta.content:
+                        contenido = respuesta.content[0].text
+
+                    resultado = RespuestaLLM(
+                        contenido=contenido,
+                        tokens_entrada=respuesta.usage.input_tokens,
+                        tokens_salida=respuesta.usage.output_tokens,
+                        modelo=respuesta.model,
+                        tiempo_ms=tiempo_ms,
+                        metadata={
+                            "stop_reason": respuesta.stop_reason,
+                            "intento": intento + 1,
+                        }
+                    )
+
+                    logger.info(
+                        f"Respuesta generada: {resultado.tokens_totales} tokens, "
+                        f"{tiempo_ms}ms, intento {intento + 1}"
+                    )
+                    return resultado
+
+                except APIConnectionError as e:
+                    ultimo_error = e
+                    logger.warning(f"Error de conexión: {e} (intento {intento + 1})")
                     await asyncio.sleep(2 ** intento)
-                else:
-                    raise
 
-        # Si llegamos aquí, fallaron todos los reintentos
-        logger.error(f"Fallaron todos los reintentos: {ultimo_error}")
-        raise ultimo_error or Exception("Error desconocido en generación LLM")
+                except APIError as e:
+                    ultimo_error = e
+                    logger.error(f"Error de API: {e} (intento {intento + 1})")
+                    if e.status_code and e.status_code >= 500:
+                        await asyncio.sleep(2 ** intento)
+                    else:
+                        raise
+
+            # Si llegamos aquí, fallaron todos los reintentos
+            logger.error(f"Fallaron todos los reintentos: {ultimo_error}")
+            raise ultimo_error or Exception("Error desconocido en generación LLM")
 
     async def generar_estructurado(
         self,
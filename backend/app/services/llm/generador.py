@@ -7,11 +7,12 @@ para generar informes estructurados de prefactibilidad.
 
 import logging
 from dataclasses import dataclass, field
-from typing import Any, Optional
+from typing import Any, Awaitable, Callable, Optional
 from enum import Enum
 from datetime import datetime
 import asyncio
 
+from app.services.llm.cache_secciones import CacheSecciones, get_cache_secciones, hash_prompt
 from app.services.llm.cliente import ClienteLLM, get_cliente_llm
 from app.services.llm.prompts import GestorPrompts, TipoPrompt, ContextoPrompt
 from app.services.reglas.seia import MotorReglasSSEIA, ClasificacionSEIA
@@ -139,6 +140,7 @@ class GeneradorInformes:
         cliente_llm: Optional[ClienteLLM] = None,
         motor_reglas: Optional[MotorReglasSSEIA] = None,
         sistema_alertas: Optional[SistemaAlertas] = None,
+        cache: Optional[CacheSecciones] = None,
     ):
         """
         Inicializa el generador de informes.
@@ -147,10 +149,12 @@ class GeneradorInformes:
             cliente_llm: Cliente LLM opcional (usa singleton si no se proporciona)
             motor_reglas: Motor de reglas SEIA opcional
             sistema_alertas: Sistema de alertas opcional
+            cache: Caché de secciones LLM opcional (usa singleton si no se proporciona)
         """
         self.cliente_llm = cliente_llm or get_cliente_llm()
         self.motor_reglas = motor_reglas or MotorReglasSSEIA()
         self.sistema_alertas = sistema_alertas or SistemaAlertas()
+        self.cache = cache or get_cache_secciones()
         self.gestor_prompts = GestorPrompts()
         logger.info("GeneradorInformes inicializado")
 
@@ -160,6 +164,7 @@ class GeneradorInformes:
         resultado_gis: dict[str, Any],
         normativa_relevante: list[dict[str, Any]],
         secciones_a_generar: Optional[list[SeccionInforme]] = None,
+        al_completar_seccion: Optional[Callable[[SeccionGenerada], Awaitable[None]]] = None,
     ) -> InformePrefactibilidad:
         """
         Genera un informe completo de prefactibilidad ambiental.
@@ -169,6 +174,8 @@ class GeneradorInformes:
             resultado_gis: Resultado del análisis espacial
             normativa_relevante: Fragmentos de normativa del RAG
             secciones_a_generar: Lista opcional de secciones a incluir
+            al_completar_seccion: Callback opcional que recibe cada sección
+                apenas termina (en orden de llegada, no del informe)
 
         Returns:
             InformePrefactibilidad con todas las secciones generadas
@@ -207,15 +214,18 @@ class GeneradorInformes:
         async def generar_seccion_safe(seccion: SeccionInforme) -> SeccionGenerada:
             """Wrapper que captura errores por sección."""
             try:
-                return await self._generar_seccion(seccion, contexto, clasificacion, alertas_dict)
+                generada = await self._generar_seccion(seccion, contexto, clasificacion, alertas_dict)
             except Exception as e:
                 logger.error(f"Error generando sección {seccion.value}: {e}")
-                return SeccionGenerada(
+                generada = SeccionGenerada(
                     seccion=seccion,
                     titulo=self.TITULOS_SECCIONES[seccion],
                     contenido=f"[Error al generar esta sección: {str(e)}]",
                     metadata={"error": str(e)},
                 )
+            if al_completar_seccion is not None:
+                await al_completar_seccion(generada)
+            return generada
 
         # Ejecutar todas las secciones en paralelo
         tareas = [generar_seccion_safe(seccion) for seccion in secciones_a_generar]
@@ -258,12 +268,20 @@ class GeneradorInformes:
         contexto: ContextoPrompt,
         clasificacion: ClasificacionSEIA,
         alertas: list[dict],
+        forzar: bool = False,
     ) -> SeccionGenerada:
-        """Genera una sección específica del informe."""
+        """
+        Genera una sección específica del informe.
+
+        Las secciones LLM se buscan primero en la caché por (sección, modelo,
+        hash del prompt renderizado); un acierto no consume tokens. Con
+        forzar=True se ignora la entrada cacheada y se reemplaza.
+        """
         import time
 
         inicio = time.time()
         titulo = self.TITULOS_SECCIONES[seccion]
+        metadata = {}
 
         # Mapear sección a tipo de prompt
         tipo_prompt = self._mapear_seccion_a_prompt(seccion)
@@ -272,14 +290,27 @@ class GeneradorInformes:
             # Generar con LLM
             prompt = self.gestor_prompts.construir_prompt(tipo_prompt, contexto)
             prompt_sistema = self.gestor_prompts.obtener_prompt_sistema()
+            modelo = self.cliente_llm.config.modelo
+            hash_ = hash_prompt(prompt_sistema, prompt, {
+                "max_tokens": self.cliente_llm.config.max_tokens,
+                "temperatura": self.cliente_llm.config.temperatura,
+            })
+
+            cacheada = None if forzar else await self.cache.obtener(seccion.value, modelo, hash_)
+            if cacheada is not None:
+                contenido = cacheada["contenido"]
+                tokens = 0
+                metadata = {"cache": True, "tokens_originales": cacheada.get("tokens_usados", 0)}
+            else:
+                respuesta = await self.cliente_llm.generar(
+                    prompt_usuario=prompt,
+                    prompt_sistema=prompt_sistema,
+                    sitio=f"informe.{seccion.value}",
+                )
 
-            respuesta = await self.cliente_llm.generar(
-                prompt_usuario=prompt,
-                prompt_sistema=prompt_sistema,
-            )
-
-            contenido = respuesta.contenido
-            tokens = respuesta.tokens_totales
+                contenido = respuesta.contenido
+                tokens = respuesta.tokens_totales
+                await self.cache.guardar(seccion.value, modelo, hash_, contenido, tokens)
         else:
             # Generar contenido estático/estructurado
             contenido = self._generar_contenido_estatico(seccion, contexto, clasificacion, alertas)
@@ -291,7 +322,7 @@ class GeneradorInformes:
             seccion=seccion,
             titulo=titulo,
             contenido=contenido,
-            metadata={"tipo_generacion": "llm" if tipo_prompt else "estatico"},
+            metadata={"tipo_generacion": "llm" if tipo_prompt else "estatico", **metadata},
             tokens_usados=tokens,
             tiempo_generacion_ms=tiempo_ms,
         )
@@ -458,12 +489,14 @@ class GeneradorInformes:
         datos_proyecto: dict[str, Any],
         resultado_gis: dict[str, Any],
         normativa_relevante: list[dict[str, Any]],
+        forzar: bool = False,
     ) -> SeccionGenerada:
         """
         Genera una sección individual del informe.
 
         Útil para regenerar secciones específicas o para
-        generación incremental.
+        generación incremental. Con forzar=True se vuelve a generar
+        aunque la sección esté en caché.
         """
         # Ejecutar análisis necesarios
         clasificacion = self.motor_reglas.clasificar_proyecto(resultado_gis, datos_proyecto)
@@ -478,4 +511,4 @@ class GeneradorInformes:
             normativa_relevante=normativa_relevante,
         )
 
-        return await self._generar_seccion(seccion, contexto, clasificacion, alertas_dict)
+        return await self._generar_seccion(seccion, contexto, clasificacion, alertas_dict, forzar=forzar)
@@ -0,0 +1,461 @@
+"""
+Limitador de tasa compartido para las llamadas a Anthropic.
+
+Los informes (secciones en paralelo), el chat, el OCR y la clasificación de
+la ingesta llaman a la API por su cuenta; bajo carga se pisan y reciben
+429. Este módulo aplica dos token buckets, solicitudes por minuto (RPM) y
+tokens por minuto (TPM), cuyo estado vive en Redis para que todos los
+workers de uvicorn y los procesos de la cola compartan el mismo
+presupuesto. Si Redis no responde, cada proceso sigue con buckets locales.
+
+El cliente de Redis queda ligado al event loop que lo usa, y el OCR corre
+cada llamada síncrona en un loop propio (asyncio.run, a veces en un hilo):
+por eso hay un cliente por loop, igual que el pool de Anthropic, y el
+código que sale de un loop propio lo cierra con `cerrar_limitador_llm`.
+
+Prioridades: cada llamada se clasifica por su sitio (ver telemetria). Las
+llamadas de lote solo consumen mientras el bucket queda sobre una reserva,
+de modo que el chat interactivo encuentra capacidad aunque la ingesta esté
+saturando; dentro de un proceso, además, una llamada espera mientras haya
+otra de mayor prioridad esperando.
+
+Backoff adaptativo: un 429 pausa a todos los procesos según retry-after o
+los headers anthropic-ratelimit-*-reset, y reduce la capacidad efectiva
+(por el límite que informan los headers, o a la mitad); cada respuesta
+exitosa la recupera de a poco (AIMD).
+"""
+
+import asyncio
+import logging
+import random
+import time
+import weakref
+from collections import Counter
+from datetime import datetime, timezone
+from enum import IntEnum
+from typing import Any, Dict, Mapping, Optional
+
+import redis
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CLAVE_REDIS = "llm:limite:anthropic"
+TOKENS_POR_IMAGEN = 1600  # Imagen de ~1568 px de lado mayor
+CARACTERES_POR_TOKEN = 4
+ESPERA_MAXIMA_SONDEO = 2.0  # Se vuelve a consultar el bucket al menos cada tanto
+PAUSA_POR_DEFECTO = 5.0  # Sin retry-after ni headers de reset
+FACTOR_MINIMO = 0.1
+FACTOR_REDUCCION = 0.5
+FACTOR_INCREMENTO = 0.02
+
+
+class PrioridadLLM(IntEnum):
+    """Clase de prioridad de una llamada (menor valor = más prioritaria)."""
+    INTERACTIVA = 0
+    NORMAL = 1
+    LOTE = 2
+
+
+# Fracción de cada bucket que la prioridad no puede consumir
+RESERVA_POR_PRIORIDAD: Dict[PrioridadLLM, float] = {
+    PrioridadLLM.INTERACTIVA: 0.0,
+    PrioridadLLM.NORMAL: 0.1,
+    PrioridadLLM.LOTE: 0.3,
+}
+
+# Prioridad por prefijo del sitio de telemetría ("asistente.chat" -> "asistente")
+PRIORIDAD_POR_SITIO: Dict[str, PrioridadLLM] = {
+    "asistente": PrioridadLLM.INTERACTIVA,
+    "ocr": PrioridadLLM.LOTE,
+    "clasificador": PrioridadLLM.LOTE,
+    "recopilacion": PrioridadLLM.LOTE,
+    "generacion_eia": PrioridadLLM.LOTE,
+}
+
+
+def prioridad_de_sitio(sitio: Optional[str]) -> PrioridadLLM:
+    return PRIORIDAD_POR_SITIO.get((sitio or "").split(".")[0], PrioridadLLM.NORMAL)
+
+
+def _tokens_contenido(valor: Any) -> int:
+    if isinstance(valor, str):
+        return len(valor) // CARACTERES_POR_TOKEN
+    if isinstance(valor, dict):
+        if valor.get("type") in ("image", "document"):
+            return TOKENS_POR_IMAGEN
+        return sum(_tokens_contenido(v) for v in valor.values())
+    if isinstance(valor, (list, tuple)):
+        return sum(_tokens_contenido(v) for v in valor)
+    return 0
+
+
+def estimar_tokens_solicitud(parametros: Mapping[str, Any]) -> int:
+    """
+    Tokens a reservar para una llamada: entrada estimada más max_tokens.
+
+    La reserva es conservadora; al terminar la llamada se liquida con el
+    uso real y la diferencia vuelve al bucket.
+    """
+    entrada = sum(_tokens_contenido(parametros.get(campo)) for campo in ("system", "messages", "tools"))
+    return max(1, entrada + int(parametros.get("max_tokens") or 0))
+
+
+def _segundos_hasta(valor: str, ahora: datetime) -> Optional[float]:
+    try:
+        instante = datetime.fromisoformat(valor.replace("Z", "+00:00"))
+    except (TypeError, ValueError):
+        return None
+    return (instante - ahora).total_seconds()
+
+
+def pausa_desde_headers(headers: Mapping[str, str]) -> float:
+    """Segundos a pausar tras un 429 según retry-after o los headers de reset."""
+    try:
+        return max(0.0, float(headers.get("retry-after")))
+    except (TypeError, ValueError):
+        pass
+    ahora = datetime.now(timezone.utc)
+    resets = [
+        _segundos_hasta(valor, ahora)
+        for nombre, valor in headers.items()
+        if nombre.lower().startswith("anthropic-ratelimit-") and nombre.lower().endswith("-reset")
+    ]
+    resets = [r for r in resets if r is not None]
+    return max(0.0, max(resets)) if resets else PAUSA_POR_DEFECTO
+
+
+def tope_desde_headers(headers: Mapping[str, str], rpm: int, tpm: int) -> float:
+    """
+    Factor de capacidad máximo según los límites que informa la API.
+
+    Si la organización tiene un límite menor que el configurado (p. ej. un
+    tier más bajo), la capacidad efectiva se ajusta a ese límite.
+    """
+    tope = 1.0
+    for sufijo, configurado in (
+        ("requests-limit", rpm),
+        ("tokens-limit", tpm),
+        ("input-tokens-limit", tpm),
+    ):
+        try:
+            informado = float(headers.get(f"anthropic-ratelimit-{sufijo}"))
+        except (TypeError, ValueError):
+            continue
+        if configurado > 0:
+            tope = min(tope, informado / configurado)
+    return max(FACTOR_MINIMO, tope)
+
+
+# =============================================================================
+# Buckets
+# =============================================================================
+
+class _CubetasLocales:
+    """Buckets RPM/TPM en memoria del proceso (respaldo sin Redis)."""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.solicitudes: Optional[float] = None
+        self.tokens: Optional[float] = None
+        self.actualizado = time.monotonic()
+        self.pausa_hasta = 0.0
+        self.factor = 1.0
+
+    def _reponer(self, ahora: float):
+        cap_s, cap_t = self.rpm * self.factor, self.tpm * self.factor
+        if self.solicitudes is None:
+            self.solicitudes, self.tokens = cap_s, cap_t
+        transcurrido = max(0.0, ahora - self.actualizado)
+        self.solicitudes = min(cap_s, self.solicitudes + transcurrido * cap_s / 60)
+        self.tokens = min(cap_t, self.tokens + transcurrido * cap_t / 60)
+        self.actualizado = ahora
+
+    async def intentar(self, costo: int, reserva: float) -> float:
+        ahora = time.monotonic()
+        self._reponer(ahora)
+        if self.pausa_hasta > ahora:
+            return self.pausa_hasta - ahora
+        cap_s, cap_t = self.rpm * self.factor, self.tpm * self.factor
+        falta_s = min(1 + reserva * cap_s, cap_s) - self.solicitudes
+        falta_t = min(costo + reserva * cap_t, cap_t) - self.tokens
+        if falta_s > 0 or falta_t > 0:
+            return max(falta_s * 60 / cap_s, falta_t * 60 / cap_t)
+        self.solicitudes -= 1
+        self.tokens -= costo
+        return 0.0
+
+    async def liquidar(self, devolucion: int):
+        self._reponer(time.monotonic())
+        self.tokens += devolucion
+        self.factor = min(1.0, self.factor + FACTOR_INCREMENTO)
+
+    async def penalizar(self, segundos: float, tope: float) -> float:
+        ahora = time.monotonic()
+        self._reponer(ahora)
+        # Varios 429 simultáneos son el mismo evento: se reduce una sola vez
+        if self.pausa_hasta <= ahora:
+            self.factor = max(FACTOR_MINIMO, self.factor * FACTOR_REDUCCION)
+        self.factor = min(self.factor, tope)
+        self.solicitudes = min(self.solicitudes, self.rpm * self.factor)
+        self.tokens = min(self.tokens, self.tpm * self.factor)
+        self.pausa_hasta = max(self.pausa_hasta, ahora + segundos)
+        return self.factor
+
+
+# Estado en un hash: solicitudes, tokens, actualizado, pausa_hasta, factor.
+# El reloj es el de Redis, común a todos los procesos.
+_LUA_COMUN = """
+local t = redis.call('TIME')
+local ahora = tonumber(t[1]) + tonumber(t[2]) / 1e6
+local rpm, tpm = tonumber(ARGV[1]), tonumber(ARGV[2])
+local e = redis.call('HMGET', KEYS[1], 'solicitudes', 'tokens', 'actualizado', 'pausa_hasta', 'factor')
+local factor = tonumber(e[5]) or 1
+local cap_s, cap_t = rpm * factor, tpm * factor
+local solicitudes = tonumber(e[1]) or cap_s
+local tokens = tonumber(e[2]) or cap_t
+local transcurrido = math.max(0, ahora - (tonumber(e[3]) or ahora))
+local pausa_hasta = tonumber(e[4]) or 0
+solicitudes = math.min(cap_s, solicitudes + transcurrido * cap_s / 60)
+tokens = math.min(cap_t, tokens + transcurrido * cap_t / 60)
+local function guardar()
+    redis.call('HSET', KEYS[1], 'solicitudes', solicitudes, 'tokens', tokens,
+        'actualizado', ahora, 'pausa_hasta', pausa_hasta, 'factor', factor)
+    redis.call('EXPIRE', KEYS[1], 600)
+end
+"""
+
+LUA_INTENTAR = _LUA_COMUN + """
+local costo, reserva = tonumber(ARGV[3]), tonumber(ARGV[4])
+local espera = 0
+if pausa_hasta > ahora then
+    espera = pausa_hasta - ahora
+else
+    local falta_s = math.min(1 + reserva * cap_s, cap_s) - solicitudes
+    local falta_t = math.min(costo + reserva * cap_t, cap_t) - tokens
+    if falta_s > 0 or falta_t > 0 then
+        espera = math.max(falta_s * 60 / cap_s, falta_t * 60 / cap_t)
+    else
+        solicitudes = solicitudes - 1
+        tokens = tokens - costo
+    end
+end
+guardar()
+return tostring(espera)
+"""
+
+LUA_LIQUIDAR = _LUA_COMUN + """
+tokens = tokens + tonumber(ARGV[3])
+factor = math.min(1, factor + tonumber(ARGV[4]))
+guardar()
+return tostring(factor)
+"""
+
+LUA_PENALIZAR = _LUA_COMUN + """
+local segundos, tope = tonumber(ARGV[3]), tonumber(ARGV[4])
+local minimo, reduccion = tonumber(ARGV[5]), tonumber(ARGV[6])
+if pausa_hasta <= ahora then
+    factor = math.max(minimo, factor * reduccion)
+end
+factor = math.min(factor, tope)
+solicitudes = math.min(solicitudes, rpm * factor)
+tokens = math.min(tokens, tpm * factor)
+pausa_hasta = math.max(pausa_hasta, ahora + segundos)
+guardar()
+return tostring(factor)
+"""
+
+
+class _CubetasRedis:
+    """Buckets RPM/TPM compartidos entre procesos (scripts Lua atómicos)."""
+
+    def __init__(self, cliente: aioredis.Redis, rpm: int, tpm: int):
+        self.cliente = cliente
+        self.rpm = rpm
+        self.tpm = tpm
+        self._intentar = cliente.register_script(LUA_INTENTAR)
+        self._liquidar = cliente.register_script(LUA_LIQUIDAR)
+        self._penalizar = cliente.register_script(LUA_PENALIZAR)
+
+    async def intentar(self, costo: int, reserva: float) -> float:
+        return float(await self._intentar(keys=[CLAVE_REDIS], args=[self.rpm, self.tpm, costo, reserva]))
+
+    async def liquidar(self, devolucion: int):
+        await self._liquidar(keys=[CLAVE_REDIS], args=[self.rpm, self.tpm, devolucion, FACTOR_INCREMENTO])
+
+    async def penalizar(self, segundos: float, tope: float) -> float:
+        return float(await self._penalizar(
+            keys=[CLAVE_REDIS],
+            args=[self.rpm, self.tpm, segundos, tope, FACTOR_MINIMO, FACTOR_REDUCCION],
+        ))
+
+
+# =============================================================================
+# Limitador
+# =============================================================================
+
+class LimitadorLLM:
+    """
+    Limitador de tasa RPM/TPM con prioridades y backoff adaptativo.
+
+    Uso (lo hace el cliente instrumentado de telemetria):
+        reservados = await limitador.adquirir(parametros, prioridad)
+        ... llamada ...
+        await limitador.liquidar(reservados, tokens_reales)   # o penalizar(headers) ante un 429
+    """
+
+    def __init__(
+        self,
+        rpm: Optional[int] = None,
+        tpm: Optional[int] = None,
+        redis_url: Optional[str] = None,
+        cliente: Optional[aioredis.Redis] = None,
+        usar_redis: bool = True,
+    ):
+        self.rpm = rpm or settings.LLM_LIMITE_RPM
+        self.tpm = tpm or settings.LLM_LIMITE_TPM
+        self.redis_url = redis_url or settings.REDIS_URL
+        self.habilitado = settings.LLM_LIMITE_HABILITADO
+        self._local = _CubetasLocales(self.rpm, self.tpm)
+        self._usar_redis = usar_redis
+        self._cliente_inyectado = cliente
+        self._redis_por_loop: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _CubetasRedis]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._esperando: Counter = Counter()
+        self._metricas = {"adquisiciones": 0, "esperas": 0, "segundos_espera": 0.0, "rechazos_429": 0}
+
+    def _redis(self) -> Optional[_CubetasRedis]:
+        """Buckets en Redis del loop actual, con su cliente creado al primer uso."""
+        if not self._usar_redis:
+            return None
+        loop = asyncio.get_running_loop()
+        cubetas = self._redis_por_loop.get(loop)
+        if cubetas is None:
+            cliente = self._cliente_inyectado or aioredis.from_url(
+                self.redis_url,
+                decode_responses=True,
+                socket_connect_timeout=2,
+            )
+            cubetas = _CubetasRedis(cliente, self.rpm, self.tpm)
+            self._redis_por_loop[loop] = cubetas
+        return cubetas
+
+    def _deshabilitar_redis(self, error: Exception):
+        logger.warning(f"Limitador LLM sin Redis, se continúa con límites locales: {error}")
+        self._usar_redis = False
+
+    async def _cubetas(self, operacion: str, *args) -> float:
+        cubetas = self._redis()
+        if cubetas is not None:
+            try:
+                return await getattr(cubetas, operacion)(*args)
+            except (redis.RedisError, OSError) as e:
+                self._deshabilitar_redis(e)
+            except RuntimeError as e:
+                # Cliente ligado a un loop ya cerrado: se descarta y esta
+                # llamada usa los buckets locales; la siguiente crea otro
+                logger.warning(f"Limitador LLM: cliente Redis inválido en este loop, se usan límites locales: {e}")
+                self._redis_por_loop.pop(asyncio.get_running_loop(), None)
+        return await getattr(self._local, operacion)(*args)
+
+    async def cerrar(self):
+        """Cierra el cliente de Redis del loop actual."""
+        cubetas = self._redis_por_loop.pop(asyncio.get_running_loop(), None)
+        if cubetas is not None and cubetas.cliente is not self._cliente_inyectado:
+            try:
+                await cubetas.cliente.aclose()
+            except (redis.RedisError, OSError, RuntimeError):
+                pass
+
+    def _hay_mas_prioritaria(self, prioridad: PrioridadLLM) -> bool:
+        return any(self._esperando[p] for p in PrioridadLLM if p < prioridad)
+
+    async def adquirir(self, parametros: Mapping[str, Any], prioridad: PrioridadLLM) -> int:
+        """
+        Espera hasta que los buckets admitan la llamada y la descuenta.
+
+        Returns:
+            Tokens reservados (para liquidar al terminar)
+        """
+        costo = estimar_tokens_solicitud(parametros)
+        if not self.habilitado:
+            return costo
+
+        reserva = RESERVA_POR_PRIORIDAD[prioridad]
+        inicio = time.monotonic()
+        self._esperando[prioridad] += 1
+        try:
+            while True:
+                if self._hay_mas_prioritaria(prioridad):
+                    await asyncio.sleep(0.05)
+                    continue
+                espera = await self._cubetas("intentar", costo, reserva)
+                if espera <= 0:
+                    break
+                # Jitter para que los procesos no reintenten todos a la vez
+                await asyncio.sleep(min(espera, ESPERA_MAXIMA_SONDEO) * random.uniform(1.0, 1.2))
+        finally:
+            self._esperando[prioridad] -= 1
+
+        esperado = time.monotonic() - inicio
+        self._metricas["adquisiciones"] += 1
+        if esperado > 0.01:
+            self._metricas["esperas"] += 1
+            self._metricas["segundos_espera"] += esperado
+            logger.debug(f"Limitador LLM: {prioridad.name} esperó {esperado:.2f}s ({costo} tokens)")
+        return costo
+
+    async def liquidar(self, reservados: int, reales: Optional[int]):
+        """Devuelve al bucket lo reservado de más y recupera capacidad tras un éxito."""
+        if not self.habilitado:
+            return
+        devolucion = reservados - reales if reales is not None else 0
+        await self._cubetas("liquidar", devolucion)
+
+    async def penalizar(self, headers: Optional[Mapping[str, str]]) -> float:
+        """
+        Registra un 429: pausa a todos los procesos y reduce la capacidad.
+
+        Returns:
+            Segundos de pausa aplicados
+        """
+        headers = headers or {}
+        segundos = pausa_desde_headers(headers)
+        self._metricas["rechazos_429"] += 1
+        if not self.habilitado:
+            return segundos
+        factor = await self._cubetas("penalizar", segundos, tope_desde_headers(headers, self.rpm, self.tpm))
+        logger.warning(f"Rate limit de Anthropic: pausa de {segundos:.1f}s, capacidad al {factor:.0%}")
+        return segundos
+
+    def metricas(self) -> Dict[str, Any]:
+        """Contadores del proceso."""
+        return {
+            **self._metricas,
+            "segundos_espera": round(self._metricas["segundos_espera"], 3),
+            "esperando": {p.name.lower(): n for p, n in self._esperando.items() if n},
+            "rpm": self.rpm,
+            "tpm": self.tpm,
+            "redis": self._usar_redis,
+        }
+
+
+_limitador: Optional[LimitadorLLM] = None
+
+
+def get_limitador_llm() -> LimitadorLLM:
+    """Obtiene la instancia singleton del limitador."""
+    global _limitador
+    if _limitador is None:
+        _limitador = LimitadorLLM()
+    return _limitador
+
+
+async def cerrar_limitador_llm():
+    """Cierra el cliente de Redis del limitador en el loop actual."""
+    if _limitador is not None:
+        await _limitador.cerrar()
@@ -7,6 +7,7 @@ sobre normativa ambiental, proyectos SEIA, y guias del SEA.
 
 import logging
 import asyncio
+import time
 from dataclasses import dataclass, field
 from typing import Any, Dict, List, Literal, Optional
 from enum import Enum
@@ -14,6 +15,8 @@ from enum import Enum
 import httpx
 
 from app.core.config import settings
+from app.services.llm.cache_perplexity import CachePerplexity, get_cache_perplexity
+from app.services.llm.telemetria import operacion_llm, registrar_llamada
 
 logger = logging.getLogger(__name__)
 
@@ -94,6 +97,7 @@ diariooficial.interior.gob.cl cuando sea posible."""
         self,
         api_key: Optional[str] = None,
         timeout: Optional[int] = None,
+        cache: Optional[CachePerplexity] = None,
     ):
         """
         Inicializa el cliente Perplexity.
@@ -101,9 +105,11 @@ diariooficial.interior.gob.cl cuando sea posible."""
         Args:
             api_key: API key de Perplexity. Si no se proporciona, usa settings.
             timeout: Timeout en segundos. Si no se proporciona, usa settings.
+            cache: Cache de busquedas. Si no se proporciona, usa la compartida.
         """
         self.api_key = api_key or settings.PERPLEXITY_API_KEY
         self.timeout = timeout or settings.PERPLEXITY_TIMEOUT_SECONDS
+        self.cache = cache
         self._client: Optional[httpx.AsyncClient] = None
 
         if not self.api_key:
@@ -114,7 +120,7 @@ diariooficial.interior.gob.cl cuando sea posible."""
         """Lazy loading del cliente HTTP."""
         if self._client is None or self._client.is_closed:
             self._client = httpx.AsyncClient(
-                base_url=self.BASE_URL,
+                base_url=settings.PERPLEXITY_BASE_URL or self.BASE_URL,
                 headers={
                     "Authorization": f"Bearer {self.api_key}",
                     "Content-Type": "application/json",
@@ -123,16 +129,45 @@ diariooficial.interior.gob.cl cuando sea posible."""
             )
         return self._client
 
+    async def _post_chat(self, payload: Dict[str, Any], sitio: str) -> Dict[str, Any]:
+        """POST a /chat/completions registrando la llamada en la telemetria LLM."""
+        inicio = time.perf_counter()
+        try:
+            response = await self.client.post("/chat/completions", json=payload)
+            response.raise_for_status()
+            data = response.json()
+        except Exception as e:
+            registrar_llamada(
+                sitio, "perplexity", payload["model"],
+                int((time.perf_counter() - inicio) * 1000), error=type(e).__name__,
+            )
+            raise
+
+        usage = data.get("usage", {})
+        registrar_llamada(
+            sitio, "perplexity", data.get("model", payload["model"]),
+            int((time.perf_counter() - inicio) * 1000),
+            tokens_input=usage.get("prompt_tokens", 0),
+            tokens_output=usage.get("completion_tokens", 0),
+        )
+        return data
+
     async def buscar(
         self,
         query: str,
         modo: Literal["chat", "research", "reasoning"] = "chat",
         contexto_chile: bool = True,
         contexto_adicional: Optional[str] = None,
+        sitio: Optional[str] = None,
+        usar_cache: bool = True,
+        servir_obsoleto: Optional[bool] = None,
     ) -> PerplexityResponse:
         """
         Realiza una busqueda con Perplexity AI.
 
+        Las busquedas identicas (misma consulta normalizada, modo y contexto)
+        se responden desde la cache o comparten la solicitud en vuelo.
+
         Args:
             query: Consulta de busqueda en lenguaje natural
             modo: Modo de busqueda:
@@ -141,6 +176,10 @@ diariooficial.interior.gob.cl cuando sea posible."""
                 - "reasoning": Analisis logico (sonar-reasoning-pro)
             contexto_chile: Si True, agrega contexto de normativa chilena
             contexto_adicional: Contexto extra opcional
+            sitio: Funcionalidad a la que la telemetria atribuye la llamada
+            usar_cache: Si False, consulta siempre la API
+            servir_obsoleto: Entregar una respuesta vencida mientras se
+                refresca en segundo plano. None usa PERPLEXITY_CACHE_SWR.
 
         Returns:
             PerplexityResponse con contenido y fuentes
@@ -154,6 +193,28 @@ diariooficial.interior.gob.cl cuando sea posible."""
                 "Configure la variable de entorno o en el archivo .env"
             )
 
+        async def consultar() -> PerplexityResponse:
+            return await self._consultar(query, modo, contexto_chile, contexto_adicional, sitio)
+
+        if not (usar_cache and settings.PERPLEXITY_CACHE_HABILITADO):
+            return await consultar()
+
+        cache = self.cache or get_cache_perplexity()
+        return await cache.obtener_o_buscar(
+            cache.clave(query, modo, contexto_chile, contexto_adicional),
+            consultar,
+            servir_obsoleto=settings.PERPLEXITY_CACHE_SWR if servir_obsoleto is None else servir_obsoleto,
+        )
+
+    async def _consultar(
+        self,
+        query: str,
+        modo: str,
+        contexto_chile: bool,
+        contexto_adicional: Optional[str],
+        sitio: Optional[str],
+    ) -> PerplexityResponse:
+        """Consulta /chat/completions y convierte la respuesta, sin cache."""
         # Determinar modelo
         modo_enum = ModoPerplexity(modo)
         modelo = self.MODELOS[modo_enum]
@@ -190,12 +251,7 @@ diariooficial.interior.gob.cl cuando sea posible."""
         logger.info(f"Perplexity busqueda: modo={modo}, query={query[:100]}...")
 
         try:
-            response = await self.client.post(
-                "/chat/completions",
-                json=payload,
-            )
-            response.raise_for_status()
-            data = response.json()
+            data = await self._post_chat(payload, sitio or "perplexity.buscar")
 
             # Extraer contenido
             contenido = ""
@@ -220,8 +276,7 @@ diariooficial.interior.gob.cl cuando sea posible."""
                     ))
 
             # Tokens usados
-            usage = data.get("usage", {})
-            tokens = usage.get("total_tokens", 0)
+            tokens = data.get("usage", {}).get("total_tokens", 0)
 
             resultado = PerplexityResponse(
                 contenido=contenido,
@@ -286,27 +341,29 @@ diariooficial.interior.gob.cl cuando sea posible."""
         """
         ultimo_error = None
 
-        for intento in range(max_reintentos):
-            try:
-                return await self.buscar(
-                    query=query,
-                    modo=modo,
-                    contexto_chile=contexto_chile,
-                    **kwargs
-                )
-            except PerplexityError as e:
-                ultimo_error = e
-                # Solo reintentar en errores de rate limit o servidor
-                if "Rate limit" in str(e) or "no disponible" in str(e):
-                    espera = min(2 ** intento * 2, 30)  # 2s, 4s, 8s... max 30s
-                    logger.warning(
-                        f"Perplexity error reintentable: {e}. "
-                        f"Reintentando en {espera}s (intento {intento + 1}/{max_reintentos})"
+        # La telemetria cuenta cada intento extra como reintento
+        with operacion_llm(kwargs.get("sitio")):
+            for intento in range(max_reintentos):
+                try:
+                    return await self.buscar(
+                        query=query,
+                        modo=modo,
+                        contexto_chile=contexto_chile,
+                        **kwargs
                     )
-                    await asyncio.sleep(espera)
-                else:
-                    # Error no reintentable
-                    raise
+                except PerplexityError as e:
+                    ultimo_error = e
+                    # Solo reintentar en errores de rate limit o servidor
+                    if "Rate limit" in str(e) or "no disponible" in str(e):
+                        espera = min(2 ** intento * 2, 30)  # 2s, 4s, 8s... max 30s
+                        logger.warning(
+                            f"Perplexity error reintentable: {e}. "
+                            f"Reintentando en {espera}s (intento {intento + 1}/{max_reintentos})"
+                        )
+                        await asyncio.sleep(espera)
+                    else:
+                        # Error no reintentable
+                        raise
 
         raise ultimo_error or PerplexityError("Error desconocido despues de reintentos")
 
@@ -328,6 +385,7 @@ diariooficial.interior.gob.cl cuando sea posible."""
                 query="test",
                 modo="chat",
                 contexto_chile=False,
+                usar_cache=False,
             )
             return {
                 "status": "healthy",
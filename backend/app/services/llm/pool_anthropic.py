@@ -0,0 +1,110 @@
+"""
+Pool compartido de conexiones HTTP para los clientes asíncronos de Anthropic.
+
+Cada servicio (asistente, informes, capítulos EIA, OCR, extracción) pedía
+su propio cliente, y algunos uno por solicitud: cada uno abría conexiones y
+handshakes TLS nuevos. Aquí hay un único `httpx.AsyncClient` por event loop,
+con límites de conexiones y keep-alive ajustados, y cada servicio recibe
+una copia ligera de un AsyncAnthropic base (`with_options`) que comparte ese
+pool pero fija su propio timeout, reintentos o base_url.
+
+Los 429 los maneja el limitador de tasa (app.services.llm.limitador) desde
+el cliente instrumentado: el SDK sigue reintentando timeouts y errores 5xx,
+pero no los 429, que de otro modo se reintentarían sin pasar por los buckets
+de RPM/TPM.
+
+El pool queda ligado al loop que lo creó: el código que ejecuta corrutinas
+en un loop propio (asyncio.run desde código síncrono) debe cerrar el suyo
+con `cerrar_pool_anthropic` antes de salir del loop.
+"""
+
+import asyncio
+import logging
+import weakref
+from typing import Optional
+
+import anthropic
+import httpx
+
+from app.core.config import settings
+from app.services.llm.telemetria import instrumentar
+
+logger = logging.getLogger(__name__)
+
+# Timeout de conexión; el de lectura lo fija cada servicio
+TIMEOUT_CONEXION_SEGUNDOS = 10.0
+
+_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, anthropic.AsyncAnthropic]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+class _AsyncAnthropicSin429(anthropic.AsyncAnthropic):
+    """AsyncAnthropic cuyos reintentos internos omiten los 429."""
+
+    def _should_retry(self, response: httpx.Response) -> bool:
+        if response.status_code == 429:
+            return False
+        return super()._should_retry(response)
+
+
+def _cliente_base() -> anthropic.AsyncAnthropic:
+    """Cliente base del loop actual, creado con el pool al primer uso."""
+    loop = asyncio.get_running_loop()
+    base = _pools.get(loop)
+    if base is None:
+        base = _AsyncAnthropicSin429(
+            api_key=settings.ANTHROPIC_API_KEY or None,
+            base_url=settings.LLM_BASE_URL or None,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.ANTHROPIC_POOL_CONEXIONES,
+                    max_keepalive_connections=settings.ANTHROPIC_POOL_KEEPALIVE,
+                    keepalive_expiry=settings.ANTHROPIC_POOL_KEEPALIVE_SEGUNDOS,
+                ),
+                timeout=httpx.Timeout(600.0, connect=TIMEOUT_CONEXION_SEGUNDOS),
+            ),
+        )
+        _pools[loop] = base
+        logger.debug(
+            f"Pool Anthropic creado ({settings.ANTHROPIC_POOL_CONEXIONES} conexiones, "
+            f"{settings.ANTHROPIC_POOL_KEEPALIVE} keep-alive)"
+        )
+    return base
+
+
+def get_cliente_anthropic(
+    sitio: str,
+    api_key: Optional[str] = None,
+    base_url: Optional[str] = None,
+    timeout: Optional[float] = None,
+    max_retries: Optional[int] = None,
+):
+    """
+    Cliente AsyncAnthropic instrumentado que usa el pool compartido.
+
+    Debe llamarse desde código que corre en un event loop. No se debe
+    cerrar el cliente devuelto: el pool es de todos los servicios.
+
+    Args:
+        sitio: Sitio de telemetría por defecto de las llamadas
+        api_key: Clave a usar (default: ANTHROPIC_API_KEY)
+        base_url: URL de la API; vacío o None = LLM_BASE_URL o API de Anthropic
+        timeout: Timeout de lectura en segundos
+        max_retries: Reintentos del SDK (0 si el llamador maneja los suyos)
+    """
+    opciones = {
+        "api_key": api_key,
+        "base_url": base_url or None,
+        "timeout": timeout,
+        "max_retries": max_retries,
+    }
+    cliente = _cliente_base().with_options(**{k: v for k, v in opciones.items() if v is not None})
+    return instrumentar(cliente, sitio=sitio)
+
+
+async def cerrar_pool_anthropic():
+    """Cierra las conexiones del pool del loop actual."""
+    base = _pools.pop(asyncio.get_running_loop(), None)
+    if base is not None:
+        await base.close()
@@ -6,22 +6,32 @@ Enruta tareas al modelo LLM mas apropiado segun el tipo de tarea:
 - Claude Haiku: Respuestas rapidas, fallback
 - Perplexity Sonar: Busqueda web actualizada
 - Perplexity Deep Research: Investigacion profunda
+
+En modo "latencia" (LLM_ROUTER_MODO) el enrutamiento consulta ademas la
+latencia y los errores recientes de cada modelo (salud_modelos): con un
+presupuesto de latencia, las tareas degradables pasan al modelo rapido
+si el modelo por defecto no lo cumple, y las busquedas se desvian de
+Perplexity si esta degradado.
 """
 
 import logging
+import time
+from collections import Counter, deque
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Any, Dict, Optional, Union
+from typing import Any, Deque, Dict, Optional, Union
 
 from app.core.config import settings
 from app.services.llm.cliente import ClienteLLM, RespuestaLLM, get_cliente_llm
 from app.services.llm.perplexity_client import (
+    ModoPerplexity,
     PerplexityClient,
     PerplexityResponse,
     PerplexityError,
     get_perplexity_client,
     is_perplexity_enabled,
 )
+from app.services.llm.salud_modelos import EstadisticasModelo, MonitorModelos, get_monitor_modelos
 
 logger = logging.getLogger(__name__)
 
@@ -41,6 +51,25 @@ class Proveedor(str, Enum):
     PERPLEXITY = "perplexity"
 
 
+@dataclass
+class DecisionRouting:
+    """Proveedor y modelo elegidos para una tarea, con el motivo."""
+    tipo_tarea: TipoTarea
+    proveedor: Proveedor
+    modelo: Optional[str] = None  # None = modelo por defecto del proveedor
+    motivo: str = "estatico"
+    presupuesto_ms: Optional[int] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "tipo_tarea": self.tipo_tarea.value,
+            "proveedor": self.proveedor.value,
+            "modelo": self.modelo,
+            "motivo": self.motivo,
+            "presupuesto_ms": self.presupuesto_ms,
+        }
+
+
 @dataclass
 class RespuestaRouter:
     """Respuesta unificada del router."""
@@ -89,10 +118,18 @@ class LLMRouter:
         TipoTarea.INVESTIGACION: "research",
     }
 
+    # Tareas que en modo "latencia" pueden pasar al modelo rapido
+    TAREAS_DEGRADABLES = {TipoTarea.RESPUESTA_RAPIDA}
+
+    # Decisiones recientes expuestas en get_routing_info
+    MAX_DECISIONES = 50
+
     def __init__(
         self,
         anthropic_client: Optional[ClienteLLM] = None,
         perplexity_client: Optional[PerplexityClient] = None,
+        modo: Optional[str] = None,
+        monitor: Optional[MonitorModelos] = None,
     ):
         """
         Inicializa el router LLM.
@@ -100,12 +137,18 @@ class LLMRouter:
         Args:
             anthropic_client: Cliente de Anthropic. Si no se proporciona, usa singleton.
             perplexity_client: Cliente de Perplexity. Si no se proporciona, usa singleton.
+            modo: "estatico" o "latencia". Si no se proporciona, usa settings.
+            monitor: Estadisticas por modelo. Si no se proporciona, usa el singleton.
         """
         self.anthropic = anthropic_client
         self.perplexity = perplexity_client
+        self.modo = modo or settings.LLM_ROUTER_MODO
+        self.monitor = monitor or get_monitor_modelos()
         self._initialized = False
+        self._decisiones: Deque[Dict[str, Any]] = deque(maxlen=self.MAX_DECISIONES)
+        self._conteo_decisiones: Counter = Counter()
 
-        logger.info("LLMRouter inicializado")
+        logger.info(f"LLMRouter inicializado (modo {self.modo})")
 
     def _ensure_clients(self):
         """Inicializa los clientes de forma lazy."""
@@ -145,12 +188,82 @@ class LLMRouter:
 
         return proveedor_preferido
 
+    def decidir(self, tipo_tarea: TipoTarea, presupuesto_ms: Optional[int] = None) -> DecisionRouting:
+        """
+        Elige proveedor y modelo para una tarea y registra la decision.
+
+        En modo "estatico" equivale a determinar_proveedor. En modo
+        "latencia" usa las estadisticas recientes de cada modelo.
+
+        Args:
+            tipo_tarea: Tipo de tarea a ejecutar
+            presupuesto_ms: Latencia maxima deseada (p95) para la tarea
+
+        Returns:
+            DecisionRouting con proveedor, modelo y motivo
+        """
+        decision = self._decidir(tipo_tarea, presupuesto_ms)
+        if self.modo == "latencia":
+            self._registrar_decision(decision)
+        return decision
+
+    def _decidir(self, tipo_tarea: TipoTarea, presupuesto_ms: Optional[int]) -> DecisionRouting:
+        """Decision sin registrarla (tambien la usa get_routing_info)."""
+        proveedor = self.determinar_proveedor(tipo_tarea)
+        if self.modo != "latencia":
+            return DecisionRouting(tipo_tarea, proveedor, presupuesto_ms=presupuesto_ms)
+
+        if proveedor == Proveedor.PERPLEXITY:
+            modelo = PerplexityClient.MODELOS[ModoPerplexity(self.MODOS_PERPLEXITY.get(tipo_tarea, "chat"))]
+            estadisticas = self.monitor.estadisticas(Proveedor.PERPLEXITY.value, modelo)
+            if self._degradado(estadisticas, presupuesto_ms or settings.LLM_ROUTER_PRESUPUESTO_BUSQUEDA_MS):
+                return DecisionRouting(
+                    tipo_tarea, Proveedor.ANTHROPIC, motivo="perplexity_degradado", presupuesto_ms=presupuesto_ms,
+                )
+            return DecisionRouting(tipo_tarea, proveedor, motivo="preferido", presupuesto_ms=presupuesto_ms)
+
+        modelo = self.anthropic.config.modelo
+        rapido = settings.LLM_MODELO_RAPIDO
+        if tipo_tarea in self.TAREAS_DEGRADABLES and rapido != modelo:
+            actual = self.monitor.estadisticas(Proveedor.ANTHROPIC.value, modelo)
+            alternativa = self.monitor.estadisticas(Proveedor.ANTHROPIC.value, rapido)
+            if self._degradado(actual, presupuesto_ms) and not self._degradado(alternativa, None) and (
+                alternativa.muestras < settings.LLM_ROUTER_MIN_MUESTRAS or alternativa.p95_ms < actual.p95_ms
+                or actual.tasa_error >= settings.LLM_ROUTER_TASA_ERROR_DEGRADADO
+            ):
+                motivo = (
+                    "modelo_degradado" if actual.tasa_error >= settings.LLM_ROUTER_TASA_ERROR_DEGRADADO
+                    else "fuera_de_presupuesto"
+                )
+                return DecisionRouting(tipo_tarea, proveedor, rapido, motivo, presupuesto_ms)
+        return DecisionRouting(tipo_tarea, proveedor, motivo="preferido", presupuesto_ms=presupuesto_ms)
+
+    @staticmethod
+    def _degradado(estadisticas: EstadisticasModelo, presupuesto_ms: Optional[int]) -> bool:
+        """Con suficientes muestras, si falla demasiado o su p95 excede el presupuesto."""
+        if estadisticas.muestras < settings.LLM_ROUTER_MIN_MUESTRAS:
+            return False
+        if estadisticas.tasa_error >= settings.LLM_ROUTER_TASA_ERROR_DEGRADADO:
+            return True
+        return bool(presupuesto_ms) and estadisticas.p95_ms > presupuesto_ms
+
+    def _registrar_decision(self, decision: DecisionRouting):
+        """Guarda la decision entre las recientes y registra en el log las que se desvian."""
+        self._conteo_decisiones[(decision.tipo_tarea.value, decision.motivo)] += 1
+        self._decisiones.append({"instante": time.time(), **decision.to_dict()})
+        if decision.motivo != "preferido":
+            logger.info(
+                f"LLMRouter: {decision.tipo_tarea.value} -> {decision.proveedor.value}"
+                f"/{decision.modelo or 'por defecto'} ({decision.motivo}, presupuesto={decision.presupuesto_ms}ms)"
+            )
+
     async def ejecutar(
         self,
         tipo_tarea: TipoTarea,
         prompt: str,
         prompt_sistema: Optional[str] = None,
         contexto_chile: bool = True,
+        presupuesto_ms: Optional[int] = None,
         **kwargs
     ) -> RespuestaRouter:
         """
@@ -161,6 +274,7 @@ class LLMRouter:
             prompt: Prompt o query del usuario
             prompt_sistema: Prompt de sistema (solo Anthropic)
             contexto_chile: Incluir contexto de normativa chilena (solo Perplexity)
+            presupuesto_ms: Latencia maxima deseada (solo modo "latencia")
             **kwargs: Argumentos adicionales para el proveedor
 
         Returns:
@@ -171,23 +285,30 @@ class LLMRouter:
         """
         self._ensure_clients()
 
-        proveedor = self.determinar_proveedor(tipo_tarea)
+        decision = self.decidir(tipo_tarea, presupuesto_ms)
 
-        logger.info(f"LLMRouter: {tipo_tarea.value} -> {proveedor.value}")
+        logger.info(f"LLMRouter: {tipo_tarea.value} -> {decision.proveedor.value}")
 
-        if proveedor == Proveedor.PERPLEXITY:
-            return await self._ejecutar_perplexity(
+        kwargs.setdefault("sitio", f"router.{tipo_tarea.value}")
+        if decision.proveedor == Proveedor.PERPLEXITY:
+            resultado = await self._ejecutar_perplexity(
                 tipo_tarea=tipo_tarea,
                 prompt=prompt,
                 contexto_chile=contexto_chile,
                 **kwargs
             )
         else:
-            return await self._ejecutar_anthropic(
+            if decision.modelo:
+                kwargs.setdefault("modelo", decision.modelo)
+            if decision.motivo == "perplexity_degradado":
+                prompt_sistema = prompt_sistema or self._generar_contexto_fallback(contexto_chile)
+            resultado = await self._ejecutar_anthropic(
                 prompt=prompt,
                 prompt_sistema=prompt_sistema,
                 **kwargs
             )
+        resultado.metadata["routing"] = decision.motivo
+        return resultado
 
     async def _ejecutar_anthropic(
         self,
@@ -241,6 +362,7 @@ class LLMRouter:
                 metadata={
                     "modo": modo,
                     "num_fuentes": len(respuesta.fuentes),
+                    "cache": respuesta.metadata.get("cache"),
                 }
             )
 
@@ -250,6 +372,7 @@ class LLMRouter:
             return await self._ejecutar_anthropic(
                 prompt=prompt,
                 prompt_sistema=self._generar_contexto_fallback(contexto_chile),
+                sitio=kwargs.get("sitio"),
             )
 
     def _generar_contexto_fallback(self, contexto_chile: bool) -> str:
@@ -378,16 +501,25 @@ como sea.gob.cl o bcn.cl."""
 
         return resultado
 
-    def get_routing_info(self) -> Dict[str, str]:
+    def get_routing_info(self) -> Dict[str, Any]:
         """
         Retorna informacion sobre el enrutamiento configurado.
 
         Returns:
-            Diccionario con tipo de tarea -> proveedor
+            Diccionario con el modo, tipo de tarea -> proveedor y modelo
+            (sin presupuesto), las estadisticas por modelo y las
+            decisiones recientes con su conteo por motivo
         """
+        decisiones = {tipo: self._decidir(tipo, None) for tipo in TipoTarea}
         return {
-            tipo.value: self.determinar_proveedor(tipo).value
-            for tipo in TipoTarea
+            "modo": self.modo,
+            "routing": {tipo.value: d.proveedor.value for tipo, d in decisiones.items()},
+            "modelos": {tipo.value: d.modelo for tipo, d in decisiones.items() if d.modelo},
+            "estadisticas": self.monitor.instantanea(),
+            "decisiones_recientes": list(self._decisiones),
+            "conteo_decisiones": {
+                f"{tipo}:{motivo}": n for (tipo, motivo), n in sorted(self._conteo_decisiones.items())
+            },
         }
 
 
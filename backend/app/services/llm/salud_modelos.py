@@ -0,0 +1,122 @@
+"""
+Latencia y errores recientes por proveedor y modelo.
+
+La telemetría (app.services.llm.telemetria) acumula totales desde el
+arranque; para decidir a qué modelo enviar una tarea interesa lo que pasó
+en los últimos minutos. Cada llamada registrada en la telemetría alimenta
+también una ventana móvil por (proveedor, modelo) con su latencia y si
+falló; LLMRouter la consulta en el modo de enrutamiento por latencia.
+
+Como la telemetría, las estadísticas son del proceso.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+
+@dataclass
+class EstadisticasModelo:
+    """Resumen de la ventana de un modelo."""
+    proveedor: str
+    modelo: str
+    muestras: int
+    p50_ms: float
+    p95_ms: float
+    tasa_error: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "proveedor": self.proveedor,
+            "modelo": self.modelo,
+            "muestras": self.muestras,
+            "p50_ms": self.p50_ms,
+            "p95_ms": self.p95_ms,
+            "tasa_error": self.tasa_error,
+        }
+
+
+def _percentil(ordenados: List[float], p: float) -> float:
+    """Percentil por rango más cercano."""
+    if not ordenados:
+        return 0.0
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+class MonitorModelos:
+    """
+    Ventana móvil de (instante, latencia, error) por (proveedor, modelo).
+
+    Se descartan las muestras más antiguas que `ventana_segundos` y se
+    conservan a lo sumo `max_muestras` por modelo. Las llamadas pueden
+    registrarse desde hilos (clientes síncronos), por eso un lock.
+    """
+
+    def __init__(
+        self,
+        ventana_segundos: Optional[float] = None,
+        max_muestras: Optional[int] = None,
+    ):
+        self.ventana_segundos = ventana_segundos or settings.LLM_ROUTER_VENTANA_SEGUNDOS
+        self.max_muestras = max_muestras or settings.LLM_ROUTER_MAX_MUESTRAS
+        self._lock = threading.Lock()
+        self._muestras: Dict[Tuple[str, str], Deque[Tuple[float, int, bool]]] = {}
+
+    def registrar(self, proveedor: str, modelo: str, latencia_ms: int, error: bool = False):
+        """Agrega una llamada a la ventana de su modelo."""
+        with self._lock:
+            muestras = self._muestras.setdefault((proveedor, modelo), deque(maxlen=self.max_muestras))
+            muestras.append((time.monotonic(), latencia_ms, error))
+
+    def estadisticas(self, proveedor: str, modelo: str) -> EstadisticasModelo:
+        """Percentiles de latencia de las llamadas exitosas y tasa de error en la ventana."""
+        limite = time.monotonic() - self.ventana_segundos
+        with self._lock:
+            muestras = self._muestras.get((proveedor, modelo), deque())
+            while muestras and muestras[0][0] < limite:
+                muestras.popleft()
+            recientes = list(muestras)
+
+        latencias = sorted(latencia for _, latencia, error in recientes if not error)
+        errores = sum(1 for _, _, error in recientes if error)
+        return EstadisticasModelo(
+            proveedor=proveedor,
+            modelo=modelo,
+            muestras=len(recientes),
+            p50_ms=_percentil(latencias, 50),
+            p95_ms=_percentil(latencias, 95),
+            tasa_error=round(errores / len(recientes), 4) if recientes else 0.0,
+        )
+
+    def modelos_de(self, proveedor: str) -> List[str]:
+        """Modelos del proveedor con muestras registradas."""
+        with self._lock:
+            return [modelo for (p, modelo) in self._muestras if p == proveedor]
+
+    def instantanea(self) -> List[Dict[str, Any]]:
+        """Estadísticas de todos los modelos con muestras en la ventana."""
+        with self._lock:
+            claves = list(self._muestras)
+        resumenes = (self.estadisticas(proveedor, modelo) for proveedor, modelo in claves)
+        return [r.to_dict() for r in resumenes if r.muestras]
+
+    def limpiar(self):
+        """Descarta todas las muestras."""
+        with self._lock:
+            self._muestras.clear()
+
+
+_monitor: Optional[MonitorModelos] = None
+
+
+def get_monitor_modelos() -> MonitorModelos:
+    """Obtiene la instancia singleton del monitor de modelos."""
+    global _monitor
+    if _monitor is None:
+        _monitor = MonitorModelos()
+    return _monitor
@@ -0,0 +1,636 @@
+"""
+Telemetría unificada de llamadas a LLM.
+
+Todas las llamadas a Anthropic (asíncronas, síncronas y en streaming) pasan
+por `instrumentar(cliente, sitio)`, que envuelve `messages` y registra por
+llamada los tokens reales (entrada, salida, lectura y escritura de caché),
+la latencia, el costo estimado y el error si lo hubo. Perplexity, que se
+consume por HTTP, registra con `registrar_llamada` directamente.
+
+Cada llamada se agrupa por (sitio, proveedor, modelo). El sitio es el
+nombre de la funcionalidad que llama ("asistente.chat", "informe.resumen_ejecutivo",
+"ocr.vision", ...): lo fija el cliente instrumentado y lo puede refinar el
+código que llama con `operacion_llm(sitio)`. Dentro de una misma operación,
+cada llamada después de la primera cuenta como reintento.
+
+Las llamadas asíncronas esperan turno en el limitador de tasa compartido
+(app.services.llm.limitador), con la prioridad que corresponde a su sitio.
+
+Cada llamada alimenta además la ventana móvil de latencia y errores por
+modelo (app.services.llm.salud_modelos) que usa el enrutamiento por latencia.
+
+Las métricas del proceso se exportan en formato Prometheus (histograma de
+latencia incluido) y un volcado periódico suma los agregados por hora en
+telemetria.llm_rollups, para comparar funcionalidades entre procesos y días.
+"""
+
+import asyncio
+import contextvars
+import inspect
+import logging
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+import anthropic
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.services.llm.limitador import get_limitador_llm, prioridad_de_sitio
+from app.services.llm.salud_modelos import get_monitor_modelos
+
+logger = logging.getLogger(__name__)
+
+# Límites superiores (ms) de los buckets del histograma de latencia
+BUCKETS_LATENCIA_MS: Tuple[int, ...] = (100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000)
+
+# Precio de los tokens de caché relativo al de entrada (escritura 5 min / lectura)
+FACTOR_CACHE_ESCRITURA = 1.25
+FACTOR_CACHE_LECTURA = 0.1
+
+# USD por 1K tokens de modelos fuera del catálogo de Claude
+PRECIOS_EXTERNOS_1K: Dict[str, Tuple[float, float]] = {
+    "sonar-pro": (0.003, 0.015),
+    "sonar-reasoning-pro": (0.002, 0.008),
+    "sonar-deep-research": (0.002, 0.008),
+}
+
+SITIO_DESCONOCIDO = "desconocido"
+
+
+def _precios_1k(modelo: str) -> Optional[Tuple[float, float]]:
+    """(entrada, salida) en USD por 1K tokens, o None si el modelo no tiene precio."""
+    # Import diferido: gestor importa el cliente LLM, que usa este módulo
+    from app.services.llm.gestor import CATALOGO_MODELOS
+
+    info = CATALOGO_MODELOS.get(modelo)
+    if info:
+        return info["costo_input_1k"], info["costo_output_1k"]
+    return PRECIOS_EXTERNOS_1K.get(modelo)
+
+
+def costo_usd(
+    modelo: str,
+    tokens_input: int,
+    tokens_output: int,
+    cache_lectura: int = 0,
+    cache_escritura: int = 0,
+) -> float:
+    """Costo estimado de una llamada; 0 si el modelo no tiene precio conocido."""
+    precios = _precios_1k(modelo)
+    if precios is None:
+        return 0.0
+    entrada, salida = precios
+    return (
+        tokens_input * entrada
+        + cache_escritura * entrada * FACTOR_CACHE_ESCRITURA
+        + cache_lectura * entrada * FACTOR_CACHE_LECTURA
+        + tokens_output * salida
+    ) / 1000
+
+
+# =============================================================================
+# Operaciones (sitio de llamada y reintentos)
+# =============================================================================
+
+@dataclass
+class _Operacion:
+    sitio: Optional[str]
+    intentos: int = 0
+
+
+_operacion_actual: contextvars.ContextVar[Optional[_Operacion]] = contextvars.ContextVar(
+    "operacion_llm", default=None
+)
+
+
+@contextmanager
+def operacion_llm(sitio: Optional[str] = None) -> Iterator[_Operacion]:
+    """
+    Agrupa las llamadas de una operación lógica.
+
+    Las llamadas dentro del bloque se atribuyen a `sitio` (o al de la
+    operación que la contiene) y, después de la primera, cuentan como
+    reintentos. No usar alrededor de un `yield` de un generador asíncrono.
+    """
+    actual = _operacion_actual.get()
+    operacion = _Operacion(sitio=sitio or (actual.sitio if actual else None))
+    token = _operacion_actual.set(operacion)
+    try:
+        yield operacion
+    finally:
+        _operacion_actual.reset(token)
+
+
+def sitio_actual(sitio: Optional[str]) -> Optional[str]:
+    """Sitio al que se atribuirá una llamada hecha ahora con `sitio` por defecto."""
+    operacion = _operacion_actual.get()
+    return (operacion.sitio if operacion else None) or sitio
+
+
+# =============================================================================
+# Registro de métricas
+# =============================================================================
+
+@dataclass
+class _Serie:
+    """Contadores acumulados de un (sitio, proveedor, modelo)."""
+    llamadas: int = 0
+    errores: int = 0
+    reintentos: int = 0
+    tokens_input: int = 0
+    tokens_output: int = 0
+    cache_lectura: int = 0
+    cache_escritura: int = 0
+    costo_usd: float = 0.0
+    latencia_total_ms: int = 0
+    buckets: List[int] = field(default_factory=lambda: [0] * (len(BUCKETS_LATENCIA_MS) + 1))
+    errores_por_tipo: Dict[str, int] = field(default_factory=dict)
+
+    def sumar(
+        self,
+        latencia_ms: int,
+        tokens_input: int,
+        tokens_output: int,
+        cache_lectura: int,
+        cache_escritura: int,
+        costo: float,
+        reintento: bool,
+        error: Optional[str],
+    ):
+        self.llamadas += 1
+        self.reintentos += int(reintento)
+        self.tokens_input += tokens_input
+        self.tokens_output += tokens_output
+        self.cache_lectura += cache_lectura
+        self.cache_escritura += cache_escritura
+        self.costo_usd += costo
+        self.latencia_total_ms += latencia_ms
+        indice = next(
+            (i for i, limite in enumerate(BUCKETS_LATENCIA_MS) if latencia_ms <= limite),
+            len(BUCKETS_LATENCIA_MS),
+        )
+        self.buckets[indice] += 1
+        if error:
+            self.errores += 1
+            self.errores_por_tipo[error] = self.errores_por_tipo.get(error, 0) + 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "llamadas": self.llamadas,
+            "errores": self.errores,
+            "errores_por_tipo": dict(self.errores_por_tipo),
+            "reintentos": self.reintentos,
+            "tokens_input": self.tokens_input,
+            "tokens_output": self.tokens_output,
+            "tokens_cache_lectura": self.cache_lectura,
+            "tokens_cache_escritura": self.cache_escritura,
+            "costo_usd": round(self.costo_usd, 6),
+            "latencia_media_ms": round(self.latencia_total_ms / self.llamadas) if self.llamadas else 0,
+        }
+
+
+ClaveSerie = Tuple[str, str, str]
+
+
+class TelemetriaLLM:
+    """
+    Acumula métricas de llamadas LLM del proceso.
+
+    Mantiene dos vistas: los totales desde el arranque (para /metrics) y los
+    deltas por hora aún no persistidos (para volcar_rollups). Las llamadas
+    pueden registrarse desde hilos (clientes síncronos), por eso un lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totales: Dict[ClaveSerie, _Serie] = {}
+        self._pendientes: Dict[Tuple[datetime, str, str, str], _Serie] = {}
+
+    def registrar(
+        self,
+        sitio: Optional[str],
+        proveedor: str,
+        modelo: str,
+        latencia_ms: int,
+        tokens_input: int = 0,
+        tokens_output: int = 0,
+        cache_lectura: int = 0,
+        cache_escritura: int = 0,
+        error: Optional[str] = None,
+    ):
+        """Registra una llamada; el sitio lo puede sobrescribir la operación en curso."""
+        operacion = _operacion_actual.get()
+        reintento = False
+        if operacion is not None:
+            sitio = operacion.sitio or sitio
+            operacion.intentos += 1
+            reintento = operacion.intentos > 1
+        sitio = sitio or SITIO_DESCONOCIDO
+        modelo = modelo or "desconocido"
+
+        datos = dict(
+            latencia_ms=latencia_ms,
+            tokens_input=tokens_input,
+            tokens_output=tokens_output,
+            cache_lectura=cache_lectura,
+            cache_escritura=cache_escritura,
+            costo=costo_usd(modelo, tokens_input, tokens_output, cache_lectura, cache_escritura),
+            reintento=reintento,
+            error=error,
+        )
+        periodo = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        with self._lock:
+            self._totales.setdefault((sitio, proveedor, modelo), _Serie()).sumar(**datos)
+            self._pendientes.setdefault((periodo, sitio, proveedor, modelo), _Serie()).sumar(**datos)
+        get_monitor_modelos().registrar(proveedor, modelo, latencia_ms, error=error is not None)
+
+        logger.debug(
+            f"LLM {sitio} ({proveedor}/{modelo}): {latencia_ms}ms, in={tokens_input}, "
+            f"out={tokens_output}, cache_r={cache_lectura}, cache_w={cache_escritura}"
+            + (f", error={error}" if error else "")
+        )
+
+    def registrar_respuesta_anthropic(
+        self,
+        sitio: Optional[str],
+        modelo: str,
+        latencia_ms: int,
+        respuesta: Any = None,
+        error: Optional[BaseException] = None,
+    ):
+        """Registra una llamada a Anthropic leyendo el `usage` de la respuesta."""
+        usage = getattr(respuesta, "usage", None)
+        self.registrar(
+            sitio,
+            "anthropic",
+            getattr(respuesta, "model", None) or modelo,
+            latencia_ms,
+            tokens_input=getattr(usage, "input_tokens", 0) or 0,
+            tokens_output=getattr(usage, "output_tokens", 0) or 0,
+            cache_lectura=getattr(usage, "cache_read_input_tokens", 0) or 0,
+            cache_escritura=getattr(usage, "cache_creation_input_tokens", 0) or 0,
+            error=type(error).__name__ if error is not None else None,
+        )
+
+    def instantanea(self) -> List[Dict[str, Any]]:
+        """Totales por serie desde el arranque del proceso."""
+        with self._lock:
+            return [
+                {"sitio": sitio, "proveedor": proveedor, "modelo": modelo, **serie.to_dict()}
+                for (sitio, proveedor, modelo), serie in sorted(self._totales.items())
+            ]
+
+    def exportar_prometheus(self) -> str:
+        """Métricas del proceso en formato de exposición de Prometheus."""
+        lineas = [
+            "# HELP llm_llamadas_total Llamadas a LLM por sitio, proveedor y modelo.",
+            "# TYPE llm_llamadas_total counter",
+            "# HELP llm_errores_total Llamadas a LLM fallidas por tipo de error.",
+            "# TYPE llm_errores_total counter",
+            "# HELP llm_reintentos_total Llamadas que reintentan una operación fallida.",
+            "# TYPE llm_reintentos_total counter",
+            "# HELP llm_tokens_total Tokens facturados por tipo.",
+            "# TYPE llm_tokens_total counter",
+            "# HELP llm_costo_usd_total Costo estimado en USD.",
+            "# TYPE llm_costo_usd_total counter",
+            "# HELP llm_latencia_ms Latencia de las llamadas a LLM en milisegundos.",
+            "# TYPE llm_latencia_ms histogram",
+        ]
+        with self._lock:
+            series = sorted(self._totales.items())
+            for (sitio, proveedor, modelo), serie in series:
+                etiquetas = f'sitio="{sitio}",proveedor="{proveedor}",modelo="{modelo}"'
+                lineas.append(f"llm_llamadas_total{{{etiquetas}}} {serie.llamadas}")
+                for tipo, cantidad in sorted(serie.errores_por_tipo.items()):
+                    lineas.append(f'llm_errores_total{{{etiquetas},tipo="{tipo}"}} {cantidad}')
+                lineas.append(f"llm_reintentos_total{{{etiquetas}}} {serie.reintentos}")
+                for tipo, cantidad in (
+                    ("input", serie.tokens_input),
+                    ("output", serie.tokens_output),
+                    ("cache_lectura", serie.cache_lectura),
+                    ("cache_escritura", serie.cache_escritura),
+                ):
+                    lineas.append(f'llm_tokens_total{{{etiquetas},tipo="{tipo}"}} {cantidad}')
+                lineas.append(f"llm_costo_usd_total{{{etiquetas}}} {serie.costo_usd:.6f}")
+                acumulado = 0
+                for limite, cantidad in zip((*BUCKETS_LATENCIA_MS, "+Inf"), serie.buckets):
+                    acumulado += cantidad
+                    lineas.append(f'llm_latencia_ms_bucket{{{etiquetas},le="{limite}"}} {acumulado}')
+                lineas.append(f"llm_latencia_ms_sum{{{etiquetas}}} {serie.latencia_total_ms}")
+                lineas.append(f"llm_latencia_ms_count{{{etiquetas}}} {serie.llamadas}")
+        return "\n".join(lineas) + "\n"
+
+    def _tomar_pendientes(self) -> Dict[Tuple[datetime, str, str, str], _Serie]:
+        with self._lock:
+            pendientes, self._pendientes = self._pendientes, {}
+        return pendientes
+
+    def _devolver_pendientes(self, pendientes: Dict[Tuple[datetime, str, str, str], _Serie]):
+        """Reincorpora deltas que no se pudieron persistir."""
+        with self._lock:
+            for clave, serie in pendientes.items():
+                actual = self._pendientes.get(clave)
+                if actual is None:
+                    self._pendientes[clave] = serie
+                    continue
+                for nombre in (
+                    "llamadas", "errores", "reintentos", "tokens_input", "tokens_output",
+                    "cache_lectura", "cache_escritura", "costo_usd", "latencia_total_ms",
+                ):
+                    setattr(actual, nombre, getattr(actual, nombre) + getattr(serie, nombre))
+                actual.buckets = [a + b for a, b in zip(actual.buckets, serie.buckets)]
+
+    async def volcar_rollups(self, db) -> int:
+        """
+        Suma los deltas pendientes en telemetria.llm_rollups (una fila por hora y serie).
+
+        Si la escritura falla los deltas se conservan para el próximo volcado.
+
+        Returns:
+            Número de filas actualizadas
+        """
+        pendientes = self._tomar_pendientes()
+        if not pendientes:
+            return 0
+        try:
+            for (periodo, sitio, proveedor, modelo), serie in pendientes.items():
+                await db.execute(SQL_UPSERT_ROLLUP, {
+                    "periodo": periodo,
+                    "sitio": sitio,
+                    "proveedor": proveedor,
+                    "modelo": modelo,
+                    "llamadas": serie.llamadas,
+                    "errores": serie.errores,
+                    "reintentos": serie.reintentos,
+                    "tokens_input": serie.tokens_input,
+                    "tokens_output": serie.tokens_output,
+                    "cache_lectura": serie.cache_lectura,
+                    "cache_escritura": serie.cache_escritura,
+                    "costo_usd": round(serie.costo_usd, 6),
+                    "latencia_total_ms": serie.latencia_total_ms,
+                    "buckets": serie.buckets,
+                })
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            self._devolver_pendientes(pendientes)
+            raise
+        return len(pendientes)
+
+    def limpiar(self):
+        """Descarta totales y deltas pendientes."""
+        with self._lock:
+            self._totales.clear()
+            self._pendientes.clear()
+
+
+SQL_UPSERT_ROLLUP = text("""
+    INSERT INTO telemetria.llm_rollups (
+        periodo, sitio, proveedor, modelo, llamadas, errores, reintentos,
+        tokens_input, tokens_output, tokens_cache_lectura, tokens_cache_escritura,
+        costo_usd, latencia_total_ms, latencia_buckets
+    ) VALUES (
+        :periodo, :sitio, :proveedor, :modelo, :llamadas, :errores, :reintentos,
+        :tokens_input, :tokens_output, :cache_lectura, :cache_escritura,
+        :costo_usd, :latencia_total_ms, CAST(:buckets AS bigint[])
+    )
+    ON CONFLICT (periodo, sitio, proveedor, modelo) DO UPDATE SET
+        llamadas = llm_rollups.llamadas + EXCLUDED.llamadas,
+        errores = llm_rollups.errores + EXCLUDED.errores,
+        reintentos = llm_rollups.reintentos + EXCLUDED.reintentos,
+        tokens_input = llm_rollups.tokens_input + EXCLUDED.tokens_input,
+        tokens_output = llm_rollups.tokens_output + EXCLUDED.tokens_output,
+        tokens_cache_lectura = llm_rollups.tokens_cache_lectura + EXCLUDED.tokens_cache_lectura,
+        tokens_cache_escritura = llm_rollups.tokens_cache_escritura + EXCLUDED.tokens_cache_escritura,
+        costo_usd = llm_rollups.costo_usd + EXCLUDED.costo_usd,
+        latencia_total_ms = llm_rollups.latencia_total_ms + EXCLUDED.latencia_total_ms,
+        latencia_buckets = ARRAY(
+            SELECT COALESCE(a, 0) + COALESCE(b, 0) FROM unnest(llm_rollups.latencia_buckets, EXCLUDED.latencia_buckets) AS t(a, b)
+        )
+""")
+
+
+_telemetria: Optional[TelemetriaLLM] = None
+
+
+def get_telemetria_llm() -> TelemetriaLLM:
+    """Obtiene la instancia singleton de la telemetría LLM."""
+    global _telemetria
+    if _telemetria is None:
+        _telemetria = TelemetriaLLM()
+    return _telemetria
+
+
+def registrar_llamada(sitio: Optional[str], proveedor: str, modelo: str, latencia_ms: int, **tokens):
+    """Atajo para registrar una llamada en la telemetría del proceso."""
+    get_telemetria_llm().registrar(sitio, proveedor, modelo, latencia_ms, **tokens)
+
+
+# =============================================================================
+# Clientes instrumentados
+# =============================================================================
+
+def _ms_desde(inicio: float) -> int:
+    return int((time.perf_counter() - inicio) * 1000)
+
+
+def _tokens_facturados(respuesta: Any) -> Optional[int]:
+    """Tokens que cuentan para el límite TPM (la lectura de caché no cuenta)."""
+    usage = getattr(respuesta, "usage", None)
+    if usage is None:
+        return None
+    return sum(
+        getattr(usage, campo, 0) or 0
+        for campo in ("input_tokens", "output_tokens", "cache_creation_input_tokens")
+    )
+
+
+def _headers_error(error: BaseException) -> Mapping[str, str]:
+    respuesta = getattr(error, "response", None)
+    return getattr(respuesta, "headers", None) or {}
+
+
+class _StreamInstrumentado:
+    """Envuelve el context manager de messages.stream (síncrono o asíncrono)."""
+
+    def __init__(self, manager, sitio: str, parametros: Dict[str, Any]):
+        self._manager = manager
+        self._sitio = sitio
+        self._parametros = parametros
+        self._modelo = parametros.get("model", "")
+        self._stream = None
+        self._inicio = 0.0
+        self._reservados = 0
+
+    def _registrar(self, error: Optional[BaseException]):
+        snapshot = None
+        try:
+            snapshot = self._stream.current_message_snapshot if self._stream is not None else None
+        except Exception:
+            pass
+        get_telemetria_llm().registrar_respuesta_anthropic(
+            self._sitio, self._modelo, _ms_desde(self._inicio), snapshot, error,
+        )
+
+    async def __aenter__(self):
+        limitador = get_limitador_llm()
+        self._reservados = await limitador.adquirir(
+            self._parametros, prioridad_de_sitio(sitio_actual(self._sitio)),
+        )
+        self._inicio = time.perf_counter()
+        try:
+            self._stream = await self._manager.__aenter__()
+        except BaseException as e:
+            self._registrar(e)
+            if isinstance(e, anthropic.RateLimitError):
+                await limitador.penalizar(_headers_error(e))
+            raise
+        return self._stream
+
+    async def __aexit__(self, tipo, error, tb):
+        try:
+            return await self._manager.__aexit__(tipo, error, tb)
+        finally:
+            self._registrar(error)
+            snapshot = getattr(self._stream, "current_message_snapshot", None) if error is None else None
+            await get_limitador_llm().liquidar(self._reservados, _tokens_facturados(snapshot))
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        try:
+            self._stream = self._manager.__enter__()
+        except BaseException as e:
+            self._registrar(e)
+            raise
+        return self._stream
+
+    def __exit__(self, tipo, error, tb):
+        try:
+            return self._manager.__exit__(tipo, error, tb)
+        finally:
+            self._registrar(error)
+
+
+class _MensajesInstrumentados:
+    """Envuelve un recurso `messages` de Anthropic (create y stream)."""
+
+    def __init__(self, mensajes, sitio: str):
+        self._mensajes = mensajes
+        self._sitio = sitio
+
+    def __getattr__(self, nombre):
+        return getattr(self._mensajes, nombre)
+
+    def create(self, **kwargs):
+        modelo = kwargs.get("model", "")
+        inicio = time.perf_counter()
+        try:
+            resultado = self._mensajes.create(**kwargs)
+        except BaseException as e:
+            get_telemetria_llm().registrar_respuesta_anthropic(self._sitio, modelo, _ms_desde(inicio), error=e)
+            raise
+        if inspect.isawaitable(resultado):
+            return self._esperar(resultado, kwargs)
+        get_telemetria_llm().registrar_respuesta_anthropic(self._sitio, modelo, _ms_desde(inicio), resultado)
+        return resultado
+
+    async def _esperar(self, resultado, kwargs: Dict[str, Any]):
+        """
+        Espera una llamada asíncrona bajo el limitador de tasa.
+
+        La corrutina del SDK no envía nada hasta que se la espera, por lo que
+        el permiso se adquiere antes. Ante un 429 se pausa a todos los
+        procesos y se reintenta hasta LLM_LIMITE_REINTENTOS_429 veces.
+        """
+        modelo = kwargs.get("model", "")
+        limitador = get_limitador_llm()
+        prioridad = prioridad_de_sitio(sitio_actual(self._sitio))
+        operacion = nullcontext() if _operacion_actual.get() else operacion_llm()
+        with operacion:
+            for intento in range(settings.LLM_LIMITE_REINTENTOS_429 + 1):
+                if intento:
+                    resultado = self._mensajes.create(**kwargs)
+                try:
+                    reservados = await limitador.adquirir(kwargs, prioridad)
+                except BaseException:
+                    if inspect.iscoroutine(resultado):
+                        resultado.close()
+                    raise
+                inicio = time.perf_counter()
+                try:
+                    respuesta = await resultado
+                except anthropic.RateLimitError as e:
+                    get_telemetria_llm().registrar_respuesta_anthropic(self._sitio, modelo, _ms_desde(inicio), error=e)
+                    await limitador.penalizar(_headers_error(e))
+                    if intento == settings.LLM_LIMITE_REINTENTOS_429:
+                        raise
+                    continue
+                except BaseException as e:
+                    get_telemetria_llm().registrar_respuesta_anthropic(self._sitio, modelo, _ms_desde(inicio), error=e)
+                    raise
+                get_telemetria_llm().registrar_respuesta_anthropic(self._sitio, modelo, _ms_desde(inicio), respuesta)
+                await limitador.liquidar(reservados, _tokens_facturados(respuesta))
+                return respuesta
+
+    def stream(self, **kwargs):
+        return _StreamInstrumentado(self._mensajes.stream(**kwargs), self._sitio, kwargs)
+
+
+class _ClienteInstrumentado:
+    """Proxy de un cliente Anthropic cuyos recursos `messages` quedan instrumentados."""
+
+    def __init__(self, objetivo, sitio: str):
+        self._objetivo = objetivo
+        self._sitio = sitio
+
+    def __getattr__(self, nombre):
+        valor = getattr(self._objetivo, nombre)
+        if nombre == "messages":
+            return _MensajesInstrumentados(valor, self._sitio)
+        if nombre in ("beta", "prompt_caching"):
+            return _ClienteInstrumentado(valor, self._sitio)
+        return valor
+
+
+def instrumentar(cliente, sitio: str):
+    """
+    Envuelve un cliente Anthropic (AsyncAnthropic o Anthropic) para registrar
+    cada llamada de `messages.create` y `messages.stream`, también bajo
+    `beta.prompt_caching`. Las llamadas asíncronas pasan además por el
+    limitador de tasa compartido (ver limitador).
+
+    Args:
+        cliente: Cliente del SDK de Anthropic
+        sitio: Funcionalidad a la que se atribuyen las llamadas por defecto
+    """
+    return _ClienteInstrumentado(cliente, sitio)
+
+
+# =============================================================================
+# Volcado periódico
+# =============================================================================
+
+async def bucle_volcado(detener: asyncio.Event, intervalo: Optional[int] = None):
+    """Persiste los agregados cada `intervalo` segundos y una última vez al detenerse."""
+    from app.db.session import AsyncSessionLocal
+
+    intervalo = intervalo or settings.TELEMETRIA_LLM_VOLCADO_SEGUNDOS
+    telemetria = get_telemetria_llm()
+    while True:
+        try:
+            await asyncio.wait_for(detener.wait(), timeout=intervalo)
+        except asyncio.TimeoutError:
+            pass
+        try:
+            async with AsyncSessionLocal() as db:
+                filas = await telemetria.volcar_rollups(db)
+            if filas:
+                logger.debug(f"Telemetría LLM: {filas} agregados persistidos")
+        except Exception as e:
+            logger.warning(f"No se pudo persistir la telemetría LLM: {e}")
+        if detener.is_set():
+            return
@@ -1,5 +1,6 @@
 """Servicios de OCR con Claude Vision."""
 
-from .claude_vision import ClaudeVisionOCR, extraer_texto_con_vision
+from .cache import CacheOCR
+from .claude_vision import ClaudeVisionOCR, ResultadoOCR, extraer_texto_con_vision
 
-__all__ = ["ClaudeVisionOCR", "extraer_texto_con_vision"]
+__all__ = ["CacheOCR", "ClaudeVisionOCR", "ResultadoOCR", "extraer_texto_con_vision"]
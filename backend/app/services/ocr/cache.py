@@ -0,0 +1,79 @@
+"""
+Caché del texto OCR por hash de la imagen de página.
+
+Persiste en Redis para que una re-subida del mismo PDF, o el reintento
+de un trabajo que falló a mitad, no vuelva a pagar las páginas ya
+procesadas. Si Redis no está disponible el OCR sigue funcionando sin caché.
+"""
+
+import logging
+from typing import Optional
+
+import redis
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PREFIJO_CLAVE = "ocr:pagina:"
+
+
+class CacheOCR:
+    """
+    Caché asíncrona de texto OCR en Redis.
+
+    El cliente se crea de forma perezosa y se cierra al terminar el
+    procesamiento (`cerrar`): la conexión queda ligada al event loop que
+    la creó, y cada llamada síncrona al OCR corre en un loop propio.
+    """
+
+    def __init__(self, redis_url: Optional[str] = None, ttl_dias: Optional[int] = None):
+        self.redis_url = redis_url or settings.REDIS_URL
+        self.ttl_segundos = (ttl_dias or settings.OCR_CACHE_TTL_DIAS) * 86400
+        self._cliente: Optional[aioredis.Redis] = None
+        self._disponible = True
+
+    def _get_redis(self) -> Optional[aioredis.Redis]:
+        if self._cliente is None and self._disponible:
+            self._cliente = aioredis.from_url(
+                self.redis_url,
+                decode_responses=True,
+                socket_connect_timeout=2,
+            )
+        return self._cliente
+
+    def _deshabilitar(self, error: Exception):
+        logger.warning(f"Caché OCR no disponible, se continúa sin caché: {error}")
+        self._disponible = False
+
+    async def obtener(self, clave: str) -> Optional[str]:
+        """Texto cacheado para la clave, o None."""
+        cliente = self._get_redis()
+        if cliente is None:
+            return None
+        try:
+            return await cliente.get(PREFIJO_CLAVE + clave)
+        except (redis.RedisError, OSError) as e:
+            self._deshabilitar(e)
+            return None
+
+    async def guardar(self, clave: str, texto: str):
+        """Guarda el texto OCR de una página."""
+        cliente = self._get_redis()
+        if cliente is None:
+            return
+        try:
+            await cliente.set(PREFIJO_CLAVE + clave, texto, ex=self.ttl_segundos)
+        except (redis.RedisError, OSError) as e:
+            self._deshabilitar(e)
+
+    async def cerrar(self):
+        """Cierra la conexión y rehabilita la caché para el próximo uso."""
+        if self._cliente is not None:
+            try:
+                await self._cliente.aclose()
+            except (redis.RedisError, OSError):
+                pass
+        self._cliente = None
+        self._disponible = True
@@ -1,21 +1,32 @@
 """
 OCR usando Claude Vision.
 
-Convierte páginas PDF a imágenes y usa Claude Vision para extraer
+Renderiza páginas PDF a imágenes y usa Claude Vision para extraer
 texto, tablas y descripciones de gráficos.
+
+Las páginas se renderizan de a una, solo cuando hay cupo para enviarlas,
+y se procesan en paralelo con el cliente asíncrono bajo un limitador que
+pausa todos los envíos cuando la API responde con rate limit. El texto
+de cada página se cachea por el hash de su imagen.
 """
 
+import asyncio
 import base64
-import io
+import hashlib
 import logging
-from dataclasses import dataclass
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
 import anthropic
-from PIL import Image
 
 from app.core.config import settings
+from app.services.llm.limitador import cerrar_limitador_llm
+from app.services.llm.pool_anthropic import cerrar_pool_anthropic, get_cliente_anthropic
+from app.services.llm.telemetria import operacion_llm
+from app.services.ocr.cache import CacheOCR
 
 logger = logging.getLogger(__name__)
 
@@ -30,13 +41,76 @@ class ResultadoOCR:
     metodo: str = "claude_vision"
     tablas_detectadas: int = 0
     imagenes_descritas: int = 0
+    paginas_en_cache: int = 0
+    paginas_con_error: List[int] = field(default_factory=list)
+    textos_por_pagina: Dict[int, str] = field(default_factory=dict)
+
+
+class LimitadorVision:
+    """
+    Semáforo de concurrencia que respeta el rate limit de la API.
+
+    Cuando una página recibe un 429, `pausar` fija un instante de reanudación
+    compartido: ninguna página vuelve a enviar hasta entonces, en lugar de
+    que cada una reintente por su cuenta y prolongue el rate limit.
+    """
+
+    def __init__(self, concurrencia: int):
+        self._semaforo = asyncio.Semaphore(concurrencia)
+        self._reanudar_en = 0.0
+
+    async def __aenter__(self):
+        await self._semaforo.acquire()
+        return self
+
+    async def __aexit__(self, *args):
+        self._semaforo.release()
+        return False
+
+    def pausar(self, segundos: float):
+        self._reanudar_en = max(self._reanudar_en, time.monotonic() + segundos)
+
+    async def esperar_turno(self):
+        espera = self._reanudar_en - time.monotonic()
+        if espera > 0:
+            await asyncio.sleep(espera)
+
+
+def _segundos_reintento(error: anthropic.APIStatusError, intento: int) -> float:
+    """Espera sugerida por el header retry-after, o backoff exponencial."""
+    try:
+        return float(error.response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return float(2 ** intento)
+
+
+def _ejecutar_sync(coro):
+    """Ejecuta una corrutina desde código síncrono, haya o no un loop corriendo."""
+    async def ejecutar():
+        try:
+            return await coro
+        finally:
+            # El loop propio muere al terminar: se cierran sus conexiones
+            await cerrar_pool_anthropic()
+            await cerrar_limitador_llm()
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(ejecutar())
+    # Llamado desde dentro de un loop (p. ej. scripts de ingesta async): no
+    # se puede anidar asyncio.run, así que corre en un loop propio en otro
+    # hilo. El loop del llamador queda bloqueado hasta que termina el OCR;
+    # el código async debe usar procesar_pdf_async o procesar_paginas_async.
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, ejecutar()).result()
 
 
 class ClaudeVisionOCR:
     """
     Servicio de OCR usando Claude Vision.
 
-    Convierte PDFs a imágenes y extrae texto usando las capacidades
+    Renderiza PDFs a imágenes y extrae texto usando las capacidades
     de visión de Claude, incluyendo:
     - Texto impreso y manuscrito
     - Tablas (preservando estructura)
@@ -60,172 +134,227 @@ FORMATO DE SALIDA:
 
 Extrae el contenido:"""
 
-    def __init__(self):
-        self._cliente: Optional[anthropic.Anthropic] = None
+    def __init__(
+        self,
+        cliente: Optional[anthropic.AsyncAnthropic] = None,
+        cache: Optional[CacheOCR] = None,
+    ):
+        self._cliente = cliente
+        self._cache = cache
         self.modelo = settings.OCR_VISION_MODEL
         self.dpi = settings.OCR_IMAGE_DPI
+        self.max_dimension = settings.OCR_MAX_DIMENSION
         self.max_paginas = settings.OCR_MAX_PAGES
+        self.concurrencia = settings.OCR_CONCURRENCIA
+        self.reintentos = settings.OCR_REINTENTOS
+        self._version_prompt = hashlib.sha256(self.PROMPT_OCR.encode()).hexdigest()[:8]
+
+    def _crear_cliente(self) -> anthropic.AsyncAnthropic:
+        """Cliente asíncrono del pool compartido; los reintentos los maneja el limitador."""
+        api_key = settings.ANTHROPIC_API_KEY
+        if not api_key:
+            raise ValueError("ANTHROPIC_API_KEY no configurada")
+        return get_cliente_anthropic(
+            "ocr.vision",
+            api_key=api_key,
+            base_url=settings.OCR_VISION_BASE_URL,
+            max_retries=0,
+        )
 
-    @property
-    def cliente(self) -> anthropic.Anthropic:
-        """Cliente de Anthropic (síncrono para procesamiento batch)."""
-        if self._cliente is None:
-            api_key = settings.ANTHROPIC_API_KEY
-            if not api_key:
-                raise ValueError("ANTHROPIC_API_KEY no configurada")
-            self._cliente = anthropic.Anthropic(api_key=api_key)
-        return self._cliente
-
-    def pdf_a_imagenes(self, ruta_pdf: str) -> list[Image.Image]:
+    def renderizar_pagina(self, doc, num_pagina: int) -> bytes:
         """
-        Convierte un PDF a lista de imágenes PIL.
+        Renderiza una página a PNG.
+
+        Usa OCR_IMAGE_DPI, reduciendo la escala si la imagen superaría
+        OCR_MAX_DIMENSION px (el tamaño útil máximo para Claude Vision).
 
         Args:
-            ruta_pdf: Ruta al archivo PDF
+            doc: Documento PyMuPDF abierto
+            num_pagina: Número de página (1-indexado)
 
         Returns:
-            Lista de imágenes PIL, una por página
+            Bytes PNG de la página
         """
-        from pdf2image import convert_from_path
-
-        logger.info(f"Convirtiendo PDF a imágenes: {ruta_pdf}")
-
-        imagenes = convert_from_path(
-            ruta_pdf,
-            dpi=self.dpi,
-            first_page=1,
-            last_page=self.max_paginas,
-        )
-
-        logger.info(f"Convertidas {len(imagenes)} páginas")
-        return imagenes
-
-    def imagen_a_base64(self, imagen: Image.Image, formato: str = "PNG") -> str:
-        """Convierte una imagen PIL a base64."""
-        buffer = io.BytesIO()
-
-        # Convertir a RGB si es necesario (para JPEG)
-        if formato.upper() == "JPEG" and imagen.mode in ("RGBA", "P"):
-            imagen = imagen.convert("RGB")
-
-        imagen.save(buffer, format=formato)
-        return base64.standard_b64encode(buffer.getvalue()).decode("utf-8")
-
-    def optimizar_imagen(self, imagen: Image.Image, max_dimension: int = 1568) -> Image.Image:
-        """
-        Optimiza una imagen para enviar a Claude Vision.
-
-        Claude Vision tiene un límite de ~1568px en la dimensión mayor
-        para mejor rendimiento.
-        """
-        ancho, alto = imagen.size
-
-        if max(ancho, alto) <= max_dimension:
-            return imagen
-
-        if ancho > alto:
-            nuevo_ancho = max_dimension
-            nuevo_alto = int(alto * (max_dimension / ancho))
-        else:
-            nuevo_alto = max_dimension
-            nuevo_ancho = int(ancho * (max_dimension / alto))
-
-        return imagen.resize((nuevo_ancho, nuevo_alto), Image.Resampling.LANCZOS)
-
-    def extraer_texto_imagen(self, imagen: Image.Image, num_pagina: int = 1) -> tuple[str, int]:
+        import fitz  # PyMuPDF
+
+        pagina = doc[num_pagina - 1]
+        escala = self.dpi / 72
+        lado_mayor = max(pagina.rect.width, pagina.rect.height) * escala
+        if lado_mayor > self.max_dimension:
+            escala *= self.max_dimension / lado_mayor
+
+        pixmap = pagina.get_pixmap(matrix=fitz.Matrix(escala, escala), alpha=False)
+        return pixmap.tobytes("png")
+
+    def clave_cache(self, imagen_png: bytes) -> str:
+        """Clave de caché: modelo, versión del prompt y hash de la imagen."""
+        return f"{self.modelo}:{self._version_prompt}:{hashlib.sha256(imagen_png).hexdigest()}"
+
+    async def extraer_texto_imagen(
+        self,
+        cliente: anthropic.AsyncAnthropic,
+        imagen_png: bytes,
+        limitador: LimitadorVision,
+        num_pagina: int = 1,
+    ) -> Tuple[Optional[str], int]:
         """
         Extrae texto de una imagen usando Claude Vision.
 
+        Reintenta ante rate limit (pausando a todas las páginas) y ante
+        errores transitorios del servidor o de conexión.
+
         Args:
-            imagen: Imagen PIL
+            cliente: Cliente asíncrono de Anthropic
+            imagen_png: Imagen de la página en PNG
+            limitador: Limitador compartido por el procesamiento
             num_pagina: Número de página (para logging)
 
         Returns:
-            Tupla (texto_extraido, tokens_usados)
+            Tupla (texto_extraido o None si falló, tokens_usados)
         """
-        # Optimizar imagen
-        imagen_opt = self.optimizar_imagen(imagen)
-
-        # Convertir a base64
-        imagen_b64 = self.imagen_a_base64(imagen_opt, formato="PNG")
-
-        logger.debug(f"Procesando página {num_pagina} con Claude Vision")
-
-        try:
-            respuesta = self.cliente.messages.create(
-                model=self.modelo,
-                max_tokens=4096,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "image",
-                                "source": {
-                                    "type": "base64",
-                                    "media_type": "image/png",
-                                    "data": imagen_b64,
+        imagen_b64 = base64.standard_b64encode(imagen_png).decode("utf-8")
+
+        for intento in range(self.reintentos + 1):
+            await limitador.esperar_turno()
+            logger.debug(f"Procesando página {num_pagina} con Claude Vision")
+
+            try:
+                respuesta = await cliente.messages.create(
+                    model=self.modelo,
+                    max_tokens=4096,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": [
+                                {
+                                    "type": "image",
+                                    "source": {
+                                        "type": "base64",
+                                        "media_type": "image/png",
+                                        "data": imagen_b64,
+                                    },
                                 },
-                            },
-                            {
-                                "type": "text",
-                                "text": self.PROMPT_OCR,
-                            },
-                        ],
-                    }
-                ],
-            )
-
-            texto = respuesta.content[0].text if respuesta.content else ""
-            tokens = respuesta.usage.input_tokens + respuesta.usage.output_tokens
-
-            return texto, tokens
-
-        except Exception as e:
-            logger.error(f"Error en OCR página {num_pagina}: {e}")
-            return f"[Error procesando página {num_pagina}]", 0
-
-    def procesar_pdf(self, ruta_pdf: str) -> ResultadoOCR:
+                                {
+                                    "type": "text",
+                                    "text": self.PROMPT_OCR,
+                                },
+                            ],
+                        }
+                    ],
+                )
+
+                texto = respuesta.content[0].text if respuesta.content else ""
+                tokens = respuesta.usage.input_tokens + respuesta.usage.output_tokens
+                return texto, tokens
+
+            except anthropic.RateLimitError as e:
+                espera = _segundos_reintento(e, intento)
+                logger.warning(f"Rate limit en OCR página {num_pagina}, pausa de {espera:.1f}s")
+                limitador.pausar(espera)
+
+            except (anthropic.APIConnectionError, anthropic.InternalServerError) as e:
+                logger.warning(f"Error transitorio en OCR página {num_pagina}: {e}")
+                if intento < self.reintentos:
+                    await asyncio.sleep(2 ** intento)
+
+            except Exception as e:
+                logger.error(f"Error en OCR página {num_pagina}: {e}")
+                return None, 0
+
+        logger.error(f"OCR página {num_pagina} agotó {self.reintentos} reintentos")
+        return None, 0
+
+    async def _procesar_pagina(
+        self,
+        cliente: anthropic.AsyncAnthropic,
+        doc,
+        num_pagina: int,
+        limitador: LimitadorVision,
+        lock_render: asyncio.Lock,
+        cache: CacheOCR,
+    ) -> Tuple[Optional[str], int, bool]:
+        """Renderiza, consulta la caché y, si hace falta, envía la página."""
+        async with limitador:
+            # El documento PyMuPDF no admite uso concurrente
+            async with lock_render:
+                imagen_png = await asyncio.to_thread(self.renderizar_pagina, doc, num_pagina)
+
+            clave = self.clave_cache(imagen_png)
+            texto = await cache.obtener(clave)
+            if texto is not None:
+                logger.debug(f"OCR página {num_pagina} desde caché")
+                return texto, 0, True
+
+            # Una operación por página: los reintentos cuentan en la telemetría
+            with operacion_llm():
+                texto, tokens = await self.extraer_texto_imagen(
+                    cliente, imagen_png, limitador, num_pagina
+                )
+            if texto is not None:
+                await cache.guardar(clave, texto)
+            return texto, tokens, False
+
+    async def procesar_pdf_async(
+        self,
+        ruta_pdf: str,
+        paginas: Optional[List[int]] = None,
+    ) -> ResultadoOCR:
         """
-        Procesa un PDF completo y extrae todo el texto.
+        Procesa un PDF (o algunas de sus páginas) y extrae el texto.
 
         Args:
             ruta_pdf: Ruta al archivo PDF
+            paginas: Números de página (1-indexados). Si es None, las
+                primeras OCR_MAX_PAGES páginas.
 
         Returns:
             ResultadoOCR con el texto y metadatos
         """
-        import time
+        import fitz  # PyMuPDF
+
         inicio = time.time()
 
         if not Path(ruta_pdf).exists():
             raise FileNotFoundError(f"Archivo no encontrado: {ruta_pdf}")
 
-        # Convertir PDF a imágenes
-        imagenes = self.pdf_a_imagenes(ruta_pdf)
+        cliente = self._cliente or self._crear_cliente()
+        # Una caché por procesamiento: su conexión queda ligada a este loop
+        cache = self._cache or CacheOCR()
+        limitador = LimitadorVision(self.concurrencia)
+        lock_render = asyncio.Lock()
 
-        if not imagenes:
-            return ResultadoOCR(
-                texto="",
-                paginas_procesadas=0,
-                tokens_usados=0,
-                tiempo_ms=0,
-            )
-
-        # Procesar cada página
+        try:
+            with fitz.open(str(ruta_pdf)) as doc:
+                if paginas is None:
+                    paginas = list(range(1, len(doc) + 1))
+                paginas = paginas[:self.max_paginas]
+
+                resultados = await asyncio.gather(*(
+                    self._procesar_pagina(cliente, doc, num, limitador, lock_render, cache)
+                    for num in paginas
+                ))
+        finally:
+            await cache.cerrar()
+
+        textos_por_pagina: Dict[int, str] = {}
         textos = []
         tokens_total = 0
+        en_cache = 0
+        con_error = []
         tablas = 0
         graficos = 0
 
-        for i, imagen in enumerate(imagenes, 1):
-            logger.info(f"OCR página {i}/{len(imagenes)}")
-
-            texto_pagina, tokens = self.extraer_texto_imagen(imagen, i)
+        for num, (texto_pagina, tokens, desde_cache) in zip(paginas, resultados):
+            if texto_pagina is None:
+                con_error.append(num)
+                texto_pagina = f"[Error procesando página {num}]"
+            else:
+                textos_por_pagina[num] = texto_pagina
 
             # Agregar separador de página
-            textos.append(f"\n--- Página {i} ---\n{texto_pagina}")
+            textos.append(f"\n--- Página {num} ---\n{texto_pagina}")
             tokens_total += tokens
+            en_cache += desde_cache
 
             # Contar tablas y gráficos detectados
             if "|" in texto_pagina and "---" in texto_pagina:
@@ -237,19 +366,57 @@ Extrae el contenido:"""
         texto_completo = "\n".join(textos)
 
         logger.info(
-            f"OCR completado: {len(imagenes)} páginas, "
-            f"{len(texto_completo)} chars, {tokens_total} tokens, {tiempo_ms}ms"
+            f"OCR completado: {len(paginas)} páginas ({en_cache} desde caché, "
+            f"{len(con_error)} con error), {len(texto_completo)} chars, "
+            f"{tokens_total} tokens, {tiempo_ms}ms"
         )
 
         return ResultadoOCR(
             texto=texto_completo,
-            paginas_procesadas=len(imagenes),
+            paginas_procesadas=len(paginas),
             tokens_usados=tokens_total,
             tiempo_ms=tiempo_ms,
             tablas_detectadas=tablas,
             imagenes_descritas=graficos,
+            paginas_en_cache=en_cache,
+            paginas_con_error=con_error,
+            textos_por_pagina=textos_por_pagina,
         )
 
+    def procesar_pdf(self, ruta_pdf: str) -> ResultadoOCR:
+        """
+        Procesa un PDF completo y extrae todo el texto (versión síncrona).
+
+        Args:
+            ruta_pdf: Ruta al archivo PDF
+
+        Returns:
+            ResultadoOCR con el texto y metadatos
+        """
+        return _ejecutar_sync(self.procesar_pdf_async(ruta_pdf))
+
+    def procesar_paginas(self, ruta_pdf: str, paginas: List[int]) -> Dict[int, str]:
+        """
+        Aplica OCR solo a las páginas indicadas (versión síncrona).
+
+        Se usa cuando la extracción nativa dejó páginas escaneadas dentro
+        de un documento que sí tiene capa de texto. Las páginas que fallan
+        no se incluyen en el resultado.
+
+        Args:
+            ruta_pdf: Ruta al archivo PDF
+            paginas: Números de página (1-indexados)
+
+        Returns:
+            Diccionario {numero_pagina: texto}
+        """
+        return _ejecutar_sync(self.procesar_paginas_async(ruta_pdf, paginas))
+
+    async def procesar_paginas_async(self, ruta_pdf: str, paginas: List[int]) -> Dict[int, str]:
+        """Versión async de `procesar_paginas`, para llamar desde un event loop."""
+        resultado = await self.procesar_pdf_async(ruta_pdf, paginas=paginas)
+        return resultado.textos_por_pagina
+
 
 # Instancia singleton
 _ocr_service: Optional[ClaudeVisionOCR] = None
@@ -0,0 +1,19 @@
+"""Extracción de texto de PDFs, compartida por el ingestor RAG y el storage."""
+
+from .extractor import (
+    PaginaExtraida,
+    cerrar_pool,
+    contar_paginas,
+    extraer_paginas,
+    iterar_paginas,
+    paginas_para_ocr,
+)
+
+__all__ = [
+    "PaginaExtraida",
+    "cerrar_pool",
+    "contar_paginas",
+    "extraer_paginas",
+    "iterar_paginas",
+    "paginas_para_ocr",
+]
@@ -0,0 +1,176 @@
+"""
+Motor de extracción de texto de PDFs página a página.
+
+Reparte el rango de páginas en bloques que se extraen con PyMuPDF en un
+pool de procesos (cada proceso abre el archivo por su cuenta), y entrega
+las páginas en orden mediante un generador. Cada página indica si quedó
+sin texto, para que el OCR se aplique solo a las páginas que lo necesitan.
+
+Los PDFs pequeños se extraen en el mismo proceso: para ellos el costo de
+repartir el trabajo supera la ganancia.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Deque, Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PaginaExtraida:
+    """Texto extraído de una página del PDF."""
+    numero: int  # 1-indexado
+    texto: str
+    sin_texto: bool
+    tiene_imagenes: bool
+
+    @property
+    def requiere_ocr(self) -> bool:
+        """Página escaneada: sin capa de texto pero con imágenes."""
+        return self.sin_texto and self.tiene_imagenes
+
+
+# (numero, texto, tiene_imagenes) tal como viaja desde los procesos hijos
+_FilaPagina = Tuple[int, str, bool]
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_procesos = 0
+_pool_lock = threading.Lock()
+
+
+def _num_procesos() -> int:
+    return settings.PDF_EXTRACCION_PROCESOS or os.cpu_count() or 1
+
+
+def _obtener_pool(procesos: int) -> ProcessPoolExecutor:
+    """Pool compartido; se recrea si cambia el número de procesos."""
+    global _pool, _pool_procesos
+    with _pool_lock:
+        if _pool is None or _pool_procesos != procesos:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            # spawn: el proceso padre corre hilos (event loop, to_thread) y
+            # hacer fork con hilos activos puede dejar locks tomados.
+            _pool = ProcessPoolExecutor(
+                max_workers=procesos,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            _pool_procesos = procesos
+        return _pool
+
+
+def cerrar_pool():
+    """Cierra el pool de procesos (al apagar la aplicación o el worker)."""
+    global _pool, _pool_procesos
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+            _pool_procesos = 0
+
+
+def _extraer_bloque(ruta_pdf: str, inicio: int, fin: int) -> List[_FilaPagina]:
+    """Extrae las páginas [inicio, fin) (0-indexadas). Corre en un proceso hijo."""
+    import fitz  # PyMuPDF
+
+    filas: List[_FilaPagina] = []
+    with fitz.open(ruta_pdf) as doc:
+        for i in range(inicio, fin):
+            pagina = doc[i]
+            filas.append((i + 1, pagina.get_text(), bool(pagina.get_images())))
+    return filas
+
+
+def _a_pagina(fila: _FilaPagina, min_caracteres: int) -> PaginaExtraida:
+    numero, texto, tiene_imagenes = fila
+    return PaginaExtraida(
+        numero=numero,
+        texto=texto,
+        sin_texto=len(texto.strip()) < min_caracteres,
+        tiene_imagenes=tiene_imagenes,
+    )
+
+
+def contar_paginas(ruta_pdf: str) -> int:
+    """Número de páginas del PDF."""
+    import fitz  # PyMuPDF
+
+    with fitz.open(str(ruta_pdf)) as doc:
+        return len(doc)
+
+
+def iterar_paginas(
+    ruta_pdf: str,
+    procesos: Optional[int] = None,
+    paginas_por_bloque: Optional[int] = None,
+) -> Iterator[PaginaExtraida]:
+    """
+    Genera las páginas del PDF en orden.
+
+    Se mantienen en vuelo a lo sumo dos bloques por proceso, de modo que
+    la memoria no crece con el tamaño del documento aunque el consumidor
+    sea más lento que la extracción.
+
+    Args:
+        ruta_pdf: Ruta al archivo PDF
+        procesos: Procesos a usar (default: PDF_EXTRACCION_PROCESOS)
+        paginas_por_bloque: Páginas por tarea (default: PDF_EXTRACCION_PAGINAS_POR_BLOQUE)
+
+    Yields:
+        PaginaExtraida, de la primera a la última página
+    """
+    ruta_pdf = str(ruta_pdf)
+    procesos = procesos or _num_procesos()
+    tamano_bloque = max(1, paginas_por_bloque or settings.PDF_EXTRACCION_PAGINAS_POR_BLOQUE)
+    min_caracteres = settings.PDF_PAGINA_MIN_CARACTERES
+    total = contar_paginas(ruta_pdf)
+
+    if procesos <= 1 or total < settings.PDF_EXTRACCION_MIN_PAGINAS_PARALELO:
+        for inicio in range(0, total, tamano_bloque):
+            for fila in _extraer_bloque(ruta_pdf, inicio, min(inicio + tamano_bloque, total)):
+                yield _a_pagina(fila, min_caracteres)
+        return
+
+    bloques = deque(
+        (inicio, min(inicio + tamano_bloque, total))
+        for inicio in range(0, total, tamano_bloque)
+    )
+    logger.debug(f"Extrayendo {total} páginas de {ruta_pdf} en {len(bloques)} bloques, {procesos} procesos")
+
+    pool = _obtener_pool(procesos)
+    en_vuelo: Deque[Future] = deque()
+
+    def _enviar():
+        while bloques and len(en_vuelo) < procesos * 2:
+            inicio, fin = bloques.popleft()
+            en_vuelo.append(pool.submit(_extraer_bloque, ruta_pdf, inicio, fin))
+
+    try:
+        _enviar()
+        while en_vuelo:
+            filas = en_vuelo.popleft().result()
+            _enviar()
+            for fila in filas:
+                yield _a_pagina(fila, min_caracteres)
+    finally:
+        # Si el consumidor abandona el generador, no seguir extrayendo
+        for futuro in en_vuelo:
+            futuro.cancel()
+
+
+def extraer_paginas(ruta_pdf: str, **kwargs) -> List[PaginaExtraida]:
+    """Extrae todas las páginas del PDF (ver iterar_paginas)."""
+    return list(iterar_paginas(ruta_pdf, **kwargs))
+
+
+def paginas_para_ocr(paginas: List[PaginaExtraida]) -> List[int]:
+    """Números de las páginas escaneadas que deben pasar por OCR."""
+    return [p.numero for p in paginas if p.requiere_ocr]
@@ -5,7 +5,7 @@ Módulo que encapsula la lógica de análisis de prefactibilidad,
 separando la lógica de negocio de los endpoints HTTP.
 """
 
-from app.services.prefactibilidad.service import ServicioPrefactibilidad
+from app.services.prefactibilidad.service import EventoAnalisis, ServicioPrefactibilidad
 from app.services.prefactibilidad.helpers import (
     construir_datos_proyecto,
     calcular_checksum,
@@ -15,6 +15,7 @@ from app.services.prefactibilidad.helpers import (
 )
 
 __all__ = [
+    "EventoAnalisis",
     "ServicioPrefactibilidad",
     "construir_datos_proyecto",
     "calcular_checksum",
@@ -5,21 +5,36 @@ Encapsula la lógica de análisis de prefactibilidad ambiental,
 separando la lógica de negocio de los endpoints HTTP.
 """
 
+import asyncio
 import logging
 import time
 import uuid
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from datetime import datetime
-from typing import Any, Optional
+from typing import Any, AsyncIterator, Optional
 
+from geoalchemy2.shape import to_shape
+from shapely.geometry import mapping
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
+from app.db.models.auditoria import AuditoriaAnalisis
+from app.db.models.proyecto import Analisis, Proyecto
+from app.schemas.auditoria import AnalisisIntegradoInput, AnalisisIntegradoResponse, MetricasEjecucion
 from app.services.gis.analisis import analizar_proyecto_espacial
 from app.services.rag.busqueda import BuscadorLegal
 from app.services.reglas import MotorReglasSSEIA, SistemaAlertas, ClasificacionSEIA
 from app.services.llm import GeneradorInformes, SeccionInforme
+from app.services.llm.generador import InformePrefactibilidad, SeccionGenerada
 from app.services.componentes_eia import ServicioComponentesEIA
 from app.services.fases import ServicioFases
+from app.services.prefactibilidad.helpers import (
+    calcular_checksum,
+    construir_datos_proyecto,
+    extraer_capas_usadas,
+    extraer_normativa_citada,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -72,6 +87,39 @@ class ResultadoAnalisis:
         return sum(1 for a in self.alertas_dict if a.get("nivel") == "ALTA")
 
 
+@dataclass
+class EventoAnalisis:
+    """
+    Evento del análisis progresivo (ver `ejecutar_analisis_stream`).
+
+    Tipos:
+    - analisis: GIS, clasificación y alertas (resultado parcial, sin normativa)
+    - normativa: normativa relevante encontrada por el RAG
+    - seccion: una sección del informe LLM recién terminada
+    - done: resultado completo, igual al de `ejecutar_analisis`
+    """
+
+    tipo: str
+    resultado: Optional[ResultadoAnalisis] = None
+    normativa: Optional[list[dict]] = None
+    seccion: Optional[SeccionGenerada] = None
+
+
+def _informe_a_dict(informe: InformePrefactibilidad) -> dict:
+    """Convierte el informe LLM al diccionario que se entrega en la respuesta."""
+    return {
+        "secciones": [
+            {
+                "seccion": s.seccion.value,
+                "titulo": s.titulo,
+                "contenido": s.contenido,
+            }
+            for s in informe.secciones
+        ],
+        "texto_completo": informe.to_texto_plano(),
+    }
+
+
 class ServicioPrefactibilidad:
     """
     Servicio que encapsula la lógica de análisis de prefactibilidad.
@@ -127,19 +175,8 @@ class ServicioPrefactibilidad:
         inicio = time.time()
         logger.info(f"Iniciando análisis de prefactibilidad: {datos_proyecto.get('nombre')}")
 
-        # 1. Ejecutar análisis espacial GIS
-        logger.info("Ejecutando análisis GIS...")
-        inicio_gis = time.time()
-        resultado_gis = await analizar_proyecto_espacial(db, geojson)
-        tiempo_gis = int((time.time() - inicio_gis) * 1000)
-
-        # 2. Ejecutar motor de reglas SEIA
-        logger.info("Ejecutando motor de reglas SEIA...")
-        clasificacion = self.motor_reglas.clasificar_proyecto(resultado_gis, datos_proyecto)
-
-        # 3. Generar alertas
-        logger.info("Generando alertas...")
-        alertas = self.sistema_alertas.generar_alertas(resultado_gis, datos_proyecto)
+        # 1-3. GIS, motor de reglas SEIA y alertas
+        resultado_gis, clasificacion, alertas, tiempo_gis = await self._evaluar(db, geojson, datos_proyecto)
         alertas_dict = [a.to_dict() for a in alertas]
 
         # 4. Buscar normativa relevante
@@ -171,19 +208,9 @@ class ServicioPrefactibilidad:
                     normativa_relevante=normativa_relevante,
                     secciones_a_generar=secciones_a_generar,
                 )
-                informe_dict = {
-                    "secciones": [
-                        {
-                            "seccion": s.seccion.value,
-                            "titulo": s.titulo,
-                            "contenido": s.contenido,
-                        }
-                        for s in informe.secciones
-                    ],
-                    "texto_completo": informe.to_texto_plano(),
-                }
-                # Estimar tokens (aproximado)
-                tokens_usados = len(informe.to_texto_plano()) // 4
+                informe_dict = _informe_a_dict(informe)
+                # Tokens reales reportados por el proveedor
+                tokens_usados = informe.tokens_totales
             except Exception as e:
                 logger.error(f"Error generando informe LLM: {e}")
                 informe_dict = {"error": str(e)}
@@ -253,6 +280,302 @@ class ServicioPrefactibilidad:
             tokens_usados=tokens_usados,
         )
 
+    async def ejecutar_analisis_stream(
+        self,
+        db: AsyncSession,
+        geojson: dict,
+        datos_proyecto: dict,
+        generar_informe: bool = True,
+        secciones: Optional[list[str]] = None,
+    ) -> AsyncIterator[EventoAnalisis]:
+        """
+        Ejecuta el análisis entregando cada parte apenas está lista.
+
+        GIS, clasificación y alertas (deterministas, ~1s) salen primero; luego
+        la normativa del RAG y cada sección LLM en el orden en que termina. El
+        último evento ('done') trae el mismo resultado que `ejecutar_analisis`,
+        sin checklist de componentes EIA.
+
+        Args:
+            db: Sesión de base de datos
+            geojson: Geometría del proyecto en formato GeoJSON
+            datos_proyecto: Diccionario con datos del proyecto
+            generar_informe: Si True, genera informe con LLM
+            secciones: Secciones específicas a generar (opcional)
+
+        Yields:
+            EventoAnalisis en orden: analisis, normativa, seccion*, done
+        """
+        inicio = time.time()
+        logger.info(f"Iniciando análisis progresivo de prefactibilidad: {datos_proyecto.get('nombre')}")
+
+        resultado_gis, clasificacion, alertas, tiempo_gis = await self._evaluar(db, geojson, datos_proyecto)
+        resultado = ResultadoAnalisis(
+            id=str(uuid.uuid4())[:8].upper(),
+            fecha_analisis=datetime.now().isoformat(),
+            datos_proyecto=datos_proyecto,
+            resultado_gis=resultado_gis,
+            clasificacion=clasificacion,
+            alertas=alertas,
+            alertas_dict=[a.to_dict() for a in alertas],
+            normativa_relevante=[],
+            tiempo_total_ms=int((time.time() - inicio) * 1000),
+            tiempo_gis_ms=tiempo_gis,
+        )
+        yield EventoAnalisis("analisis", resultado=resultado)
+
+        inicio_rag = time.time()
+        normativa_relevante = await self._buscar_normativa_contextual(db, clasificacion, alertas)
+        tiempo_rag = int((time.time() - inicio_rag) * 1000)
+        yield EventoAnalisis("normativa", normativa=normativa_relevante)
+
+        informe_dict = None
+        tiempo_llm = 0
+        tokens_usados = 0
+
+        if generar_informe:
+            inicio_llm = time.time()
+            secciones_a_generar = [SeccionInforme(s) for s in secciones] if secciones else None
+
+            # Las secciones llegan por la cola a medida que terminan; None marca el fin
+            cola: asyncio.Queue[Optional[SeccionGenerada]] = asyncio.Queue()
+            tarea = asyncio.create_task(self.generador.generar_informe(
+                datos_proyecto=datos_proyecto,
+                resultado_gis=resultado_gis,
+                normativa_relevante=normativa_relevante,
+                secciones_a_generar=secciones_a_generar,
+                al_completar_seccion=cola.put,
+            ))
+            tarea.add_done_callback(lambda _: cola.put_nowait(None))
+            try:
+                while (seccion := await cola.get()) is not None:
+                    yield EventoAnalisis("seccion", seccion=seccion)
+                informe = await tarea
+                informe_dict = _informe_a_dict(informe)
+                tokens_usados = informe.tokens_totales
+            except Exception as e:
+                logger.error(f"Error generando informe LLM: {e}")
+                informe_dict = {"error": str(e)}
+            finally:
+                # Cliente desconectado: no seguir pagando secciones que nadie leerá
+                if not tarea.done():
+                    tarea.cancel()
+
+            tiempo_llm = int((time.time() - inicio_llm) * 1000)
+
+        yield EventoAnalisis("done", resultado=replace(
+            resultado,
+            normativa_relevante=normativa_relevante,
+            informe=informe_dict,
+            tiempo_total_ms=int((time.time() - inicio) * 1000),
+            tiempo_rag_ms=tiempo_rag,
+            tiempo_llm_ms=tiempo_llm,
+            tokens_usados=tokens_usados,
+        ))
+
+    async def ejecutar_analisis_integrado(
+        self,
+        db: AsyncSession,
+        input_data: AnalisisIntegradoInput,
+    ) -> AnalisisIntegradoResponse:
+        """
+        Analiza un proyecto existente en BD y persiste el análisis con su auditoría.
+
+        Deja el análisis, la auditoría y el nuevo estado del proyecto en la
+        transacción de `db` sin confirmarla: el endpoint hace commit, y el
+        trabajo en segundo plano lo confirma junto con el cierre del
+        trabajo, de modo que reintentarlo nunca duplica el análisis.
+
+        Raises:
+            LookupError: Si el proyecto no existe
+            ValueError: Si el proyecto no se puede analizar o una sección es inválida
+        """
+        inicio_total = time.time()
+        logger.info(f"Iniciando analisis integrado para proyecto_id={input_data.proyecto_id}")
+
+        # 1. Cargar proyecto
+        result = await db.execute(
+            select(Proyecto).where(Proyecto.id == input_data.proyecto_id)
+        )
+        proyecto = result.scalar()
+
+        if not proyecto:
+            raise LookupError(f"Proyecto con id={input_data.proyecto_id} no encontrado")
+        if not proyecto.geom:
+            raise ValueError(
+                "El proyecto no tiene geometria definida. Dibuje un poligono antes de analizar."
+            )
+        if proyecto.estado == "archivado":
+            raise ValueError("No se puede analizar un proyecto archivado")
+
+        secciones_a_generar = None
+        if input_data.tipo == "completo" and input_data.secciones:
+            try:
+                secciones_a_generar = [SeccionInforme(s) for s in input_data.secciones]
+            except ValueError as e:
+                raise ValueError(f"Seccion invalida: {e}")
+
+        geojson = mapping(to_shape(proyecto.geom))
+
+        # 2. GIS, motor de reglas SEIA y alertas. Region y comuna se toman de
+        # la ubicacion detectada por el GIS, no de las manuales del proyecto.
+        logger.info("Ejecutando analisis GIS...")
+        inicio_gis = time.time()
+        resultado_gis = await analizar_proyecto_espacial(db, geojson)
+        tiempo_gis = int((time.time() - inicio_gis) * 1000)
+
+        datos_proyecto = construir_datos_proyecto(proyecto, resultado_gis.get("ubicacion"))
+        clasificacion = self.motor_reglas.clasificar_proyecto(resultado_gis, datos_proyecto)
+        alertas = self.sistema_alertas.generar_alertas(resultado_gis, datos_proyecto)
+        alertas_dict = [a.to_dict() for a in alertas]
+
+        # 3. Normativa relevante (RAG)
+        inicio_rag = time.time()
+        normativa_relevante = await self._buscar_normativa_contextual(db, clasificacion, alertas)
+        tiempo_rag = int((time.time() - inicio_rag) * 1000)
+
+        # 4. Informe con LLM (solo si tipo=completo)
+        informe_dict = None
+        tiempo_llm = 0
+        tokens_usados = 0
+
+        if input_data.tipo == "completo":
+            logger.info("Generando informe con LLM...")
+            inicio_llm = time.time()
+            try:
+                informe = await self.generador.generar_informe(
+                    datos_proyecto=datos_proyecto,
+                    resultado_gis=resultado_gis,
+                    normativa_relevante=normativa_relevante,
+                    secciones_a_generar=secciones_a_generar,
+                )
+                informe_dict = _informe_a_dict(informe)
+                # Tokens reales reportados por el proveedor
+                tokens_usados = informe.tokens_totales
+            except Exception as e:
+                logger.error(f"Error generando informe LLM: {e}")
+                # Continuar sin informe
+                informe_dict = {"error": str(e)}
+            tiempo_llm = int((time.time() - inicio_llm) * 1000)
+
+        tiempo_total = int((time.time() - inicio_total) * 1000)
+
+        # 5. Persistir analisis
+        modelo_llm = settings.LLM_MODEL
+        nuevo_analisis = Analisis(
+            proyecto_id=proyecto.id,
+            tipo_analisis=input_data.tipo,
+            resultado_gis=resultado_gis,
+            via_ingreso_recomendada=clasificacion.via_ingreso.value,
+            confianza_clasificacion=clasificacion.confianza,
+            triggers_eia=[
+                {
+                    "letra": t.letra.value,
+                    "descripcion": t.descripcion,
+                    "severidad": t.severidad.value,
+                    "peso": t.peso,
+                }
+                for t in clasificacion.triggers
+            ],
+            normativa_relevante=normativa_relevante[:20],
+            informe_texto=informe_dict.get("texto_completo") if informe_dict else None,
+            informe_json=informe_dict,
+            version_modelo=modelo_llm,
+            tiempo_procesamiento_ms=tiempo_total,
+            datos_extra={
+                "alertas": alertas_dict,
+                "metricas": {
+                    "tiempo_gis_ms": tiempo_gis,
+                    "tiempo_rag_ms": tiempo_rag,
+                    "tiempo_llm_ms": tiempo_llm,
+                }
+            }
+        )
+        db.add(nuevo_analisis)
+        await db.flush()  # Para obtener el ID
+
+        # 6. Registro de auditoria
+        completo = input_data.tipo == "completo"
+        auditoria = AuditoriaAnalisis(
+            analisis_id=nuevo_analisis.id,
+            capas_gis_usadas=extraer_capas_usadas(resultado_gis),
+            documentos_referenciados=[],
+            normativa_citada=extraer_normativa_citada(clasificacion.triggers, normativa_relevante),
+            checksum_datos_entrada=calcular_checksum(proyecto),
+            version_modelo_llm=modelo_llm if completo else None,
+            version_sistema="1.0.0",
+            tiempo_gis_ms=tiempo_gis,
+            tiempo_rag_ms=tiempo_rag,
+            tiempo_llm_ms=tiempo_llm if completo else None,
+            tokens_usados=tokens_usados if completo else None,
+        )
+        db.add(auditoria)
+
+        # 7. Estado del proyecto
+        estado_anterior = proyecto.estado
+        if proyecto.estado in ["con_geometria", "completo"]:
+            proyecto.estado = "analizado"
+            logger.info(f"Estado del proyecto actualizado: {estado_anterior} -> analizado")
+
+        await db.flush()
+        await db.refresh(nuevo_analisis)
+        await db.refresh(auditoria)
+
+        logger.info(
+            f"Analisis integrado completado: analisis_id={nuevo_analisis.id}, "
+            f"auditoria_id={auditoria.id}, tiempo={tiempo_total}ms"
+        )
+
+        return AnalisisIntegradoResponse(
+            analisis_id=nuevo_analisis.id,
+            auditoria_id=auditoria.id,
+            proyecto_id=proyecto.id,
+            fecha_analisis=nuevo_analisis.fecha_analisis,
+            tipo_analisis=input_data.tipo,
+            via_ingreso_recomendada=clasificacion.via_ingreso.value,
+            confianza=clasificacion.confianza,
+            nivel_confianza=clasificacion.nivel_confianza.value,
+            justificacion=clasificacion.justificacion,
+            triggers_detectados=len(clasificacion.triggers),
+            alertas_criticas=sum(1 for a in alertas_dict if a["nivel"] == "CRITICA"),
+            alertas_altas=sum(1 for a in alertas_dict if a["nivel"] == "ALTA"),
+            alertas_totales=len(alertas),
+            estado_proyecto=proyecto.estado,
+            metricas=MetricasEjecucion(
+                tiempo_gis_ms=tiempo_gis,
+                tiempo_rag_ms=tiempo_rag,
+                tiempo_llm_ms=tiempo_llm,
+                tiempo_total_ms=tiempo_total,
+                tokens_usados=tokens_usados,
+            ),
+            informe=informe_dict,
+        )
+
+    async def _evaluar(
+        self,
+        db: AsyncSession,
+        geojson: dict,
+        datos_proyecto: dict,
+    ) -> tuple[dict, ClasificacionSEIA, list, int]:
+        """
+        Parte determinista del análisis: GIS, motor de reglas SEIA y alertas.
+
+        Returns:
+            Tupla (resultado_gis, clasificacion, alertas, tiempo_gis_ms)
+        """
+        logger.info("Ejecutando análisis GIS...")
+        inicio_gis = time.time()
+        resultado_gis = await analizar_proyecto_espacial(db, geojson)
+        tiempo_gis = int((time.time() - inicio_gis) * 1000)
+
+        logger.info("Ejecutando motor de reglas SEIA...")
+        clasificacion = self.motor_reglas.clasificar_proyecto(resultado_gis, datos_proyecto)
+
+        logger.info("Generando alertas...")
+        alertas = self.sistema_alertas.generar_alertas(resultado_gis, datos_proyecto)
+
+        return resultado_gis, clasificacion, alertas, tiempo_gis
+
     async def _buscar_normativa_contextual(
         self,
         db: AsyncSession,
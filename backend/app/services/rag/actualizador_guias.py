@@ -20,7 +20,8 @@ from bs4 import BeautifulSoup
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 
-from app.services.rag.embeddings import get_embedding_service
+from app.services.rag.embeddings import get_embedding_service, vector_sql
+from app.services.rag.segmentador import get_segmentador
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
@@ -309,14 +310,9 @@ class ActualizadorGuiasSEA:
     def extraer_texto_pdf(self, ruta_pdf: Path) -> str:
         """Extrae texto de un PDF."""
         try:
-            import fitz  # PyMuPDF
+            from app.services.pdf import iterar_paginas
 
-            texto = ""
-            with fitz.open(str(ruta_pdf)) as doc:
-                for pagina in doc:
-                    texto += pagina.get_text()
-
-            return texto.strip()
+            return "".join(p.texto for p in iterar_paginas(str(ruta_pdf))).strip()
         except Exception as e:
             logger.error(f"Error extrayendo texto de {ruta_pdf}: {e}")
             return ""
@@ -444,13 +440,13 @@ class ActualizadorGuiasSEA:
             embeddings = self.embedding_service.embed_texts(textos)
 
             for frag, embedding in zip(fragmentos, embeddings):
-                embedding_str = "[" + ",".join(str(v) for v in embedding) + "]"
+                embedding_sql = vector_sql(embedding)
 
                 await db.execute(
                     text(f"""
                         INSERT INTO legal.fragmentos
                         (documento_id, seccion, numero_seccion, contenido, temas, embedding)
-                        VALUES (:doc_id, :seccion, :num, :contenido, :temas, '{embedding_str}'::vector)
+                        VALUES (:doc_id, :seccion, :num, :contenido, :temas, {embedding_sql})
                     """),
                     {
                         "doc_id": documento_id,
@@ -511,43 +507,16 @@ class ActualizadorGuiasSEA:
 
         return componentes
 
-    def _segmentar_texto(self, contenido: str, max_chars: int = 1500) -> List[Dict]:
-        """Segmenta texto en fragmentos."""
-        fragmentos = []
-
-        # Dividir por chunks
-        chunks = self._dividir_en_chunks(contenido, max_chars)
-        for i, chunk in enumerate(chunks):
-            if len(chunk) >= 100:
-                fragmentos.append({
-                    'seccion': f'Sección {i+1}',
-                    'numero': str(i+1),
-                    'contenido': chunk,
-                })
-
-        return fragmentos
-
-    def _dividir_en_chunks(self, texto: str, max_chars: int = 1500) -> List[str]:
-        """Divide texto en chunks respetando oraciones."""
-        if len(texto) <= max_chars:
-            return [texto]
-
-        chunks = []
-        oraciones = re.split(r'(?<=[.!?])\s+', texto)
-        chunk_actual = ""
-
-        for oracion in oraciones:
-            if len(chunk_actual) + len(oracion) + 1 <= max_chars:
-                chunk_actual += (" " if chunk_actual else "") + oracion
-            else:
-                if chunk_actual:
-                    chunks.append(chunk_actual)
-                chunk_actual = oracion
-
-        if chunk_actual:
-            chunks.append(chunk_actual)
-
-        return chunks
+    def _segmentar_texto(self, contenido: str) -> List[Dict]:
+        """Segmenta texto en fragmentos (ver SegmentadorLegal)."""
+        return [
+            {
+                'seccion': s.seccion,
+                'numero': s.numero_seccion,
+                'contenido': s.contenido,
+            }
+            for s in get_segmentador().segmentar(contenido)
+        ]
 
     async def actualizar(self, db: AsyncSession) -> ResultadoActualizacion:
         """
@@ -9,7 +9,8 @@ from dataclasses import dataclass
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 
-from app.services.rag.embeddings import get_embedding_service
+from app.services.rag.cache_busqueda import get_cache_busqueda, obtener_version_corpus
+from app.services.rag.embeddings import get_embedding_service, vector_sql
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
@@ -59,11 +60,23 @@ class BuscadorLegal:
         """
         logger.info(f"Búsqueda semántica: '{query[:50]}...' (limite={limite}, tipo={filtro_tipo})")
 
+        cache = get_cache_busqueda() if settings.RAG_CACHE_HABILITADO else None
+        if cache is not None:
+            version = await obtener_version_corpus(db)
+            clave = cache.clave(
+                "buscador", query,
+                limite=limite, tipo=filtro_tipo, temas=filtro_temas, umbral=umbral_similitud,
+            )
+            cacheados = cache.obtener(clave, version)
+            if cacheados is not None:
+                logger.info(f"Búsqueda resuelta desde caché: {len(cacheados)} resultados")
+                return list(cacheados)
+
         # Generar embedding de la query
         query_embedding = self.embedding_service.embed_text(query)
 
-        # Convertir embedding a formato string para pgvector
-        embedding_str = '[' + ','.join(str(x) for x in query_embedding) + ']'
+        # Literal del embedding con el tipo de la columna (vector o halfvec)
+        embedding_sql = vector_sql(query_embedding)
 
         # Construir query SQL
         sql = f"""
@@ -75,7 +88,7 @@ class BuscadorLegal:
                 f.seccion,
                 f.contenido,
                 f.temas,
-                1 - (f.embedding <=> '{embedding_str}'::vector) as similitud
+                1 - (f.embedding <=> {embedding_sql}) as similitud
             FROM legal.fragmentos f
             JOIN legal.documentos d ON f.documento_id = d.id
             WHERE d.estado = 'vigente'
@@ -92,7 +105,7 @@ class BuscadorLegal:
             params["temas"] = filtro_temas
 
         sql += f"""
-            ORDER BY f.embedding <=> '{embedding_str}'::vector
+            ORDER BY f.embedding <=> {embedding_sql}
             LIMIT :limite
         """
 
@@ -113,6 +126,9 @@ class BuscadorLegal:
                     similitud=round(row.similitud, 4),
                 ))
 
+        if cache is not None:
+            cache.guardar(clave, version, tuple(resultados))
+
         logger.info(f"Búsqueda completada: {len(resultados)} resultados encontrados")
         return resultados
 
@@ -0,0 +1,145 @@
+"""
+Caché de resultados de búsqueda semántica sellada con la versión del corpus.
+
+Cada entrada guarda la versión de legal.corpus_version vigente al momento
+de la búsqueda (migración 013). Al leerla se compara con la versión
+actual: si el corpus cambió, la entrada se descarta, por lo que la caché
+nunca entrega normativa desactualizada. La versión se lee antes de ejecutar
+la búsqueda, así un cambio confirmado a mitad de ella solo puede dejar la
+entrada con una versión más antigua (y por lo tanto invalidada), nunca al
+revés.
+
+La caché es local a cada proceso, con TTL por entrada y desalojo LRU al
+superar el máximo de entradas.
+"""
+
+import logging
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+async def obtener_version_corpus(db: AsyncSession) -> int:
+    """Versión actual del corpus legal."""
+    result = await db.execute(text("SELECT version FROM legal.corpus_version WHERE id"))
+    return int(result.scalar() or 0)
+
+
+def normalizar_query(query: str) -> str:
+    """Normaliza una consulta para usarla como clave (mayúsculas, espacios, Unicode)."""
+    return " ".join(unicodedata.normalize("NFC", query).lower().split())
+
+
+@dataclass
+class _Entrada:
+    valor: Any
+    version: int
+    expira_en: float
+
+
+class CacheBusqueda:
+    """Caché LRU con TTL de resultados de búsqueda, invalidada por versión del corpus."""
+
+    def __init__(
+        self,
+        max_entradas: Optional[int] = None,
+        ttl_segundos: Optional[float] = None,
+    ):
+        self.max_entradas = max_entradas or settings.RAG_CACHE_MAX_ENTRADAS
+        self.ttl_segundos = ttl_segundos or settings.RAG_CACHE_TTL_SEGUNDOS
+        self._entradas: "OrderedDict[Tuple, _Entrada]" = OrderedDict()
+        self._metricas = {
+            "aciertos": 0,
+            "fallos": 0,
+            "expiradas": 0,
+            "invalidadas": 0,
+            "desalojadas": 0,
+        }
+
+    @staticmethod
+    def clave(espacio: str, query: str, **filtros: Hashable) -> Tuple:
+        """
+        Construye la clave de una búsqueda.
+
+        Args:
+            espacio: Origen de la búsqueda (p. ej. "buscador", "asistente"),
+                para no mezclar resultados con formatos distintos
+            query: Consulta en lenguaje natural
+            **filtros: Filtros y límite; las listas se ordenan
+        """
+        normalizados = tuple(sorted(
+            (nombre, tuple(sorted(valor)) if isinstance(valor, (list, tuple, set)) else valor)
+            for nombre, valor in filtros.items()
+        ))
+        return (espacio, normalizar_query(query), normalizados)
+
+    def obtener(self, clave: Tuple, version: int) -> Optional[Any]:
+        """Valor cacheado para la clave si sigue vigente en esta versión del corpus."""
+        entrada = self._entradas.get(clave)
+        if entrada is None:
+            self._metricas["fallos"] += 1
+            return None
+
+        if entrada.version != version:
+            motivo = "invalidadas"
+        elif entrada.expira_en <= time.monotonic():
+            motivo = "expiradas"
+        else:
+            self._entradas.move_to_end(clave)
+            self._metricas["aciertos"] += 1
+            return entrada.valor
+
+        del self._entradas[clave]
+        self._metricas[motivo] += 1
+        self._metricas["fallos"] += 1
+        return None
+
+    def guardar(self, clave: Tuple, version: int, valor: Any):
+        """Guarda un resultado sellado con la versión del corpus usada."""
+        self._entradas[clave] = _Entrada(
+            valor=valor,
+            version=version,
+            expira_en=time.monotonic() + self.ttl_segundos,
+        )
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+            self._metricas["desalojadas"] += 1
+
+    def limpiar(self):
+        """Elimina todas las entradas y reinicia las métricas."""
+        self._entradas.clear()
+        for nombre in self._metricas:
+            self._metricas[nombre] = 0
+
+    def metricas(self) -> Dict[str, Any]:
+        """Contadores de uso y tasa de aciertos."""
+        consultas = self._metricas["aciertos"] + self._metricas["fallos"]
+        return {
+            **self._metricas,
+            "consultas": consultas,
+            "tasa_aciertos": round(self._metricas["aciertos"] / consultas, 4) if consultas else 0.0,
+            "entradas": len(self._entradas),
+            "max_entradas": self.max_entradas,
+            "ttl_segundos": self.ttl_segundos,
+        }
+
+
+_cache_busqueda: Optional[CacheBusqueda] = None
+
+
+def get_cache_busqueda() -> CacheBusqueda:
+    """Obtiene la instancia singleton de la caché de búsqueda."""
+    global _cache_busqueda
+    if _cache_busqueda is None:
+        _cache_busqueda = CacheBusqueda()
+    return _cache_busqueda
@@ -71,6 +71,22 @@ class EmbeddingService:
         return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
 
 
+def vector_sql(embedding: List[float]) -> str:
+    """
+    Literal SQL de un embedding con el tipo de almacenamiento configurado.
+
+    El vector de la consulta debe tener el mismo tipo que la columna
+    (vector o halfvec) para que pgvector use el índice.
+
+    Args:
+        embedding: Embedding generado por el servicio
+
+    Returns:
+        Expresión SQL, p. ej. '[0.1,0.2]'::halfvec
+    """
+    return "'[" + ",".join(str(v) for v in embedding) + "]'::" + settings.EMBEDDING_ALMACENAMIENTO
+
+
 @lru_cache()
 def get_embedding_service() -> EmbeddingService:
     """Singleton del servicio de embeddings."""
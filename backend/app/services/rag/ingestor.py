@@ -5,9 +5,9 @@ Procesa PDFs y textos, los segmenta, clasifica con LLM y genera embeddings.
 Integrado con el sistema de gestión documental (categorías, temas, colecciones).
 """
 
+import asyncio
 import logging
-import re
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass, field
 from datetime import date, datetime
 
@@ -15,7 +15,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text, select
 from sqlalchemy.orm import selectinload
 
-from app.services.rag.embeddings import get_embedding_service
+from app.services.rag.embeddings import get_embedding_service, vector_sql
+from app.services.rag.segmentador import get_segmentador
 from app.services.llm.clasificador import get_clasificador_llm, ClasificadorLLM
 from app.db.models.legal import Documento, Fragmento
 from app.db.models.corpus import Categoria, Tema, ArchivoOriginal, FragmentoTema
@@ -169,90 +170,22 @@ class IngestorLegal:
         """
         Segmenta un documento legal en fragmentos indexables.
 
-        Estrategia:
+        Estrategia (ver SegmentadorLegal):
         - Detectar artículos como unidad principal
-        - Si un artículo es muy largo, subdividir por oraciones
+        - Si un artículo excede RAG_FRAGMENTO_MAX_TOKENS, subdividir por oraciones
         - Mantener contexto (título/párrafo actual)
 
         Args:
             contenido: Contenido completo del documento
 
         Returns:
-            Lista de fragmentos con seccion, numero y contenido
+            Lista de fragmentos con seccion, numero_seccion, contenido,
+            titulo y parrafo
         """
-        fragmentos = []
-
-        # Buscar artículos
-        patron_articulo = r'(?:Artículo|ARTÍCULO|Art\.?)\s+(\d+)[°º]?[.\s-]*(.*?)(?=(?:Artículo|ARTÍCULO|Art\.?)\s+\d+|$)'
-        articulos = re.findall(patron_articulo, contenido, re.DOTALL | re.IGNORECASE)
-
-        for num_art, texto_art in articulos:
-            texto_limpio = self._limpiar_texto(texto_art)
-
-            if len(texto_limpio) < 50:  # Artículo muy corto, saltar
-                continue
-
-            # Si el artículo es muy largo, dividir en chunks
-            if len(texto_limpio) > 2000:
-                chunks = self._dividir_en_chunks(texto_limpio, max_chars=1500)
-                for i, chunk in enumerate(chunks):
-                    fragmentos.append({
-                        "seccion": f"Artículo {num_art}" + (f" (parte {i+1})" if len(chunks) > 1 else ""),
-                        "numero_seccion": num_art,
-                        "contenido": chunk,
-                    })
-            else:
-                fragmentos.append({
-                    "seccion": f"Artículo {num_art}",
-                    "numero_seccion": num_art,
-                    "contenido": texto_limpio,
-                })
-
-        # Si no se encontraron artículos, dividir por párrafos/chunks
-        if not fragmentos:
-            chunks = self._dividir_en_chunks(contenido, max_chars=1500)
-            for i, chunk in enumerate(chunks):
-                fragmentos.append({
-                    "seccion": f"Sección {i+1}",
-                    "numero_seccion": str(i+1),
-                    "contenido": chunk,
-                })
-
+        fragmentos = [s.to_dict() for s in get_segmentador().segmentar(contenido)]
         logger.debug(f"Documento segmentado en {len(fragmentos)} fragmentos")
         return fragmentos
 
-    def _limpiar_texto(self, texto: str) -> str:
-        """Limpia y normaliza texto."""
-        # Eliminar saltos de línea múltiples
-        texto = re.sub(r'\n{3,}', '\n\n', texto)
-        # Eliminar espacios múltiples
-        texto = re.sub(r' {2,}', ' ', texto)
-        # Eliminar caracteres de control
-        texto = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]', '', texto)
-        return texto.strip()
-
-    def _dividir_en_chunks(self, texto: str, max_chars: int = 1500) -> List[str]:
-        """Divide texto largo en chunks respetando oraciones."""
-        if len(texto) <= max_chars:
-            return [texto]
-
-        chunks = []
-        oraciones = re.split(r'(?<=[.!?])\s+', texto)
-        chunk_actual = ""
-
-        for oracion in oraciones:
-            if len(chunk_actual) + len(oracion) + 1 <= max_chars:
-                chunk_actual += (" " if chunk_actual else "") + oracion
-            else:
-                if chunk_actual:
-                    chunks.append(chunk_actual)
-                chunk_actual = oracion
-
-        if chunk_actual:
-            chunks.append(chunk_actual)
-
-        return chunks
-
     async def _clasificar_fragmentos_con_llm(
         self,
         db: AsyncSession,
@@ -261,6 +194,10 @@ class IngestorLegal:
         """
         Clasifica fragmentos usando LLM.
 
+        Los fragmentos se envían en paquetes concurrentes (ver
+        ClasificadorLLM.clasificar_fragmentos_lote). Los que el LLM no logra
+        clasificar caen, uno a uno, a la detección por keywords.
+
         Args:
             db: Sesión de base de datos
             fragmentos: Lista de fragmentos a clasificar
@@ -271,15 +208,19 @@ class IngestorLegal:
         if not self.clasificador:
             self.clasificador = get_clasificador_llm()
 
-        resultados = []
+        try:
+            clasificaciones = await self.clasificador.clasificar_fragmentos_lote(
+                db=db,
+                textos=[frag["contenido"] for frag in fragmentos]
+            )
+        except Exception as e:
+            logger.warning(f"Error clasificando fragmentos con LLM: {e}, usando fallback")
+            clasificaciones = [None] * len(fragmentos)
 
-        for frag in fragmentos:
-            try:
-                clasificacion = await self.clasificador.clasificar_fragmento(
-                    db=db,
-                    texto=frag["contenido"]
-                )
+        resultados = []
 
+        for frag, clasificacion in zip(fragmentos, clasificaciones):
+            if clasificacion is not None:
                 resultados.append(FragmentoIngestado(
                     seccion=frag["seccion"],
                     numero_seccion=frag["numero_seccion"],
@@ -289,22 +230,21 @@ class IngestorLegal:
                     triggers_art11=clasificacion.triggers_art11,
                     componentes=clasificacion.componentes_ambientales,
                 ))
+                continue
 
-            except Exception as e:
-                logger.warning(f"Error clasificando fragmento con LLM: {e}, usando fallback")
-                # Fallback a keywords
-                temas = await self._cargar_temas(db)
-                temas_detectados = self._detectar_temas_por_keywords(frag["contenido"], temas)
+            # Fallback a keywords
+            temas = await self._cargar_temas(db)
+            temas_detectados = self._detectar_temas_por_keywords(frag["contenido"], temas)
 
-                resultados.append(FragmentoIngestado(
-                    seccion=frag["seccion"],
-                    numero_seccion=frag["numero_seccion"],
-                    contenido=frag["contenido"],
-                    temas_codigos=[t["codigo"] for t in temas_detectados],
-                    temas_confianza={t["codigo"]: t["confianza"] for t in temas_detectados},
-                    triggers_art11=[],
-                    componentes=[],
-                ))
+            resultados.append(FragmentoIngestado(
+                seccion=frag["seccion"],
+                numero_seccion=frag["numero_seccion"],
+                contenido=frag["contenido"],
+                temas_codigos=[t["codigo"] for t in temas_detectados],
+                temas_confianza={t["codigo"]: t["confianza"] for t in temas_detectados},
+                triggers_art11=[],
+                componentes=[],
+            ))
 
         return resultados
 
@@ -351,52 +291,163 @@ class IngestorLegal:
         """
         import time
         inicio = time.time()
-        errores = []
 
         usar_llm = clasificar_con_llm if clasificar_con_llm is not None else self.usar_llm
         logger.info(f"Iniciando ingestión: {documento.titulo} (LLM={usar_llm})")
 
         # 1. Clasificar documento completo con LLM si está habilitado
+        categoria_asignada, errores = await self.clasificar_metadatos_documento(
+            db, documento, usar_llm
+        )
+
+        # 2. Segmentar y clasificar fragmentos
+        fragmentos = await self.clasificar_fragmentos_documento(
+            db, documento.contenido, usar_llm
+        )
+
+        # 3. Insertar documento, fragmentos y relaciones con temas
+        indexado = await self.indexar_documento(db, documento, fragmentos, usar_llm)
+
+        await db.commit()
+
+        tiempo_ms = int((time.time() - inicio) * 1000)
+        logger.info(f"Ingestión completada: {len(fragmentos)} fragmentos, "
+                   f"{len(indexado['temas'])} temas, {tiempo_ms}ms")
+
+        return ResultadoIngestion(
+            documento_id=indexado["documento_id"],
+            titulo=documento.titulo,
+            fragmentos_creados=len(fragmentos),
+            temas_detectados=indexado["temas"],
+            triggers_detectados=indexado["triggers"],
+            componentes_detectados=indexado["componentes"],
+            categoria_asignada=categoria_asignada,
+            clasificacion_llm_usada=usar_llm,
+            tiempo_procesamiento_ms=tiempo_ms,
+            errores=errores,
+        )
+
+    async def clasificar_metadatos_documento(
+        self,
+        db: AsyncSession,
+        documento: DocumentoAIngestar,
+        usar_llm: bool,
+    ) -> Tuple[Optional[str], List[str]]:
+        """
+        Clasifica el documento completo con LLM y completa sus metadatos.
+
+        Sólo actúa si usar_llm es True y el documento no trae categoría.
+        Modifica `documento` en el lugar (categoría, sectores, triggers,
+        componentes y etapa), sin escribir en la base de datos.
+
+        Args:
+            db: Sesión de base de datos
+            documento: Documento a clasificar
+            usar_llm: Si usar LLM para la clasificación
+
+        Returns:
+            Tupla (codigo de categoría asignada, errores)
+        """
         categoria_asignada = None
-        if usar_llm and documento.categoria_id is None:
-            try:
-                if not self.clasificador:
-                    self.clasificador = get_clasificador_llm()
+        errores: List[str] = []
 
-                clasif_doc = await self.clasificador.clasificar_documento(
-                    db=db,
-                    titulo=documento.titulo,
-                    tipo=documento.tipo,
-                    contenido=documento.contenido
+        if not usar_llm or documento.categoria_id is not None:
+            return categoria_asignada, errores
+
+        try:
+            if not self.clasificador:
+                self.clasificador = get_clasificador_llm()
+
+            clasif_doc = await self.clasificador.clasificar_documento(
+                db=db,
+                titulo=documento.titulo,
+                tipo=documento.tipo,
+                contenido=documento.contenido
+            )
+
+            # Buscar ID de categoría sugerida
+            if clasif_doc.categoria_sugerida:
+                result = await db.execute(
+                    text("SELECT id FROM legal.categorias WHERE codigo = :codigo"),
+                    {"codigo": clasif_doc.categoria_sugerida}
                 )
+                cat_row = result.fetchone()
+                if cat_row:
+                    documento.categoria_id = cat_row[0]
+                    categoria_asignada = clasif_doc.categoria_sugerida
+
+            # Actualizar metadatos del documento si no están definidos
+            if not documento.sectores and clasif_doc.sectores:
+                documento.sectores = clasif_doc.sectores
+            if not documento.triggers_art11 and clasif_doc.triggers_art11:
+                documento.triggers_art11 = clasif_doc.triggers_art11
+            if not documento.componentes_ambientales and clasif_doc.componentes_ambientales:
+                documento.componentes_ambientales = clasif_doc.componentes_ambientales
+            if not documento.etapa_proceso and clasif_doc.etapa_proceso:
+                documento.etapa_proceso = clasif_doc.etapa_proceso
+
+            logger.debug(f"Clasificación documento: categoria={categoria_asignada}, "
+                       f"sectores={documento.sectores}, triggers={documento.triggers_art11}")
+
+        except Exception as e:
+            logger.warning(f"Error en clasificación LLM de documento: {e}")
+            errores.append(f"Clasificación documento: {str(e)}")
+
+        return categoria_asignada, errores
+
+    async def clasificar_fragmentos_documento(
+        self,
+        db: AsyncSession,
+        contenido: str,
+        usar_llm: bool,
+    ) -> List[FragmentoIngestado]:
+        """
+        Segmenta el contenido y clasifica cada fragmento (LLM o keywords).
 
-                # Buscar ID de categoría sugerida
-                if clasif_doc.categoria_sugerida:
-                    result = await db.execute(
-                        text("SELECT id FROM legal.categorias WHERE codigo = :codigo"),
-                        {"codigo": clasif_doc.categoria_sugerida}
-                    )
-                    cat_row = result.fetchone()
-                    if cat_row:
-                        documento.categoria_id = cat_row[0]
-                        categoria_asignada = clasif_doc.categoria_sugerida
-
-                # Actualizar metadatos del documento si no están definidos
-                if not documento.sectores and clasif_doc.sectores:
-                    documento.sectores = clasif_doc.sectores
-                if not documento.triggers_art11 and clasif_doc.triggers_art11:
-                    documento.triggers_art11 = clasif_doc.triggers_art11
-                if not documento.componentes_ambientales and clasif_doc.componentes_ambientales:
-                    documento.componentes_ambientales = clasif_doc.componentes_ambientales
-                if not documento.etapa_proceso and clasif_doc.etapa_proceso:
-                    documento.etapa_proceso = clasif_doc.etapa_proceso
-
-                logger.debug(f"Clasificación documento: categoria={categoria_asignada}, "
-                           f"sectores={documento.sectores}, triggers={documento.triggers_art11}")
-
-            except Exception as e:
-                logger.warning(f"Error en clasificación LLM de documento: {e}")
-                errores.append(f"Clasificación documento: {str(e)}")
+        Args:
+            db: Sesión de base de datos
+            contenido: Contenido completo del documento
+            usar_llm: Si usar LLM para clasificar fragmentos
+
+        Returns:
+            Lista de FragmentoIngestado clasificados
+        """
+        fragmentos_raw = self.segmentar_documento(contenido)
+        logger.info(f"Documento segmentado en {len(fragmentos_raw)} fragmentos")
+
+        if usar_llm:
+            return await self._clasificar_fragmentos_con_llm(db, fragmentos_raw)
+        return await self._clasificar_fragmentos_por_keywords(db, fragmentos_raw)
+
+    async def indexar_documento(
+        self,
+        db: AsyncSession,
+        documento: DocumentoAIngestar,
+        fragmentos: List[FragmentoIngestado],
+        usar_llm: bool,
+    ) -> Dict[str, Any]:
+        """
+        Inserta el documento y sus fragmentos con embeddings y temas.
+
+        No hace commit: el llamador decide el límite de la transacción, lo
+        que permite confirmar la indexación junto con otros cambios.
+
+        Args:
+            db: Sesión de base de datos
+            documento: Documento ya clasificado
+            fragmentos: Fragmentos clasificados
+            usar_llm: Si la clasificación de fragmentos se hizo con LLM
+
+        Returns:
+            Diccionario con documento_id y temas/triggers/componentes detectados
+        """
+        # 1. Generar embeddings en batch antes de escribir: el cálculo es
+        # síncrono y pesado, va en un hilo para no detener el event loop (los
+        # latidos de los demás trabajos del worker) y fuera de la transacción,
+        # que desde el INSERT del documento retiene legal.corpus_version.
+        textos = [f.contenido for f in fragmentos]
+        logger.debug(f"Generando embeddings para {len(textos)} fragmentos...")
+        embeddings = await asyncio.to_thread(self.embedding_service.embed_texts, textos)
 
         # 2. Insertar documento en BD
         result = await db.execute(
@@ -429,39 +480,24 @@ class IngestorLegal:
         documento_id = result.scalar()
         logger.debug(f"Documento insertado con ID: {documento_id}")
 
-        # 3. Segmentar documento
-        fragmentos_raw = self.segmentar_documento(documento.contenido)
-        logger.info(f"Documento segmentado en {len(fragmentos_raw)} fragmentos")
-
-        # 4. Clasificar fragmentos
-        if usar_llm:
-            fragmentos = await self._clasificar_fragmentos_con_llm(db, fragmentos_raw)
-        else:
-            fragmentos = await self._clasificar_fragmentos_por_keywords(db, fragmentos_raw)
-
-        # 5. Generar embeddings en batch
-        textos = [f.contenido for f in fragmentos]
-        logger.debug(f"Generando embeddings para {len(textos)} fragmentos...")
-        embeddings = self.embedding_service.embed_texts(textos)
-
-        # 6. Cargar mapeo de temas para insertar relaciones
+        # 3. Cargar mapeo de temas para insertar relaciones
         temas_map = await self._cargar_temas(db)
 
-        # 7. Insertar fragmentos y crear relaciones con temas
+        # 4. Insertar fragmentos y crear relaciones con temas
         todos_temas = set()
         todos_triggers = set()
         todos_componentes = set()
 
         for fragmento, embedding in zip(fragmentos, embeddings):
-            # Convertir embedding a formato string para pgvector
-            embedding_str = "[" + ",".join(str(v) for v in embedding) + "]"
+            # Literal del embedding con el tipo de la columna (vector o halfvec)
+            embedding_sql = vector_sql(embedding)
 
             # Insertar fragmento
             result = await db.execute(
                 text(f"""
                     INSERT INTO legal.fragmentos
                     (documento_id, seccion, numero_seccion, contenido, temas, embedding)
-                    VALUES (:doc_id, :seccion, :num, :contenido, :temas, '{embedding_str}'::vector)
+                    VALUES (:doc_id, :seccion, :num, :contenido, :temas, {embedding_sql})
                     RETURNING id
                 """),
                 {
@@ -502,7 +538,7 @@ class IngestorLegal:
             todos_triggers.update(fragmento.triggers_art11)
             todos_componentes.update(fragmento.componentes)
 
-        # 8. Actualizar triggers y componentes del documento si se detectaron nuevos
+        # 5. Actualizar triggers y componentes del documento si se detectaron nuevos
         if todos_triggers or todos_componentes:
             triggers_actualizados = list(set(documento.triggers_art11 or []) | todos_triggers)
             componentes_actualizados = list(set(documento.componentes_ambientales or []) | todos_componentes)
@@ -521,24 +557,12 @@ class IngestorLegal:
                 }
             )
 
-        await db.commit()
-
-        tiempo_ms = int((time.time() - inicio) * 1000)
-        logger.info(f"Ingestión completada: {len(fragmentos)} fragmentos, "
-                   f"{len(todos_temas)} temas, {tiempo_ms}ms")
-
-        return ResultadoIngestion(
-            documento_id=documento_id,
-            titulo=documento.titulo,
-            fragmentos_creados=len(fragmentos),
-            temas_detectados=list(todos_temas),
-            triggers_detectados=list(todos_triggers),
-            componentes_detectados=list(todos_componentes),
-            categoria_asignada=categoria_asignada,
-            clasificacion_llm_usada=usar_llm,
-            tiempo_procesamiento_ms=tiempo_ms,
-            errores=errores,
-        )
+        return {
+            "documento_id": documento_id,
+            "temas": list(todos_temas),
+            "triggers": list(todos_triggers),
+            "componentes": list(todos_componentes),
+        }
 
     async def procesar_documento_existente(
         self,
@@ -603,10 +627,10 @@ class IngestorLegal:
         else:
             fragmentos = await self._clasificar_fragmentos_por_keywords(db, fragmentos_raw)
 
-        # 4. Generar embeddings en batch
+        # 4. Generar embeddings en batch (síncrono: en un hilo, fuera del event loop)
         textos = [f.contenido for f in fragmentos]
         logger.debug(f"Generando embeddings para {len(textos)} fragmentos...")
-        embeddings = self.embedding_service.embed_texts(textos)
+        embeddings = await asyncio.to_thread(self.embedding_service.embed_texts, textos)
 
         # 5. Cargar mapeo de temas
         temas_map = await self._cargar_temas(db)
@@ -617,15 +641,15 @@ class IngestorLegal:
         todos_componentes = set()
 
         for fragmento, embedding in zip(fragmentos, embeddings):
-            # Convertir embedding a formato string para pgvector
-            embedding_str = "[" + ",".join(str(v) for v in embedding) + "]"
+            # Literal del embedding con el tipo de la columna (vector o halfvec)
+            embedding_sql = vector_sql(embedding)
 
             # Insertar fragmento
             result = await db.execute(
                 text(f"""
                     INSERT INTO legal.fragmentos
                     (documento_id, seccion, numero_seccion, contenido, temas, embedding)
-                    VALUES (:doc_id, :seccion, :num, :contenido, :temas, '{embedding_str}'::vector)
+                    VALUES (:doc_id, :seccion, :num, :contenido, :temas, {embedding_sql})
                     RETURNING id
                 """),
                 {
@@ -797,12 +821,12 @@ class IngestorLegal:
             # Regenerar embedding
             if regenerar_embeddings:
                 embedding = self.embedding_service.embed_text(contenido)
-                embedding_str = "[" + ",".join(str(v) for v in embedding) + "]"
+                embedding_sql = vector_sql(embedding)
 
                 await db.execute(
                     text(f"""
                         UPDATE legal.fragmentos
-                        SET embedding = '{embedding_str}'::vector
+                        SET embedding = {embedding_sql}
                         WHERE id = :frag_id
                     """),
                     {"frag_id": frag_id}
@@ -826,13 +850,82 @@ class IngestorLegal:
             self.clasificador.invalidar_cache()
 
 
+def _extraer_capa_texto(ruta_pdf: str, usar_ocr_vision: bool) -> Tuple[Dict[int, str], List[int]]:
+    """
+    Extrae la capa de texto del PDF y decide qué páginas pasan por OCR.
+
+    Returns:
+        Tupla (texto por número de página, páginas a procesar con OCR)
+    """
+    from app.services.pdf import iterar_paginas
+
+    textos: Dict[int, str] = {}
+    sin_texto: List[int] = []
+    escaneadas: List[int] = []
+    for pagina in iterar_paginas(ruta_pdf):
+        textos[pagina.numero] = pagina.texto
+        if pagina.sin_texto:
+            sin_texto.append(pagina.numero)
+        if pagina.requiere_ocr:
+            escaneadas.append(pagina.numero)
+
+    chars_extraidos = len("".join(textos.values()).strip())
+    logger.info(
+        f"PyMuPDF extrajo {chars_extraidos} caracteres de {len(textos)} páginas "
+        f"({len(sin_texto)} sin texto)"
+    )
+
+    umbral = settings.OCR_MIN_TEXT_THRESHOLD
+    paginas_ocr = sin_texto if chars_extraidos < umbral else escaneadas
+    if not paginas_ocr:
+        return textos, []
+
+    if not (settings.OCR_VISION_ENABLED and usar_ocr_vision):
+        if chars_extraidos < umbral:
+            logger.warning(
+                f"Texto insuficiente ({chars_extraidos} < {umbral}) pero OCR deshabilitado"
+            )
+        return textos, []
+
+    logger.info(f"Usando Claude Vision OCR en {len(paginas_ocr)} páginas sin texto...")
+    return textos, paginas_ocr
+
+
+def _combinar_texto_ocr(textos: Dict[int, str], textos_ocr: Dict[int, str]) -> str:
+    """Inserta el texto OCR en la posición de las páginas que mejora."""
+    texto = "".join(textos.values())
+    chars_extraidos = len(texto.strip())
+
+    mejoradas = 0
+    for num, texto_ocr in textos_ocr.items():
+        if len(texto_ocr.strip()) > len(textos[num].strip()):
+            textos[num] = f"\n--- Página {num} ---\n{texto_ocr}\n"
+            mejoradas += 1
+
+    if not mejoradas:
+        logger.warning("Claude Vision no mejoró la extracción, usando texto original")
+        return texto
+
+    texto_final = "".join(textos.values())
+    logger.info(
+        f"Claude Vision mejoró {mejoradas} páginas "
+        f"(+{len(texto_final.strip()) - chars_extraidos} caracteres)"
+    )
+    return texto_final
+
+
 def extraer_texto_pdf(ruta_pdf: str, usar_ocr_vision: bool = True) -> str:
     """
     Extrae texto de un archivo PDF.
 
-    Intenta primero extracción nativa con PyMuPDF. Si el texto extraído
-    es insuficiente (< OCR_MIN_TEXT_THRESHOLD caracteres) y OCR está
-    habilitado, usa Claude Vision para OCR.
+    Extrae la capa de texto página a página con PyMuPDF (en paralelo para
+    documentos grandes). Si el documento completo tiene menos de
+    OCR_MIN_TEXT_THRESHOLD caracteres, todas sus páginas sin texto pasan
+    por Claude Vision; si no, solo las páginas escaneadas (sin texto pero
+    con imágenes), cuyo texto OCR se inserta en su posición original.
+
+    Bloquea hasta terminar el OCR; desde código async usar
+    `extraer_texto_pdf_async`.
 
     Args:
         ruta_pdf: Ruta al archivo PDF
@@ -841,63 +934,41 @@ def extraer_texto_pdf(ruta_pdf: str, usar_ocr_vision: bool = True) -> str:
     Returns:
         Texto extraído
     """
-    import fitz  # PyMuPDF
-    import logging
-    from app.core.config import settings
-
-    logger = logging.getLogger(__name__)
-
-    # Intento 1: Extracción nativa con PyMuPDF
-    texto = ""
-    num_paginas = 0
-    with fitz.open(ruta_pdf) as doc:
-        num_paginas = len(doc)
-        for pagina in doc:
-            texto += pagina.get_text()
+    textos, paginas_ocr = _extraer_capa_texto(ruta_pdf, usar_ocr_vision)
+    if not paginas_ocr:
+        return "".join(textos.values())
 
-    texto_limpio = texto.strip()
-    chars_extraidos = len(texto_limpio)
+    try:
+        from app.services.ocr.claude_vision import get_ocr_service
 
-    logger.info(f"PyMuPDF extrajo {chars_extraidos} caracteres de {num_paginas} páginas")
+        textos_ocr = get_ocr_service().procesar_paginas(ruta_pdf, paginas_ocr)
+    except Exception as e:
+        logger.error(f"Error en OCR con Claude Vision: {e}")
+        return "".join(textos.values())
 
-    # Verificar si necesitamos OCR
-    umbral = settings.OCR_MIN_TEXT_THRESHOLD
-    ocr_habilitado = settings.OCR_VISION_ENABLED and usar_ocr_vision
+    return _combinar_texto_ocr(textos, textos_ocr)
 
-    if chars_extraidos >= umbral:
-        # Texto suficiente, no necesitamos OCR
-        return texto
 
-    if not ocr_habilitado:
-        logger.warning(
-            f"Texto insuficiente ({chars_extraidos} < {umbral}) pero OCR deshabilitado"
-        )
-        return texto
+async def extraer_texto_pdf_async(ruta_pdf: str, usar_ocr_vision: bool = True) -> str:
+    """
+    Versión async de `extraer_texto_pdf`.
 
-    # Intento 2: OCR con Claude Vision
-    logger.info(
-        f"Texto insuficiente ({chars_extraidos} < {umbral}), "
-        f"usando Claude Vision OCR..."
-    )
+    La capa de texto se extrae en un hilo y el OCR corre en el loop del
+    llamador, sin bloquearlo.
+    """
+    textos, paginas_ocr = await asyncio.to_thread(_extraer_capa_texto, ruta_pdf, usar_ocr_vision)
+    if not paginas_ocr:
+        return "".join(textos.values())
 
     try:
-        from app.services.ocr import extraer_texto_con_vision
-
-        texto_ocr = extraer_texto_con_vision(ruta_pdf)
-
-        if len(texto_ocr.strip()) > chars_extraidos:
-            logger.info(
-                f"Claude Vision extrajo {len(texto_ocr)} caracteres "
-                f"(mejora: +{len(texto_ocr) - chars_extraidos})"
-            )
-            return texto_ocr
-        else:
-            logger.warning("Claude Vision no mejoró la extracción, usando texto original")
-            return texto
+        from app.services.ocr.claude_vision import get_ocr_service
 
+        textos_ocr = await get_ocr_service().procesar_paginas_async(ruta_pdf, paginas_ocr)
     except Exception as e:
         logger.error(f"Error en OCR con Claude Vision: {e}")
-        return texto
+        return "".join(textos.values())
+
+    return _combinar_texto_ocr(textos, textos_ocr)
 
 
 def extraer_texto_docx(ruta_docx: str) -> str:
@@ -0,0 +1,390 @@
+"""
+Segmentador de documentos legales en fragmentos indexables.
+
+Recorre el texto línea a línea en una sola pasada con patrones
+precompilados anclados al inicio de línea, por lo que el costo es lineal
+en el largo del documento. Reconoce la jerarquía Título / Párrafo /
+Artículo de las leyes y reglamentos chilenos; los documentos sin
+artículos (guías, instructivos) se segmentan por sus encabezados
+numerados o, si no los tienen, en bloques de tamaño fijo.
+
+Los fragmentos se dimensionan por tokens, no por caracteres, y se
+entregan a medida que se cierran, sin acumular el documento completo.
+"""
+
+import io
+import logging
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_ORDINALES = (
+    r"[ÚúUu]nico|primero|segundo|tercero|cuarto|quinto|sexto|s[eé]ptimo|octavo|noveno|d[eé]cimo"
+)
+_SUFIJOS = r"bis|ter|qu[áa]ter|quinquies|sexies|septies|octies|nonies|decies"
+
+# Encabezado de artículo al inicio de línea: "Artículo 7° bis.-", "ARTÍCULO 10.", "Art. 3-"
+# Las referencias dentro del texto ("el artículo 86 ...") no califican:
+# van en minúscula o no terminan en separador.
+_RE_ARTICULO = re.compile(
+    r'^\s*["“]?(?:Art[íi]culo|ART[ÍI]CULO|Art\.)\s+'
+    rf'(?P<numero>\d+|(?i:{_ORDINALES}))\s*[°º]?'
+    rf'(?:\s+(?P<sufijo>(?i:{_SUFIJOS})))?'
+    r'(?:\s+(?P<transitorio>(?i:transitorio)))?'
+    r'\s*(?:\.\s*-|\.|-|–|:)\s*(?P<resto>.*)$'
+)
+_RE_TITULO = re.compile(
+    r'^\s*["“]?(?i:t[íi]tulo)\s+(?P<numero>PRELIMINAR|FINAL|[IVXLCDM]+)\b\.?\s*(?P<nombre>[^.]*)$'
+)
+_RE_PARRAFO = re.compile(
+    r'^\s*(?i:p[áa]rrafo)\s+(?P<numero>\d+)\s*[°º]?'
+    rf'(?:\s+(?P<sufijo>(?i:{_SUFIJOS}))(?!\w))?\.?\s*(?P<nombre>[^.]*)$'
+)
+# Encabezado numerado de guías: "3.2 Descripción del área de influencia"
+_RE_SECCION_NUMERADA = re.compile(
+    r'^\s*(?P<numero>\d{1,2}(?:\.\d{1,2}){0,3})\.?\s+(?P<nombre>[A-ZÁÉÍÓÚÑ][^.]{2,99})$'
+)
+
+_RE_FIN_ORACION = re.compile(r'(?<=[.!?;])\s+')
+_TABLA_CONTROL = {c: None for c in [*range(0x00, 0x09), 0x0b, 0x0c, *range(0x0e, 0x20), 0x7f]}
+
+# Tokens de subpalabra por palabra en textos legales en español, signos
+# incluidos (estimación; `contar_tokens` admite un tokenizer real)
+TOKENS_POR_PALABRA = 1.6
+
+_INICIALES_ENCABEZADO = frozenset('AaTtPp"“')
+
+# Nombre de título/párrafo en la línea siguiente al encabezado
+_MAX_CHARS_NOMBRE = 120
+
+
+def estimar_tokens(texto: str) -> int:
+    """Estima los tokens de un texto a partir de su número de palabras."""
+    return math.ceil(len(texto.split()) * TOKENS_POR_PALABRA)
+
+
+def limpiar_linea(linea: str) -> str:
+    """Elimina caracteres de control y espacios repetidos."""
+    return " ".join(linea.translate(_TABLA_CONTROL).split())
+
+
+@dataclass
+class Segmento:
+    """Fragmento de un documento, con su ubicación en la jerarquía."""
+    seccion: str
+    numero_seccion: str
+    contenido: str
+    tokens: int
+    titulo: Optional[str] = None
+    parrafo: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "seccion": self.seccion,
+            "numero_seccion": self.numero_seccion,
+            "contenido": self.contenido,
+            "titulo": self.titulo,
+            "parrafo": self.parrafo,
+        }
+
+
+@dataclass
+class _Unidad:
+    """Artículo o sección que se está acumulando."""
+    etiqueta: str
+    numero: str
+    implicita: bool = False  # Texto sin encabezado: cada bloque es una sección
+    lineas: List[str] = field(default_factory=list)
+    tokens: int = 0
+    partes_emitidas: int = 0
+
+
+class SegmentadorLegal:
+    """
+    Segmenta documentos legales en una sola pasada.
+
+    Mientras no aparece el primer artículo, las líneas se retienen como
+    preámbulo (hasta un límite de tokens). Si luego aparece un artículo el
+    preámbulo se descarta, como encabezados de publicación o vistos; si se
+    supera el límite, el documento se trata como uno sin artículos y el
+    preámbulo se segmenta por secciones.
+    """
+
+    def __init__(
+        self,
+        max_tokens: Optional[int] = None,
+        min_caracteres: int = 50,
+        contar_tokens: Callable[[str], int] = estimar_tokens,
+    ):
+        self.max_tokens = max_tokens or settings.RAG_FRAGMENTO_MAX_TOKENS
+        self.min_caracteres = min_caracteres
+        self.contar_tokens = contar_tokens
+        self.max_tokens_preambulo = self.max_tokens * 4
+
+    def segmentar(self, documento: Union[str, Iterable[str]]) -> Iterator[Segmento]:
+        """
+        Genera los fragmentos del documento en orden.
+
+        Args:
+            documento: Texto completo o iterable de líneas (p. ej. páginas
+                extraídas de un PDF, ya divididas en líneas)
+
+        Yields:
+            Segmento por cada artículo, sección o parte de ellos
+        """
+        lineas = io.StringIO(documento) if isinstance(documento, str) else documento
+        estado = _EstadoSegmentacion(self)
+        for linea in lineas:
+            yield from estado.procesar_linea(linea)
+        yield from estado.finalizar()
+
+    def dividir(self, texto: str) -> List[str]:
+        """
+        Divide un texto en bloques de hasta max_tokens respetando oraciones.
+
+        Una oración que por sí sola excede el límite se corta por palabras.
+        """
+        if self.contar_tokens(texto) <= self.max_tokens:
+            return [texto]
+
+        bloques: List[str] = []
+        actual: List[str] = []
+        tokens_actual = 0
+
+        for oracion in _RE_FIN_ORACION.split(texto):
+            tokens = self.contar_tokens(oracion)
+            if tokens > self.max_tokens:
+                if actual:
+                    bloques.append(" ".join(actual))
+                    actual, tokens_actual = [], 0
+                bloques.extend(self._cortar_por_palabras(oracion))
+                continue
+            if actual and tokens_actual + tokens > self.max_tokens:
+                bloques.append(" ".join(actual))
+                actual, tokens_actual = [], 0
+            actual.append(oracion)
+            tokens_actual += tokens
+
+        if actual:
+            bloques.append(" ".join(actual))
+        return bloques
+
+    def _cortar_por_palabras(self, texto: str) -> List[str]:
+        palabras = texto.split()
+        por_bloque = max(1, len(palabras) * self.max_tokens // max(1, self.contar_tokens(texto)))
+        return [
+            " ".join(palabras[i:i + por_bloque])
+            for i in range(0, len(palabras), por_bloque)
+        ]
+
+
+class _EstadoSegmentacion:
+    """Estado de una pasada de segmentación (jerarquía y unidad abierta)."""
+
+    def __init__(self, segmentador: SegmentadorLegal):
+        self.seg = segmentador
+        self.modo = "preambulo"  # preambulo | articulos | secciones
+        self.preambulo: List[str] = []
+        self.tokens_preambulo = 0
+        self.titulo: Optional[str] = None
+        self.parrafo: Optional[str] = None
+        self.esperando_nombre: Optional[str] = None  # "titulo" | "parrafo"
+        self.unidad: Optional[_Unidad] = None
+        self.secciones_implicitas = 0
+
+    # -- entrada ------------------------------------------------------------
+
+    def procesar_linea(self, linea: str) -> Iterator[Segmento]:
+        if self.modo == "preambulo":
+            yield from self._procesar_preambulo(linea)
+        else:
+            yield from self._procesar(linea)
+
+    def finalizar(self) -> Iterator[Segmento]:
+        if self.modo == "preambulo":
+            yield from self._pasar_a_secciones()
+        yield from self._cerrar_unidad()
+
+    # -- preámbulo ----------------------------------------------------------
+
+    def _procesar_preambulo(self, linea: str) -> Iterator[Segmento]:
+        if _RE_ARTICULO.match(linea):
+            # Documento con articulado: el preámbulo no se indexa, pero sus
+            # encabezados de Título/Párrafo sí dan contexto.
+            for previa in self.preambulo:
+                if not self._actualizar_jerarquia(previa):
+                    self._capturar_nombre(limpiar_linea(previa))
+            self.preambulo = []
+            self.modo = "articulos"
+            yield from self._procesar(linea)
+            return
+
+        self.preambulo.append(linea)
+        self.tokens_preambulo += self.seg.contar_tokens(linea)
+        if self.tokens_preambulo > self.seg.max_tokens_preambulo:
+            yield from self._pasar_a_secciones()
+
+    def _pasar_a_secciones(self) -> Iterator[Segmento]:
+        self.modo = "secciones"
+        preambulo, self.preambulo = self.preambulo, []
+        for previa in preambulo:
+            yield from self._procesar(previa)
+
+    # -- cuerpo -------------------------------------------------------------
+
+    def _procesar(self, linea: str) -> Iterator[Segmento]:
+        limpia = limpiar_linea(linea)
+        inicial = limpia[:1]
+
+        # Solo las líneas que empiezan como un encabezado pasan por los patrones
+        if inicial in _INICIALES_ENCABEZADO:
+            m = _RE_ARTICULO.match(limpia)
+            if m:
+                yield from self._cerrar_unidad()
+                self.modo = "articulos"
+                numero = m.group("numero")
+                for parte in ("sufijo", "transitorio"):
+                    if m.group(parte):
+                        numero += f" {m.group(parte).lower()}"
+                self.unidad = _Unidad(etiqueta=f"Artículo {numero}", numero=numero)
+                self.esperando_nombre = None
+                self._agregar(m.group("resto"))
+                return
+
+            if _RE_TITULO.match(limpia) or _RE_PARRAFO.match(limpia):
+                yield from self._cerrar_unidad()
+                self._actualizar_jerarquia(limpia)
+                return
+
+        elif inicial.isdigit() and self.modo == "secciones":
+            m = _RE_SECCION_NUMERADA.match(limpia)
+            if m:
+                yield from self._cerrar_unidad()
+                numero = m.group("numero")
+                self.unidad = _Unidad(etiqueta=f"Sección {numero}", numero=numero)
+                self._agregar(limpia)
+                return
+
+        if self._capturar_nombre(limpia):
+            return
+
+        if self.unidad is None:
+            if self.modo == "articulos":
+                return  # Texto suelto entre encabezados
+            self.unidad = _Unidad(etiqueta="Sección", numero="", implicita=True)
+        self._agregar(limpia)
+        if self.unidad.tokens > self.seg.max_tokens * 2:
+            yield from self._emitir_excedente()
+
+    def _actualizar_jerarquia(self, linea: str) -> bool:
+        """Actualiza título/párrafo si la línea es un encabezado."""
+        m = _RE_TITULO.match(linea)
+        if m:
+            self.titulo = f"Título {m.group('numero')}"
+            self.parrafo = None
+            self._esperar_nombre("titulo", m.group("nombre"))
+            return True
+        m = _RE_PARRAFO.match(linea)
+        if m:
+            numero = m.group("numero")
+            if m.group("sufijo"):
+                numero += f" {m.group('sufijo').lower()}"
+            self.parrafo = f"Párrafo {numero}"
+            self._esperar_nombre("parrafo", m.group("nombre"))
+            return True
+        return False
+
+    def _esperar_nombre(self, nivel: str, nombre: str):
+        self.esperando_nombre = nivel
+        nombre = limpiar_linea(nombre)
+        if nombre:
+            self._nombrar(nombre)
+
+    def _capturar_nombre(self, limpia: str) -> bool:
+        """Usa la línea como nombre del título/párrafo recién abierto."""
+        if not (self.esperando_nombre and limpia):
+            return False
+        if len(limpia) > _MAX_CHARS_NOMBRE:
+            self.esperando_nombre = None
+            return False
+        self._nombrar(limpia)
+        return True
+
+    def _nombrar(self, nombre: str):
+        if self.esperando_nombre == "titulo":
+            self.titulo = f"{self.titulo} {nombre}"
+        elif self.esperando_nombre == "parrafo":
+            self.parrafo = f"{self.parrafo} {nombre}"
+        self.esperando_nombre = None
+
+    # -- unidades -----------------------------------------------------------
+
+    def _agregar(self, limpia: str):
+        if not limpia:
+            # Conservar separación de párrafos sin acumular líneas vacías
+            if self.unidad.lineas and self.unidad.lineas[-1]:
+                self.unidad.lineas.append("")
+            return
+        self.unidad.lineas.append(limpia)
+        self.unidad.tokens += self.seg.contar_tokens(limpia)
+
+    def _emitir_excedente(self) -> Iterator[Segmento]:
+        """Emite los bloques completos de una unidad que ya superó el límite."""
+        unidad = self.unidad
+        bloques = self.seg.dividir(self._texto(unidad))
+        for bloque in bloques[:-1]:
+            yield from self._emitir(unidad, bloque, parte=True)
+        unidad.lineas = [bloques[-1]]
+        unidad.tokens = self.seg.contar_tokens(bloques[-1])
+
+    def _cerrar_unidad(self) -> Iterator[Segmento]:
+        unidad, self.unidad = self.unidad, None
+        if unidad is None:
+            return
+        texto = self._texto(unidad)
+        if len(texto) < self.seg.min_caracteres:
+            return
+        bloques = self.seg.dividir(texto)
+        varias = len(bloques) > 1 or unidad.partes_emitidas > 0
+        for bloque in bloques:
+            yield from self._emitir(unidad, bloque, parte=varias)
+
+    def _emitir(self, unidad: _Unidad, texto: str, parte: bool) -> Iterator[Segmento]:
+        if unidad.implicita:
+            self.secciones_implicitas += 1
+            numero = str(self.secciones_implicitas)
+            seccion = f"Sección {numero}"
+        else:
+            unidad.partes_emitidas += 1
+            numero = unidad.numero
+            seccion = unidad.etiqueta
+            if parte:
+                seccion += f" (parte {unidad.partes_emitidas})"
+        yield Segmento(
+            seccion=seccion,
+            numero_seccion=numero,
+            contenido=texto,
+            tokens=self.seg.contar_tokens(texto),
+            titulo=self.titulo,
+            parrafo=self.parrafo,
+        )
+
+    @staticmethod
+    def _texto(unidad: _Unidad) -> str:
+        return "\n".join(unidad.lineas).strip()
+
+
+_segmentador: Optional[SegmentadorLegal] = None
+
+
+def get_segmentador() -> SegmentadorLegal:
+    """Obtiene la instancia singleton del segmentador."""
+    global _segmentador
+    if _segmentador is None:
+        _segmentador = SegmentadorLegal()
+    return _segmentador
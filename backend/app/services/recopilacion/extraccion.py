@@ -17,7 +17,7 @@ from app.db.models.proyecto import Proyecto
 from app.schemas.recopilacion import (
     ExtraccionDocumentoResponse, MapeoSeccionSugerido
 )
-from app.core.config import settings
+from app.services.llm.pool_anthropic import get_cliente_anthropic
 
 logger = logging.getLogger(__name__)
 
@@ -116,12 +116,9 @@ class ExtraccionDocumentosService:
 
     @property
     def anthropic_client(self):
-        """Cliente Anthropic lazy-loaded."""
+        """Cliente Anthropic asíncrono (pool compartido), lazy-loaded."""
         if self._anthropic_client is None:
-            import anthropic
-            self._anthropic_client = anthropic.Anthropic(
-                api_key=settings.ANTHROPIC_API_KEY
-            )
+            self._anthropic_client = get_cliente_anthropic("recopilacion.extraccion")
         return self._anthropic_client
 
     async def extraer_datos_documento(
@@ -284,7 +281,7 @@ class ExtraccionDocumentosService:
         media_type = self._get_media_type(extension)
 
         # Llamar a Claude Vision
-        response = self.anthropic_client.messages.create(
+        response = await self.anthropic_client.messages.create(
             model="claude-sonnet-4-20250514",
             max_tokens=4096,
             messages=[
@@ -446,7 +443,7 @@ TIPOS POSIBLES:
 
 Responde SOLO con el codigo del tipo (ej: "informe_flora")"""
 
-        response = self.anthropic_client.messages.create(
+        response = await self.anthropic_client.messages.create(
             model="claude-sonnet-4-20250514",
             max_tokens=100,
             messages=[
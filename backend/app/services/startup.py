@@ -12,6 +12,7 @@ from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.session import AsyncSessionLocal
+from app.services.rag.embeddings import vector_sql
 
 logger = logging.getLogger(__name__)
 
@@ -182,12 +183,12 @@ async def _cargar_documento(
 
         # Insertar fragmentos
         for frag, embedding in zip(fragmentos_data, embeddings):
-            embedding_str = "[" + ",".join(str(v) for v in embedding) + "]"
+            embedding_sql = vector_sql(embedding)
             await session.execute(
                 text(f"""
                     INSERT INTO legal.fragmentos
                     (documento_id, seccion, numero_seccion, contenido, temas, embedding)
-                    VALUES (:doc_id, :seccion, :num, :contenido, :temas, '{embedding_str}'::vector)
+                    VALUES (:doc_id, :seccion, :num, :contenido, :temas, {embedding_sql})
                 """),
                 {
                     "doc_id": documento_id,
@@ -177,20 +177,21 @@ class ArchivoService:
             Tuple con (texto_extraido, numero_paginas)
         """
         try:
-            import fitz  # PyMuPDF
+            import fitz  # noqa: F401  PyMuPDF
         except ImportError:
             logger.error("PyMuPDF no instalado. Instalar con: pip install PyMuPDF")
             raise ImportError("PyMuPDF no esta instalado")
 
+        from app.services.pdf import iterar_paginas
+
         ruta = self.base_path / ruta_storage
         texto_completo = []
+        num_paginas = 0
 
-        with fitz.open(str(ruta)) as doc:
-            num_paginas = len(doc)
-            for pagina in doc:
-                texto = pagina.get_text()
-                if texto.strip():
-                    texto_completo.append(texto)
+        for pagina in iterar_paginas(str(ruta)):
+            num_paginas += 1
+            if pagina.texto.strip():
+                texto_completo.append(pagina.texto)
 
         texto_final = "\n\n".join(texto_completo)
         logger.info(f"Texto extraido de PDF: {len(texto_final)} caracteres, {num_paginas} paginas")
@@ -0,0 +1,22 @@
+"""
+Trabajos en segundo plano con cola persistente en PostgreSQL.
+"""
+from .cola import (
+    ColaTrabajos,
+    EstadoTrabajo,
+    Trabajo,
+    TrabajoCancelado,
+    TrabajoPerdido,
+    get_cola_trabajos,
+)
+from .base import EjecutorTrabajo
+
+__all__ = [
+    "ColaTrabajos",
+    "EstadoTrabajo",
+    "Trabajo",
+    "TrabajoCancelado",
+    "TrabajoPerdido",
+    "get_cola_trabajos",
+    "EjecutorTrabajo",
+]
@@ -0,0 +1,50 @@
+"""
+Trabajo de análisis integrado de prefactibilidad.
+
+Ejecuta ServicioPrefactibilidad.ejecutar_analisis_integrado (GIS, reglas,
+RAG e informe LLM) fuera del request. El análisis, su auditoría y el cierre
+del trabajo se confirman en la misma transacción: si el worker cae a mitad
+del informe, el reintento vuelve a analizar sin dejar un análisis huérfano.
+"""
+
+from typing import Any, Dict
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.schemas.auditoria import AnalisisIntegradoInput
+from app.services.prefactibilidad import ServicioPrefactibilidad
+from app.services.trabajos.base import EjecutorTrabajo
+from app.services.trabajos.cola import Trabajo
+
+TIPO_ANALISIS_INTEGRADO = "analisis_integrado"
+
+
+class EjecutorAnalisisIntegrado(EjecutorTrabajo):
+    """Ejecuta POST /prefactibilidad/analisis-integrado en segundo plano."""
+
+    tipo = TIPO_ANALISIS_INTEGRADO
+    etapas = [("analisis", 100)]
+    reintentos = 2
+    limite_concurrencia = 4
+
+    def validar_parametros(self, parametros: Dict[str, Any]) -> Dict[str, Any]:
+        return AnalisisIntegradoInput(**parametros).model_dump()
+
+    async def ejecutar_etapa(
+        self,
+        db: AsyncSession,
+        trabajo: Trabajo,
+        etapa: str,
+        checkpoint: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        respuesta = await ServicioPrefactibilidad().ejecutar_analisis_integrado(
+            db, AnalisisIntegradoInput(**trabajo.parametros)
+        )
+        return {"analisis": respuesta.model_dump(mode="json")}
+
+    def construir_resultado(
+        self,
+        trabajo: Trabajo,
+        checkpoint: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        return checkpoint["analisis"]
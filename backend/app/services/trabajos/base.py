@@ -0,0 +1,90 @@
+"""
+Clase base para los tipos de trabajo ejecutados por los workers.
+"""
+
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.services.trabajos.cola import Trabajo
+
+
+class EjecutorTrabajo:
+    """
+    Define cómo se ejecuta un tipo de trabajo, etapa por etapa.
+
+    Cada etapa recibe el checkpoint acumulado de las anteriores y retorna
+    un diccionario que se agrega a él. El worker confirma la salida de la
+    etapa en la misma transacción que la sesión `db` que le entrega, de
+    modo que una etapa nunca queda a medias: o se completó o se repite.
+
+    Si una etapa falla con un error reintentable y quedan `reintentos`, el
+    trabajo vuelve a la cola con espera exponencial y se retoma desde esa
+    etapa. `limite_concurrencia` acota cuántos trabajos del tipo corren a
+    la vez entre todos los workers, para que un tipo pesado (exportaciones,
+    generación con LLM) no acapare los workers.
+    """
+
+    # Identificador del tipo de trabajo en la cola
+    tipo: str = ""
+
+    # (nombre de etapa, progreso % al completarla), en orden de ejecución
+    etapas: List[Tuple[str, int]] = []
+
+    # Veces que un trabajo fallido vuelve a la cola antes de quedar en error
+    reintentos: int = 0
+
+    # Trabajos del tipo en proceso a la vez (None = sin límite)
+    limite_concurrencia: Optional[int] = None
+
+    # Si el tipo puede encolarse con POST /trabajos
+    encolable_por_api: bool = True
+
+    def validar_parametros(self, parametros: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Valida y normaliza los parámetros recibidos al encolar.
+
+        Raises:
+            ValueError: Si los parámetros no son válidos
+        """
+        return parametros
+
+    def es_reintentable(self, error: Exception) -> bool:
+        """
+        Si vale la pena repetir el trabajo tras este error.
+
+        ValueError y LookupError indican una entrada inválida o un recurso
+        inexistente: repetir no cambia el resultado.
+        """
+        return not isinstance(error, (ValueError, LookupError))
+
+    def espera_reintento(self, reintento: int) -> float:
+        """Segundos antes del reintento número `reintento` (desde 0), con jitter."""
+        espera = min(
+            settings.TRABAJOS_BACKOFF_BASE_SEGUNDOS * 2 ** reintento,
+            settings.TRABAJOS_BACKOFF_MAX_SEGUNDOS,
+        )
+        return random.uniform(espera / 2, espera)
+
+    async def ejecutar_etapa(
+        self,
+        db: AsyncSession,
+        trabajo: Trabajo,
+        etapa: str,
+        checkpoint: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        """Ejecuta una etapa y retorna lo que se agrega al checkpoint."""
+        raise NotImplementedError
+
+    def construir_resultado(
+        self,
+        trabajo: Trabajo,
+        checkpoint: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        """Construye el resultado público a partir del checkpoint final."""
+        return {}
+
+    async def limpiar(self, trabajo: Trabajo):
+        """Libera recursos del trabajo cuando llega a un estado terminal."""
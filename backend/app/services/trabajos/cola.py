@@ -0,0 +1,548 @@
+"""
+Cola persistente de trabajos en segundo plano sobre PostgreSQL.
+
+Los workers reclaman trabajos con FOR UPDATE SKIP LOCKED, así que varios
+procesos pueden consumir la misma cola sin coordinarse entre sí. Cada
+trabajo avanza por etapas y guarda en `checkpoint` la salida de las etapas
+ya confirmadas; si un worker cae, otro reclama el trabajo cuando su latido
+expira y lo retoma desde la última etapa completada.
+
+Un trabajo que falla con un error transitorio vuelve a la cola con una
+espera (`disponible_desde`) y se retoma igualmente desde su checkpoint.
+Al encolar con una clave de idempotencia, una segunda solicitud con la
+misma clave retorna el trabajo existente en lugar de crear otro.
+"""
+
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class EstadoTrabajo(str, Enum):
+    """Estados posibles de un trabajo."""
+    PENDIENTE = "pendiente"
+    EN_PROCESO = "en_proceso"
+    COMPLETADO = "completado"
+    ERROR = "error"
+    CANCELADO = "cancelado"
+
+
+ESTADOS_TERMINALES = {
+    EstadoTrabajo.COMPLETADO.value,
+    EstadoTrabajo.ERROR.value,
+    EstadoTrabajo.CANCELADO.value,
+}
+
+
+class TrabajoCancelado(Exception):
+    """El trabajo fue cancelado mientras se ejecutaba."""
+
+
+class TrabajoPerdido(Exception):
+    """El worker perdió la propiedad del trabajo (otro worker lo reclamó)."""
+
+
+@dataclass
+class Trabajo:
+    """Trabajo de la cola."""
+    id: int
+    tipo: str
+    estado: str
+    parametros: Dict[str, Any] = field(default_factory=dict)
+    etapa_actual: Optional[str] = None
+    etapas_completadas: List[str] = field(default_factory=list)
+    progreso: int = 0
+    checkpoint: Dict[str, Any] = field(default_factory=dict)
+    resultado: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    cancelacion_solicitada: bool = False
+    intentos: int = 0
+    reintentos: int = 0
+    clave_idempotencia: Optional[str] = None
+    worker_id: Optional[str] = None
+    disponible_desde: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    @classmethod
+    def desde_fila(cls, row) -> "Trabajo":
+        return cls(
+            id=row.id,
+            tipo=row.tipo,
+            estado=row.estado,
+            parametros=row.parametros or {},
+            etapa_actual=row.etapa_actual,
+            etapas_completadas=list(row.etapas_completadas or []),
+            progreso=row.progreso,
+            checkpoint=row.checkpoint or {},
+            resultado=row.resultado,
+            error=row.error,
+            cancelacion_solicitada=row.cancelacion_solicitada,
+            intentos=row.intentos,
+            reintentos=row.reintentos,
+            clave_idempotencia=row.clave_idempotencia,
+            worker_id=row.worker_id,
+            disponible_desde=row.disponible_desde,
+            created_at=row.created_at,
+            started_at=row.started_at,
+            finished_at=row.finished_at,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Representación pública (sin el checkpoint interno)."""
+        return {
+            "id": self.id,
+            "tipo": self.tipo,
+            "estado": self.estado,
+            "etapa_actual": self.etapa_actual,
+            "etapas_completadas": self.etapas_completadas,
+            "progreso": self.progreso,
+            "resultado": self.resultado,
+            "error": self.error,
+            "cancelacion_solicitada": self.cancelacion_solicitada,
+            "intentos": self.intentos,
+            "reintentos": self.reintentos,
+            "clave_idempotencia": self.clave_idempotencia,
+            "disponible_desde": self.disponible_desde.isoformat() if self.disponible_desde else None,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+_COLUMNAS = """
+    id, tipo, estado, parametros, etapa_actual, etapas_completadas, progreso,
+    checkpoint, resultado, error, cancelacion_solicitada, intentos, reintentos,
+    clave_idempotencia, worker_id, disponible_desde, created_at, started_at, finished_at
+"""
+
+# Estados en los que una clave de idempotencia sigue ocupada (ver migración 018)
+_ESTADOS_IDEMPOTENCIA = "('pendiente', 'en_proceso', 'completado')"
+
+
+class ColaTrabajos:
+    """
+    Operaciones sobre la tabla trabajos.trabajos.
+
+    Cada operación abre su propia sesión corta, salvo las que reciben `db`:
+    esas se ejecutan dentro de la transacción del llamador para que el
+    avance del trabajo quede confirmado junto con el trabajo de la etapa.
+    """
+
+    def __init__(self, session_factory: Callable[[], AsyncSession] = AsyncSessionLocal):
+        self._session_factory = session_factory
+
+    def sesion(self) -> AsyncSession:
+        """Abre una sesión para ejecutar una etapa dentro de su transacción."""
+        return self._session_factory()
+
+    async def encolar(
+        self,
+        tipo: str,
+        parametros: Dict[str, Any],
+        clave_idempotencia: Optional[str] = None,
+    ) -> Trabajo:
+        """
+        Crea un trabajo pendiente.
+
+        Con `clave_idempotencia`, si ya hay un trabajo del mismo tipo con esa
+        clave pendiente, en proceso o completado, se retorna ese trabajo. Uno
+        fallido o cancelado no ocupa la clave.
+        """
+        params = {
+            "tipo": tipo,
+            "parametros": json.dumps(parametros, default=str),
+            "clave": clave_idempotencia,
+        }
+        async with self._session_factory() as db:
+            # Dos vueltas: si el trabajo que ocupaba la clave terminó con error
+            # entre el INSERT y el SELECT, la clave quedó libre.
+            for _ in range(2):
+                result = await db.execute(
+                    text(f"""
+                        INSERT INTO trabajos.trabajos (tipo, parametros, clave_idempotencia)
+                        VALUES (:tipo, CAST(:parametros AS JSONB), :clave)
+                        ON CONFLICT (tipo, clave_idempotencia)
+                            WHERE clave_idempotencia IS NOT NULL AND estado IN {_ESTADOS_IDEMPOTENCIA}
+                        DO NOTHING
+                        RETURNING {_COLUMNAS}
+                    """),
+                    params
+                )
+                row = result.fetchone()
+                if row is not None:
+                    break
+
+                result = await db.execute(
+                    text(f"""
+                        SELECT {_COLUMNAS} FROM trabajos.trabajos
+                        WHERE tipo = :tipo AND clave_idempotencia = :clave
+                          AND estado IN {_ESTADOS_IDEMPOTENCIA}
+                    """),
+                    params
+                )
+                existente = result.fetchone()
+                if existente is not None:
+                    logger.info(f"Trabajo {existente.id} ({tipo}) ya existe para la clave {clave_idempotencia!r}")
+                    return Trabajo.desde_fila(existente)
+            else:
+                raise RuntimeError(f"No se pudo encolar el trabajo {tipo} con clave {clave_idempotencia!r}")
+
+            trabajo = Trabajo.desde_fila(row)
+            await db.commit()
+
+        logger.info(f"Trabajo encolado: {trabajo.id} ({tipo})")
+        return trabajo
+
+    async def obtener(self, trabajo_id: int) -> Optional[Trabajo]:
+        """Obtiene un trabajo por ID."""
+        async with self._session_factory() as db:
+            result = await db.execute(
+                text(f"SELECT {_COLUMNAS} FROM trabajos.trabajos WHERE id = :id"),
+                {"id": trabajo_id}
+            )
+            row = result.fetchone()
+        return Trabajo.desde_fila(row) if row else None
+
+    async def listar(
+        self,
+        tipo: Optional[str] = None,
+        estado: Optional[str] = None,
+        limite: int = 50,
+    ) -> List[Trabajo]:
+        """Lista trabajos recientes, opcionalmente filtrados."""
+        sql = f"SELECT {_COLUMNAS} FROM trabajos.trabajos WHERE 1=1"
+        params: Dict[str, Any] = {"limite": limite}
+        if tipo:
+            sql += " AND tipo = :tipo"
+            params["tipo"] = tipo
+        if estado:
+            sql += " AND estado = :estado"
+            params["estado"] = estado
+        sql += " ORDER BY created_at DESC LIMIT :limite"
+
+        async with self._session_factory() as db:
+            result = await db.execute(text(sql), params)
+            return [Trabajo.desde_fila(row) for row in result.fetchall()]
+
+    async def reclamar(
+        self,
+        worker_id: str,
+        tipos: Optional[List[str]] = None,
+        limites: Optional[Dict[str, int]] = None,
+    ) -> Optional[Trabajo]:
+        """
+        Reclama el siguiente trabajo disponible.
+
+        Disponibles son los pendientes cuya espera de reintento venció y los
+        en proceso cuyo latido expiró (worker caído). Un trabajo que agotó
+        TRABAJOS_MAX_INTENTOS reclamos se marca como error en lugar de
+        reintentarse indefinidamente.
+
+        Args:
+            worker_id: Identificador del worker que reclama
+            tipos: Tipos de trabajo que el worker sabe ejecutar
+            limites: Máximo de trabajos en proceso por tipo, sumando todos
+                los workers. Un tipo en su límite no se reclama.
+        """
+        filtro_tipo = "AND tipo = ANY(:tipos)" if tipos else ""
+        filtro_limite = ""
+        params: Dict[str, Any] = {
+            "worker_id": worker_id,
+            "timeout": settings.TRABAJOS_TIMEOUT_HEARTBEAT_SEGUNDOS,
+            "max_intentos": settings.TRABAJOS_MAX_INTENTOS,
+        }
+        if tipos:
+            params["tipos"] = tipos
+        if limites:
+            filtro_limite = """
+                        AND (
+                            (CAST(:limites AS JSONB) ->> t.tipo) IS NULL
+                            OR (
+                                SELECT COUNT(*) FROM trabajos.trabajos activo
+                                WHERE activo.tipo = t.tipo
+                                  AND activo.estado = 'en_proceso'
+                                  AND activo.heartbeat_at >= NOW() - make_interval(secs => :timeout)
+                            ) < (CAST(:limites AS JSONB) ->> t.tipo)::int
+                        )
+            """
+            params["limites"] = json.dumps(limites)
+
+        async with self._session_factory() as db:
+            if limites:
+                # Los reclamos se serializan para que dos workers no vean a la
+                # vez un cupo libre y ambos lo ocupen.
+                await db.execute(text("SELECT pg_advisory_xact_lock(hashtext('trabajos.reclamar'))"))
+
+            await db.execute(
+                text(f"""
+                    UPDATE trabajos.trabajos
+                    SET estado = 'error',
+                        error = 'Worker caído demasiadas veces durante el trabajo',
+                        finished_at = NOW()
+                    WHERE estado = 'en_proceso'
+                      AND heartbeat_at < NOW() - make_interval(secs => :timeout)
+                      AND intentos >= :max_intentos
+                      {filtro_tipo}
+                """),
+                params
+            )
+
+            result = await db.execute(
+                text(f"""
+                    UPDATE trabajos.trabajos
+                    SET estado = 'en_proceso',
+                        worker_id = :worker_id,
+                        intentos = intentos + 1,
+                        heartbeat_at = NOW(),
+                        started_at = COALESCE(started_at, NOW())
+                    WHERE id = (
+                        SELECT t.id FROM trabajos.trabajos t
+                        WHERE (
+                            (estado = 'pendiente'
+                                AND (disponible_desde IS NULL OR disponible_desde <= NOW()))
+                            OR (estado = 'en_proceso'
+                                AND heartbeat_at < NOW() - make_interval(secs => :timeout))
+                        )
+                        AND intentos < :max_intentos
+                        {filtro_tipo}
+                        {filtro_limite}
+                        ORDER BY created_at
+                        FOR UPDATE OF t SKIP LOCKED
+                        LIMIT 1
+                    )
+                    RETURNING {_COLUMNAS}
+                """),
+                params
+            )
+            row = result.fetchone()
+            await db.commit()
+
+        if not row:
+            return None
+
+        trabajo = Trabajo.desde_fila(row)
+        if trabajo.etapas_completadas:
+            logger.info(
+                f"Trabajo {trabajo.id} reanudado por {worker_id} "
+                f"tras etapas {trabajo.etapas_completadas}"
+            )
+        return trabajo
+
+    async def latido(self, trabajo_id: int, worker_id: str) -> bool:
+        """
+        Renueva el latido del trabajo.
+
+        Returns:
+            True si se solicitó la cancelación del trabajo.
+
+        Raises:
+            TrabajoPerdido: Si el trabajo ya no pertenece a este worker
+        """
+        async with self._session_factory() as db:
+            result = await db.execute(
+                text("""
+                    UPDATE trabajos.trabajos
+                    SET heartbeat_at = NOW()
+                    WHERE id = :id AND worker_id = :worker_id AND estado = 'en_proceso'
+                    RETURNING cancelacion_solicitada
+                """),
+                {"id": trabajo_id, "worker_id": worker_id}
+            )
+            row = result.fetchone()
+            await db.commit()
+
+        if not row:
+            raise TrabajoPerdido(f"Trabajo {trabajo_id} ya no pertenece a {worker_id}")
+        return bool(row[0])
+
+    async def iniciar_etapa(self, trabajo_id: int, worker_id: str, etapa: str, progreso: int):
+        """Registra la etapa en curso y su progreso inicial."""
+        async with self._session_factory() as db:
+            await db.execute(
+                text("""
+                    UPDATE trabajos.trabajos
+                    SET etapa_actual = :etapa, progreso = :progreso, heartbeat_at = NOW()
+                    WHERE id = :id AND worker_id = :worker_id
+                """),
+                {"id": trabajo_id, "worker_id": worker_id, "etapa": etapa, "progreso": progreso}
+            )
+            await db.commit()
+
+    async def completar_etapa(
+        self,
+        db: AsyncSession,
+        trabajo_id: int,
+        worker_id: str,
+        etapa: str,
+        progreso: int,
+        checkpoint: Dict[str, Any],
+    ):
+        """
+        Marca una etapa como completada dentro de la transacción `db`.
+
+        No hace commit: la etapa y su checkpoint se confirman junto con lo
+        que la etapa haya escrito en la misma sesión.
+
+        Raises:
+            TrabajoPerdido: Si el trabajo ya no pertenece a este worker
+        """
+        result = await db.execute(
+            text("""
+                UPDATE trabajos.trabajos
+                SET etapas_completadas = array_append(etapas_completadas, :etapa),
+                    checkpoint = checkpoint || CAST(:checkpoint AS JSONB),
+                    progreso = :progreso,
+                    heartbeat_at = NOW()
+                WHERE id = :id AND worker_id = :worker_id AND estado = 'en_proceso'
+            """),
+            {
+                "id": trabajo_id,
+                "worker_id": worker_id,
+                "etapa": etapa,
+                "progreso": progreso,
+                "checkpoint": json.dumps(checkpoint, default=str),
+            }
+        )
+        if result.rowcount == 0:
+            raise TrabajoPerdido(f"Trabajo {trabajo_id} ya no pertenece a {worker_id}")
+
+    async def completar(
+        self,
+        db: AsyncSession,
+        trabajo_id: int,
+        worker_id: str,
+        resultado: Dict[str, Any],
+    ):
+        """Marca el trabajo como completado dentro de la transacción `db`."""
+        result = await db.execute(
+            text("""
+                UPDATE trabajos.trabajos
+                SET estado = 'completado',
+                    resultado = CAST(:resultado AS JSONB),
+                    error = NULL,
+                    progreso = 100,
+                    etapa_actual = NULL,
+                    finished_at = NOW()
+                WHERE id = :id AND worker_id = :worker_id AND estado = 'en_proceso'
+            """),
+            {
+                "id": trabajo_id,
+                "worker_id": worker_id,
+                "resultado": json.dumps(resultado, default=str),
+            }
+        )
+        if result.rowcount == 0:
+            raise TrabajoPerdido(f"Trabajo {trabajo_id} ya no pertenece a {worker_id}")
+
+    async def fallar(self, trabajo_id: int, worker_id: str, error: str):
+        """Marca el trabajo como fallido."""
+        await self._finalizar(trabajo_id, worker_id, EstadoTrabajo.ERROR, error)
+
+    async def reintentar(self, trabajo_id: int, worker_id: str, error: str, espera_segundos: float):
+        """
+        Devuelve a la cola un trabajo que falló con un error reintentable.
+
+        Conserva el checkpoint, así el reintento parte desde la etapa que
+        falló, y no cuenta como reclamo para TRABAJOS_MAX_INTENTOS.
+        """
+        async with self._session_factory() as db:
+            await db.execute(
+                text("""
+                    UPDATE trabajos.trabajos
+                    SET estado = 'pendiente', worker_id = NULL, heartbeat_at = NULL,
+                        etapa_actual = NULL, error = :error,
+                        intentos = GREATEST(intentos - 1, 0),
+                        reintentos = reintentos + 1,
+                        disponible_desde = NOW() + make_interval(secs => :espera)
+                    WHERE id = :id AND worker_id = :worker_id AND estado = 'en_proceso'
+                """),
+                {"id": trabajo_id, "worker_id": worker_id, "error": error, "espera": espera_segundos}
+            )
+            await db.commit()
+
+    async def marcar_cancelado(self, trabajo_id: int, worker_id: str):
+        """Marca como cancelado un trabajo que el worker interrumpió."""
+        await self._finalizar(trabajo_id, worker_id, EstadoTrabajo.CANCELADO, None)
+
+    async def liberar(self, trabajo_id: int, worker_id: str):
+        """Devuelve un trabajo en curso a la cola (apagado ordenado del worker)."""
+        async with self._session_factory() as db:
+            await db.execute(
+                text("""
+                    UPDATE trabajos.trabajos
+                    SET estado = 'pendiente', worker_id = NULL, heartbeat_at = NULL,
+                        intentos = GREATEST(intentos - 1, 0)
+                    WHERE id = :id AND worker_id = :worker_id AND estado = 'en_proceso'
+                """),
+                {"id": trabajo_id, "worker_id": worker_id}
+            )
+            await db.commit()
+
+    async def solicitar_cancelacion(self, trabajo_id: int) -> Optional[Trabajo]:
+        """
+        Cancela un trabajo.
+
+        Un trabajo pendiente se cancela de inmediato; uno en proceso queda
+        marcado y su worker lo interrumpe en el siguiente latido.
+        """
+        async with self._session_factory() as db:
+            result = await db.execute(
+                text(f"""
+                    UPDATE trabajos.trabajos
+                    SET cancelacion_solicitada = TRUE,
+                        estado = CASE WHEN estado = 'pendiente' THEN 'cancelado' ELSE estado END,
+                        finished_at = CASE WHEN estado = 'pendiente' THEN NOW() ELSE finished_at END
+                    WHERE id = :id AND estado IN ('pendiente', 'en_proceso')
+                    RETURNING {_COLUMNAS}
+                """),
+                {"id": trabajo_id}
+            )
+            row = result.fetchone()
+            await db.commit()
+
+        if row:
+            return Trabajo.desde_fila(row)
+        return await self.obtener(trabajo_id)
+
+    async def _finalizar(
+        self,
+        trabajo_id: int,
+        worker_id: str,
+        estado: EstadoTrabajo,
+        error: Optional[str],
+    ):
+        async with self._session_factory() as db:
+            await db.execute(
+                text("""
+                    UPDATE trabajos.trabajos
+                    SET estado = :estado, error = :error, finished_at = NOW()
+                    WHERE id = :id AND worker_id = :worker_id AND estado = 'en_proceso'
+                """),
+                {"id": trabajo_id, "worker_id": worker_id, "estado": estado.value, "error": error}
+            )
+            await db.commit()
+
+
+# Instancia singleton
+_cola: Optional[ColaTrabajos] = None
+
+
+def get_cola_trabajos() -> ColaTrabajos:
+    """Obtiene la instancia singleton de la cola de trabajos."""
+    global _cola
+    if _cola is None:
+        _cola = ColaTrabajos()
+    return _cola
@@ -0,0 +1,113 @@
+"""
+Trabajos de generación del documento EIA: compilación y exportación.
+
+La compilación genera los capítulos con el LLM y ya persiste cada uno
+apenas termina, así que un reintento la reanuda (`reanudar=True`) sin
+repetir los capítulos completados. La exportación renderiza PDF/DOCX/XML,
+trabajo de CPU que se limita aparte para no frenar a los demás tipos.
+"""
+
+from typing import Any, Dict
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.schemas.generacion_eia import CompilarDocumentoRequest, FormatoExportacionEnum
+from app.services.generacion_eia.service import GeneracionEIAService
+from app.services.trabajos.base import EjecutorTrabajo
+from app.services.trabajos.cola import Trabajo
+
+TIPO_COMPILACION_EIA = "compilacion_eia"
+TIPO_EXPORTACION_EIA = "exportacion_eia"
+
+
+def _proyecto_id(parametros: Dict[str, Any]) -> int:
+    try:
+        return int(parametros["proyecto_id"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Se requiere proyecto_id entero")
+
+
+class EjecutorCompilacionEIA(EjecutorTrabajo):
+    """Ejecuta POST /generacion/{proyecto_id}/compilar en segundo plano."""
+
+    tipo = TIPO_COMPILACION_EIA
+    etapas = [("compilacion", 100)]
+    reintentos = 2
+    # Cada compilación ya genera GENERACION_EIA_CONCURRENCIA capítulos en paralelo
+    limite_concurrencia = 2
+
+    def validar_parametros(self, parametros: Dict[str, Any]) -> Dict[str, Any]:
+        request = CompilarDocumentoRequest(**{k: v for k, v in parametros.items() if k != "proyecto_id"})
+        return {"proyecto_id": _proyecto_id(parametros), **request.model_dump()}
+
+    async def ejecutar_etapa(
+        self,
+        db: AsyncSession,
+        trabajo: Trabajo,
+        etapa: str,
+        checkpoint: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        parametros = dict(trabajo.parametros)
+        proyecto_id = parametros.pop("proyecto_id")
+        request = CompilarDocumentoRequest(**parametros)
+        if trabajo.reintentos or trabajo.intentos > 1:
+            # Retoma lo que dejó el intento anterior
+            request = request.model_copy(update={"reanudar": True})
+
+        resultado = await GeneracionEIAService().compilar_documento(
+            db=db, proyecto_id=proyecto_id, request=request
+        )
+        if resultado.capitulos_con_error and trabajo.reintentos < self.reintentos:
+            raise RuntimeError(f"Capítulos con error: {resultado.capitulos_con_error}")
+
+        return {"compilacion": resultado.model_dump(mode="json")}
+
+    def construir_resultado(
+        self,
+        trabajo: Trabajo,
+        checkpoint: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        return checkpoint["compilacion"]
+
+
+class EjecutorExportacionEIA(EjecutorTrabajo):
+    """Ejecuta POST /generacion/{proyecto_id}/exportar/{formato} en segundo plano."""
+
+    tipo = TIPO_EXPORTACION_EIA
+    etapas = [("exportacion", 100)]
+    reintentos = 1
+    limite_concurrencia = 2
+
+    def validar_parametros(self, parametros: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "proyecto_id": _proyecto_id(parametros),
+            "formato": FormatoExportacionEnum(parametros.get("formato")).value,
+            "configuracion": parametros.get("configuracion"),
+        }
+
+    async def ejecutar_etapa(
+        self,
+        db: AsyncSession,
+        trabajo: Trabajo,
+        etapa: str,
+        checkpoint: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        parametros = trabajo.parametros
+        exportacion = await GeneracionEIAService().exportar(
+            db=db,
+            proyecto_id=parametros["proyecto_id"],
+            formato=parametros["formato"],
+            config=parametros.get("configuracion"),
+        )
+        if not exportacion.generado_exitoso:
+            # El exportador registra el fallo y retorna en lugar de lanzar
+            raise RuntimeError(exportacion.error_mensaje or "Exportación fallida")
+
+        return {"exportacion": exportacion.model_dump(mode="json")}
+
+    def construir_resultado(
+        self,
+        trabajo: Trabajo,
+        checkpoint: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        return checkpoint["exportacion"]
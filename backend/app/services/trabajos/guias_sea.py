@@ -0,0 +1,50 @@
+"""
+Trabajo de actualización del corpus con las guías y criterios del SEA.
+
+El actualizador compara el listado de sea.gob.cl con los documentos ya
+ingresados e ingiere solo los nuevos, así que repetirlo tras una caída
+no duplica guías. Corre uno a la vez: varios en paralelo descargarían
+las mismas guías.
+"""
+
+from dataclasses import asdict
+from typing import Any, Dict
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services.rag.actualizador_guias import get_actualizador
+from app.services.trabajos.base import EjecutorTrabajo
+from app.services.trabajos.cola import Trabajo
+
+TIPO_ACTUALIZACION_GUIAS_SEA = "actualizacion_guias_sea"
+
+
+class EjecutorActualizacionGuiasSEA(EjecutorTrabajo):
+    """Ejecuta POST /ingestor/actualizar-guias-sea en segundo plano."""
+
+    tipo = TIPO_ACTUALIZACION_GUIAS_SEA
+    etapas = [("actualizacion", 100)]
+    reintentos = 2
+    limite_concurrencia = 1
+
+    def validar_parametros(self, parametros: Dict[str, Any]) -> Dict[str, Any]:
+        return {}
+
+    async def ejecutar_etapa(
+        self,
+        db: AsyncSession,
+        trabajo: Trabajo,
+        etapa: str,
+        checkpoint: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        resultado = await get_actualizador().actualizar(db)
+        return {"actualizacion": asdict(resultado)}
+
+    def construir_resultado(
+        self,
+        trabajo: Trabajo,
+        checkpoint: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        resultado = dict(checkpoint["actualizacion"])
+        resultado["errores"] = resultado["errores"][:10]
+        return resultado
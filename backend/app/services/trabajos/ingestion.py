@@ -0,0 +1,156 @@
+"""
+Trabajo de ingestión de PDFs legales al corpus RAG.
+
+Divide IngestorLegal.ingestar_documento en etapas con checkpoint:
+
+1. extraccion: texto del PDF (con OCR si hace falta)
+2. clasificacion: metadatos del documento y fragmentos clasificados
+3. indexacion: embeddings e inserción en legal.documentos/fragmentos
+
+La indexación se confirma en la misma transacción que el cierre del
+trabajo, por lo que reanudar tras una caída nunca duplica el documento.
+"""
+
+import logging
+import os
+from dataclasses import asdict
+from datetime import date, datetime, timezone
+from typing import Any, Dict
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services.rag.ingestor import (
+    DocumentoAIngestar,
+    FragmentoIngestado,
+    extraer_texto_pdf_async,
+    get_ingestor_legal,
+)
+from app.services.trabajos.base import EjecutorTrabajo
+from app.services.trabajos.cola import Trabajo
+
+logger = logging.getLogger(__name__)
+
+TIPO_INGESTION_PDF = "ingestion_pdf"
+
+# Metadatos del documento que la etapa de clasificación puede completar
+_CAMPOS_METADATOS = (
+    "categoria_id",
+    "sectores",
+    "triggers_art11",
+    "componentes_ambientales",
+    "etapa_proceso",
+)
+
+
+class EjecutorIngestionPDF(EjecutorTrabajo):
+    """Ejecuta la ingestión de un PDF subido a /ingestor/pdf."""
+
+    tipo = TIPO_INGESTION_PDF
+    etapas = [
+        ("extraccion", 30),
+        ("clasificacion", 80),
+        ("indexacion", 100),
+    ]
+    reintentos = 2
+    # La extracción con OCR ocupa CPU del pool de procesos
+    limite_concurrencia = 4
+    # Requiere el archivo subido: se encola con POST /ingestor/pdf
+    encolable_por_api = False
+
+    async def ejecutar_etapa(
+        self,
+        db: AsyncSession,
+        trabajo: Trabajo,
+        etapa: str,
+        checkpoint: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        parametros = trabajo.parametros
+        ingestor = get_ingestor_legal(usar_llm=parametros.get("usar_llm", True))
+        usar_llm = ingestor.usar_llm
+
+        if etapa == "extraccion":
+            # PyMuPDF corre en un hilo y el OCR en este loop: el latido del
+            # trabajo sigue corriendo mientras tanto.
+            texto = await extraer_texto_pdf_async(parametros["ruta_archivo"])
+            texto = texto.replace("\x00", "")  # JSONB no admite el carácter nulo
+            if len(texto.strip()) < 100:
+                raise ValueError("No se pudo extraer suficiente texto del PDF")
+            return {"texto": texto}
+
+        documento = self._construir_documento(parametros, checkpoint)
+
+        if etapa == "clasificacion":
+            categoria_asignada, errores = await ingestor.clasificar_metadatos_documento(
+                db, documento, usar_llm
+            )
+            fragmentos = await ingestor.clasificar_fragmentos_documento(
+                db, documento.contenido, usar_llm
+            )
+            return {
+                "metadatos": {campo: getattr(documento, campo) for campo in _CAMPOS_METADATOS},
+                "categoria_asignada": categoria_asignada,
+                "errores": errores,
+                "fragmentos": [asdict(f) for f in fragmentos],
+            }
+
+        if etapa == "indexacion":
+            fragmentos = [FragmentoIngestado(**f) for f in checkpoint["fragmentos"]]
+            indexado = await ingestor.indexar_documento(db, documento, fragmentos, usar_llm)
+            return {"indexado": indexado}
+
+        raise ValueError(f"Etapa desconocida: {etapa}")
+
+    def construir_resultado(
+        self,
+        trabajo: Trabajo,
+        checkpoint: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        indexado = checkpoint["indexado"]
+        tiempo_ms = 0
+        if trabajo.created_at:
+            tiempo_ms = int((datetime.now(timezone.utc) - trabajo.created_at).total_seconds() * 1000)
+
+        return {
+            "documento_id": indexado["documento_id"],
+            "titulo": trabajo.parametros["titulo"],
+            "fragmentos_creados": len(checkpoint.get("fragmentos", [])),
+            "temas_detectados": indexado["temas"],
+            "triggers_detectados": indexado["triggers"],
+            "componentes_detectados": indexado["componentes"],
+            "categoria_asignada": checkpoint.get("categoria_asignada"),
+            "clasificacion_llm_usada": trabajo.parametros.get("usar_llm", True),
+            "tiempo_procesamiento_ms": tiempo_ms,
+            "errores": checkpoint.get("errores", []),
+        }
+
+    async def limpiar(self, trabajo: Trabajo):
+        ruta = trabajo.parametros.get("ruta_archivo")
+        if ruta:
+            try:
+                os.unlink(ruta)
+            except OSError:
+                pass
+
+    def _construir_documento(
+        self,
+        parametros: Dict[str, Any],
+        checkpoint: Dict[str, Any],
+    ) -> DocumentoAIngestar:
+        """Reconstruye el documento desde los parámetros y el checkpoint."""
+        fecha_pub = parametros.get("fecha_publicacion")
+
+        documento = DocumentoAIngestar(
+            titulo=parametros["titulo"],
+            tipo=parametros["tipo"],
+            numero=parametros.get("numero"),
+            fecha_publicacion=date.fromisoformat(fecha_pub) if fecha_pub else None,
+            organismo=parametros.get("organismo"),
+            contenido=checkpoint["texto"],
+            url_fuente=parametros.get("url_fuente"),
+            categoria_id=parametros.get("categoria_id"),
+        )
+
+        for campo, valor in checkpoint.get("metadatos", {}).items():
+            setattr(documento, campo, valor)
+
+        return documento
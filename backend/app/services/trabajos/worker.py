@@ -0,0 +1,252 @@
+"""
+Proceso worker que consume la cola de trabajos.
+
+Uso:
+    python -m app.services.trabajos.worker [--concurrencia N] [--tipos a,b]
+
+Cada proceso ejecuta hasta N trabajos a la vez. Mientras un trabajo corre,
+una tarea paralela renueva su latido y detecta cancelaciones; al recibir
+SIGTERM/SIGINT los trabajos en curso se devuelven a la cola para que otro
+worker los retome desde su último checkpoint. Un trabajo que falla con un
+error reintentable vuelve a la cola con espera exponencial, y los tipos
+con límite de concurrencia no se reclaman mientras estén en su límite.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+from app.services.llm.limitador import cerrar_limitador_llm
+from app.services.llm.pool_anthropic import cerrar_pool_anthropic
+from app.services.llm.telemetria import bucle_volcado
+from app.services.pdf import cerrar_pool
+from app.services.trabajos.base import EjecutorTrabajo
+from app.services.trabajos.cola import (
+    ColaTrabajos,
+    Trabajo,
+    TrabajoCancelado,
+    TrabajoPerdido,
+    get_cola_trabajos,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def obtener_ejecutores() -> List[EjecutorTrabajo]:
+    """Ejecutores de todos los tipos de trabajo registrados."""
+    from app.services.trabajos.analisis import EjecutorAnalisisIntegrado
+    from app.services.trabajos.generacion_eia import EjecutorCompilacionEIA, EjecutorExportacionEIA
+    from app.services.trabajos.guias_sea import EjecutorActualizacionGuiasSEA
+    from app.services.trabajos.ingestion import EjecutorIngestionPDF
+
+    return [
+        EjecutorIngestionPDF(),
+        EjecutorAnalisisIntegrado(),
+        EjecutorCompilacionEIA(),
+        EjecutorExportacionEIA(),
+        EjecutorActualizacionGuiasSEA(),
+    ]
+
+
+def limites_concurrencia(ejecutores: List[EjecutorTrabajo]) -> Dict[str, int]:
+    """Límite por tipo: el de TRABAJOS_LIMITES_CONCURRENCIA o el del ejecutor (0 = sin límite)."""
+    tipos = {e.tipo for e in ejecutores}
+    limites = {e.tipo: e.limite_concurrencia or 0 for e in ejecutores}
+    limites.update({t: l for t, l in settings.TRABAJOS_LIMITES_CONCURRENCIA.items() if t in tipos})
+    return {tipo: limite for tipo, limite in limites.items() if limite > 0}
+
+
+class WorkerTrabajos:
+    """Consume trabajos de la cola y los ejecuta etapa por etapa."""
+
+    def __init__(
+        self,
+        ejecutores: List[EjecutorTrabajo],
+        cola: Optional[ColaTrabajos] = None,
+        concurrencia: Optional[int] = None,
+        worker_id: Optional[str] = None,
+    ):
+        self.ejecutores: Dict[str, EjecutorTrabajo] = {e.tipo: e for e in ejecutores}
+        self.cola = cola or get_cola_trabajos()
+        self.concurrencia = concurrencia or settings.TRABAJOS_CONCURRENCIA_WORKER
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.limites = limites_concurrencia(ejecutores)
+
+    async def ejecutar(self, detener: asyncio.Event):
+        """Ejecuta los bucles de consumo hasta que se active `detener`."""
+        logger.info(
+            f"Worker {self.worker_id} iniciado: tipos={list(self.ejecutores)}, "
+            f"concurrencia={self.concurrencia}, limites={self.limites}"
+        )
+        await asyncio.gather(*(self._bucle(detener) for _ in range(self.concurrencia)))
+        logger.info(f"Worker {self.worker_id} detenido")
+
+    async def _bucle(self, detener: asyncio.Event):
+        while not detener.is_set():
+            try:
+                trabajo = await self.cola.reclamar(self.worker_id, list(self.ejecutores), self.limites)
+            except Exception as e:
+                logger.error(f"Error reclamando trabajo: {e}")
+                trabajo = None
+
+            if trabajo is None:
+                try:
+                    await asyncio.wait_for(detener.wait(), timeout=settings.TRABAJOS_POLL_SEGUNDOS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self.procesar(trabajo, detener)
+
+    async def procesar(self, trabajo: Trabajo, detener: asyncio.Event):
+        """Ejecuta un trabajo reclamado, con latido y manejo de cancelación."""
+        ejecutor = self.ejecutores[trabajo.tipo]
+        motivo: Dict[str, str] = {}
+
+        tarea = asyncio.create_task(self._ejecutar_etapas(trabajo, ejecutor))
+        latido = asyncio.create_task(self._latir(trabajo, tarea, detener, motivo))
+
+        try:
+            await tarea
+            logger.info(f"Trabajo {trabajo.id} completado")
+            await ejecutor.limpiar(trabajo)
+
+        except (asyncio.CancelledError, TrabajoCancelado, TrabajoPerdido) as e:
+            razon = motivo.get("razon") or ("perdido" if isinstance(e, TrabajoPerdido) else "cancelado")
+            if razon == "apagado":
+                logger.info(f"Trabajo {trabajo.id} devuelto a la cola por apagado del worker")
+                await self.cola.liberar(trabajo.id, self.worker_id)
+            elif razon == "perdido":
+                logger.warning(f"Trabajo {trabajo.id} reclamado por otro worker; se abandona")
+            else:
+                logger.info(f"Trabajo {trabajo.id} cancelado")
+                await self.cola.marcar_cancelado(trabajo.id, self.worker_id)
+                await ejecutor.limpiar(trabajo)
+
+        except Exception as e:
+            if ejecutor.es_reintentable(e) and trabajo.reintentos < ejecutor.reintentos:
+                espera = ejecutor.espera_reintento(trabajo.reintentos)
+                logger.warning(
+                    f"Trabajo {trabajo.id} falló ({e}); reintento "
+                    f"{trabajo.reintentos + 1}/{ejecutor.reintentos} en {espera:.0f}s"
+                )
+                await self.cola.reintentar(trabajo.id, self.worker_id, str(e), espera)
+            else:
+                logger.error(f"Trabajo {trabajo.id} falló: {e}", exc_info=True)
+                await self.cola.fallar(trabajo.id, self.worker_id, str(e))
+                await ejecutor.limpiar(trabajo)
+
+        finally:
+            latido.cancel()
+            await asyncio.gather(latido, return_exceptions=True)
+
+    async def _ejecutar_etapas(self, trabajo: Trabajo, ejecutor: EjecutorTrabajo):
+        """Ejecuta las etapas pendientes, saltando las ya confirmadas."""
+        checkpoint = dict(trabajo.checkpoint)
+        completadas = set(trabajo.etapas_completadas)
+        ultima = ejecutor.etapas[-1][0]
+        progreso_previo = 0
+
+        for etapa, progreso in ejecutor.etapas:
+            if etapa in completadas:
+                progreso_previo = progreso
+                continue
+
+            if trabajo.cancelacion_solicitada:
+                raise TrabajoCancelado()
+
+            await self.cola.iniciar_etapa(trabajo.id, self.worker_id, etapa, progreso_previo)
+            logger.info(f"Trabajo {trabajo.id}: etapa '{etapa}' iniciada")
+
+            async with self.cola.sesion() as db:
+                salida = await ejecutor.ejecutar_etapa(db, trabajo, etapa, checkpoint)
+                checkpoint.update(salida)
+
+                await self.cola.completar_etapa(
+                    db, trabajo.id, self.worker_id, etapa, progreso, salida
+                )
+                if etapa == ultima:
+                    await self.cola.completar(
+                        db, trabajo.id, self.worker_id,
+                        ejecutor.construir_resultado(trabajo, checkpoint)
+                    )
+                await db.commit()
+
+            progreso_previo = progreso
+
+    async def _latir(
+        self,
+        trabajo: Trabajo,
+        tarea: asyncio.Task,
+        detener: asyncio.Event,
+        motivo: Dict[str, str],
+    ):
+        """Renueva el latido y cancela la tarea si corresponde."""
+        while not tarea.done():
+            try:
+                await asyncio.wait_for(detener.wait(), timeout=settings.TRABAJOS_HEARTBEAT_SEGUNDOS)
+                motivo["razon"] = "apagado"
+                tarea.cancel()
+                return
+            except asyncio.TimeoutError:
+                pass
+
+            try:
+                if await self.cola.latido(trabajo.id, self.worker_id):
+                    trabajo.cancelacion_solicitada = True
+                    motivo["razon"] = "cancelado"
+                    tarea.cancel()
+                    return
+            except TrabajoPerdido:
+                motivo["razon"] = "perdido"
+                tarea.cancel()
+                return
+            except Exception as e:
+                logger.warning(f"Error renovando latido del trabajo {trabajo.id}: {e}")
+
+
+async def _main(concurrencia: Optional[int], tipos: Optional[List[str]]):
+    detener = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, detener.set)
+
+    ejecutores = obtener_ejecutores()
+    if tipos:
+        ejecutores = [e for e in ejecutores if e.tipo in tipos]
+
+    worker = WorkerTrabajos(ejecutores=ejecutores, concurrencia=concurrencia)
+    volcado_telemetria = asyncio.create_task(bucle_volcado(detener))
+    try:
+        await worker.ejecutar(detener)
+    finally:
+        detener.set()
+        await volcado_telemetria
+        await cerrar_pool_anthropic()
+        await cerrar_limitador_llm()
+        cerrar_pool()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker de la cola de trabajos")
+    parser.add_argument("--concurrencia", type=int, default=None,
+                        help="Trabajos simultáneos (default: TRABAJOS_CONCURRENCIA_WORKER)")
+    parser.add_argument("--tipos", type=str, default=None,
+                        help="Tipos de trabajo a consumir, separados por coma")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.DEBUG if settings.DEBUG else logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    tipos = [t.strip() for t in args.tipos.split(",")] if args.tipos else None
+    asyncio.run(_main(args.concurrencia, tipos))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+-- ============================================================================
+-- Migración 012: Cola persistente de trabajos en segundo plano
+-- Descripción: Tabla consumida por los procesos worker (app.services.trabajos).
+--              Cada trabajo avanza por etapas con checkpoint, de modo que si un
+--              worker cae, otro lo retoma desde la última etapa confirmada.
+-- ============================================================================
+
+BEGIN;
+
+CREATE SCHEMA IF NOT EXISTS trabajos;
+
+CREATE TABLE IF NOT EXISTS trabajos.trabajos (
+    id SERIAL PRIMARY KEY,
+    tipo VARCHAR(50) NOT NULL,                  -- ingestion_pdf, ...
+    estado VARCHAR(20) NOT NULL DEFAULT 'pendiente',
+    parametros JSONB NOT NULL DEFAULT '{}',     -- Entrada del trabajo
+    etapa_actual VARCHAR(50),
+    etapas_completadas TEXT[] NOT NULL DEFAULT '{}',
+    progreso SMALLINT NOT NULL DEFAULT 0,       -- 0-100
+    checkpoint JSONB NOT NULL DEFAULT '{}',     -- Salida acumulada de las etapas completadas
+    resultado JSONB,
+    error TEXT,
+    cancelacion_solicitada BOOLEAN NOT NULL DEFAULT FALSE,
+    intentos INTEGER NOT NULL DEFAULT 0,        -- Veces que un worker reclamó el trabajo
+    worker_id VARCHAR(100),
+    heartbeat_at TIMESTAMPTZ,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    started_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ,
+
+    CONSTRAINT chk_estado_trabajo CHECK (
+        estado IN ('pendiente', 'en_proceso', 'completado', 'error', 'cancelado')
+    ),
+    CONSTRAINT chk_progreso_trabajo CHECK (progreso BETWEEN 0 AND 100)
+);
+
+-- Índice parcial para el reclamo de trabajos (pendientes y en curso)
+CREATE INDEX IF NOT EXISTS idx_trabajos_cola
+ON trabajos.trabajos(estado, created_at)
+WHERE estado IN ('pendiente', 'en_proceso');
+
+CREATE INDEX IF NOT EXISTS idx_trabajos_tipo ON trabajos.trabajos(tipo);
+
+COMMENT ON TABLE trabajos.trabajos IS 'Cola persistente de trabajos en segundo plano con etapas y checkpoint';
+COMMENT ON COLUMN trabajos.trabajos.checkpoint IS 'Salida de cada etapa completada; permite reanudar tras una caída del worker';
+COMMENT ON COLUMN trabajos.trabajos.heartbeat_at IS 'Último latido del worker; si expira, otro worker puede reclamar el trabajo';
+
+COMMIT;
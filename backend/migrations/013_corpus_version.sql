@@ -0,0 +1,47 @@
+-- ============================================================================
+-- Migración 013: Versión del corpus legal
+-- Descripción: Contador que aumenta con cada INSERT, UPDATE, DELETE o TRUNCATE
+--              sobre legal.documentos y legal.fragmentos. La caché de
+--              búsqueda semántica sella cada resultado con esta versión y lo
+--              descarta cuando cambia, de modo que nunca entrega normativa
+--              desactualizada.
+-- ============================================================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS legal.corpus_version (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE,        -- Fila única
+    version BIGINT NOT NULL DEFAULT 1,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+
+    CONSTRAINT chk_corpus_version_fila_unica CHECK (id)
+);
+
+INSERT INTO legal.corpus_version (id) VALUES (TRUE) ON CONFLICT (id) DO NOTHING;
+
+-- Trigger por sentencia: una ingesta de N fragmentos en un INSERT multi-fila
+-- aumenta la versión una vez. El UPDATE es transaccional, por lo que la nueva
+-- versión solo se ve cuando los cambios del corpus ya están confirmados.
+CREATE OR REPLACE FUNCTION legal.fn_incrementar_corpus_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE legal.corpus_version
+    SET version = version + 1, updated_at = NOW()
+    WHERE id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_corpus_version_documentos ON legal.documentos;
+CREATE TRIGGER trg_corpus_version_documentos
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON legal.documentos
+    FOR EACH STATEMENT EXECUTE FUNCTION legal.fn_incrementar_corpus_version();
+
+DROP TRIGGER IF EXISTS trg_corpus_version_fragmentos ON legal.fragmentos;
+CREATE TRIGGER trg_corpus_version_fragmentos
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON legal.fragmentos
+    FOR EACH STATEMENT EXECUTE FUNCTION legal.fn_incrementar_corpus_version();
+
+COMMENT ON TABLE legal.corpus_version IS 'Versión del corpus legal; invalida la caché de búsqueda semántica';
+
+COMMIT;
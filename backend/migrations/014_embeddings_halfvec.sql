@@ -0,0 +1,99 @@
+-- ============================================================================
+-- Migración 014: Embeddings en media precisión (halfvec) - Fase 1
+-- Descripción: Agrega columnas halfvec(384) junto a los embeddings float32 de
+--              legal.fragmentos y asistente.documentacion_sistema, las rellena
+--              por lotes y construye índices HNSW sobre ellas. halfvec ocupa
+--              la mitad de memoria que vector, de modo que el grafo HNSW
+--              completo cabe en shared_buffers a medida que crece el corpus.
+--
+-- Requiere pgvector >= 0.7.0 (tipo halfvec e índices HNSW sobre halfvec).
+--
+-- Se ejecuta SIN transacción envolvente (usa COMMIT por lote y CREATE INDEX
+-- CONCURRENTLY), por lo que la aplicación sigue operando durante la
+-- conversión:
+--   psql -v ON_ERROR_STOP=1 -f 014_embeddings_halfvec.sql
+--
+-- Pasos siguientes:
+--   1. Comparar recall contra float32:
+--        python data/scripts/comparar_recall_halfvec.py
+--   2. Si el recall es aceptable, aplicar 015_embeddings_halfvec_swap.sql y
+--      configurar EMBEDDING_ALMACENAMIENTO=halfvec en el backend.
+-- ============================================================================
+
+DO $$
+BEGIN
+    IF string_to_array(
+        (SELECT extversion FROM pg_extension WHERE extname = 'vector'), '.'
+    )::int[] < ARRAY[0, 7, 0] THEN
+        RAISE EXCEPTION 'halfvec requiere pgvector >= 0.7.0 (ALTER EXTENSION vector UPDATE)';
+    END IF;
+END $$;
+
+ALTER TABLE legal.fragmentos
+    ADD COLUMN IF NOT EXISTS embedding_half halfvec(384);
+ALTER TABLE asistente.documentacion_sistema
+    ADD COLUMN IF NOT EXISTS embedding_half halfvec(384);
+
+-- Mientras conviven ambas columnas, toda escritura del embedding float32
+-- actualiza también la copia halfvec; así el relleno por lotes no pierde
+-- filas insertadas o re-embebidas durante la conversión.
+CREATE OR REPLACE FUNCTION public.fn_sincronizar_embedding_half()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.embedding_half := NEW.embedding::halfvec(384);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_fragmentos_embedding_half ON legal.fragmentos;
+CREATE TRIGGER trg_fragmentos_embedding_half
+    BEFORE INSERT OR UPDATE OF embedding ON legal.fragmentos
+    FOR EACH ROW EXECUTE FUNCTION public.fn_sincronizar_embedding_half();
+
+DROP TRIGGER IF EXISTS trg_documentacion_embedding_half ON asistente.documentacion_sistema;
+CREATE TRIGGER trg_documentacion_embedding_half
+    BEFORE INSERT OR UPDATE OF embedding ON asistente.documentacion_sistema
+    FOR EACH ROW EXECUTE FUNCTION public.fn_sincronizar_embedding_half();
+
+-- Relleno por lotes: cada lote confirma por separado, así no se retienen
+-- bloqueos de fila ni se genera una única transacción del tamaño del corpus.
+CREATE OR REPLACE PROCEDURE public.convertir_embeddings_halfvec(
+    tabla REGCLASS,
+    lote INTEGER DEFAULT 5000
+)
+LANGUAGE plpgsql AS $$
+DECLARE
+    filas INTEGER;
+    total BIGINT := 0;
+BEGIN
+    LOOP
+        EXECUTE format(
+            'UPDATE %1$s SET embedding_half = embedding::halfvec(384)
+             WHERE ctid = ANY (ARRAY(
+                 SELECT ctid FROM %1$s
+                 WHERE embedding IS NOT NULL AND embedding_half IS NULL
+                 LIMIT %2$s
+             ))',
+            tabla, lote
+        );
+        GET DIAGNOSTICS filas = ROW_COUNT;
+        COMMIT;
+        total := total + filas;
+        EXIT WHEN filas = 0;
+        RAISE NOTICE '%: % embeddings convertidos', tabla, total;
+    END LOOP;
+END;
+$$;
+
+CALL public.convertir_embeddings_halfvec('legal.fragmentos');
+CALL public.convertir_embeddings_halfvec('asistente.documentacion_sistema');
+
+-- Índices HNSW (coseno) sobre las columnas halfvec
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_fragmentos_embedding_half
+    ON legal.fragmentos USING hnsw (embedding_half halfvec_cosine_ops)
+    WITH (m = 16, ef_construction = 64);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_documentacion_embedding_half
+    ON asistente.documentacion_sistema USING hnsw (embedding_half halfvec_cosine_ops)
+    WITH (m = 16, ef_construction = 64)
+    WHERE embedding_half IS NOT NULL;
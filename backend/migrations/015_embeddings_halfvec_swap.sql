@@ -0,0 +1,112 @@
+-- ============================================================================
+-- Migración 015: Embeddings en media precisión (halfvec) - Fase 2
+-- Descripción: Reemplaza las columnas float32 por las halfvec construidas en
+--              la migración 014 y deja los índices HNSW con los nombres
+--              originales. Aplicar después de validar el recall con
+--              data/scripts/comparar_recall_halfvec.py y desplegar el backend
+--              con EMBEDDING_ALMACENAMIENTO=halfvec.
+--
+-- Es una transacción corta: el trabajo pesado (conversión e índices) ya se
+-- hizo en la fase 1.
+-- ============================================================================
+
+BEGIN;
+
+LOCK TABLE legal.fragmentos, asistente.documentacion_sistema IN ACCESS EXCLUSIVE MODE;
+
+-- Filas que pudieran haber quedado sin convertir
+UPDATE legal.fragmentos
+SET embedding_half = embedding::halfvec(384)
+WHERE embedding IS NOT NULL AND embedding_half IS NULL;
+
+UPDATE asistente.documentacion_sistema
+SET embedding_half = embedding::halfvec(384)
+WHERE embedding IS NOT NULL AND embedding_half IS NULL;
+
+-- La vista depende de las columnas embedding; se recrea más abajo
+DROP VIEW IF EXISTS asistente.corpus_unificado;
+
+DROP TRIGGER IF EXISTS trg_fragmentos_embedding_half ON legal.fragmentos;
+DROP TRIGGER IF EXISTS trg_documentacion_embedding_half ON asistente.documentacion_sistema;
+DROP FUNCTION IF EXISTS public.fn_sincronizar_embedding_half();
+DROP PROCEDURE IF EXISTS public.convertir_embeddings_halfvec(REGCLASS, INTEGER);
+
+-- legal.fragmentos
+DROP INDEX IF EXISTS legal.idx_fragmentos_embedding;
+ALTER TABLE legal.fragmentos DROP COLUMN embedding;
+ALTER TABLE legal.fragmentos RENAME COLUMN embedding_half TO embedding;
+ALTER INDEX legal.idx_fragmentos_embedding_half RENAME TO idx_fragmentos_embedding;
+
+-- asistente.documentacion_sistema
+DROP INDEX IF EXISTS asistente.idx_documentacion_embedding;
+ALTER TABLE asistente.documentacion_sistema DROP COLUMN embedding;
+ALTER TABLE asistente.documentacion_sistema RENAME COLUMN embedding_half TO embedding;
+ALTER INDEX asistente.idx_documentacion_embedding_half RENAME TO idx_documentacion_embedding;
+
+COMMENT ON COLUMN legal.fragmentos.embedding IS 'Embedding halfvec(384) para búsqueda semántica (paraphrase-multilingual-MiniLM-L12-v2)';
+
+CREATE OR REPLACE VIEW asistente.corpus_unificado AS
+SELECT
+    f.id::text as id,
+    'legal' as origen,
+    f.contenido,
+    f.embedding,
+    jsonb_build_object(
+        'documento_id', f.documento_id,
+        'articulo', f.articulo,
+        'seccion', f.seccion,
+        'documento_titulo', d.titulo,
+        'documento_tipo', d.tipo
+    ) as metadata
+FROM legal.fragmentos f
+JOIN legal.documentos d ON f.documento_id = d.id
+WHERE f.embedding IS NOT NULL
+
+UNION ALL
+
+SELECT
+    ds.id::text as id,
+    'sistema' as origen,
+    ds.contenido,
+    ds.embedding,
+    jsonb_build_object(
+        'tipo', ds.tipo,
+        'ruta', ds.ruta,
+        'titulo', ds.titulo,
+        'tags', ds.tags
+    ) as metadata
+FROM asistente.documentacion_sistema ds
+WHERE ds.embedding IS NOT NULL AND ds.activo = TRUE;
+
+COMMENT ON VIEW asistente.corpus_unificado IS 'Vista unificada del corpus para busqueda RAG (legal + sistema)';
+
+-- Misma firma; el vector de consulta se convierte al tipo de la columna
+-- para que el planificador use el índice HNSW
+CREATE OR REPLACE FUNCTION legal.buscar_similares(
+    query_embedding vector(384),
+    limite INTEGER DEFAULT 10,
+    filtro_temas TEXT[] DEFAULT NULL
+)
+RETURNS TABLE(
+    id INTEGER,
+    documento_id INTEGER,
+    seccion VARCHAR,
+    contenido TEXT,
+    similitud FLOAT
+) AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        f.id,
+        f.documento_id,
+        f.seccion,
+        f.contenido,
+        1 - (f.embedding <=> query_embedding::halfvec(384)) as similitud
+    FROM legal.fragmentos f
+    WHERE (filtro_temas IS NULL OR f.temas && filtro_temas)
+    ORDER BY f.embedding <=> query_embedding::halfvec(384)
+    LIMIT limite;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMIT;
@@ -0,0 +1,22 @@
+-- ============================================================================
+-- Migración 016: Resumen acumulado de conversaciones del asistente
+-- Descripción: El historial enviado al modelo se acota por tokens; los turnos
+--              que salen del presupuesto se incorporan a un resumen guardado
+--              en la conversación. resumen_hasta marca el último mensaje
+--              resumido, de modo que solo se leen los mensajes posteriores.
+-- ============================================================================
+
+ALTER TABLE asistente.conversaciones
+ADD COLUMN IF NOT EXISTS resumen TEXT;
+
+ALTER TABLE asistente.conversaciones
+ADD COLUMN IF NOT EXISTS resumen_hasta TIMESTAMP WITH TIME ZONE;
+
+-- Lectura de los mensajes posteriores al resumen
+CREATE INDEX IF NOT EXISTS idx_mensajes_conversacion_created
+ON asistente.mensajes(conversacion_id, created_at);
+
+COMMENT ON COLUMN asistente.conversaciones.resumen IS
+'Resumen acumulado de los turnos que ya no entran en el historial enviado al modelo.';
+COMMENT ON COLUMN asistente.conversaciones.resumen_hasta IS
+'created_at del último mensaje incorporado al resumen.';
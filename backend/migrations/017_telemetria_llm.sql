@@ -0,0 +1,36 @@
+-- ============================================================================
+-- Migración 017: Telemetría de llamadas a LLM
+-- Descripción: Agregados por hora de las llamadas a LLM de cada funcionalidad
+--              (sitio), proveedor y modelo. Los escribe periódicamente cada
+--              proceso (app.services.llm.telemetria), sumando sobre la fila.
+-- ============================================================================
+
+BEGIN;
+
+CREATE SCHEMA IF NOT EXISTS telemetria;
+
+CREATE TABLE IF NOT EXISTS telemetria.llm_rollups (
+    periodo TIMESTAMPTZ NOT NULL,               -- Inicio de la hora (UTC)
+    sitio VARCHAR(100) NOT NULL,                -- asistente.chat, informe.resumen_ejecutivo, ocr.vision, ...
+    proveedor VARCHAR(30) NOT NULL,             -- anthropic, perplexity
+    modelo VARCHAR(100) NOT NULL,
+    llamadas BIGINT NOT NULL DEFAULT 0,
+    errores BIGINT NOT NULL DEFAULT 0,
+    reintentos BIGINT NOT NULL DEFAULT 0,
+    tokens_input BIGINT NOT NULL DEFAULT 0,
+    tokens_output BIGINT NOT NULL DEFAULT 0,
+    tokens_cache_lectura BIGINT NOT NULL DEFAULT 0,
+    tokens_cache_escritura BIGINT NOT NULL DEFAULT 0,
+    costo_usd NUMERIC(14, 6) NOT NULL DEFAULT 0,
+    latencia_total_ms BIGINT NOT NULL DEFAULT 0,
+    latencia_buckets BIGINT[] NOT NULL DEFAULT '{}',  -- Conteos por bucket de BUCKETS_LATENCIA_MS (+Inf al final)
+    PRIMARY KEY (periodo, sitio, proveedor, modelo)
+);
+
+CREATE INDEX IF NOT EXISTS idx_llm_rollups_sitio ON telemetria.llm_rollups(sitio, periodo DESC);
+
+COMMENT ON TABLE telemetria.llm_rollups IS 'Agregados por hora de llamadas a LLM por sitio, proveedor y modelo';
+COMMENT ON COLUMN telemetria.llm_rollups.reintentos IS 'Llamadas que repiten una operación que falló (reintentos de la aplicación)';
+COMMENT ON COLUMN telemetria.llm_rollups.costo_usd IS 'Costo estimado con los precios del catálogo de modelos, incluida la caché de prompts';
+
+COMMIT;
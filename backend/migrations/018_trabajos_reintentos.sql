@@ -0,0 +1,26 @@
+-- ============================================================================
+-- Migración 018: Reintentos, idempotencia y límites en la cola de trabajos
+-- Descripción: Un trabajo que falla con un error transitorio vuelve a la cola
+--              con espera exponencial (disponible_desde) en lugar de quedar en
+--              error. La clave de idempotencia evita encolar dos veces el
+--              mismo trabajo mientras está vigente o ya se completó.
+-- ============================================================================
+
+BEGIN;
+
+ALTER TABLE trabajos.trabajos
+    ADD COLUMN IF NOT EXISTS reintentos INTEGER NOT NULL DEFAULT 0,     -- Fallas reintentadas
+    ADD COLUMN IF NOT EXISTS disponible_desde TIMESTAMPTZ,              -- No se reclama antes (backoff)
+    ADD COLUMN IF NOT EXISTS clave_idempotencia VARCHAR(200);
+
+-- Una clave identifica un solo trabajo vigente o completado por tipo; los
+-- fallidos y cancelados salen del índice para poder volver a encolarse.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_trabajos_idempotencia
+ON trabajos.trabajos(tipo, clave_idempotencia)
+WHERE clave_idempotencia IS NOT NULL AND estado IN ('pendiente', 'en_proceso', 'completado');
+
+COMMENT ON COLUMN trabajos.trabajos.reintentos IS 'Veces que el trabajo volvió a la cola tras fallar con un error reintentable';
+COMMENT ON COLUMN trabajos.trabajos.disponible_desde IS 'Espera del reintento: el trabajo no se reclama antes de este instante';
+COMMENT ON COLUMN trabajos.trabajos.clave_idempotencia IS 'Clave del cliente; encolar de nuevo con la misma clave retorna el trabajo existente';
+
+COMMIT;
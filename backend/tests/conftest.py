@@ -8,6 +8,53 @@ from unittest.mock import AsyncMock, MagicMock, patch
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
+@pytest.fixture(autouse=True)
+def limpiar_cache_busqueda():
+    """Aísla la caché de búsqueda entre tests."""
+    from app.services.rag.cache_busqueda import get_cache_busqueda
+
+    get_cache_busqueda().limpiar()
+    yield
+    get_cache_busqueda().limpiar()
+
+
+@pytest.fixture(autouse=True)
+def limpiar_cache_perplexity():
+    """Aísla la caché de búsqueda web entre tests."""
+    from app.services.llm.cache_perplexity import get_cache_perplexity
+
+    get_cache_perplexity().limpiar()
+    yield
+    get_cache_perplexity().limpiar()
+
+
+@pytest.fixture(autouse=True)
+def limitador_llm_local(monkeypatch):
+    """Limitador de tasa nuevo y sin Redis en cada test."""
+    from app.services.llm import limitador
+
+    monkeypatch.setattr(limitador, "_limitador", limitador.LimitadorLLM(usar_redis=False))
+    return limitador._limitador
+
+
+@pytest.fixture(autouse=True)
+def monitor_modelos_local(monkeypatch):
+    """Estadísticas de latencia por modelo vacías en cada test."""
+    from app.services.llm import salud_modelos
+
+    monkeypatch.setattr(salud_modelos, "_monitor", salud_modelos.MonitorModelos())
+    return salud_modelos._monitor
+
+
+@pytest.fixture(autouse=True)
+def precarga_normativa_local(monkeypatch):
+    """Precarga de normativa sin proyectos recordados en cada test."""
+    from app.services.asistente import precarga
+
+    monkeypatch.setattr(precarga, "_precarga_normativa", precarga.PrecargaNormativa())
+    return precarga._precarga_normativa
+
+
 @pytest.fixture
 def mock_db():
     """Mock de sesión de base de datos."""
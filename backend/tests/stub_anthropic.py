@@ -0,0 +1,549 @@
+"""
+Servidor stub de los proveedores LLM (API de mensajes de Anthropic y
+chat completions de Perplexity).
+
+Responde POST /v1/messages sin invocar un modelo, devolviendo un eco del
+ultimo mensaje del usuario y un `usage` que simula el prompt caching de la
+API real: el prefijo (tools -> system -> messages) hasta cada breakpoint
+`cache_control` se recuerda por hash; una llamada posterior con el mismo
+prefijo lo reporta como `cache_read_input_tokens`, los prefijos marcados
+nuevos como `cache_creation_input_tokens` y el resto como `input_tokens`.
+
+Con `--limite-rpm` (o `rechazos_pendientes` en los tests) responde 429 con
+retry-after y los headers anthropic-ratelimit-*, como la API al superar el
+limite de solicitudes por minuto.
+
+Para pruebas de carga simula ademas (de forma reproducible con `--semilla`):
+- latencia hasta el primer byte (`--latencia fija:ms`, `uniforme:min:max`
+  o `lognormal:mediana:sigma`), propia de un modelo
+  (`--latencia-modelo claude-sonnet-4-20250514=fija:3000`, repetible) y
+  por token de salida (`--ms-por-token`)
+- respuestas largas (`--tokens-salida`)
+- llamadas a herramientas guionadas (`--guion`, ver ReglaGuion)
+- 429 y 5xx aleatorios (`--tasa-429`, `--tasa-5xx`)
+- POST /chat/completions con citas, para PerplexityClient
+
+Vive en tests/ para que el código de la aplicación no pueda importarlo. Se
+levanta desde backend/:
+
+    python -m tests.stub_anthropic --port 8787 --limite-rpm 20
+    LLM_BASE_URL=http://localhost:8787 PERPLEXITY_BASE_URL=http://localhost:8787 \
+        ANTHROPIC_API_KEY=stub PERPLEXITY_API_KEY=stub uvicorn app.main:app
+
+Los tokens se estiman como caracteres / 4 (no replica el tokenizer real).
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+CARACTERES_POR_TOKEN = 4
+BLOQUES_RETROCESO = 20
+PALABRAS_POR_DELTA = 4  # Palabras por content_block_delta en streaming
+RELLENO = "La linea base ambiental del proyecto considera los componentes del medio fisico y biotico. "
+CITAS_PERPLEXITY = [
+    "https://www.sea.gob.cl/documentacion/guias-y-criterios",
+    "https://www.bcn.cl/leychile/navegar?idNorma=30667",
+]
+
+# Errores 5xx que devuelve la API de Anthropic
+ERRORES_5XX = [
+    (500, "api_error", "Internal server error"),
+    (529, "overloaded_error", "Overloaded"),
+]
+
+
+@dataclass
+class DistribucionLatencia:
+    """
+    Latencia simulada en milisegundos.
+
+    tipo "fija" usa `a`; "uniforme" muestrea entre `a` y `b`; "lognormal"
+    usa `a` como mediana y `b` como sigma (colas largas como la API real).
+    """
+
+    tipo: str = "fija"
+    a: float = 0.0
+    b: float = 0.0
+
+    @classmethod
+    def desde_texto(cls, texto: str) -> "DistribucionLatencia":
+        """Parsea 'fija:200', 'uniforme:100:900' o 'lognormal:800:0.5'."""
+        tipo, *valores = texto.split(":")
+        if tipo not in ("fija", "uniforme", "lognormal") or not valores:
+            raise ValueError(f"Distribucion de latencia invalida: {texto}")
+        numeros = [float(v) for v in valores]
+        return cls(tipo, numeros[0], numeros[1] if len(numeros) > 1 else 0.0)
+
+    def muestrear(self, azar: random.Random) -> float:
+        if self.tipo == "uniforme":
+            return azar.uniform(self.a, self.b)
+        if self.tipo == "lognormal" and self.a > 0:
+            return azar.lognormvariate(math.log(self.a), self.b)
+        return self.a
+
+
+@dataclass
+class ReglaGuion:
+    """
+    Llamada a herramienta guionada.
+
+    Si el ultimo mensaje del usuario es texto que calza con `patron` (regex,
+    sin distinguir mayusculas) y la solicitud ofrece la herramienta, el stub
+    responde con un bloque tool_use; tras el tool_result responde con texto,
+    como el modelo al terminar el turno.
+    """
+
+    patron: str
+    herramienta: str
+    entrada: Dict[str, Any] = field(default_factory=dict)
+
+    def aplica(self, cuerpo: Dict[str, Any]) -> bool:
+        nombres = {t.get("name") for t in cuerpo.get("tools") or []}
+        if self.herramienta not in nombres or _ultimo_bloque_usuario(cuerpo) != "text":
+            return False
+        return re.search(self.patron, _ultimo_texto_usuario(cuerpo), re.IGNORECASE) is not None
+
+
+def cargar_guion(ruta: str) -> List[ReglaGuion]:
+    """Reglas desde un JSON: [{"patron": ..., "herramienta": ..., "entrada": {...}}]."""
+    with open(ruta, encoding="utf-8") as f:
+        return [ReglaGuion(**regla) for regla in json.load(f)]
+
+
+def estimar_tokens(bloque: Any) -> int:
+    """Tokens aproximados de un bloque serializado."""
+    texto = bloque if isinstance(bloque, str) else json.dumps(bloque, ensure_ascii=False, sort_keys=True)
+    return max(1, math.ceil(len(texto) / CARACTERES_POR_TOKEN))
+
+
+def _sin_cache_control(bloque: Any) -> Any:
+    if isinstance(bloque, dict):
+        return {k: v for k, v in bloque.items() if k != "cache_control"}
+    return bloque
+
+
+def bloques_prompt(cuerpo: Dict[str, Any]) -> List[Tuple[Any, bool]]:
+    """
+    Bloques del prompt en el orden en que la API arma el prefijo cacheable.
+
+    Returns:
+        Lista de (bloque sin cache_control, si el bloque es breakpoint)
+    """
+    bloques: List[Tuple[Any, bool]] = []
+    for tool in cuerpo.get("tools") or []:
+        bloques.append((_sin_cache_control(tool), "cache_control" in tool))
+
+    system = cuerpo.get("system") or []
+    if isinstance(system, str):
+        system = [{"type": "text", "text": system}]
+    for bloque in system:
+        bloques.append((_sin_cache_control(bloque), "cache_control" in bloque))
+
+    for mensaje in cuerpo.get("messages") or []:
+        contenido = mensaje["content"]
+        if isinstance(contenido, str):
+            contenido = [{"type": "text", "text": contenido}]
+        for bloque in contenido:
+            bloques.append((
+                {"role": mensaje["role"], **_sin_cache_control(bloque)},
+                isinstance(bloque, dict) and "cache_control" in bloque,
+            ))
+    return bloques
+
+
+class StubAnthropic:
+    """Estado del stub: prefijos cacheados, llamadas recibidas, limite de tasa y fallas simuladas."""
+
+    def __init__(
+        self,
+        min_tokens_cache: int = 0,
+        limite_rpm: int = 0,
+        latencia: Optional[DistribucionLatencia] = None,
+        latencia_por_modelo: Optional[Dict[str, DistribucionLatencia]] = None,
+        ms_por_token: float = 0.0,
+        tokens_salida: int = 0,
+        guion: Optional[List[ReglaGuion]] = None,
+        tasa_429: float = 0.0,
+        tasa_5xx: float = 0.0,
+        semilla: Optional[int] = None,
+    ):
+        self.min_tokens_cache = min_tokens_cache
+        self.limite_rpm = limite_rpm
+        self.latencia = latencia or DistribucionLatencia()
+        self.latencia_por_modelo = latencia_por_modelo or {}
+        self.ms_por_token = ms_por_token
+        self.tokens_salida = tokens_salida
+        self.guion = guion or []
+        self.tasa_429 = tasa_429
+        self.tasa_5xx = tasa_5xx
+        self.azar = random.Random(semilla)
+        self.prefijos: Dict[str, float] = {}
+        self.llamadas: List[Dict[str, Any]] = []
+        self.aceptadas: deque = deque()
+        self.rechazos_pendientes = 0  # Proximas solicitudes que reciben 429
+        self.segundos_reintento = 1.0  # retry-after de los rechazos forzados
+        self.rechazadas = 0
+        self.errores_5xx = 0
+        self.por_ruta: Counter = Counter()
+
+    async def esperar_latencia(self, modelo: Optional[str] = None):
+        """Duerme la latencia hasta el primer byte muestreada (la del modelo si tiene una propia)."""
+        ms = self.latencia_por_modelo.get(modelo, self.latencia).muestrear(self.azar)
+        if ms > 0:
+            await asyncio.sleep(ms / 1000)
+
+    def error_simulado(self) -> Optional[Tuple[int, Dict[str, Any], Dict[str, str]]]:
+        """
+        Decide si la solicitud falla con un 429 o 5xx aleatorio.
+
+        Returns:
+            (status, cuerpo, headers) del error, o None si no falla
+        """
+        sorteo = self.azar.random()
+        if sorteo < self.tasa_429:
+            self.rechazadas += 1
+            return 429, _cuerpo_error("rate_limit_error", "Rate limit exceeded"), {
+                **self.headers_limite(), "retry-after": f"{self.segundos_reintento:g}",
+            }
+        if sorteo < self.tasa_429 + self.tasa_5xx:
+            self.errores_5xx += 1
+            status, tipo, mensaje = self.azar.choice(ERRORES_5XX)
+            return status, _cuerpo_error(tipo, mensaje), {}
+        return None
+
+    def texto_respuesta(self, cuerpo: Dict[str, Any]) -> str:
+        """Eco del usuario, rellenado hasta `tokens_salida` si se configuro."""
+        texto = "stub: " + _ultimo_texto_usuario(cuerpo)[:200]
+        faltan = self.tokens_salida * CARACTERES_POR_TOKEN - len(texto)
+        if faltan > 0:
+            texto += " " + (RELLENO * (faltan // len(RELLENO) + 1))[:faltan].strip()
+        return texto
+
+    def headers_limite(self) -> Dict[str, str]:
+        """Headers anthropic-ratelimit-* del estado actual de la ventana."""
+        if not self.limite_rpm:
+            return {}
+        ahora = time.time()
+        reset = (self.aceptadas[0] + 60) if self.aceptadas else ahora
+        return {
+            "anthropic-ratelimit-requests-limit": str(self.limite_rpm),
+            "anthropic-ratelimit-requests-remaining": str(max(0, self.limite_rpm - len(self.aceptadas))),
+            "anthropic-ratelimit-requests-reset": datetime.fromtimestamp(reset, timezone.utc).isoformat(),
+        }
+
+    def verificar_limite(self) -> Optional[Dict[str, str]]:
+        """
+        Cuenta la solicitud en la ventana de un minuto.
+
+        Returns:
+            Headers del 429 si la solicitud se rechaza, None si se acepta
+        """
+        ahora = time.time()
+        while self.aceptadas and self.aceptadas[0] <= ahora - 60:
+            self.aceptadas.popleft()
+
+        if self.rechazos_pendientes > 0:
+            self.rechazos_pendientes -= 1
+            espera = self.segundos_reintento
+        elif self.limite_rpm and len(self.aceptadas) >= self.limite_rpm:
+            espera = self.aceptadas[0] + 60 - ahora
+        else:
+            self.aceptadas.append(ahora)
+            return None
+
+        self.rechazadas += 1
+        return {
+            **self.headers_limite(),
+            "retry-after": f"{max(espera, 0):g}",
+            "anthropic-ratelimit-requests-reset": (
+                datetime.now(timezone.utc) + timedelta(seconds=espera)
+            ).isoformat(),
+        }
+
+    def calcular_uso(self, cuerpo: Dict[str, Any]) -> Dict[str, int]:
+        """
+        Usage de una llamada, registrando los prefijos marcados.
+
+        Como la API, busca aciertos en los limites de bloque hasta
+        BLOQUES_RETROCESO posiciones antes de cada breakpoint, de modo que el
+        breakpoint de la llamada anterior se encuentra aunque ahora este
+        mas atras en el historial.
+        """
+        acumulado = 0
+        posiciones: List[Tuple[str, int]] = []
+        breakpoints: List[int] = []
+        hash_prefijo = hashlib.sha256(cuerpo.get("model", "").encode())
+        for bloque, es_breakpoint in bloques_prompt(cuerpo):
+            acumulado += estimar_tokens(bloque)
+            hash_prefijo.update(json.dumps(bloque, ensure_ascii=False, sort_keys=True).encode())
+            posiciones.append((hash_prefijo.copy().hexdigest(), acumulado))
+            if es_breakpoint and acumulado >= self.min_tokens_cache:
+                breakpoints.append(len(posiciones) - 1)
+        total = acumulado
+
+        leidos = 0
+        for indice in breakpoints:
+            for clave, tokens in posiciones[max(0, indice - BLOQUES_RETROCESO):indice + 1]:
+                if clave in self.prefijos:
+                    leidos = max(leidos, tokens)
+        cacheados = posiciones[breakpoints[-1]][1] if breakpoints else 0
+        for indice in breakpoints:
+            self.prefijos[posiciones[indice][0]] = time.time()
+
+        return {
+            "input_tokens": total - max(cacheados, leidos),
+            "cache_creation_input_tokens": max(cacheados - leidos, 0),
+            "cache_read_input_tokens": leidos,
+            "output_tokens": 0,
+        }
+
+    def responder(self, cuerpo: Dict[str, Any]) -> Dict[str, Any]:
+        """Mensaje de respuesta (eco o tool_use guionado) con el usage calculado."""
+        uso = self.calcular_uso(cuerpo)
+        regla = next((r for r in self.guion if r.aplica(cuerpo)), None)
+        if regla is not None:
+            contenido = [{
+                "type": "tool_use",
+                "id": f"toolu_stub_{uuid4().hex[:16]}",
+                "name": regla.herramienta,
+                "input": regla.entrada,
+            }]
+            stop_reason = "tool_use"
+        else:
+            contenido = [{"type": "text", "text": self.texto_respuesta(cuerpo)}]
+            stop_reason = "end_turn"
+        uso["output_tokens"] = sum(estimar_tokens(b.get("text") or b.get("input")) for b in contenido)
+        self.llamadas.append({"cuerpo": cuerpo, "usage": uso})
+        return {
+            "id": f"msg_stub_{uuid4().hex[:16]}",
+            "type": "message",
+            "role": "assistant",
+            "model": cuerpo.get("model", "stub"),
+            "content": contenido,
+            "stop_reason": stop_reason,
+            "stop_sequence": None,
+            "usage": uso,
+        }
+
+    def responder_chat(self, cuerpo: Dict[str, Any]) -> Dict[str, Any]:
+        """Respuesta de chat completions al estilo Perplexity, con citas."""
+        entrada = sum(estimar_tokens(m.get("content", "")) for m in cuerpo.get("messages") or [])
+        texto = self.texto_respuesta(cuerpo)
+        salida = estimar_tokens(texto)
+        self.llamadas.append({"cuerpo": cuerpo, "usage": {"input_tokens": entrada, "output_tokens": salida}})
+        return {
+            "id": f"chat_stub_{uuid4().hex[:16]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": cuerpo.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": texto},
+                "finish_reason": "stop",
+            }],
+            "citations": CITAS_PERPLEXITY,
+            "usage": {"prompt_tokens": entrada, "completion_tokens": salida, "total_tokens": entrada + salida},
+        }
+
+    def metricas(self) -> Dict[str, Any]:
+        """Contadores para contrastar con el reporte de una prueba de carga."""
+        return {
+            "llamadas": len(self.llamadas),
+            "por_ruta": dict(self.por_ruta),
+            "rechazadas_429": self.rechazadas,
+            "errores_5xx": self.errores_5xx,
+            "tokens_output": sum(ll["usage"].get("output_tokens", 0) for ll in self.llamadas),
+        }
+
+    def limpiar(self):
+        self.prefijos.clear()
+        self.llamadas.clear()
+        self.aceptadas.clear()
+        self.rechazadas = 0
+        self.errores_5xx = 0
+        self.por_ruta.clear()
+
+
+def _cuerpo_error(tipo: str, mensaje: str) -> Dict[str, Any]:
+    return {"type": "error", "error": {"type": tipo, "message": mensaje}}
+
+
+def _ultimo_bloque_usuario(cuerpo: Dict[str, Any]) -> Optional[str]:
+    """Tipo del ultimo bloque del ultimo mensaje del usuario ('text', 'tool_result', ...)."""
+    for mensaje in reversed(cuerpo.get("messages") or []):
+        if mensaje["role"] != "user":
+            continue
+        contenido = mensaje["content"]
+        if isinstance(contenido, str):
+            return "text"
+        return contenido[-1].get("type") if contenido else None
+    return None
+
+
+def _ultimo_texto_usuario(cuerpo: Dict[str, Any]) -> str:
+    for mensaje in reversed(cuerpo.get("messages") or []):
+        if mensaje["role"] != "user":
+            continue
+        contenido = mensaje["content"]
+        if isinstance(contenido, str):
+            return contenido
+        for bloque in contenido:
+            if bloque.get("type") == "text":
+                return bloque["text"]
+            if bloque.get("type") == "tool_result":
+                return str(bloque.get("content", ""))
+    return ""
+
+
+def _evento(tipo: str, datos: Dict[str, Any]) -> str:
+    return f"event: {tipo}\ndata: {json.dumps({'type': tipo, **datos}, ensure_ascii=False)}\n\n"
+
+
+async def _eventos_stream(mensaje: Dict[str, Any], ms_por_token: float = 0.0) -> AsyncIterator[str]:
+    """Eventos SSE equivalentes a un mensaje completo, con el texto en deltas."""
+    uso = mensaje["usage"]
+    inicio = {**mensaje, "content": [], "stop_reason": None, "usage": {**uso, "output_tokens": 1}}
+    yield _evento("message_start", {"message": inicio})
+    for indice, bloque in enumerate(mensaje["content"]):
+        if bloque["type"] == "tool_use":
+            yield _evento("content_block_start", {"index": indice, "content_block": {**bloque, "input": {}}})
+            yield _evento("content_block_delta", {"index": indice, "delta": {
+                "type": "input_json_delta", "partial_json": json.dumps(bloque["input"], ensure_ascii=False),
+            }})
+            yield _evento("content_block_stop", {"index": indice})
+            continue
+        yield _evento("content_block_start", {"index": indice, "content_block": {"type": "text", "text": ""}})
+        palabras = bloque["text"].split(" ")
+        for i in range(0, len(palabras), PALABRAS_POR_DELTA):
+            delta = " ".join(palabras[i:i + PALABRAS_POR_DELTA]) + (" " if i + PALABRAS_POR_DELTA < len(palabras) else "")
+            if ms_por_token:
+                await asyncio.sleep(estimar_tokens(delta) * ms_por_token / 1000)
+            yield _evento("content_block_delta", {"index": indice, "delta": {"type": "text_delta", "text": delta}})
+        yield _evento("content_block_stop", {"index": indice})
+    yield _evento("message_delta", {
+        "delta": {"stop_reason": mensaje["stop_reason"], "stop_sequence": None},
+        "usage": {"output_tokens": uso["output_tokens"]},
+    })
+    yield _evento("message_stop", {})
+
+
+def crear_app(stub: StubAnthropic = None) -> FastAPI:
+    """App ASGI del stub; `app.state.stub` expone el estado para los tests."""
+    stub = stub or StubAnthropic()
+    app = FastAPI(title="Stub APIs LLM")
+    app.state.stub = stub
+
+    async def fallas(ruta: str, cuerpo: Dict[str, Any]) -> Optional[JSONResponse]:
+        """Limite de tasa, latencia y errores simulados previos a responder."""
+        stub.por_ruta[ruta] += 1
+        rechazo = stub.verificar_limite()
+        if rechazo is not None:
+            return JSONResponse(_cuerpo_error("rate_limit_error", "Rate limit exceeded"), status_code=429, headers=rechazo)
+        await stub.esperar_latencia(cuerpo.get("model"))
+        error = stub.error_simulado()
+        if error is not None:
+            status, cuerpo, headers = error
+            return JSONResponse(cuerpo, status_code=status, headers=headers)
+        return None
+
+    @app.post("/v1/messages")
+    async def mensajes(request: Request):
+        cuerpo = await request.json()
+        falla = await fallas("messages", cuerpo)
+        if falla is not None:
+            return falla
+        mensaje = stub.responder(cuerpo)
+        headers = stub.headers_limite()
+        if cuerpo.get("stream"):
+            return StreamingResponse(
+                _eventos_stream(mensaje, stub.ms_por_token), media_type="text/event-stream", headers=headers,
+            )
+        if stub.ms_por_token:
+            await asyncio.sleep(mensaje["usage"]["output_tokens"] * stub.ms_por_token / 1000)
+        return JSONResponse(mensaje, headers=headers)
+
+    @app.post("/chat/completions")
+    async def chat_completions(request: Request):
+        cuerpo = await request.json()
+        falla = await fallas("chat_completions", cuerpo)
+        if falla is not None:
+            return falla
+        respuesta = stub.responder_chat(cuerpo)
+        if stub.ms_por_token:
+            await asyncio.sleep(respuesta["usage"]["completion_tokens"] * stub.ms_por_token / 1000)
+        return JSONResponse(respuesta)
+
+    @app.get("/metricas")
+    async def metricas():
+        return stub.metricas()
+
+    @app.delete("/cache")
+    async def limpiar_cache():
+        stub.limpiar()
+        return {"ok": True}
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Stub local de las APIs de Anthropic y Perplexity")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument(
+        "--min-tokens-cache", type=int, default=0,
+        help="Prefijos mas cortos no se cachean (la API real exige 1024-2048)",
+    )
+    parser.add_argument(
+        "--limite-rpm", type=int, default=0,
+        help="Solicitudes por minuto antes de responder 429 (0 = sin limite)",
+    )
+    parser.add_argument(
+        "--latencia", type=DistribucionLatencia.desde_texto, default=DistribucionLatencia(),
+        help="Latencia al primer byte: fija:MS, uniforme:MIN:MAX o lognormal:MEDIANA:SIGMA",
+    )
+    parser.add_argument(
+        "--latencia-modelo", action="append", default=[], metavar="MODELO=DISTRIBUCION",
+        help="Latencia al primer byte de un modelo (repetible), p. ej. claude-sonnet-4-20250514=fija:3000",
+    )
+    parser.add_argument("--ms-por-token", type=float, default=0.0, help="Latencia por token de salida")
+    parser.add_argument("--tokens-salida", type=int, default=0, help="Largo de las respuestas de texto (0 = eco)")
+    parser.add_argument("--guion", help="JSON con reglas de llamadas a herramientas guionadas")
+    parser.add_argument("--tasa-429", type=float, default=0.0, help="Fraccion de solicitudes con 429 aleatorio")
+    parser.add_argument("--tasa-5xx", type=float, default=0.0, help="Fraccion de solicitudes con 500/529")
+    parser.add_argument("--semilla", type=int, help="Semilla para latencias y fallas reproducibles")
+    args = parser.parse_args()
+    stub = StubAnthropic(
+        args.min_tokens_cache,
+        args.limite_rpm,
+        latencia=args.latencia,
+        latencia_por_modelo={
+            modelo: DistribucionLatencia.desde_texto(distribucion)
+            for modelo, distribucion in (opcion.split("=", 1) for opcion in args.latencia_modelo)
+        },
+        ms_por_token=args.ms_por_token,
+        tokens_salida=args.tokens_salida,
+        guion=cargar_guion(args.guion) if args.guion else None,
+        tasa_429=args.tasa_429,
+        tasa_5xx=args.tasa_5xx,
+        semilla=args.semilla,
+    )
+    uvicorn.run(crear_app(stub), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Tests de la escritura en lote de los mensajes del turno.
+"""
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+from uuid import uuid4
+
+import pytest
+
+from app.schemas.asistente import ChatRequest, ContextoAsistente
+from app.services.asistente import AsistenteService, ResultadoHerramienta
+
+
+def _respuesta(*bloques, stop_reason="tool_use"):
+    return SimpleNamespace(content=list(bloques), stop_reason=stop_reason, usage=None)
+
+
+def _texto(texto):
+    return SimpleNamespace(type="text", text=texto)
+
+
+def _tool_use(id_, nombre, entrada):
+    return SimpleNamespace(type="tool_use", id=id_, name=nombre, input=entrada)
+
+
+@pytest.fixture
+def servicio(mock_db):
+    """Servicio con conversacion, contexto y herramientas simulados."""
+    resultado = MagicMock()
+    resultado.scalars.return_value.all.return_value = []
+    mock_db.execute = AsyncMock(return_value=resultado)
+
+    servicio = AsistenteService(mock_db)
+    servicio._obtener_o_crear_conversacion = AsyncMock(
+        return_value=SimpleNamespace(id=uuid4(), resumen=None, resumen_hasta=None)
+    )
+    servicio.gestor_contexto.obtener_contexto = AsyncMock(return_value=ContextoAsistente(session_id=uuid4()))
+    return servicio
+
+
+def _cliente(*respuestas):
+    pendientes = list(respuestas)
+    mensajes = SimpleNamespace(create=AsyncMock(side_effect=lambda **kwargs: pendientes.pop(0)))
+    return SimpleNamespace(beta=SimpleNamespace(prompt_caching=SimpleNamespace(messages=mensajes)))
+
+
+class TestBufferMensajes:
+    """Tests del buffer de mensajes de GestorMemoria."""
+
+    @pytest.mark.asyncio
+    async def test_turno_con_herramientas_escribe_una_vez_y_en_orden(self, servicio, mock_db):
+        """Test que un turno de varias iteraciones escribe todos sus mensajes en un solo flush."""
+        servicio._cliente = _cliente(
+            _respuesta(_texto("Busco."), _tool_use("t1", "buscar_normativa", {"query": "EIA"})),
+            _respuesta(_tool_use("t2", "consultar_proyecto", {"proyecto_id": 7})),
+            _respuesta(_texto("Se requiere EIA."), stop_reason="end_turn"),
+        )
+        servicio.ejecutor.ejecutar_tools = AsyncMock(side_effect=lambda llamadas, **kwargs: [
+            (ResultadoHerramienta(exito=True, contenido={"ok": nombre}), None) for nombre, _ in llamadas
+        ])
+
+        respuesta = await servicio.chat(ChatRequest(mensaje="¿Requiere EIA?", session_id=uuid4()))
+
+        assert mock_db.flush.await_count == 1
+        mock_db.commit.assert_awaited_once()
+        escritos = mock_db.add_all.call_args.args[0]
+        assert [(m.rol, m.tool_call_id) for m in escritos] == [
+            ("user", None), ("assistant", None), ("tool", "t1"),
+            ("assistant", None), ("tool", "t2"), ("assistant", None),
+        ]
+        marcas = [m.created_at for m in escritos]
+        assert marcas == sorted(marcas) and len(set(marcas)) == len(marcas)
+        assert respuesta.mensaje.id == escritos[-1].id
+        assert servicio.gestor_memoria.pendientes == []
+
+    @pytest.mark.asyncio
+    async def test_pausa_por_confirmacion_vuelca_antes_de_redactarla(self, servicio, mock_db):
+        """Test que los mensajes se escriben antes de la llamada que redacta la confirmacion."""
+        servicio._cliente = _cliente(
+            _respuesta(_tool_use("t1", "actualizar_proyecto", {"proyecto_id": 7, "nombre": "Cobre"})),
+        )
+        accion = SimpleNamespace(id=uuid4())
+        servicio.ejecutor.ejecutar_tools = AsyncMock(return_value=[
+            (ResultadoHerramienta(exito=True, contenido={"accion_pendiente": True}), accion),
+        ])
+        pendientes_al_confirmar = []
+
+        async def confirmacion(*args):
+            pendientes_al_confirmar.append(len(servicio.gestor_memoria.pendientes))
+            return "¿Confirmas el cambio?"
+
+        servicio._generar_mensaje_confirmacion = confirmacion
+        conversacion_id = uuid4()
+        await servicio.gestor_memoria.guardar_mensaje(conversacion_id, "user", "Renombra el proyecto")
+
+        respuesta, _, _, pendiente = await servicio._ejecutar_loop_tool_use(
+            "sistema", [{"role": "user", "content": "Renombra el proyecto"}], [], conversacion_id,
+        )
+
+        assert pendiente is accion
+        assert respuesta == "¿Confirmas el cambio?"
+        assert pendientes_al_confirmar == [0]
+        assert [m.rol for m in mock_db.add_all.call_args.args[0]] == ["user", "assistant", "tool"]
+
+    @pytest.mark.asyncio
+    async def test_historial_incluye_mensajes_pendientes(self, servicio):
+        """Test que el mensaje del usuario encolado forma parte del historial del turno."""
+        conversacion = SimpleNamespace(id=uuid4(), resumen=None, resumen_hasta=None)
+        await servicio.gestor_memoria.guardar_mensaje(conversacion.id, "user", "¿Y la linea de base?")
+        await servicio.gestor_memoria.guardar_mensaje(uuid4(), "user", "otra conversacion")
+
+        historial = await servicio.gestor_memoria.construir_historial(conversacion)
+
+        assert historial == [{"role": "user", "content": "¿Y la linea de base?"}]
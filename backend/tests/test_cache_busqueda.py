@@ -0,0 +1,143 @@
+"""
+Tests de la caché de resultados de búsqueda por versión del corpus.
+"""
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.services.rag.busqueda import BuscadorLegal
+from app.services.rag.cache_busqueda import CacheBusqueda, normalizar_query
+
+
+def _resultado_version(version: int) -> MagicMock:
+    return MagicMock(scalar=MagicMock(return_value=version))
+
+
+def _resultado_filas(similitudes) -> MagicMock:
+    filas = []
+    for i, similitud in enumerate(similitudes, start=1):
+        fila = MagicMock()
+        fila.fragmento_id = i
+        fila.documento_id = 1
+        fila.documento_titulo = "Ley 19.300"
+        fila.documento_tipo = "Ley"
+        fila.seccion = f"Artículo {i}"
+        fila.contenido = "Contenido"
+        fila.temas = ["eia"]
+        fila.similitud = similitud
+        filas.append(fila)
+    return MagicMock(fetchall=MagicMock(return_value=filas))
+
+
+class TestCacheBusqueda:
+    """Tests de la estructura de caché."""
+
+    def test_clave_normaliza_query_y_filtros(self):
+        """Test que consultas equivalentes producen la misma clave."""
+        a = CacheBusqueda.clave("buscador", "  Áreas   PROTEGIDAS ", limite=5, temas=["agua", "eia"])
+        b = CacheBusqueda.clave("buscador", "áreas protegidas", temas=["eia", "agua"], limite=5)
+        c = CacheBusqueda.clave("buscador", "áreas protegidas", limite=6, temas=["eia", "agua"])
+
+        assert a == b
+        assert a != c
+        assert normalizar_query("Glaciares\n de  Roca") == "glaciares de roca"
+
+    def test_acierto_y_invalidacion_por_version(self):
+        """Test que un cambio de versión del corpus invalida la entrada."""
+        cache = CacheBusqueda(max_entradas=10, ttl_segundos=60)
+        clave = cache.clave("buscador", "agua")
+        cache.guardar(clave, 1, ["r"])
+
+        assert cache.obtener(clave, 1) == ["r"]
+        assert cache.obtener(clave, 2) is None
+        assert cache.obtener(clave, 1) is None  # la entrada ya fue descartada
+
+        metricas = cache.metricas()
+        assert metricas["aciertos"] == 1
+        assert metricas["invalidadas"] == 1
+        assert metricas["fallos"] == 2
+        assert metricas["tasa_aciertos"] == pytest.approx(1 / 3, abs=1e-4)
+
+    def test_expiracion_por_ttl(self):
+        """Test que las entradas expiran según su TTL."""
+        cache = CacheBusqueda(max_entradas=10, ttl_segundos=30)
+        clave = cache.clave("buscador", "agua")
+
+        with patch("app.services.rag.cache_busqueda.time.monotonic", return_value=100.0):
+            cache.guardar(clave, 1, ["r"])
+        with patch("app.services.rag.cache_busqueda.time.monotonic", return_value=129.0):
+            assert cache.obtener(clave, 1) == ["r"]
+        with patch("app.services.rag.cache_busqueda.time.monotonic", return_value=131.0):
+            assert cache.obtener(clave, 1) is None
+
+        assert cache.metricas()["expiradas"] == 1
+
+    def test_desalojo_lru(self):
+        """Test que al superar el máximo se desaloja la entrada menos usada."""
+        cache = CacheBusqueda(max_entradas=2, ttl_segundos=60)
+        a, b, c = (cache.clave("buscador", q) for q in ("a", "b", "c"))
+        cache.guardar(a, 1, "A")
+        cache.guardar(b, 1, "B")
+        cache.obtener(a, 1)  # "a" pasa a ser la más reciente
+        cache.guardar(c, 1, "C")
+
+        assert cache.obtener(b, 1) is None
+        assert cache.obtener(a, 1) == "A"
+        assert cache.obtener(c, 1) == "C"
+        assert cache.metricas()["desalojadas"] == 1
+        assert cache.metricas()["entradas"] == 2
+
+
+class TestBuscadorConCache:
+    """Tests de la integración de la caché con BuscadorLegal."""
+
+    @pytest.fixture
+    def buscador(self, mock_embedding_service):
+        """Fixture del buscador con mock de embeddings."""
+        with patch('app.services.rag.busqueda.get_embedding_service', return_value=mock_embedding_service):
+            return BuscadorLegal()
+
+    @pytest.mark.asyncio
+    async def test_busqueda_repetida_no_consulta_pgvector(self, buscador, mock_db):
+        """Test que una búsqueda repetida se sirve desde caché sin embedding ni SQL vectorial."""
+        mock_db.execute = AsyncMock(side_effect=[
+            _resultado_version(7),
+            _resultado_filas([0.9, 0.8]),
+            _resultado_version(7),
+        ])
+
+        primera = await buscador.buscar(mock_db, "Requisitos EIA", limite=5)
+        segunda = await buscador.buscar(mock_db, "requisitos  eia", limite=5)
+
+        assert [r.fragmento_id for r in segunda] == [r.fragmento_id for r in primera]
+        assert mock_db.execute.await_count == 3
+        assert buscador.embedding_service.embed_text.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_cambio_de_corpus_repite_busqueda(self, buscador, mock_db):
+        """Test que tras modificar el corpus la búsqueda vuelve a la base de datos."""
+        mock_db.execute = AsyncMock(side_effect=[
+            _resultado_version(7),
+            _resultado_filas([0.9]),
+            _resultado_version(8),
+            _resultado_filas([0.9, 0.85]),
+        ])
+
+        primera = await buscador.buscar(mock_db, "glaciares")
+        segunda = await buscador.buscar(mock_db, "glaciares")
+
+        assert len(primera) == 1
+        assert len(segunda) == 2
+        assert buscador.embedding_service.embed_text.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_cache_deshabilitada(self, buscador, mock_db):
+        """Test que con la caché deshabilitada no se lee la versión del corpus."""
+        mock_db.execute = AsyncMock(return_value=_resultado_filas([0.9]))
+
+        with patch("app.services.rag.busqueda.settings.RAG_CACHE_HABILITADO", False):
+            await buscador.buscar(mock_db, "agua")
+            await buscador.buscar(mock_db, "agua")
+
+        assert mock_db.execute.await_count == 2
+        assert all("corpus_version" not in str(c.args[0]) for c in mock_db.execute.call_args_list)
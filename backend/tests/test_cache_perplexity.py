@@ -0,0 +1,121 @@
+"""
+Tests de la caché y coalescencia de búsquedas web en Perplexity.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.llm.cache_perplexity import CachePerplexity
+from app.services.llm.perplexity_client import PerplexityClient, PerplexityError, PerplexityResponse
+
+from tests.stub_anthropic import DistribucionLatencia, StubAnthropic, crear_app
+
+
+def _cliente(stub, cache):
+    cliente = PerplexityClient(api_key="stub", cache=cache)
+    cliente._client = httpx.AsyncClient(
+        base_url="http://stub", transport=httpx.ASGITransport(app=crear_app(stub)),
+    )
+    return cliente
+
+
+class TestCachePerplexity:
+    """Tests de single-flight, TTL y stale-while-revalidate."""
+
+    def test_clave_normaliza_mayusculas_espacios_y_signos(self):
+        """Test que variantes triviales de la consulta comparten clave, pero no el modo."""
+        clave = CachePerplexity.clave("¿Cambios recientes al  reglamento del SEIA?", "chat")
+
+        assert CachePerplexity.clave("cambios recientes al reglamento del seia", "chat") == clave
+        assert CachePerplexity.clave("cambios recientes al reglamento del seia", "research") != clave
+        assert CachePerplexity.clave("cambios recientes al reglamento del seia", "chat", False) != clave
+
+    @pytest.mark.asyncio
+    async def test_consultas_concurrentes_comparten_una_solicitud(self):
+        """Test que búsquedas idénticas simultáneas hacen una sola llamada y luego sale de caché."""
+        stub = StubAnthropic(latencia=DistribucionLatencia("fija", 50))
+        cache = CachePerplexity(ttl_segundos=60)
+        cliente = _cliente(stub, cache)
+
+        respuestas = await asyncio.gather(
+            cliente.buscar("Plazos de una DIA"),
+            cliente.buscar("plazos de una dia?"),
+            cliente.buscar("  PLAZOS de una DIA "),
+        )
+        despues = await cliente.buscar("plazos de una DIA")
+
+        assert stub.metricas()["por_ruta"] == {"chat_completions": 1}
+        assert len({r.contenido for r in respuestas}) == 1
+        assert sorted(r.metadata.get("cache", "") for r in respuestas) == ["", "coalescida", "coalescida"]
+        assert despues.metadata["cache"] == "acierto"
+        assert cache.metricas()["coalescidas"] == 2 and cache.metricas()["aciertos"] == 1
+
+    @pytest.mark.asyncio
+    async def test_cancelar_un_llamador_no_cancela_a_los_demas(self):
+        """Test que la solicitud compartida sigue si el primer llamador se cancela."""
+        stub = StubAnthropic(latencia=DistribucionLatencia("fija", 50))
+        cliente = _cliente(stub, CachePerplexity())
+
+        primero = asyncio.create_task(cliente.buscar("umbral de producción minera"))
+        await asyncio.sleep(0.01)
+        segundo = asyncio.create_task(cliente.buscar("umbral de producción minera"))
+        await asyncio.sleep(0.01)
+        primero.cancel()
+
+        respuesta = await segundo
+        assert respuesta.contenido == "stub: umbral de producción minera"
+        assert stub.metricas()["por_ruta"] == {"chat_completions": 1}
+
+    @pytest.mark.asyncio
+    async def test_obsoleta_se_sirve_y_revalida_en_segundo_plano(self):
+        """Test que con SWR una entrada vencida responde al instante y se refresca una vez."""
+        respuestas = iter(["versión 1", "versión 2", "versión 3"])
+
+        async def buscar():
+            await asyncio.sleep(0.02)
+            return PerplexityResponse(contenido=next(respuestas), fuentes=[], modelo="sonar-pro", tokens_usados=10)
+
+        def envejecer(segundos):
+            entrada = cache._entradas[clave]
+            entrada.fresca_hasta -= segundos
+            entrada.obsoleta_hasta -= segundos
+
+        cache = CachePerplexity(ttl_segundos=60, obsoleto_segundos=600)
+        clave = cache.clave("reglamento SEIA", "chat")
+
+        inicial = await cache.obtener_o_buscar(clave, buscar, servir_obsoleto=True)
+        envejecer(120)
+        obsoletas = [await cache.obtener_o_buscar(clave, buscar, servir_obsoleto=True) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        refrescada = await cache.obtener_o_buscar(clave, buscar, servir_obsoleto=True)
+        envejecer(1000)
+        fuera_de_ventana = await cache.obtener_o_buscar(clave, buscar, servir_obsoleto=True)
+
+        assert inicial.contenido == "versión 1"
+        assert [r.contenido for r in obsoletas] == ["versión 1"] * 3
+        assert {r.metadata["cache"] for r in obsoletas} == {"obsoleto"}
+        assert (refrescada.contenido, refrescada.metadata["cache"]) == ("versión 2", "acierto")
+        assert fuera_de_ventana.contenido == "versión 3" and "cache" not in fuera_de_ventana.metadata
+        assert cache.metricas()["revalidaciones"] == 1
+
+    @pytest.mark.asyncio
+    async def test_errores_no_se_cachean_y_sin_swr_se_consulta(self):
+        """Test que un error se propaga a todos sin quedar guardado y el TTL vencido sin SWR vuelve a consultar."""
+        stub = StubAnthropic(tasa_5xx=1.0, semilla=1)
+        cache = CachePerplexity(ttl_segundos=0, obsoleto_segundos=60)
+        cliente = _cliente(stub, cache)
+
+        errores = await asyncio.gather(
+            cliente.buscar("guías del SEA"), cliente.buscar("guías del SEA"), return_exceptions=True,
+        )
+        stub.tasa_5xx = 0.0
+        await cliente.buscar("guías del SEA", servir_obsoleto=False)
+        await cliente.buscar("guías del SEA", servir_obsoleto=False)
+        await cliente.buscar("guías del SEA", usar_cache=False)
+
+        assert all(isinstance(e, PerplexityError) for e in errores)
+        assert stub.metricas()["errores_5xx"] == 1
+        assert stub.metricas()["llamadas"] == 3
+        assert cache.metricas()["obsoletas"] == 0
@@ -0,0 +1,191 @@
+"""
+Tests para la clasificación por lotes de fragmentos con LLM.
+
+Usa un LLM stub local que responde JSON por fragmento, sin llamadas reales.
+"""
+
+import asyncio
+import re
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from app.services.llm.clasificador import ClasificadorLLM
+from app.services.rag.ingestor import IngestorLegal
+
+
+class StubLLM:
+    """Stub de ClienteLLM que clasifica cada fragmento del prompt como 'agua'."""
+
+    def __init__(self, latencia: float = 0.0, fallar_paquetes: int = 0, omitir: int = 0):
+        self.latencia = latencia
+        self.fallar_paquetes = fallar_paquetes
+        self.omitir = omitir
+        self.llamadas = []
+        self.en_vuelo = 0
+        self.max_en_vuelo = 0
+
+    async def generar_estructurado(self, prompt_usuario: str, **kwargs):
+        indices = [int(n) for n in re.findall(r"\[FRAGMENTO (\d+)\]", prompt_usuario)]
+        self.llamadas.append(indices)
+        self.en_vuelo += 1
+        self.max_en_vuelo = max(self.max_en_vuelo, self.en_vuelo)
+        try:
+            await asyncio.sleep(self.latencia)
+        finally:
+            self.en_vuelo -= 1
+
+        if self.fallar_paquetes > 0:
+            self.fallar_paquetes -= 1
+            return {"data": None, "error": "JSON inválido"}
+
+        return {
+            "data": {
+                "fragmentos": [
+                    {
+                        "indice": i,
+                        "temas": [{"codigo": "agua", "confianza": 0.9}],
+                        "triggers_art11": ["b"],
+                        "componentes_ambientales": ["agua"],
+                        "confianza_general": 0.9,
+                    }
+                    for i in indices[self.omitir:]
+                ]
+            }
+        }
+
+
+@pytest.fixture
+def mock_db_temas(mock_db):
+    """Sesión mock que retorna un catálogo mínimo de temas."""
+    result = MagicMock()
+    result.fetchall.return_value = [
+        ("agua", "Recursos hídricos", "componente", ["río", "caudal"]),
+    ]
+    mock_db.execute.return_value = result
+    return mock_db
+
+
+class TestClasificacionLote:
+    """Tests de ClasificadorLLM.clasificar_fragmentos_lote."""
+
+    @pytest.mark.asyncio
+    async def test_empaqueta_fragmentos_por_lote(self, mock_db_temas):
+        """Test que agrupa los fragmentos en paquetes del tamaño configurado."""
+        stub = StubLLM()
+        clasificador = ClasificadorLLM(cliente_llm=stub)
+        textos = [f"fragmento {i}" for i in range(10)]
+
+        resultados = await clasificador.clasificar_fragmentos_lote(
+            mock_db_temas, textos, tamano_lote=4, max_concurrencia=2
+        )
+
+        assert len(stub.llamadas) == 3
+        assert sorted(len(p) for p in stub.llamadas) == [2, 4, 4]
+        assert all(r is not None for r in resultados)
+        assert resultados[0].triggers_art11 == ["b"]
+
+    @pytest.mark.asyncio
+    async def test_respeta_semaforo_de_concurrencia(self, mock_db_temas):
+        """Test que no excede el número de llamadas simultáneas."""
+        stub = StubLLM(latencia=0.02)
+        clasificador = ClasificadorLLM(cliente_llm=stub)
+
+        await clasificador.clasificar_fragmentos_lote(
+            mock_db_temas, ["texto"] * 40, tamano_lote=2, max_concurrencia=3
+        )
+
+        assert len(stub.llamadas) == 20
+        assert stub.max_en_vuelo == 3
+
+    @pytest.mark.asyncio
+    async def test_reintenta_solo_paquetes_fallidos(self, mock_db_temas):
+        """Test que sólo los paquetes fallidos se vuelven a enviar."""
+        stub = StubLLM(fallar_paquetes=1)
+        clasificador = ClasificadorLLM(cliente_llm=stub)
+
+        resultados = await clasificador.clasificar_fragmentos_lote(
+            mock_db_temas, ["texto"] * 6, tamano_lote=2, max_concurrencia=1, reintentos=2
+        )
+
+        assert len(stub.llamadas) == 4
+        assert all(r is not None for r in resultados)
+
+    @pytest.mark.asyncio
+    async def test_fragmentos_omitidos_quedan_sin_clasificar(self, mock_db_temas):
+        """Test que los fragmentos omitidos por el modelo retornan None."""
+        stub = StubLLM(omitir=1)
+        clasificador = ClasificadorLLM(cliente_llm=stub)
+
+        resultados = await clasificador.clasificar_fragmentos_lote(
+            mock_db_temas, ["a", "b", "c", "d"], tamano_lote=2, reintentos=0
+        )
+
+        assert resultados[0] is None
+        assert resultados[1] is not None
+        assert resultados[2] is None
+        assert resultados[3] is not None
+
+
+class TestIngestorClasificacionLLM:
+    """Tests del fallback por fragmento en IngestorLegal."""
+
+    @pytest.mark.asyncio
+    async def test_fallback_keywords_por_fragmento(self, mock_db, mock_embedding_service):
+        """Test que los fragmentos sin clasificación LLM usan keywords."""
+        temas_result = MagicMock()
+        temas_result.fetchall.return_value = [(1, "agua", "Agua", ["caudal"])]
+        mock_db.execute.return_value = temas_result
+
+        stub = StubLLM(omitir=1)
+        with patch('app.services.rag.ingestor.get_embedding_service', return_value=mock_embedding_service):
+            ingestor = IngestorLegal(clasificador=ClasificadorLLM(cliente_llm=stub))
+
+        fragmentos = [
+            {"seccion": "Artículo 1", "numero_seccion": "1", "contenido": "El caudal del río."},
+            {"seccion": "Artículo 2", "numero_seccion": "2", "contenido": "Texto genérico."},
+        ]
+        with patch('app.services.llm.clasificador.settings') as mock_settings:
+            mock_settings.RAG_CLASIFICACION_LOTE = 2
+            mock_settings.RAG_CLASIFICACION_CONCURRENCIA = 1
+            mock_settings.RAG_CLASIFICACION_REINTENTOS = 0
+            resultados = await ingestor._clasificar_fragmentos_con_llm(mock_db, fragmentos)
+
+        assert len(stub.llamadas) == 1
+        assert resultados[0].temas_codigos == ["agua"]
+        assert resultados[0].triggers_art11 == []
+        assert resultados[1].triggers_art11 == ["b"]
+
+    @pytest.mark.asyncio
+    async def test_items_mal_formados_usan_keywords(self, mock_db, mock_embedding_service):
+        """Test que un item de lote con temas inválidos cae a keywords sin abortar la ingesta."""
+        temas_result = MagicMock()
+        temas_result.fetchall.return_value = [(1, "agua", "Agua", ["caudal"])]
+        mock_db.execute.return_value = temas_result
+
+        class StubMalFormado(StubLLM):
+            async def generar_estructurado(self, prompt_usuario: str, **kwargs):
+                respuesta = await super().generar_estructurado(prompt_usuario, **kwargs)
+                fragmentos = respuesta["data"]["fragmentos"]
+                fragmentos[0]["temas"] = ["agua"]
+                fragmentos[1]["temas"] = [{"codigo": "agua"}]
+                fragmentos[2]["triggers_art11"] = "b"
+                return respuesta
+
+        stub = StubMalFormado()
+        with patch('app.services.rag.ingestor.get_embedding_service', return_value=mock_embedding_service):
+            ingestor = IngestorLegal(clasificador=ClasificadorLLM(cliente_llm=stub))
+
+        fragmentos = [
+            {"seccion": f"Artículo {i}", "numero_seccion": str(i), "contenido": "El caudal del río."}
+            for i in range(1, 5)
+        ]
+        with patch('app.services.llm.clasificador.settings') as mock_settings:
+            mock_settings.RAG_CLASIFICACION_LOTE = 4
+            mock_settings.RAG_CLASIFICACION_CONCURRENCIA = 1
+            mock_settings.RAG_CLASIFICACION_REINTENTOS = 0
+            resultados = await ingestor._clasificar_fragmentos_con_llm(mock_db, fragmentos)
+
+        assert len(resultados) == 4
+        assert [r.triggers_art11 for r in resultados] == [[], [], [], ["b"]]
+        assert all(r.temas_codigos == ["agua"] for r in resultados)
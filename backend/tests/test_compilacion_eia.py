@@ -0,0 +1,155 @@
+"""
+Tests de la compilación paralela de documentos EIA.
+"""
+
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.schemas.generacion_eia import CompilarDocumentoRequest
+from app.services.generacion_eia.service import GeneracionEIAService
+
+
+class _Sesiones:
+    """Fábrica de sesiones que registra cada UPDATE confirmado."""
+
+    def __init__(self):
+        self.sentencias = []
+        self.commits = 0
+
+    @asynccontextmanager
+    async def __call__(self):
+        sesion = AsyncMock()
+        sesion.execute = AsyncMock(side_effect=lambda consulta, parametros: self.sentencias.append(
+            (str(consulta), parametros)
+        ))
+
+        async def commit():
+            self.commits += 1
+
+        sesion.commit = commit
+        yield sesion
+
+    def capitulos_guardados(self):
+        return [p["capitulo"] for sql, p in self.sentencias if "contenido_capitulos" in sql]
+
+    def estados(self, capitulo):
+        return [
+            json.loads(p["estado"])["estado"]
+            for sql, p in self.sentencias if p.get("ruta", [None])[-1] == capitulo
+        ]
+
+
+def _documento(metadatos=None, contenido=None):
+    return SimpleNamespace(id=5, contenido_capitulos=contenido or {}, metadatos=metadatos or {}, estadisticas={})
+
+
+@pytest.fixture
+def servicio(mock_db):
+    servicio = GeneracionEIAService(session_factory=_Sesiones(), concurrencia=2)
+    mock_db.execute = AsyncMock()
+    return servicio
+
+
+def _generador(servicio, fallan=(), demora=0.02):
+    """Generador de capítulos falso que mide la concurrencia."""
+    activos = {"ahora": 0, "max": 0}
+
+    async def generar_texto_capitulo(db, proyecto_id, capitulo_numero):
+        activos["ahora"] += 1
+        activos["max"] = max(activos["max"], activos["ahora"])
+        await asyncio.sleep(demora)
+        activos["ahora"] -= 1
+        if capitulo_numero in fallan:
+            raise ValueError("Se excedió el límite de solicitudes a Claude")
+        return {"titulo": f"Capítulo {capitulo_numero}", "contenido": "texto " * 100}
+
+    servicio.generador.generar_texto_capitulo = AsyncMock(side_effect=generar_texto_capitulo)
+    return activos
+
+
+class TestCompilacionParalela:
+    """Tests de compilar_documento con concurrencia acotada y reanudación."""
+
+    @pytest.mark.asyncio
+    async def test_capitulos_en_paralelo_y_persistidos_al_terminar(self, servicio, mock_db):
+        """Test que se respeta la concurrencia y un capítulo fallido no impide guardar los demás."""
+        servicio._get_or_create_documento = AsyncMock(return_value=_documento())
+        activos = _generador(servicio, fallan={3})
+
+        resultado = await servicio.compilar_documento(
+            mock_db, 1, CompilarDocumentoRequest(incluir_capitulos=[1, 2, 3, 4, 5]),
+        )
+
+        assert activos["max"] == 2
+        assert resultado.capitulos_generados == [1, 2, 4, 5]
+        assert resultado.capitulos_con_error == [3]
+        sesiones = servicio.session_factory
+        assert sorted(sesiones.capitulos_guardados()) == ["1", "2", "4", "5"]
+        assert sesiones.estados("3") == ["generando", "error"]
+        assert sesiones.estados("4") == ["generando", "completado"]
+        # Un commit por cambio de estado de cada capítulo
+        assert sesiones.commits == 10
+        cierre = mock_db.execute.await_args_list[-1].args[1]
+        assert json.loads(cierre["estado"]) == "con_errores"
+        assert resultado.estadisticas.capitulos_completados == 4
+
+    @pytest.mark.asyncio
+    async def test_reanudar_omite_capitulos_completados(self, servicio, mock_db):
+        """Test que reanudar genera solo los capítulos pendientes o fallidos de la compilación."""
+        previa = {
+            "id": "abc",
+            "estado": "con_errores",
+            "capitulos": {
+                "1": {"estado": "completado", "duracion_segundos": 40},
+                "2": {"estado": "completado", "duracion_segundos": 50},
+                "3": {"estado": "error", "error": "timeout"},
+                "4": {"estado": "generando"},
+            },
+        }
+        contenido = {"1": {"contenido": "uno"}, "2": {"contenido": "dos"}}
+        servicio._get_or_create_documento = AsyncMock(return_value=_documento({"compilacion": previa}, contenido))
+        _generador(servicio)
+
+        resultado = await servicio.compilar_documento(
+            mock_db, 1, CompilarDocumentoRequest(regenerar_existentes=True, reanudar=True),
+        )
+
+        assert resultado.compilacion_id == "abc"
+        assert resultado.capitulos_omitidos == [1, 2]
+        assert resultado.capitulos_generados == [3, 4]
+        llamados = [c.kwargs["capitulo_numero"] for c in servicio.generador.generar_texto_capitulo.await_args_list]
+        assert sorted(llamados) == [3, 4]
+        assert resultado.estadisticas.capitulos_completados == 4
+
+    @pytest.mark.asyncio
+    async def test_progreso_en_vivo(self, servicio, mock_db):
+        """Test que el progreso refleja capítulos generando y con error de la compilación en curso."""
+        inicio = (datetime.utcnow() - timedelta(seconds=20)).isoformat()
+        compilacion = {
+            "id": "abc",
+            "estado": "en_curso",
+            "capitulos": {
+                "1": {"estado": "completado", "duracion_segundos": 40},
+                "2": {"estado": "generando", "inicio": inicio},
+                "3": {"estado": "error", "error": "timeout"},
+                "4": {"estado": "pendiente"},
+            },
+        }
+        documento = _documento({"compilacion": compilacion}, {"1": {"titulo": "Uno", "contenido": "a b c"}})
+        servicio._get_documento_by_proyecto = AsyncMock(return_value=documento)
+
+        progreso = {p.capitulo_numero: p for p in await servicio.get_progreso_generacion(mock_db, 1)}
+
+        assert (progreso[1].estado, progreso[1].palabras_generadas) == ("completado", 3)
+        assert progreso[2].estado == "generando"
+        assert 40 <= progreso[2].progreso_porcentaje <= 60
+        assert progreso[2].tiempo_estimado_segundos == pytest.approx(20, abs=2)
+        assert (progreso[3].estado, progreso[3].error) == ("error", "timeout")
+        assert progreso[4].estado == "pendiente" and progreso[4].tiempo_estimado_segundos == 40
+        assert progreso[11].estado == "pendiente"
@@ -0,0 +1,141 @@
+"""
+Tests de la ejecución de herramientas del asistente.
+"""
+
+import asyncio
+import time
+from typing import Any, Dict
+from unittest.mock import AsyncMock, MagicMock, patch
+from uuid import uuid4
+
+import pytest
+
+from app.services.asistente import EjecutorHerramientas
+from app.services.asistente.tools import (
+    Herramienta,
+    PermisoHerramienta,
+    RegistroHerramientas,
+    ResultadoHerramienta,
+)
+
+DEMORA = 0.2
+
+
+def _registro(ejecuciones):
+    """Registro con herramientas de prueba que anotan la sesión usada."""
+    registro = RegistroHerramientas()
+
+    class _Base(Herramienta):
+        def set_db(self, db):
+            self._db = db
+
+        @classmethod
+        def get_schema(cls) -> Dict[str, Any]:
+            return {"type": "object", "properties": {}}
+
+        async def ejecutar(self, db=None, **kwargs) -> ResultadoHerramienta:
+            ejecuciones.append((self.nombre, db, time.perf_counter()))
+            await asyncio.sleep(DEMORA)
+            return ResultadoHerramienta(exito=True, contenido={"tool": self.nombre, **kwargs})
+
+    @registro.registrar
+    class ConsultarA(_Base):
+        nombre = "consultar_a"
+
+    @registro.registrar
+    class ConsultarB(_Base):
+        nombre = "consultar_b"
+
+    @registro.registrar
+    class ConsultarC(_Base):
+        nombre = "consultar_c"
+
+    @registro.registrar
+    class Guardar(_Base):
+        nombre = "guardar"
+        permisos = [PermisoHerramienta.ESCRITURA]
+
+    return registro
+
+
+def _fabrica_sesiones(sesiones):
+    def fabrica():
+        sesion = MagicMock()
+        sesion.rollback = AsyncMock()
+        sesiones.append(sesion)
+        contexto = MagicMock()
+        contexto.__aenter__ = AsyncMock(return_value=sesion)
+        contexto.__aexit__ = AsyncMock(return_value=False)
+        return contexto
+    return fabrica
+
+
+class TestEjecucionParalela:
+    """Tests del despacho concurrente de herramientas de solo lectura."""
+
+    @pytest.mark.asyncio
+    async def test_lecturas_en_paralelo_con_sesiones_propias(self, mock_db):
+        """Test que varias lecturas tardan lo que la más lenta y usan sesiones separadas."""
+        ejecuciones, sesiones = [], []
+        ejecutor = EjecutorHerramientas(mock_db, session_factory=_fabrica_sesiones(sesiones))
+
+        with patch("app.services.asistente.service.registro_herramientas", _registro(ejecuciones)):
+            inicio = time.perf_counter()
+            resultados = await ejecutor.ejecutar_tools(
+                [("consultar_a", {"n": 1}), ("consultar_b", {"n": 2}), ("consultar_c", {"n": 3})],
+                conversacion_id=uuid4(),
+            )
+            duracion = time.perf_counter() - inicio
+
+        assert duracion < DEMORA * 2
+        assert [r.contenido["tool"] for r, _ in resultados] == ["consultar_a", "consultar_b", "consultar_c"]
+        assert [r.contenido["n"] for r, _ in resultados] == [1, 2, 3]
+        assert len(sesiones) == 3
+        assert {id(db) for _, db, _ in ejecuciones} == {id(s) for s in sesiones}
+        for sesion in sesiones:
+            sesion.rollback.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_escrituras_en_serie_sobre_sesion_principal(self, mock_db):
+        """Test que la escritura corre en su posición y las lecturas siguientes no se paralelizan."""
+        ejecuciones, sesiones = [], []
+        # La escritura invalida el memo de la conversación
+        mock_db.execute = AsyncMock(return_value=MagicMock(scalar=MagicMock(return_value={"*": 1})))
+        ejecutor = EjecutorHerramientas(mock_db, session_factory=_fabrica_sesiones(sesiones))
+
+        with patch("app.services.asistente.service.registro_herramientas", _registro(ejecuciones)):
+            resultados = await ejecutor.ejecutar_tools(
+                [("consultar_a", {}), ("consultar_b", {}), ("guardar", {}), ("consultar_c", {})],
+                conversacion_id=uuid4(),
+            )
+
+        assert [r.contenido["tool"] for r, _ in resultados] == ["consultar_a", "consultar_b", "guardar", "consultar_c"]
+        por_nombre = {nombre: (db, t) for nombre, db, t in ejecuciones}
+        # Lecturas previas a la escritura: paralelas y aisladas
+        assert len(sesiones) == 2
+        # La escritura y la lectura posterior usan la sesión principal, en orden
+        assert por_nombre["guardar"][0] is mock_db
+        assert por_nombre["consultar_c"][0] is mock_db
+        assert por_nombre["guardar"][1] >= max(por_nombre["consultar_a"][1], por_nombre["consultar_b"][1])
+        assert por_nombre["consultar_c"][1] >= por_nombre["guardar"][1] + DEMORA * 0.9
+
+    @pytest.mark.asyncio
+    async def test_lectura_unica_usa_sesion_principal(self, mock_db):
+        """Test que una sola lectura no abre sesiones adicionales."""
+        ejecuciones, sesiones = [], []
+        ejecutor = EjecutorHerramientas(mock_db, session_factory=_fabrica_sesiones(sesiones))
+
+        with patch("app.services.asistente.service.registro_herramientas", _registro(ejecuciones)):
+            await ejecutor.ejecutar_tools([("consultar_a", {})], conversacion_id=uuid4())
+
+        assert sesiones == []
+        assert ejecuciones[0][1] is mock_db
+
+    def test_es_solo_lectura(self):
+        """Test de la clasificación de herramientas de solo lectura."""
+        from app.services.asistente import registro_herramientas
+
+        assert registro_herramientas.obtener("buscar_normativa").es_solo_lectura()
+        assert registro_herramientas.obtener("consultar_proyecto").es_solo_lectura()
+        assert not registro_herramientas.obtener("guardar_ficha").es_solo_lectura()
+        assert not registro_herramientas.obtener("crear_proyecto").es_solo_lectura()
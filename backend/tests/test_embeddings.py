@@ -91,3 +91,33 @@ class TestEmbeddingServiceSingleton:
 
             # Debe ser la misma instancia (singleton via lru_cache)
             assert service1 is service2
+
+
+class TestVectorSql:
+    """Tests del literal SQL de embeddings."""
+
+    def test_vector_sql_usa_tipo_configurado(self):
+        """Test que el literal se convierte al tipo de almacenamiento configurado."""
+        from app.services.rag.embeddings import vector_sql
+
+        with patch("app.services.rag.embeddings.settings.EMBEDDING_ALMACENAMIENTO", "halfvec"):
+            assert vector_sql([0.5, -1.0]) == "'[0.5,-1.0]'::halfvec"
+        with patch("app.services.rag.embeddings.settings.EMBEDDING_ALMACENAMIENTO", "vector"):
+            assert vector_sql([0.5, -1.0]) == "'[0.5,-1.0]'::vector"
+
+    @pytest.mark.asyncio
+    async def test_busqueda_castea_consulta_a_halfvec(self, mock_db, mock_embedding_service):
+        """Test que la búsqueda compara contra la columna con un vector del mismo tipo."""
+        from app.services.rag.busqueda import BuscadorLegal
+
+        with patch('app.services.rag.busqueda.get_embedding_service', return_value=mock_embedding_service):
+            buscador = BuscadorLegal()
+        mock_db.execute.return_value = MagicMock(fetchall=MagicMock(return_value=[]))
+
+        with patch("app.services.rag.embeddings.settings.EMBEDDING_ALMACENAMIENTO", "halfvec"), \
+             patch("app.services.rag.busqueda.settings.RAG_CACHE_HABILITADO", False):
+            await buscador.buscar(mock_db, "glaciares")
+
+        sql = str(mock_db.execute.call_args[0][0])
+        assert "]'::halfvec" in sql
+        assert "::vector" not in sql
@@ -0,0 +1,107 @@
+"""
+Tests para el motor de extracción de texto de PDFs.
+"""
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+fitz = pytest.importorskip("fitz")
+
+from app.services.pdf import extraer_paginas, iterar_paginas, paginas_para_ocr
+from app.services.pdf import extractor
+from app.services.rag.ingestor import extraer_texto_pdf, extraer_texto_pdf_async
+
+
+def _crear_pdf(ruta, paginas):
+    """Crea un PDF: "texto" escribe texto, "imagen" solo una imagen, "" página vacía."""
+    doc = fitz.open()
+    for contenido in paginas:
+        pagina = doc.new_page()
+        if contenido == "imagen":
+            pixmap = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 8, 8), False)
+            pixmap.clear_with(200)
+            pagina.insert_image(fitz.Rect(50, 50, 250, 250), pixmap=pixmap)
+        elif contenido:
+            pagina.insert_text((72, 72), contenido)
+    doc.save(str(ruta))
+    doc.close()
+    return str(ruta)
+
+
+@pytest.fixture
+def pdf_mixto(tmp_path):
+    paginas = [f"Articulo {i}. Texto de la pagina numero {i}." for i in range(1, 11)]
+    paginas[3] = "imagen"
+    paginas[6] = ""
+    return _crear_pdf(tmp_path / "mixto.pdf", paginas)
+
+
+class TestIterarPaginas:
+    """Tests de iterar_paginas."""
+
+    def test_paginas_en_orden_y_deteccion_sin_texto(self, pdf_mixto):
+        """Test que entrega las páginas en orden y marca las escaneadas."""
+        paginas = extraer_paginas(pdf_mixto, procesos=1, paginas_por_bloque=3)
+
+        assert [p.numero for p in paginas] == list(range(1, 11))
+        assert "Articulo 1." in paginas[0].texto
+        assert [p.numero for p in paginas if p.sin_texto] == [4, 7]
+        assert paginas_para_ocr(paginas) == [4]
+
+    def test_extraccion_paralela_igual_a_secuencial(self, pdf_mixto, monkeypatch):
+        """Test que repartir en procesos produce el mismo resultado y orden."""
+        monkeypatch.setattr(extractor.settings, "PDF_EXTRACCION_MIN_PAGINAS_PARALELO", 0)
+        try:
+            paralelas = extraer_paginas(pdf_mixto, procesos=2, paginas_por_bloque=2)
+        finally:
+            extractor.cerrar_pool()
+        secuenciales = extraer_paginas(pdf_mixto, procesos=1)
+
+        assert paralelas == secuenciales
+
+    def test_generador_abandonado_no_falla(self, pdf_mixto):
+        """Test que se puede dejar de consumir el generador a mitad."""
+        generador = iterar_paginas(pdf_mixto, procesos=1, paginas_por_bloque=2)
+        assert next(generador).numero == 1
+        generador.close()
+
+
+class TestExtraerTextoPdf:
+    """Tests del OCR selectivo en extraer_texto_pdf."""
+
+    def test_ocr_solo_de_paginas_escaneadas(self, pdf_mixto, monkeypatch):
+        """Test que solo las páginas escaneadas pasan por OCR, en su posición."""
+        ocr = MagicMock()
+        ocr.procesar_paginas.return_value = {4: "Texto reconocido de la pagina escaneada"}
+        monkeypatch.setattr("app.services.ocr.claude_vision.get_ocr_service", lambda: ocr)
+        monkeypatch.setattr("app.core.config.settings.OCR_VISION_ENABLED", True)
+
+        texto = extraer_texto_pdf(pdf_mixto)
+
+        ocr.procesar_paginas.assert_called_once_with(pdf_mixto, [4])
+        assert texto.index("Articulo 3.") < texto.index("Texto reconocido") < texto.index("Articulo 5.")
+
+    @pytest.mark.asyncio
+    async def test_version_async_no_usa_el_ocr_bloqueante(self, pdf_mixto, monkeypatch):
+        """Test que la versión async espera el OCR en el loop en lugar de bloquearlo."""
+        ocr = MagicMock()
+        ocr.procesar_paginas_async = AsyncMock(return_value={4: "Texto reconocido de la pagina escaneada"})
+        monkeypatch.setattr("app.services.ocr.claude_vision.get_ocr_service", lambda: ocr)
+        monkeypatch.setattr("app.core.config.settings.OCR_VISION_ENABLED", True)
+
+        texto = await extraer_texto_pdf_async(pdf_mixto)
+
+        ocr.procesar_paginas.assert_not_called()
+        ocr.procesar_paginas_async.assert_awaited_once_with(pdf_mixto, [4])
+        assert texto.index("Articulo 3.") < texto.index("Texto reconocido") < texto.index("Articulo 5.")
+
+    def test_sin_ocr_si_no_hay_paginas_escaneadas(self, tmp_path, monkeypatch):
+        """Test que un PDF con capa de texto completa no llama al OCR."""
+        ruta = _crear_pdf(tmp_path / "texto.pdf", [f"Pagina {i} con suficiente texto legal" for i in range(5)])
+        ocr = MagicMock()
+        monkeypatch.setattr("app.services.ocr.claude_vision.get_ocr_service", lambda: ocr)
+
+        texto = extraer_texto_pdf(ruta)
+
+        ocr.procesar_paginas.assert_not_called()
+        assert "Pagina 4" in texto
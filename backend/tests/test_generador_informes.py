@@ -353,6 +353,137 @@ class TestGeneradorInformes:
         assert "RESUMEN EJECUTIVO" in texto
 
 
+# === Tests CacheSecciones ===
+
+class _RedisFalso:
+    """Subconjunto de redis.asyncio.Redis usado por la caché de secciones."""
+
+    def __init__(self):
+        self.datos = {}
+
+    async def get(self, clave):
+        return self.datos.get(clave)
+
+    async def set(self, clave, valor, ex=None):
+        self.datos[clave] = valor
+
+    async def scan_iter(self, match, count=None):
+        import fnmatch
+        for clave in list(self.datos):
+            if fnmatch.fnmatch(clave, match):
+                yield clave
+
+    async def delete(self, *claves):
+        return sum(1 for c in claves if self.datos.pop(c, None) is not None)
+
+
+class TestCacheSecciones:
+    """Tests de la caché de secciones LLM del informe."""
+
+    @pytest.fixture
+    def generador(self):
+        from app.services.llm.cache_secciones import CacheSecciones
+        from app.services.llm.cliente import ConfiguracionLLM
+
+        llamadas = []
+
+        async def generar(prompt_usuario, prompt_sistema=None, **kwargs):
+            llamadas.append(prompt_usuario)
+            response = MagicMock()
+            response.contenido = f"Texto LLM {len(llamadas)}"
+            response.tokens_totales = 1200
+            return response
+
+        cliente = MagicMock()
+        cliente.config = ConfiguracionLLM(modelo="claude-test")
+        cliente.generar = generar
+        generador = GeneradorInformes(cliente_llm=cliente, cache=CacheSecciones(cliente=_RedisFalso()))
+        generador.llamadas = llamadas
+        return generador
+
+    @pytest.mark.asyncio
+    async def test_informe_repetido_no_consume_tokens(self, generador, datos_proyecto, resultado_gis):
+        """Test que regenerar el mismo informe sirve las secciones LLM desde la caché."""
+        secciones = [SeccionInforme.RESUMEN_EJECUTIVO, SeccionInforme.RECOMENDACIONES]
+
+        primero = await generador.generar_informe(datos_proyecto, resultado_gis, [], secciones)
+        segundo = await generador.generar_informe(datos_proyecto, resultado_gis, [], secciones)
+
+        assert len(generador.llamadas) == 2
+        assert primero.tokens_totales == 2400
+        assert segundo.tokens_totales == 0
+        assert [s.contenido for s in segundo.secciones] == [s.contenido for s in primero.secciones]
+        assert all(s.metadata["cache"] and s.metadata["tokens_originales"] == 1200 for s in segundo.secciones)
+        assert generador.cache.metricas()["tokens_ahorrados"] == 2400
+
+    @pytest.mark.asyncio
+    async def test_contexto_distinto_y_forzar_regeneran(self, generador, datos_proyecto, resultado_gis):
+        """Test que un cambio en el prompt o forzar=True vuelven a llamar al LLM."""
+        seccion = SeccionInforme.RESUMEN_EJECUTIVO
+        await generador.generar_seccion_individual(seccion, datos_proyecto, resultado_gis, [])
+
+        otro = await generador.generar_seccion_individual(
+            seccion, {**datos_proyecto, "superficie_ha": 900}, resultado_gis, [],
+        )
+        forzada = await generador.generar_seccion_individual(
+            seccion, datos_proyecto, resultado_gis, [], forzar=True,
+        )
+        cacheada = await generador.generar_seccion_individual(seccion, datos_proyecto, resultado_gis, [])
+
+        assert len(generador.llamadas) == 3
+        assert otro.tokens_usados == 1200 and forzada.tokens_usados == 1200
+        assert cacheada.contenido == forzada.contenido == "Texto LLM 3"
+
+    @pytest.mark.asyncio
+    async def test_invalidar_por_seccion(self, generador, datos_proyecto, resultado_gis):
+        """Test que la invalidación explícita elimina solo la sección indicada."""
+        secciones = [SeccionInforme.RESUMEN_EJECUTIVO, SeccionInforme.RECOMENDACIONES]
+        await generador.generar_informe(datos_proyecto, resultado_gis, [], secciones)
+
+        eliminadas = await generador.cache.invalidar(SeccionInforme.RECOMENDACIONES.value)
+        informe = await generador.generar_informe(datos_proyecto, resultado_gis, [], secciones)
+
+        assert eliminadas == 1
+        assert len(generador.llamadas) == 3
+        assert [s.tokens_usados for s in informe.secciones] == [0, 1200]
+
+    @pytest.mark.asyncio
+    async def test_entrada_corrupta_es_un_fallo(self):
+        """Test que un valor que no es JSON válido se descarta como fallo en lugar de lanzar."""
+        from app.services.llm.cache_secciones import CacheSecciones, clave_seccion
+
+        redis_falso = _RedisFalso()
+        redis_falso.datos[clave_seccion("resumen", "claude-test", "abc")] = "{no es json"
+        cache = CacheSecciones(cliente=redis_falso)
+
+        assert await cache.obtener("resumen", "claude-test", "abc") is None
+        assert redis_falso.datos == {}
+        assert cache.metricas()["fallos"] == 1
+
+    @pytest.mark.asyncio
+    async def test_error_de_redis_suspende_y_reintenta(self, monkeypatch):
+        """Test que tras un error de Redis la caché se suspende un tiempo y luego se vuelve a usar."""
+        import redis
+        from types import SimpleNamespace
+        from app.services.llm import cache_secciones
+
+        ahora = [1000.0]
+        monkeypatch.setattr(cache_secciones, "time", SimpleNamespace(monotonic=lambda: ahora[0]))
+        redis_falso = _RedisFalso()
+        redis_falso.get = AsyncMock(side_effect=[redis.ConnectionError("caído"), None])
+        cache = cache_secciones.CacheSecciones(cliente=redis_falso)
+
+        assert await cache.obtener("resumen", "claude-test", "abc") is None
+        assert cache.metricas()["disponible"] is False
+        assert await cache.obtener("resumen", "claude-test", "abc") is None
+        assert redis_falso.get.await_count == 1
+
+        ahora[0] += cache_secciones.ESPERA_REINTENTO_SEGUNDOS
+        assert await cache.obtener("resumen", "claude-test", "abc") is None
+        assert redis_falso.get.await_count == 2
+        assert cache.metricas()["disponible"] is True
+
+
 # === Tests ExportadorInformes ===
 
 class TestExportadorInformes:
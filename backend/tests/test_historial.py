@@ -0,0 +1,194 @@
+"""
+Tests del historial de conversacion acotado por tokens.
+"""
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from uuid import uuid4
+
+import pytest
+
+from app.db.models.asistente import Mensaje
+from app.schemas.asistente import ContextoAsistente
+from app.services.asistente import AsistenteService, GestorMemoria
+from app.services.asistente.historial import (
+    MARCA_TRUNCADO,
+    agrupar_turnos,
+    seleccionar_turnos,
+    tokens_mensaje,
+)
+
+RESULTADO_GRANDE = "{'success': True, 'result': {'fragmentos': [" + "'Articulo 11 de la Ley 19.300 sobre efectos adversos' " * 400 + "]}}"
+
+
+class _Conversacion:
+    """Conversacion en memoria con los campos usados por el historial."""
+
+    def __init__(self):
+        self.id = uuid4()
+        self.resumen = None
+        self.resumen_hasta = None
+        self.filas = []
+        self._reloj = datetime(2026, 1, 1)
+
+    def agregar(self, rol, contenido, **kwargs):
+        self._reloj += timedelta(seconds=1)
+        self.filas.append(Mensaje(
+            conversacion_id=self.id, rol=rol, contenido=contenido, created_at=self._reloj, **kwargs,
+        ))
+
+    def agregar_turno(self, pregunta, con_herramienta=True):
+        self.agregar("user", pregunta)
+        if con_herramienta:
+            tool_id = f"t{len(self.filas)}"
+            self.agregar("assistant", "Voy a buscar.", tool_calls=[
+                {"id": tool_id, "name": "buscar_normativa", "input": {"query": pregunta}},
+            ])
+            self.agregar("tool", RESULTADO_GRANDE, tool_call_id=tool_id, tool_name="buscar_normativa")
+        self.agregar("assistant", f"Respuesta a: {pregunta}")
+
+
+def _db_para(conversacion, mock_db):
+    """Sesion cuyo execute devuelve las filas posteriores al resumen, mas recientes primero."""
+    async def execute(consulta):
+        filas = [
+            f for f in conversacion.filas
+            if conversacion.resumen_hasta is None or f.created_at > conversacion.resumen_hasta
+        ]
+        resultado = MagicMock()
+        resultado.scalars.return_value.all.return_value = list(reversed(filas))
+        return resultado
+
+    mock_db.execute = AsyncMock(side_effect=execute)
+    return mock_db
+
+
+def _configuracion(**valores):
+    base = dict(
+        ASISTENTE_HISTORIAL_MAX_TOKENS=3000,
+        ASISTENTE_HISTORIAL_TURNOS_COMPLETOS=1,
+        ASISTENTE_HISTORIAL_TOOL_RESULT_TOKENS=100,
+    )
+    base.update(valores)
+    return patch.multiple("app.services.asistente.service.settings", **base)
+
+
+class TestSeleccionTurnos:
+    """Tests de la seleccion de turnos por presupuesto."""
+
+    def test_turnos_recientes_completos_y_antiguos_truncados(self):
+        """Test que solo se truncan los resultados de turnos fuera de la ventana reciente."""
+        conversacion = _Conversacion()
+        for i in range(3):
+            conversacion.agregar_turno(f"pregunta {i}")
+
+        seleccion = seleccionar_turnos(
+            agrupar_turnos(conversacion.filas), max_tokens=100000, turnos_completos=1, max_tokens_tool=100,
+        )
+
+        resultados = [
+            m["content"][0]["content"] for m in seleccion.mensajes
+            if isinstance(m["content"], list) and m["content"][0]["type"] == "tool_result"
+        ]
+        assert [r.endswith(MARCA_TRUNCADO) for r in resultados] == [True, True, False]
+        assert seleccion.salientes == []
+
+    def test_no_separa_tool_use_de_su_resultado(self):
+        """Test que el historial empieza en un mensaje de usuario aunque falten filas."""
+        conversacion = _Conversacion()
+        for i in range(4):
+            conversacion.agregar_turno(f"pregunta {i}")
+
+        # Simula un limite de filas que corta el primer turno a la mitad
+        turnos = agrupar_turnos(conversacion.filas[2:])
+        seleccion = seleccionar_turnos(turnos, max_tokens=2000, turnos_completos=1, max_tokens_tool=100)
+
+        assert seleccion.mensajes[0] == {"role": "user", "content": seleccion.mensajes[0]["content"]}
+        assert isinstance(seleccion.mensajes[0]["content"], str)
+        ids_uso = {b["id"] for m in seleccion.mensajes if isinstance(m["content"], list)
+                   for b in m["content"] if b["type"] == "tool_use"}
+        ids_resultado = {b["tool_use_id"] for m in seleccion.mensajes if isinstance(m["content"], list)
+                         for b in m["content"] if b["type"] == "tool_result"}
+        assert ids_uso == ids_resultado
+        assert seleccion.tokens <= 2000
+
+    def test_ultimo_turno_siempre_incluido(self):
+        """Test que un turno que excede el presupuesto se envía truncado."""
+        conversacion = _Conversacion()
+        conversacion.agregar_turno("pregunta")
+
+        seleccion = seleccionar_turnos(
+            agrupar_turnos(conversacion.filas), max_tokens=300, turnos_completos=3, max_tokens_tool=100,
+        )
+
+        assert len(seleccion.mensajes) == 4
+        assert seleccion.mensajes[2]["content"][0]["content"].endswith(MARCA_TRUNCADO)
+
+
+class TestResumenAcumulado:
+    """Tests del resumen incremental guardado en la conversacion."""
+
+    @pytest.mark.asyncio
+    async def test_tokens_acotados_en_conversacion_larga(self, mock_db):
+        """Test que el historial no crece con la conversacion y el resumen se actualiza por tramos."""
+        conversacion = _Conversacion()
+        resumidor = AsyncMock(side_effect=lambda previo, transcripcion: f"resumen {resumidor.await_count}")
+        gestor = GestorMemoria(_db_para(conversacion, mock_db), resumidor=resumidor)
+
+        tokens = []
+        with _configuracion():
+            for i in range(40):
+                conversacion.agregar("user", f"pregunta {i}")
+                historial = await gestor.construir_historial(conversacion)
+                tokens.append(sum(tokens_mensaje(m) for m in historial))
+                conversacion.filas.pop()
+                conversacion.agregar_turno(f"pregunta {i}")
+
+        assert max(tokens) <= 3000
+        assert conversacion.resumen == f"resumen {resumidor.await_count}"
+        # El margen tras cada resumen evita resumir en todos los turnos
+        assert 1 < resumidor.await_count < 20
+        # Cada resumen recibe el anterior y solo los turnos nuevos
+        previo, transcripcion = resumidor.await_args_list[1].args
+        assert previo == "resumen 1"
+        assert "pregunta 0\n" not in transcripcion
+
+    @pytest.mark.asyncio
+    async def test_fallo_del_resumidor_no_avanza_el_resumen(self, mock_db):
+        """Test que si el resumen falla los turnos se reintentan en el proximo turno."""
+        conversacion = _Conversacion()
+        for i in range(10):
+            conversacion.agregar_turno(f"pregunta {i}")
+        conversacion.agregar("user", "pregunta final")
+        gestor = GestorMemoria(
+            _db_para(conversacion, mock_db), resumidor=AsyncMock(side_effect=RuntimeError("sin red")),
+        )
+
+        with _configuracion():
+            historial = await gestor.construir_historial(conversacion)
+
+        assert conversacion.resumen is None and conversacion.resumen_hasta is None
+        assert sum(tokens_mensaje(m) for m in historial) <= 3000
+        assert historial[-1] == {"role": "user", "content": "pregunta final"}
+
+    @pytest.mark.asyncio
+    async def test_resumen_entra_en_el_contexto_del_prompt(self, mock_db):
+        """Test que el resumen de la conversacion se agrega al bloque de contexto."""
+        servicio = AsistenteService(mock_db)
+        conversacion = SimpleNamespace(id=uuid4(), resumen="El usuario evalua el proyecto Cobre Norte (ID 7).")
+        servicio._obtener_o_crear_conversacion = AsyncMock(return_value=conversacion)
+        servicio.gestor_memoria.guardar_mensaje = AsyncMock()
+        servicio.gestor_memoria.construir_historial = AsyncMock(return_value=[])
+        servicio.gestor_contexto.obtener_contexto = AsyncMock(
+            return_value=ContextoAsistente(session_id=uuid4())
+        )
+        request = SimpleNamespace(
+            mensaje="¿Y la linea de base?", session_id=uuid4(), user_id=None,
+            proyecto_contexto_id=None, vista_actual=None,
+        )
+
+        turno = await servicio._preparar_turno(request)
+
+        assert "Cobre Norte (ID 7)" in turno.system_prompt[-1]["text"]
+        assert "Cobre Norte" not in turno.system_prompt[0]["text"]
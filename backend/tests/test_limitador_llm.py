@@ -0,0 +1,236 @@
+"""
+Tests del limitador de tasa compartido para Anthropic.
+"""
+
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import anthropic
+import httpx
+import pytest
+import redis
+
+from app.services.llm.limitador import (
+    LimitadorLLM,
+    PrioridadLLM,
+    estimar_tokens_solicitud,
+    pausa_desde_headers,
+    prioridad_de_sitio,
+)
+from app.services.llm.telemetria import get_telemetria_llm, instrumentar
+
+from tests.stub_anthropic import StubAnthropic, crear_app
+
+MODELO = "claude-sonnet-4-20250514"
+
+
+def _parametros(texto="hola", max_tokens=100):
+    return {"model": MODELO, "max_tokens": max_tokens, "messages": [{"role": "user", "content": texto}]}
+
+
+def _cliente_stub(stub, sitio):
+    """Cliente Anthropic real, sin reintentos del SDK, instrumentado contra el stub."""
+    return instrumentar(
+        anthropic.AsyncAnthropic(
+            api_key="stub",
+            base_url="http://stub",
+            max_retries=0,
+            http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=crear_app(stub))),
+        ),
+        sitio=sitio,
+    )
+
+
+@pytest.fixture
+def telemetria():
+    telemetria = get_telemetria_llm()
+    telemetria.limpiar()
+    yield telemetria
+    telemetria.limpiar()
+
+
+class TestLimitadorLLM:
+    """Tests de buckets, prioridades y backoff adaptativo."""
+
+    @pytest.mark.asyncio
+    async def test_reserva_deja_capacidad_para_interactivas(self):
+        """Test que el lote se detiene sobre la reserva mientras el chat sigue siendo admitido."""
+        limitador = LimitadorLLM(rpm=10, tpm=100000, usar_redis=False)
+        for _ in range(7):
+            await limitador.adquirir(_parametros(), PrioridadLLM.INTERACTIVA)
+
+        assert await limitador._local.intentar(10, 0.3) > 0
+        assert await limitador._local.intentar(10, 0.0) == 0
+        assert prioridad_de_sitio("asistente.chat") == PrioridadLLM.INTERACTIVA
+        assert prioridad_de_sitio("clasificador.lote") == PrioridadLLM.LOTE
+        assert prioridad_de_sitio("informe.resumen_ejecutivo") == PrioridadLLM.NORMAL
+
+    @pytest.mark.asyncio
+    async def test_interactiva_pasa_antes_que_lote_en_espera(self):
+        """Test que al terminar una pausa la llamada interactiva se atiende antes que la de lote."""
+        limitador = LimitadorLLM(rpm=100, tpm=100000, usar_redis=False)
+        await limitador.penalizar({"retry-after": "0.2"})
+        orden = []
+
+        async def llamar(prioridad):
+            await limitador.adquirir(_parametros(), prioridad)
+            orden.append(prioridad)
+
+        lote = asyncio.create_task(llamar(PrioridadLLM.LOTE))
+        await asyncio.sleep(0.05)
+        await llamar(PrioridadLLM.INTERACTIVA)
+        await lote
+
+        assert orden == [PrioridadLLM.INTERACTIVA, PrioridadLLM.LOTE]
+
+    @pytest.mark.asyncio
+    async def test_backoff_adaptativo(self):
+        """Test que un 429 reduce la capacidad al límite informado y los éxitos la recuperan."""
+        limitador = LimitadorLLM(rpm=100, tpm=100000, usar_redis=False)
+        headers = {"retry-after": "0", "anthropic-ratelimit-requests-limit": "20"}
+
+        await limitador.penalizar(headers)
+        assert limitador._local.factor == pytest.approx(0.2)
+
+        reservados = await limitador.adquirir(_parametros(max_tokens=1000), PrioridadLLM.NORMAL)
+        tokens_antes = limitador._local.tokens
+        await limitador.liquidar(reservados, reales=50)
+
+        assert limitador._local.tokens == pytest.approx(tokens_antes + reservados - 50, abs=1)
+        assert limitador._local.factor == pytest.approx(0.22)
+        assert reservados == estimar_tokens_solicitud(_parametros(max_tokens=1000))
+        assert pausa_desde_headers({}) > 0
+
+    @pytest.mark.asyncio
+    async def test_sin_redis_usa_limites_locales(self):
+        """Test que un error de Redis deja al limitador con buckets locales."""
+        cliente = SimpleNamespace(register_script=lambda script: AsyncMock(
+            side_effect=redis.ConnectionError("sin redis"),
+        ))
+        limitador = LimitadorLLM(rpm=10, tpm=100000, cliente=cliente)
+
+        await limitador.adquirir(_parametros(), PrioridadLLM.NORMAL)
+
+        assert limitador.metricas()["redis"] is False
+        assert limitador._local.solicitudes == pytest.approx(9, abs=0.01)
+
+    def test_un_cliente_redis_por_event_loop(self, monkeypatch):
+        """Test que cada asyncio.run (como el OCR síncrono) usa su propio cliente de Redis."""
+        clientes = []
+
+        class _RedisLigadoAlLoop:
+            def __init__(self):
+                self.loop = None
+                self.cerrado = False
+                clientes.append(self)
+
+            def register_script(self, script):
+                async def ejecutar(keys, args):
+                    loop = asyncio.get_running_loop()
+                    if self.loop not in (None, loop):
+                        raise RuntimeError("Event loop is closed")
+                    self.loop = loop
+                    return "0"
+                return ejecutar
+
+            async def aclose(self):
+                self.cerrado = True
+
+        monkeypatch.setattr("app.services.llm.limitador.aioredis.from_url", lambda *a, **k: _RedisLigadoAlLoop())
+        limitador = LimitadorLLM(rpm=10, tpm=100000)
+
+        async def llamada():
+            try:
+                await limitador.adquirir(_parametros(), PrioridadLLM.LOTE)
+            finally:
+                await limitador.cerrar()
+
+        asyncio.run(llamada())
+        asyncio.run(llamada())
+
+        assert len(clientes) == 2 and all(c.cerrado for c in clientes)
+        assert limitador.metricas()["redis"] is True
+        assert limitador._local.solicitudes is None  # Nunca cayó a los buckets locales
+
+    @pytest.mark.asyncio
+    async def test_runtime_error_de_redis_usa_limites_locales(self):
+        """Test que un cliente Redis ligado a un loop cerrado no hace fallar la llamada."""
+        cliente = SimpleNamespace(register_script=lambda script: AsyncMock(
+            side_effect=RuntimeError("Event loop is closed"),
+        ))
+        limitador = LimitadorLLM(rpm=10, tpm=100000, cliente=cliente)
+
+        await limitador.adquirir(_parametros(), PrioridadLLM.NORMAL)
+
+        assert limitador._local.solicitudes == pytest.approx(9, abs=0.01)
+        assert limitador.metricas()["redis"] is True
+
+
+class TestLimitadorConStub:
+    """Tests contra el stub local que responde 429."""
+
+    @pytest.mark.asyncio
+    async def test_429_pausa_y_reintenta(self, limitador_llm_local, telemetria):
+        """Test que un 429 del stub se reintenta tras la pausa y queda registrado en la telemetría."""
+        stub = StubAnthropic(limite_rpm=50)
+        stub.rechazos_pendientes = 1
+        stub.segundos_reintento = 0.1
+        cliente = _cliente_stub(stub, "asistente.chat")
+
+        respuesta = await cliente.messages.create(**_parametros("¿Requiere EIA?"))
+
+        assert respuesta.content[0].text.startswith("stub:")
+        assert stub.rechazadas == 1 and len(stub.llamadas) == 1
+        assert limitador_llm_local.metricas()["rechazos_429"] == 1
+        assert limitador_llm_local._local.factor < 1
+        [serie] = telemetria.instantanea()
+        assert serie["llamadas"] == 2 and serie["reintentos"] == 1
+        assert serie["errores_por_tipo"] == {"RateLimitError": 1}
+
+    @pytest.mark.asyncio
+    async def test_429_persistente_se_propaga(self, telemetria, monkeypatch):
+        """Test que agotados los reintentos el RateLimitError llega al llamador."""
+        monkeypatch.setattr("app.core.config.settings.LLM_LIMITE_REINTENTOS_429", 1)
+        stub = StubAnthropic()
+        stub.rechazos_pendientes = 5
+        stub.segundos_reintento = 0
+        cliente = _cliente_stub(stub, "ocr.vision")
+
+        with pytest.raises(anthropic.RateLimitError):
+            await cliente.messages.create(**_parametros())
+
+        assert stub.rechazadas == 2
+
+    @pytest.mark.asyncio
+    async def test_cliente_del_pool_solo_reintenta_429_en_el_limitador(self, monkeypatch, limitador_llm_local):
+        """Test que con el cliente real del pool un 429 persistente no se multiplica con los reintentos del SDK."""
+        from app.services.llm import pool_anthropic
+        from app.services.llm.cliente import ClienteLLM
+
+        monkeypatch.setattr("app.core.config.settings.LLM_LIMITE_REINTENTOS_429", 2)
+        monkeypatch.setattr("app.core.config.settings.ANTHROPIC_API_KEY", "stub")
+        monkeypatch.setattr("app.core.config.settings.LLM_BASE_URL", "http://stub")
+        stub = StubAnthropic()
+        stub.segundos_reintento = 0
+
+        class _HttpStub(httpx.AsyncClient):
+            """El pool se crea igual, pero sus conexiones van al stub."""
+
+            def __init__(self, **kwargs):
+                super().__init__(**kwargs, transport=httpx.ASGITransport(app=crear_app(stub)))
+
+        monkeypatch.setattr(pool_anthropic.httpx, "AsyncClient", _HttpStub)
+        try:
+            stub.rechazos_pendientes = 100
+            with pytest.raises(anthropic.RateLimitError):
+                await ClienteLLM().generar("¿Requiere EIA?")
+            # Un envío y dos reintentos del limitador, ninguno del SDK ni de ClienteLLM
+            assert stub.rechazadas == 3
+            assert limitador_llm_local.metricas()["rechazos_429"] == 3
+
+            stub.rechazos_pendientes = 1
+            respuesta = await ClienteLLM().generar("¿Requiere EIA?")
+            assert respuesta.contenido.startswith("stub:") and stub.rechazadas == 4
+        finally:
+            await pool_anthropic.cerrar_pool_anthropic()
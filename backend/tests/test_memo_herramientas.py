@@ -0,0 +1,213 @@
+"""
+Tests del memo de herramientas por conversacion.
+"""
+
+from typing import Any, Dict
+from unittest.mock import AsyncMock, MagicMock, patch
+from uuid import uuid4
+
+import pytest
+
+from app.services.asistente import EjecutorHerramientas
+from app.services.asistente.memo_herramientas import MemoHerramientas
+from app.services.asistente.tools import (
+    Herramienta,
+    PermisoHerramienta,
+    RegistroHerramientas,
+    ResultadoHerramienta,
+)
+
+
+def _registro(ejecuciones):
+    """Registro con lecturas memoizables y escrituras de prueba."""
+    registro = RegistroHerramientas()
+
+    class _Base(Herramienta):
+        def set_db(self, db):
+            self._db = db
+
+        @classmethod
+        def get_schema(cls) -> Dict[str, Any]:
+            return {"type": "object", "properties": {}}
+
+        async def ejecutar(self, proyecto_id: int = 0, detalle: bool = False, db=None, **kwargs):
+            ejecuciones.append(self.nombre)
+            return ResultadoHerramienta(
+                exito=proyecto_id >= 0, contenido={"proyecto_id": proyecto_id, "n": len(ejecuciones)},
+            )
+
+    @registro.registrar
+    class ConsultarProyecto(_Base):
+        nombre = "consultar_proyecto"
+        ttl_memo_segundos = 120
+        recursos_memo = ["proyecto"]
+
+    @registro.registrar
+    class ObtenerConfig(_Base):
+        nombre = "obtener_config"
+        ttl_memo_segundos = 3600
+        recursos_memo = ["config"]
+
+    @registro.registrar
+    class ListarSinMemo(_Base):
+        nombre = "listar"
+
+    @registro.registrar
+    class GuardarFicha(_Base):
+        nombre = "guardar_ficha"
+        permisos = [PermisoHerramienta.ESCRITURA]
+        invalida_memo = ["proyecto"]
+
+    @registro.registrar
+    class Registrar(_Base):
+        nombre = "registrar"
+        permisos = [PermisoHerramienta.ESCRITURA]
+
+    return registro
+
+
+class _Conversaciones:
+    """Simula datos_extra.memo_generaciones de asistente.conversaciones."""
+
+    def __init__(self):
+        self.generaciones: Dict[str, int] = {}
+
+    def sesion(self, mock_db):
+        async def execute(consulta, parametros):
+            if "UPDATE" in str(consulta):
+                for recurso in parametros["recursos"]:
+                    self.generaciones[recurso] = self.generaciones.get(recurso, 0) + 1
+            return MagicMock(scalar=MagicMock(return_value=dict(self.generaciones)))
+
+        mock_db.execute = AsyncMock(side_effect=execute)
+        return mock_db
+
+
+class _Entorno:
+    """Herramientas, conversacion simulada y memo aislado de un test."""
+
+    def __init__(self, ejecuciones, conversaciones, memo, db):
+        self.ejecuciones = ejecuciones
+        self.conversaciones = conversaciones
+        self.memo = memo
+        self.db = db
+
+    def ejecutor(self):
+        """Ejecutor de un turno nuevo (lee las generaciones de nuevo)."""
+        return EjecutorHerramientas(self.db, memo=self.memo)
+
+
+@pytest.fixture
+def entorno(mock_db):
+    ejecuciones = []
+    conversaciones = _Conversaciones()
+    with patch("app.services.asistente.service.registro_herramientas", _registro(ejecuciones)):
+        yield _Entorno(ejecuciones, conversaciones, MemoHerramientas(max_entradas=100), conversaciones.sesion(mock_db))
+
+
+class TestMemoHerramientas:
+    """Tests del memo por conversacion."""
+
+    @pytest.mark.asyncio
+    async def test_llamada_repetida_usa_memo(self, entorno):
+        """Test que parametros equivalentes (orden, defaults) no vuelven a ejecutar la herramienta."""
+        conversacion_id = uuid4()
+        ejecutor = entorno.ejecutor()
+
+        primero, _ = await ejecutor.ejecutar_tool("consultar_proyecto", {"proyecto_id": 7}, conversacion_id)
+        segundo, _ = await ejecutor.ejecutar_tool(
+            "consultar_proyecto", {"detalle": False, "proyecto_id": 7}, conversacion_id,
+        )
+        otra_conversacion, _ = await ejecutor.ejecutar_tool("consultar_proyecto", {"proyecto_id": 7}, uuid4())
+
+        assert entorno.ejecuciones == ["consultar_proyecto", "consultar_proyecto"]
+        assert segundo.contenido == primero.contenido
+        assert segundo.metadata == {"memo": True}
+        assert "memo" not in otra_conversacion.metadata
+        # Herramientas sin TTL no se memoizan
+        await ejecutor.ejecutar_tool("listar", {}, conversacion_id)
+        await ejecutor.ejecutar_tool("listar", {}, conversacion_id)
+        assert entorno.ejecuciones.count("listar") == 2
+
+    @pytest.mark.asyncio
+    async def test_escritura_invalida_solo_recursos_dependientes(self, entorno):
+        """Test que guardar_ficha invalida las lecturas del proyecto y no las de configuracion."""
+        conversacion_id = uuid4()
+        ejecutor = entorno.ejecutor()
+        await ejecutor.ejecutar_tool("consultar_proyecto", {"proyecto_id": 7}, conversacion_id)
+        await ejecutor.ejecutar_tool("obtener_config", {}, conversacion_id)
+
+        await ejecutor.ejecutar_tool("guardar_ficha", {"proyecto_id": 7}, conversacion_id)
+        await ejecutor.ejecutar_tool("consultar_proyecto", {"proyecto_id": 7}, conversacion_id)
+        await ejecutor.ejecutar_tool("obtener_config", {}, conversacion_id)
+
+        assert entorno.ejecuciones == ["consultar_proyecto", "obtener_config", "guardar_ficha", "consultar_proyecto"]
+        assert entorno.conversaciones.generaciones == {"proyecto": 1}
+
+    @pytest.mark.asyncio
+    async def test_escritura_sin_recursos_declarados_invalida_todo(self, entorno):
+        """Test que una escritura sin invalida_memo invalida todas las entradas de la conversacion."""
+        conversacion_id = uuid4()
+        ejecutor = entorno.ejecutor()
+        await ejecutor.ejecutar_tool("obtener_config", {}, conversacion_id)
+
+        await ejecutor.ejecutar_tool("registrar", {}, conversacion_id)
+        await ejecutor.ejecutar_tool("obtener_config", {}, conversacion_id)
+
+        assert entorno.ejecuciones == ["obtener_config", "registrar", "obtener_config"]
+
+    @pytest.mark.asyncio
+    async def test_invalidacion_desde_otro_proceso(self, entorno):
+        """Test que un turno nuevo ve las generaciones incrementadas por otro proceso."""
+        conversacion_id = uuid4()
+        await entorno.ejecutor().ejecutar_tool("consultar_proyecto", {"proyecto_id": 7}, conversacion_id)
+
+        # Otro worker ejecuto actualizar_proyecto en la misma conversacion
+        entorno.conversaciones.generaciones["proyecto"] = 1
+        await entorno.ejecutor().ejecutar_tool("consultar_proyecto", {"proyecto_id": 7}, conversacion_id)
+        await entorno.ejecutor().ejecutar_tool("consultar_proyecto", {"proyecto_id": 7}, conversacion_id)
+
+        assert entorno.ejecuciones == ["consultar_proyecto", "consultar_proyecto"]
+        assert entorno.memo.metricas()["invalidadas"] == 1
+
+    @pytest.mark.asyncio
+    async def test_ttl_y_errores(self, entorno):
+        """Test que las entradas expiran segun el TTL de la herramienta y los errores no se guardan."""
+        conversacion_id = uuid4()
+        ejecutor = entorno.ejecutor()
+        reloj = [1000.0]
+
+        with patch("app.services.asistente.memo_herramientas.time.monotonic", lambda: reloj[0]):
+            await ejecutor.ejecutar_tool("consultar_proyecto", {"proyecto_id": 7}, conversacion_id)
+            reloj[0] += 119
+            await ejecutor.ejecutar_tool("consultar_proyecto", {"proyecto_id": 7}, conversacion_id)
+            reloj[0] += 2
+            await ejecutor.ejecutar_tool("consultar_proyecto", {"proyecto_id": 7}, conversacion_id)
+
+            await ejecutor.ejecutar_tool("consultar_proyecto", {"proyecto_id": -1}, conversacion_id)
+            await ejecutor.ejecutar_tool("consultar_proyecto", {"proyecto_id": -1}, conversacion_id)
+
+        assert len(entorno.ejecuciones) == 4
+        assert entorno.memo.metricas()["expiradas"] == 1
+
+    @pytest.mark.asyncio
+    async def test_memo_en_ejecucion_paralela(self, entorno):
+        """Test que las lecturas en lote reutilizan y guardan entradas del memo."""
+        conversacion_id = uuid4()
+        ejecutor = entorno.ejecutor()
+        ejecutor._ejecutar_aislada = AsyncMock(side_effect=lambda nombre, entrada: ResultadoHerramienta(
+            exito=True, contenido={"aislada": nombre},
+        ))
+        await ejecutor.ejecutar_tool("consultar_proyecto", {"proyecto_id": 7}, conversacion_id)
+
+        resultados = await ejecutor.ejecutar_tools(
+            [("consultar_proyecto", {"proyecto_id": 7}), ("obtener_config", {}), ("consultar_proyecto", {"proyecto_id": 8})],
+            conversacion_id,
+        )
+        repetidos = await ejecutor.ejecutar_tools(
+            [("obtener_config", {}), ("consultar_proyecto", {"proyecto_id": 8})], conversacion_id,
+        )
+
+        assert resultados[0][0].metadata == {"memo": True}
+        assert ejecutor._ejecutar_aislada.await_count == 2
+        assert all(r.metadata == {"memo": True} for r, _ in repetidos)
@@ -0,0 +1,177 @@
+"""
+Tests para el OCR concurrente con caché de ClaudeVisionOCR.
+
+Usa un endpoint de Vision simulado (httpx.MockTransport) detrás del
+cliente AsyncAnthropic real.
+"""
+
+import asyncio
+import json
+
+import anthropic
+import httpx
+import pytest
+
+fitz = pytest.importorskip("fitz")
+
+from app.services.ocr.claude_vision import ClaudeVisionOCR
+
+
+class CacheMemoria:
+    """Caché OCR en memoria con la interfaz de CacheOCR."""
+
+    def __init__(self):
+        self.datos = {}
+
+    async def obtener(self, clave):
+        return self.datos.get(clave)
+
+    async def guardar(self, clave, texto):
+        self.datos[clave] = texto
+
+    async def cerrar(self):
+        pass
+
+
+class StubVision:
+    """Endpoint /v1/messages simulado que registra las llamadas."""
+
+    def __init__(self, latencia=0.0, respuestas=None):
+        self.latencia = latencia
+        # Respuestas forzadas por número de llamada: status HTTP o None
+        self.respuestas = respuestas or {}
+        self.llamadas = 0
+        self.en_vuelo = 0
+        self.max_en_vuelo = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.llamadas += 1
+        numero = self.llamadas
+        self.en_vuelo += 1
+        self.max_en_vuelo = max(self.max_en_vuelo, self.en_vuelo)
+        try:
+            await asyncio.sleep(self.latencia)
+        finally:
+            self.en_vuelo -= 1
+
+        status = self.respuestas.get(numero)
+        if status == 429:
+            return httpx.Response(429, headers={"retry-after": "0"}, json={
+                "type": "error", "error": {"type": "rate_limit_error", "message": "rate limited"},
+            })
+        if status:
+            return httpx.Response(status, json={
+                "type": "error", "error": {"type": "api_error", "message": "boom"},
+            })
+
+        cuerpo = json.loads(request.content)
+        assert cuerpo["messages"][0]["content"][0]["type"] == "image"
+        return httpx.Response(200, json={
+            "id": f"msg_{numero}",
+            "type": "message",
+            "role": "assistant",
+            "model": cuerpo["model"],
+            "content": [{"type": "text", "text": f"texto ocr {numero}"}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": 10, "output_tokens": 5},
+        })
+
+
+def _ocr(stub, cache, concurrencia=2, reintentos=2):
+    cliente = anthropic.AsyncAnthropic(
+        api_key="test",
+        base_url="http://vision.stub",
+        max_retries=0,
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(stub)),
+    )
+    ocr = ClaudeVisionOCR(cliente=cliente, cache=cache)
+    ocr.concurrencia = concurrencia
+    ocr.reintentos = reintentos
+    ocr.dpi = 20
+    return ocr
+
+
+@pytest.fixture
+def pdf_escaneado(tmp_path):
+    doc = fitz.open()
+    for i in range(6):
+        pagina = doc.new_page()
+        pagina.insert_text((72, 72), f"Pagina distinta {i}")
+    ruta = tmp_path / "escaneado.pdf"
+    doc.save(str(ruta))
+    doc.close()
+    return str(ruta)
+
+
+class TestClaudeVisionOCR:
+    """Tests de ClaudeVisionOCR.procesar_pdf_async."""
+
+    @pytest.mark.asyncio
+    async def test_procesa_en_paralelo_respetando_concurrencia(self, pdf_escaneado):
+        """Test que envía las páginas en paralelo sin superar la concurrencia."""
+        stub = StubVision(latencia=0.05)
+        ocr = _ocr(stub, CacheMemoria(), concurrencia=3)
+
+        resultado = await ocr.procesar_pdf_async(pdf_escaneado)
+
+        assert stub.llamadas == 6
+        assert 1 < stub.max_en_vuelo <= 3
+        assert resultado.paginas_procesadas == 6
+        assert resultado.tokens_usados == 90
+        assert sorted(resultado.textos_por_pagina) == [1, 2, 3, 4, 5, 6]
+        assert resultado.texto.index("--- Página 1 ---") < resultado.texto.index("--- Página 6 ---")
+
+    @pytest.mark.asyncio
+    async def test_cache_evita_pagar_paginas_ya_procesadas(self, pdf_escaneado):
+        """Test que un segundo procesamiento del mismo PDF sale de la caché."""
+        cache = CacheMemoria()
+        stub = StubVision()
+
+        await _ocr(stub, cache).procesar_pdf_async(pdf_escaneado)
+        resultado = await _ocr(stub, cache).procesar_pdf_async(pdf_escaneado)
+
+        assert stub.llamadas == 6
+        assert resultado.paginas_en_cache == 6
+        assert resultado.tokens_usados == 0
+
+    @pytest.mark.asyncio
+    async def test_rate_limit_reintenta_la_pagina(self, pdf_escaneado):
+        """Test que un 429 pausa y reintenta en lugar de fallar la página."""
+        stub = StubVision(respuestas={1: 429})
+        ocr = _ocr(stub, CacheMemoria(), concurrencia=1)
+
+        resultado = await ocr.procesar_pdf_async(pdf_escaneado, paginas=[2])
+
+        assert stub.llamadas == 2
+        assert resultado.paginas_con_error == []
+        assert resultado.textos_por_pagina == {2: "texto ocr 2"}
+
+    @pytest.mark.asyncio
+    async def test_reintento_tras_falla_parcial_solo_repite_las_fallidas(self, pdf_escaneado):
+        """Test que las páginas con error no se cachean y las demás sí."""
+        cache = CacheMemoria()
+        stub = StubVision(respuestas={2: 400})
+        ocr = _ocr(stub, cache, concurrencia=1, reintentos=0)
+
+        primero = await ocr.procesar_pdf_async(pdf_escaneado, paginas=[1, 2, 3])
+        assert primero.paginas_con_error == [2]
+        assert "[Error procesando página 2]" in primero.texto
+
+        segundo = await ocr.procesar_pdf_async(pdf_escaneado, paginas=[1, 2, 3])
+        assert stub.llamadas == 4
+        assert segundo.paginas_en_cache == 2
+        assert segundo.paginas_con_error == []
+
+    def test_version_sincrona_dentro_de_un_loop(self, pdf_escaneado):
+        """Test que procesar_paginas funciona aunque se llame desde código async."""
+        stub = StubVision()
+        ocr = _ocr(stub, CacheMemoria())
+
+        async def desde_script():
+            return ocr.procesar_paginas(pdf_escaneado, [1, 3])
+
+        textos = asyncio.run(desde_script())
+
+        assert sorted(textos) == [1, 3]
+        assert stub.llamadas == 2
@@ -0,0 +1,68 @@
+"""
+Tests del pool compartido de clientes asíncronos de Anthropic.
+"""
+
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.services.llm import pool_anthropic
+from app.services.llm.pool_anthropic import cerrar_pool_anthropic, get_cliente_anthropic
+from app.services.ocr.claude_vision import _ejecutar_sync
+from app.services.recopilacion.extraccion import ExtraccionDocumentosService
+
+
+def _http(cliente):
+    """httpx.AsyncClient detrás de un cliente instrumentado."""
+    return cliente._objetivo._client
+
+
+class TestPoolAnthropic:
+    """Tests de reutilización de conexiones entre servicios."""
+
+    @pytest.mark.asyncio
+    async def test_servicios_comparten_pool_con_opciones_propias(self):
+        """Test que dos servicios del mismo loop usan el mismo pool HTTP con timeouts distintos."""
+        chat = get_cliente_anthropic("asistente.chat", api_key="k", timeout=120)
+        ocr = get_cliente_anthropic("ocr.vision", api_key="k", base_url="http://stub", max_retries=0)
+        try:
+            assert _http(chat) is _http(ocr)
+            assert chat._objetivo.timeout == 120 and ocr._objetivo.max_retries == 0
+            assert str(ocr._objetivo.base_url).startswith("http://stub")
+            assert chat._sitio == "asistente.chat"
+        finally:
+            await cerrar_pool_anthropic()
+
+        assert _http(chat).is_closed
+        assert asyncio.get_running_loop() not in pool_anthropic._pools
+
+    def test_loop_propio_cierra_su_pool(self):
+        """Test que cada loop creado desde código síncrono tiene su pool y lo cierra al salir."""
+        async def pedir():
+            return _http(get_cliente_anthropic("ocr.vision", api_key="k"))
+
+        primero = _ejecutar_sync(pedir())
+        segundo = _ejecutar_sync(pedir())
+
+        assert primero is not segundo
+        assert primero.is_closed and segundo.is_closed
+
+
+class TestExtraccionAsincrona:
+    """Tests de la extracción con el cliente asíncrono."""
+
+    @pytest.mark.asyncio
+    async def test_deteccion_de_tipo_espera_al_cliente(self, mock_db):
+        """Test que la detección de tipo espera la llamada al cliente asíncrono en vez de bloquear."""
+        servicio = ExtraccionDocumentosService(mock_db)
+        respuesta = SimpleNamespace(content=[SimpleNamespace(text="Informe_Flora\n")])
+        servicio._anthropic_client = SimpleNamespace(
+            messages=SimpleNamespace(create=AsyncMock(return_value=respuesta)),
+        )
+
+        tipo = await servicio._detectar_tipo_documento("cGRm", "/tmp/linea_base.pdf")
+
+        assert tipo == "informe_flora"
+        servicio._anthropic_client.messages.create.assert_awaited_once()
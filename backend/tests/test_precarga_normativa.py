@@ -0,0 +1,126 @@
+"""
+Tests de la precarga especulativa de normativa del asistente.
+"""
+
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from uuid import uuid4
+
+import pytest
+
+from app.services.asistente.precarga import PrecargaNormativa, consultas_precarga
+from app.services.asistente.service import GestorContexto
+from app.services.asistente.tools.rag import BuscarNormativa
+from app.services.rag.cache_busqueda import get_cache_busqueda
+
+from tests.test_cache_busqueda import _resultado_filas, _resultado_version
+
+TRIGGERS = [
+    {"letra": "b", "descripcion": "Efectos sobre recursos naturales renovables", "peso": 0.6},
+    {"letra": "d", "descripcion": "Localización en o próxima a áreas protegidas", "peso": 0.9},
+]
+
+
+def _db_corpus():
+    """Sesión falsa: versión del corpus 7 y dos fragmentos por búsqueda."""
+    db = MagicMock()
+    db.rollback = AsyncMock()
+
+    async def execute(sql, params=None):
+        return _resultado_version(7) if "corpus_version" in str(sql) else _resultado_filas([0.9, 0.8])
+
+    db.execute = AsyncMock(side_effect=execute)
+    return db
+
+
+class TestConsultasPrecarga:
+    """Tests de las consultas probables de un proyecto."""
+
+    def test_triggers_por_peso_luego_componentes_sin_repetir(self):
+        """Test que los triggers van primero por peso, luego los componentes, sin duplicados y con tope."""
+        consultas = consultas_precarga(
+            TRIGGERS, ["area_influencia", "no_existe", "area_influencia", "linea_base_fisico"], max_consultas=3,
+        )
+
+        assert consultas == [
+            "Art. 11 letra d Ley 19.300 Localización en o próxima a áreas protegidas",
+            "Art. 11 letra b Ley 19.300 Efectos sobre recursos naturales renovables",
+            "área de influencia proyecto definición metodología",
+        ]
+        assert consultas_precarga(None, None) == []
+
+
+class TestPrecargaNormativa:
+    """Tests de la precarga en segundo plano."""
+
+    @pytest.mark.asyncio
+    async def test_precarga_llena_la_cache_de_buscar_normativa(self, mock_embedding_service):
+        """Test que tras la precarga la misma consulta del modelo no vuelve a calcular embeddings."""
+        sesiones = []
+
+        @asynccontextmanager
+        async def session_factory():
+            sesiones.append(_db_corpus())
+            yield sesiones[-1]
+
+        consultas = consultas_precarga(TRIGGERS, ["area_influencia"])
+        with patch("app.services.asistente.tools.rag.get_embedding_service", return_value=mock_embedding_service):
+            precarga = PrecargaNormativa(session_factory=session_factory, intervalo_segundos=600)
+            assert precarga.lanzar(1, consultas) is True
+            assert precarga.lanzar(1, consultas) is False
+            await precarga.esperar()
+            embeddings_precarga = mock_embedding_service.embed_text.call_count
+
+            resultado = await BuscarNormativa().ejecutar(query=consultas[0].upper(), db=_db_corpus())
+
+        assert embeddings_precarga == len(consultas) == len(sesiones)
+        assert all(s.rollback.await_count == 1 for s in sesiones)
+        assert resultado.exito and resultado.contenido["total_encontrados"] == 4
+        assert mock_embedding_service.embed_text.call_count == embeddings_precarga
+        assert get_cache_busqueda().metricas()["aciertos"] == 1
+        metricas = precarga.metricas()
+        assert (metricas["lanzadas"], metricas["omitidas"], metricas["consultas"], metricas["errores"]) == (1, 1, 3, 0)
+
+    @pytest.mark.asyncio
+    async def test_excepciones_de_la_busqueda_se_cuentan(self, caplog):
+        """Test que una búsqueda que lanza queda registrada en el log y en los errores."""
+        @asynccontextmanager
+        async def session_factory():
+            raise ConnectionError("sin base de datos")
+            yield  # pragma: no cover
+
+        precarga = PrecargaNormativa(session_factory=session_factory)
+        precarga.lanzar(1, ["consulta a", "consulta b"])
+        await precarga.esperar()
+
+        metricas = precarga.metricas()
+        assert (metricas["consultas"], metricas["errores"]) == (2, 2)
+        assert "sin base de datos" in caplog.text and "consulta b" in caplog.text
+
+
+class TestContextoConPrecarga:
+    """Tests de la precarga al cargar el contexto de un proyecto."""
+
+    @pytest.mark.asyncio
+    async def test_obtener_contexto_lanza_precarga_y_la_anota(self, mock_db):
+        """Test que el contexto del proyecto lanza la precarga con el último análisis y lista las consultas."""
+        proyecto = SimpleNamespace(id=12, nombre="Proyecto Test", estado="analizado", geom="POLYGON")
+        analisis = SimpleNamespace(triggers_eia=TRIGGERS, componentes=["area_influencia"])
+        mock_db.execute.side_effect = [
+            MagicMock(scalar=MagicMock(return_value=proyecto)),
+            MagicMock(first=MagicMock(return_value=analisis)),
+            MagicMock(scalar=MagicMock(return_value=0)),
+        ]
+        precarga = MagicMock()
+
+        with patch("app.services.asistente.service.get_precarga_normativa", return_value=precarga):
+            gestor = GestorContexto(mock_db)
+            contexto = await gestor.obtener_contexto(session_id=uuid4(), proyecto_id=12)
+
+        consultas = consultas_precarga(TRIGGERS, ["area_influencia"])
+        precarga.lanzar.assert_called_once_with(12, consultas)
+        assert contexto.proyecto_tiene_analisis is True
+        assert contexto.consultas_precargadas == consultas
+        prompt = gestor.construir_prompt_contexto(contexto)
+        assert all(f"    - {consulta}" in prompt for consulta in consultas)
@@ -0,0 +1,153 @@
+"""
+Tests del análisis de prefactibilidad con resultados progresivos.
+"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.services.llm.cache_secciones import CacheSecciones
+from app.services.llm.cliente import ConfiguracionLLM
+from app.services.llm.generador import GeneradorInformes, SeccionInforme
+from app.services.prefactibilidad import EventoAnalisis, ServicioPrefactibilidad
+
+from tests.test_generador_informes import _RedisFalso
+
+DATOS_PROYECTO = {"nombre": "Proyecto Minero Test", "region": "Antofagasta", "superficie_ha": 500}
+RESULTADO_GIS = {
+    "areas_protegidas": [],
+    "glaciares": [],
+    "cuerpos_agua": [],
+    "comunidades_indigenas": [],
+    "centros_poblados": [{"id": 1, "nombre": "Pueblo Test", "tipo": "Pueblo", "poblacion": 1000, "distancia_m": 3000}],
+    "sitios_patrimoniales": [],
+    "alertas": [],
+}
+
+# Demora del LLM por sitio: el resumen ejecutivo es el más lento
+DEMORAS = {"informe.resumen_ejecutivo": 0.08}
+
+
+def _servicio(eventos_llm):
+    """Servicio con GIS y RAG falsos y un LLM cuyas secciones tardan distinto."""
+    async def generar(prompt_usuario, prompt_sistema=None, sitio=None, **kwargs):
+        eventos_llm.append(sitio)
+        await asyncio.sleep(DEMORAS.get(sitio, 0.01))
+        eventos_llm.append(f"fin:{sitio}")
+        return SimpleNamespace(contenido=f"Texto de {sitio}", tokens_totales=500)
+
+    cliente = MagicMock()
+    cliente.config = ConfiguracionLLM(modelo="claude-test")
+    cliente.generar = generar
+    buscador = MagicMock()
+    buscador.buscar = AsyncMock(return_value=[])
+    return ServicioPrefactibilidad(
+        buscador=buscador,
+        generador=GeneradorInformes(cliente_llm=cliente, cache=CacheSecciones(cliente=_RedisFalso())),
+    )
+
+
+class TestAnalisisStream:
+    """Tests del orden y contenido de los eventos del servicio."""
+
+    @pytest.mark.asyncio
+    async def test_deterministico_primero_y_secciones_al_terminar(self, mock_db):
+        """Test que GIS y clasificación salen antes del LLM y las secciones en orden de llegada."""
+        llamadas_llm = []
+        servicio = _servicio(llamadas_llm)
+        eventos = []
+
+        with patch("app.services.prefactibilidad.service.analizar_proyecto_espacial",
+                   AsyncMock(return_value=RESULTADO_GIS)):
+            async for evento in servicio.ejecutar_analisis_stream(
+                mock_db, {"type": "Polygon", "coordinates": []}, DATOS_PROYECTO,
+                secciones=["resumen_ejecutivo", "descripcion_proyecto", "recomendaciones"],
+            ):
+                eventos.append((evento, list(llamadas_llm)))
+
+        tipos = [e.tipo for e, _ in eventos]
+        assert tipos == ["analisis", "normativa", "seccion", "seccion", "seccion", "done"]
+        primero, llm_al_emitir = eventos[0]
+        assert llm_al_emitir == []
+        assert primero.resultado.clasificacion is not None and primero.resultado.informe is None
+        # La sección estática y la rápida llegan antes que el resumen ejecutivo
+        llegadas = [e.seccion.seccion for e, _ in eventos if e.tipo == "seccion"]
+        assert llegadas[-1] == SeccionInforme.RESUMEN_EJECUTIVO
+        final = eventos[-1][0].resultado
+        assert final.id == primero.resultado.id
+        assert [s["seccion"] for s in final.informe["secciones"]] == [
+            "resumen_ejecutivo", "descripcion_proyecto", "recomendaciones",
+        ]
+        assert final.tokens_usados == 1000
+
+    @pytest.mark.asyncio
+    async def test_cerrar_stream_cancela_secciones_pendientes(self, mock_db):
+        """Test que si el cliente deja de leer se cancelan las secciones LLM en curso."""
+        llamadas_llm = []
+        servicio = _servicio(llamadas_llm)
+
+        with patch("app.services.prefactibilidad.service.analizar_proyecto_espacial",
+                   AsyncMock(return_value=RESULTADO_GIS)):
+            stream = servicio.ejecutar_analisis_stream(
+                mock_db, {"type": "Polygon", "coordinates": []}, DATOS_PROYECTO,
+                secciones=["resumen_ejecutivo", "recomendaciones"],
+            )
+            async for evento in stream:
+                if evento.tipo == "seccion":
+                    break
+            await stream.aclose()
+            await asyncio.sleep(0.15)
+
+        assert evento.seccion.seccion == SeccionInforme.RECOMENDACIONES
+        assert "informe.resumen_ejecutivo" in llamadas_llm
+        assert "fin:informe.resumen_ejecutivo" not in llamadas_llm
+
+
+class TestEndpointAnalisisStream:
+    """Tests del endpoint SSE de análisis."""
+
+    def _app(self):
+        from app.api.v1.endpoints.prefactibilidad import router
+
+        app = FastAPI()
+        app.include_router(router, prefix="/prefactibilidad")
+        return app
+
+    def test_eventos_sse_y_error(self):
+        """Test que cada evento se envía como SSE y un fallo termina con un evento de error."""
+        from app.api.v1.endpoints.prefactibilidad import get_servicio_prefactibilidad
+        from app.services.llm.generador import SeccionGenerada
+
+        async def ejecutar_analisis_stream(**kwargs):
+            yield EventoAnalisis("normativa", normativa=[{"documento": "Ley 19.300"}])
+            yield EventoAnalisis("seccion", seccion=SeccionGenerada(
+                seccion=SeccionInforme.CONCLUSION, titulo="Conclusión", contenido="Procede DIA.",
+            ))
+            raise RuntimeError("GIS no disponible")
+
+        sesion = MagicMock()
+        sesion.__aenter__ = AsyncMock(return_value=MagicMock())
+        sesion.__aexit__ = AsyncMock(return_value=False)
+        app = self._app()
+        app.dependency_overrides[get_servicio_prefactibilidad] = lambda: SimpleNamespace(
+            ejecutar_analisis_stream=ejecutar_analisis_stream,
+        )
+
+        with patch("app.api.v1.endpoints.prefactibilidad.AsyncSessionLocal", return_value=sesion):
+            respuesta = TestClient(app).post("/prefactibilidad/analisis/stream", json={
+                "proyecto": {"nombre": "Proyecto Test"},
+                "geometria": {"type": "Polygon", "coordinates": [[[-69, -23], [-68, -23], [-68, -24], [-69, -23]]]},
+            })
+
+        assert respuesta.status_code == 200
+        assert respuesta.headers["content-type"].startswith("text/event-stream")
+        eventos = [e for e in respuesta.text.split("\n\n") if e]
+        assert [e.split("\n")[0] for e in eventos] == ["event: normativa", "event: seccion", "event: error"]
+        seccion = json.loads(eventos[1].split("data: ", 1)[1])
+        assert seccion["seccion"] == {"seccion": "conclusion", "titulo": "Conclusión", "contenido": "Procede DIA."}
+        assert "GIS no disponible" in json.loads(eventos[2].split("data: ", 1)[1])["error"]
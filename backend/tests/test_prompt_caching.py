@@ -0,0 +1,156 @@
+"""
+Tests del prompt caching del asistente contra el stub local de la API.
+"""
+
+from unittest.mock import AsyncMock
+from uuid import uuid4
+
+import anthropic
+import httpx
+import pytest
+
+from app.services.asistente import AsistenteService, registro_herramientas
+from app.services.asistente.cache_prompts import (
+    CACHE_EFIMERO,
+    UsoTokens,
+    construir_system,
+    marcar_historial,
+    marcar_tools,
+)
+from app.services.asistente.service import _EstadoLoop
+
+from tests.stub_anthropic import StubAnthropic, crear_app
+
+
+@pytest.fixture
+def stub():
+    return StubAnthropic()
+
+
+@pytest.fixture
+def servicio(mock_db, stub):
+    """Servicio con cliente Anthropic real apuntando al stub en memoria."""
+    servicio = AsistenteService(mock_db)
+    servicio.gestor_memoria.guardar_mensaje = AsyncMock()
+    servicio._cliente = anthropic.AsyncAnthropic(
+        api_key="stub",
+        base_url="http://stub",
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=crear_app(stub))),
+    )
+    return servicio
+
+
+def _system():
+    return construir_system("Eres un asistente de evaluacion ambiental. " * 40, "Vista actual: dashboard")
+
+
+class TestMarcadores:
+    """Tests de la colocacion de breakpoints."""
+
+    def test_marcar_historial_no_modifica_original(self):
+        """Test que solo el ultimo bloque de la copia lleva cache_control."""
+        messages = [
+            {"role": "user", "content": "Hola"},
+            {"role": "assistant", "content": [{"type": "text", "text": "Hola, ¿en que ayudo?"}]},
+            {"role": "user", "content": "¿Que es un EIA?"},
+        ]
+
+        marcados = marcar_historial(messages)
+
+        assert marcados[-1]["content"] == [
+            {"type": "text", "text": "¿Que es un EIA?", "cache_control": CACHE_EFIMERO}
+        ]
+        assert marcados[:-1] == messages[:-1]
+        assert messages[-1]["content"] == "¿Que es un EIA?"
+
+    def test_tools_y_system(self):
+        """Test que se marca solo la ultima herramienta y cada bloque del system."""
+        tools = registro_herramientas.obtener_tools_anthropic()
+
+        marcadas = marcar_tools(tools)
+
+        assert [t.get("cache_control") for t in marcadas[:-1]] == [None] * (len(tools) - 1)
+        assert marcadas[-1]["cache_control"] == CACHE_EFIMERO
+        assert "cache_control" not in tools[-1]
+        assert len(construir_system("base", "")) == 1
+        assert all(b["cache_control"] == CACHE_EFIMERO for b in construir_system("base", "ctx"))
+
+
+class TestUsoConStub:
+    """Tests de la contabilidad de tokens cacheados."""
+
+    @pytest.mark.asyncio
+    async def test_segundo_turno_lee_prefijo_cacheado(self, servicio, stub):
+        """Test que el segundo turno lee de cache el prefijo escrito en el primero."""
+        tools = registro_herramientas.obtener_tools_anthropic()
+        historial = [{"role": "user", "content": "¿Cuando se requiere EIA?"}]
+
+        primero = _EstadoLoop()
+        async for _ in servicio._iterar_loop_tool_use(_system(), historial, tools, uuid4(), None, primero):
+            pass
+
+        assert primero.uso.cache_lectura == 0
+        assert primero.uso.cache_escritura > 0
+        assert primero.uso.llamadas == 1
+
+        historial += [
+            {"role": "assistant", "content": primero.respuesta},
+            {"role": "user", "content": "¿Y una DIA?"},
+        ]
+        segundo = _EstadoLoop()
+        async for _ in servicio._iterar_loop_tool_use(
+            _system(), historial, tools, uuid4(), None, segundo, streaming=True,
+        ):
+            pass
+
+        # Se reutiliza todo el prefijo del turno anterior; solo se escribe lo nuevo
+        assert segundo.uso.cache_lectura == primero.uso.input_total
+        assert 0 < segundo.uso.cache_escritura < segundo.uso.cache_lectura
+        assert segundo.respuesta == "stub: ¿Y una DIA?"
+        assert len(stub.llamadas) == 2
+        assert stub.llamadas[1]["usage"]["cache_read_input_tokens"] == segundo.uso.cache_lectura
+
+    @pytest.mark.asyncio
+    async def test_cambio_de_contexto_conserva_tools_y_base(self, servicio, stub):
+        """Test que un contexto distinto solo invalida desde su bloque en adelante."""
+        tools = registro_herramientas.obtener_tools_anthropic()
+        base = "Eres un asistente de evaluacion ambiental. " * 40
+        mensajes = [{"role": "user", "content": "Hola"}]
+
+        for contexto in ("Vista actual: dashboard", "Vista actual: proyecto 7"):
+            estado = _EstadoLoop()
+            async for _ in servicio._iterar_loop_tool_use(
+                construir_system(base, contexto), list(mensajes), tools, uuid4(), None, estado,
+            ):
+                pass
+
+        sin_contexto = StubAnthropic().calcular_uso({
+            "model": stub.llamadas[0]["cuerpo"]["model"],
+            "tools": marcar_tools(tools),
+            "system": construir_system(base, ""),
+        })
+        assert estado.uso.cache_lectura == sin_contexto["cache_creation_input_tokens"]
+
+    def test_sin_breakpoints_todo_sin_cache(self, stub):
+        """Test que sin cache_control todo se cobra como input normal."""
+        cuerpo = {"model": "m", "system": "sistema", "messages": [{"role": "user", "content": "Hola"}]}
+
+        uso = stub.calcular_uso(cuerpo)
+        uso_repetido = stub.calcular_uso(cuerpo)
+
+        assert uso == uso_repetido
+        assert uso["cache_creation_input_tokens"] == uso["cache_read_input_tokens"] == 0
+
+    def test_uso_tokens_acumula(self):
+        """Test que UsoTokens suma llamadas y tolera campos ausentes."""
+        from types import SimpleNamespace
+
+        uso = UsoTokens()
+        uso.registrar(SimpleNamespace(input_tokens=10, cache_creation_input_tokens=100,
+                                      cache_read_input_tokens=0, output_tokens=5))
+        uso.registrar(SimpleNamespace(input_tokens=12, output_tokens=7))
+
+        assert uso.to_dict() == {
+            "input_sin_cache": 22, "cache_escritura": 100, "cache_lectura": 0, "output": 12, "llamadas": 2,
+        }
+        assert uso.input_total == 122
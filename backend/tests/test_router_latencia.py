@@ -0,0 +1,132 @@
+"""
+Tests del enrutamiento LLM por latencia contra el stub local.
+"""
+
+import time
+
+import anthropic
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.services.llm.cliente import ClienteLLM, ModeloLLM
+from app.services.llm.perplexity_client import PerplexityClient
+from app.services.llm.router import LLMRouter, Proveedor, TipoTarea
+from app.services.llm.salud_modelos import MonitorModelos
+from app.services.llm.telemetria import instrumentar
+
+from tests.stub_anthropic import DistribucionLatencia, StubAnthropic, crear_app
+
+
+def _router(stub, perplexity=None):
+    """Router en modo latencia cuyos clientes llaman al stub a través de la telemetría."""
+    cliente = ClienteLLM()
+    cliente._cliente = instrumentar(anthropic.AsyncAnthropic(
+        api_key="stub",
+        base_url="http://stub",
+        max_retries=0,
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=crear_app(stub))),
+    ), "llm.generar")
+    return LLMRouter(anthropic_client=cliente, perplexity_client=perplexity, modo="latencia")
+
+
+class TestMonitorModelos:
+    """Tests de la ventana móvil de latencia y errores."""
+
+    def test_percentiles_tasa_de_error_y_ventana(self):
+        """Test que los percentiles ignoran los errores y las muestras vencidas salen de la ventana."""
+        monitor = MonitorModelos(ventana_segundos=60, max_muestras=100)
+        for latencia in range(10, 110, 10):
+            monitor.registrar("anthropic", "modelo", latencia)
+        monitor.registrar("anthropic", "modelo", 5000, error=True)
+
+        estadisticas = monitor.estadisticas("anthropic", "modelo")
+        assert (estadisticas.muestras, estadisticas.p50_ms, estadisticas.p95_ms) == (11, 50, 100)
+        assert estadisticas.tasa_error == pytest.approx(1 / 11, abs=1e-3)
+
+        monitor.ventana_segundos = 0
+        time.sleep(0.001)
+        assert monitor.estadisticas("anthropic", "modelo").muestras == 0
+        assert monitor.instantanea() == []
+
+
+class TestRouterLatencia:
+    """Tests de las decisiones del modo latencia."""
+
+    @pytest.mark.asyncio
+    async def test_respuesta_rapida_pasa_al_modelo_rapido_fuera_de_presupuesto(self):
+        """Test que con el modelo por defecto lento las respuestas rápidas con presupuesto van al rápido."""
+        stub = StubAnthropic(latencia_por_modelo={ModeloLLM.CLAUDE_SONNET.value: DistribucionLatencia("fija", 60)})
+        router = _router(stub)
+
+        iniciales = [
+            await router.ejecutar(TipoTarea.RESPUESTA_RAPIDA, "hola", presupuesto_ms=40)
+            for _ in range(settings.LLM_ROUTER_MIN_MUESTRAS)
+        ]
+        rapida = await router.ejecutar(TipoTarea.RESPUESTA_RAPIDA, "hola", presupuesto_ms=40)
+        sin_presupuesto = await router.ejecutar(TipoTarea.RESPUESTA_RAPIDA, "hola")
+        razonamiento = await router.ejecutar(TipoTarea.RAZONAMIENTO, "analiza", presupuesto_ms=40)
+
+        assert {r.modelo for r in iniciales} == {ModeloLLM.CLAUDE_SONNET.value}
+        assert (rapida.modelo, rapida.metadata["routing"]) == (settings.LLM_MODELO_RAPIDO, "fuera_de_presupuesto")
+        assert sin_presupuesto.modelo == ModeloLLM.CLAUDE_SONNET.value
+        assert razonamiento.modelo == ModeloLLM.CLAUDE_SONNET.value
+
+        info = router.get_routing_info()
+        assert info["modo"] == "latencia"
+        assert info["conteo_decisiones"]["respuesta_rapida:fuera_de_presupuesto"] == 1
+        assert info["decisiones_recientes"][-3]["modelo"] == settings.LLM_MODELO_RAPIDO
+        lento = next(e for e in info["estadisticas"] if e["modelo"] == ModeloLLM.CLAUDE_SONNET.value)
+        assert lento["p95_ms"] >= 60
+
+    @pytest.mark.asyncio
+    async def test_busqueda_se_desvia_de_perplexity_degradado(self, monkeypatch):
+        """Test que tras fallas repetidas de Perplexity las búsquedas van directo a Anthropic."""
+        monkeypatch.setattr(settings, "PERPLEXITY_API_KEY", "stub")
+        stub = StubAnthropic()
+        perplexity = PerplexityClient(api_key="stub")
+        perplexity._client = httpx.AsyncClient(
+            base_url="http://stub", transport=httpx.ASGITransport(app=crear_app(StubAnthropic(tasa_5xx=1.0))),
+        )
+        router = _router(stub, perplexity)
+
+        fallidas = [
+            await router.ejecutar(TipoTarea.BUSQUEDA_WEB, f"cambios al SEIA {i}")
+            for i in range(settings.LLM_ROUTER_MIN_MUESTRAS)
+        ]
+        desviada = await router.ejecutar(TipoTarea.BUSQUEDA_WEB, "cambios al SEIA")
+
+        assert {r.metadata["routing"] for r in fallidas} == {"preferido"}
+        assert {r.proveedor for r in fallidas} == {Proveedor.ANTHROPIC.value}
+        assert desviada.metadata["routing"] == "perplexity_degradado"
+        assert router.get_routing_info()["routing"]["busqueda_web"] == "anthropic"
+        # La desviada no llegó a Perplexity y usó el contexto de fallback
+        assert stub.llamadas[-1]["cuerpo"]["system"]
+
+    def test_modo_estatico_no_usa_estadisticas(self, monitor_modelos_local):
+        """Test que en modo estático la tabla manda aunque el modelo esté degradado."""
+        for _ in range(10):
+            monitor_modelos_local.registrar("anthropic", ModeloLLM.CLAUDE_SONNET.value, 9000, error=True)
+        router = LLMRouter(anthropic_client=ClienteLLM(), modo="estatico")
+
+        decision = router.decidir(TipoTarea.RESPUESTA_RAPIDA, presupuesto_ms=100)
+
+        assert (decision.proveedor, decision.modelo, decision.motivo) == (Proveedor.ANTHROPIC, None, "estatico")
+        assert router.get_routing_info()["decisiones_recientes"] == []
+
+    def test_turnos_simples_del_asistente(self, monkeypatch, monitor_modelos_local):
+        """Test que solo los mensajes cortos fuera de un proyecto se enrutan con el presupuesto del asistente."""
+        from app.services.asistente.service import AsistenteService
+
+        for _ in range(settings.LLM_ROUTER_MIN_MUESTRAS):
+            monitor_modelos_local.registrar("anthropic", settings.LLM_MODEL, 8000)
+        monkeypatch.setattr(settings, "ASISTENTE_PRESUPUESTO_LATENCIA_MS", 3000)
+        monkeypatch.setattr(
+            "app.services.asistente.service.get_llm_router",
+            lambda: LLMRouter(anthropic_client=ClienteLLM(), modo="latencia"),
+        )
+        servicio = AsistenteService.__new__(AsistenteService)
+
+        assert servicio._modelo_turno("Hola, ¿qué puedes hacer?", False) == settings.LLM_MODELO_RAPIDO
+        assert servicio._modelo_turno("Hola, ¿qué puedes hacer?", True) == settings.LLM_MODEL
+        assert servicio._modelo_turno("x" * 500, False) == settings.LLM_MODEL
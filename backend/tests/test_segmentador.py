@@ -0,0 +1,120 @@
+"""
+Tests para el segmentador de documentos legales.
+"""
+
+import pytest
+
+from app.services.rag.segmentador import SegmentadorLegal, estimar_tokens
+
+LEY = """
+Biblioteca del Congreso Nacional de Chile - www.leychile.cl
+Ley 19300
+    "TITULO I
+    Disposiciones Generales
+    Artículo 1°.- El derecho a vivir en un medio ambiente
+libre de contaminación se regulará por las disposiciones de
+esta ley, sin perjuicio de lo que otras normas establezcan.
+    Artículo 2°.- Para todos los efectos legales, se entenderá
+por Biodiversidad la variabilidad de los organismos vivos, conforme
+al artículo 11 de esta ley y al Art. 3 del reglamento.
+    TITULO II
+    De los Instrumentos de Gestión Ambiental
+    Párrafo 1º bis
+    De la Evaluación Ambiental Estratégica
+     Artículo 7º bis.- Se someterán a evaluación ambiental estratégica
+las políticas y planes de carácter normativo general.
+     Artículo 17.- Derogado.
+"""
+
+
+@pytest.fixture
+def segmentador():
+    return SegmentadorLegal(max_tokens=60)
+
+
+class TestSegmentadorLegal:
+    """Tests de SegmentadorLegal.segmentar."""
+
+    def test_articulos_con_jerarquia(self, segmentador):
+        """Test que detecta artículos con su título y párrafo."""
+        segmentos = list(segmentador.segmentar(LEY))
+
+        assert [s.seccion for s in segmentos] == ["Artículo 1", "Artículo 2", "Artículo 7 bis"]
+        assert segmentos[0].titulo == "Título I Disposiciones Generales"
+        assert segmentos[0].parrafo is None
+        assert segmentos[2].titulo == "Título II De los Instrumentos de Gestión Ambiental"
+        assert segmentos[2].parrafo == "Párrafo 1 bis De la Evaluación Ambiental Estratégica"
+        assert segmentos[2].numero_seccion == "7 bis"
+
+    def test_referencias_internas_no_cortan_articulos(self, segmentador):
+        """Test que "artículo 11" o "Art. 3" dentro del texto no abren un artículo."""
+        segmentos = list(segmentador.segmentar(LEY))
+
+        articulo_2 = segmentos[1]
+        assert "artículo 11 de esta ley" in articulo_2.contenido
+        assert "Art. 3 del reglamento" in articulo_2.contenido
+        assert "TITULO" not in articulo_2.contenido
+
+    def test_preambulo_descartado_y_articulos_cortos_omitidos(self, segmentador):
+        """Test que el encabezado de publicación y 'Derogado.' no se indexan."""
+        segmentos = list(segmentador.segmentar(LEY))
+
+        assert all("Biblioteca" not in s.contenido for s in segmentos)
+        assert all(s.numero_seccion != "17" for s in segmentos)
+
+    def test_articulo_largo_se_divide_por_tokens(self, segmentador):
+        """Test que un artículo largo se divide en partes dentro del presupuesto."""
+        texto = "Artículo 5°.- " + "El titular deberá informar a la autoridad. " * 40
+
+        segmentos = list(segmentador.segmentar(texto))
+
+        assert len(segmentos) > 1
+        assert all(s.seccion.startswith("Artículo 5 (parte ") for s in segmentos)
+        assert all(s.tokens <= 60 for s in segmentos)
+        assert sum(s.contenido.count("titular") for s in segmentos) == 40
+
+    def test_documento_sin_articulos_por_secciones_numeradas(self):
+        """Test que una guía se segmenta por sus encabezados numerados."""
+        segmentador = SegmentadorLegal(max_tokens=20)
+        guia = "\n".join([
+            "1. Introducción",
+            "Esta guía describe criterios para evaluar el área de influencia del proyecto. " * 3,
+            "2.1 Descripción del área de influencia",
+            "Se deben considerar los componentes ambientales afectados por las obras. " * 3,
+        ])
+
+        segmentos = list(segmentador.segmentar(guia))
+        numeros = [s.numero_seccion for s in segmentos]
+
+        assert numeros[0] == "1" and numeros[-1] == "2.1"
+        assert any(s.seccion.startswith("Sección 2.1") for s in segmentos)
+
+    def test_texto_plano_en_bloques_secuenciales(self):
+        """Test que un texto sin encabezados se divide en secciones numeradas."""
+        segmentador = SegmentadorLegal(max_tokens=30)
+        texto = "Contiene información sobre medio ambiente y recursos naturales. " * 30
+
+        segmentos = list(segmentador.segmentar(texto))
+
+        assert len(segmentos) > 1
+        assert [s.seccion for s in segmentos] == [f"Sección {i}" for i in range(1, len(segmentos) + 1)]
+
+    def test_entrega_fragmentos_sin_consumir_todo_el_documento(self, segmentador):
+        """Test que el segmentador es un generador sobre líneas."""
+        consumidas = []
+
+        def lineas():
+            for i in range(1, 1000):
+                linea = f"Artículo {i}.- Texto del artículo {i} con contenido suficiente para indexarlo.\n"
+                consumidas.append(i)
+                yield linea
+
+        primero = next(segmentador.segmentar(lineas()))
+
+        assert primero.seccion == "Artículo 1"
+        assert len(consumidas) == 2
+
+    def test_estimar_tokens(self):
+        """Test que la estimación crece con las palabras."""
+        assert estimar_tokens("") == 0
+        assert estimar_tokens("uno dos tres") < estimar_tokens("uno dos tres cuatro cinco seis")
@@ -0,0 +1,93 @@
+"""
+Tests de la serializacion de resultados de herramientas para el LLM.
+"""
+
+import json
+
+from app.services.asistente import ResultadoHerramienta, registro_herramientas
+from app.services.asistente.tools.base import proyectar
+
+
+def _resultado_busqueda(n=20, largo=3000):
+    return ResultadoHerramienta(exito=True, contenido={
+        "query": "glaciares",
+        "metodo_busqueda": "dos_pasos",
+        "total_encontrados": n,
+        "fragmentos_prioritarios": n,
+        "fragmentos_base": 0,
+        "fragmentos": [
+            {
+                "fragmento_id": i,
+                "documento_id": 100 + i,
+                "documento_titulo": f"Guia {i}",
+                "contenido": "Los glaciares se protegen. " * (largo // 27),
+                "temas": ["glaciares", "agua"],
+                "similitud": round(0.9 - i * 0.01, 4),
+            }
+            for i in range(n)
+        ],
+    })
+
+
+class TestSerializacion:
+    """Tests de JSON compacto, proyeccion y recorte."""
+
+    def test_json_compacto_con_proyeccion(self):
+        """Test que se produce JSON valido sin los campos proyectados fuera."""
+        serializado = registro_herramientas.serializar_resultado("buscar_normativa", _resultado_busqueda(n=2, largo=100))
+
+        datos = json.loads(serializado.texto)
+        assert datos["success"] is True
+        assert "fragmentos_prioritarios" not in datos["result"]
+        assert "temas" not in datos["result"]["fragmentos"][0]
+        assert datos["result"]["fragmentos"][0]["fragmento_id"] == 0
+        assert ", " not in serializado.texto.split('"contenido"')[0]
+        assert serializado.recortado is False
+        assert serializado.bytes_final < serializado.bytes_original
+
+    def test_recorte_respeta_tope_y_conserva_los_primeros(self):
+        """Test que un resultado grande queda bajo el tope, con los mejores elementos e ids."""
+        resultado = _resultado_busqueda()
+
+        serializado = resultado.serializar(max_bytes=4000)
+
+        assert serializado.recortado is True
+        assert serializado.bytes_final <= 4000
+        assert serializado.bytes_original > 50000
+        datos = json.loads(serializado.texto)
+        fragmentos = datos["result"]["fragmentos"]
+        assert [f["fragmento_id"] for f in fragmentos if isinstance(f, dict)] == list(range(len(fragmentos) - 1))
+        assert fragmentos[-1].endswith("elementos omitidos]")
+        assert "caracteres]" in fragmentos[0]["contenido"]
+        assert datos["truncado"]["bytes_original"] == serializado.bytes_original
+
+    def test_tope_minimo_sigue_siendo_json_con_ids(self):
+        """Test que si ni el recorte mas agresivo cabe, se envia un JSON valido con estado e ids."""
+        serializado = _resultado_busqueda().serializar(max_bytes=300)
+
+        datos = json.loads(serializado.texto)
+        assert serializado.recortado is True
+        assert serializado.bytes_final <= 300
+        assert datos["success"] is True and "result" not in datos
+        assert datos["ids"]["fragmento_id"][:3] == [0, 1, 2]
+        assert datos["ids"]["documento_id"][0] == 100
+
+    def test_error_se_serializa_completo(self):
+        """Test que los errores no se proyectan ni recortan."""
+        serializado = ResultadoHerramienta(exito=False, contenido=None, error="Proyecto no encontrado").serializar(
+            proyeccion={"result": False}, max_bytes=1000,
+        )
+
+        assert json.loads(serializado.texto) == {"success": False, "error": "Proyecto no encontrado"}
+
+    def test_proyeccion_anidada(self):
+        """Test que la proyeccion omite campos anidados y conserva los no mencionados."""
+        analisis = {
+            "id": 1,
+            "alertas": [{"id": "A1", "titulo": "Glaciar", "elementos_gis": [{"geom": "..."}] * 50}],
+        }
+
+        proyectado = proyectar(analisis, {"alertas": {"elementos_gis": False}})
+
+        assert proyectado == {"id": 1, "alertas": [{"id": "A1", "titulo": "Glaciar"}]}
+        assert "elementos_gis" in analisis["alertas"][0]
@@ -0,0 +1,129 @@
+"""
+Tests del stub local de proveedores LLM usado en pruebas de carga.
+"""
+
+import random
+
+import anthropic
+import httpx
+import pytest
+
+from app.services.llm.perplexity_client import PerplexityClient
+
+from tests.stub_anthropic import (
+    CITAS_PERPLEXITY,
+    DistribucionLatencia,
+    ReglaGuion,
+    StubAnthropic,
+    crear_app,
+)
+
+MODELO = "claude-sonnet-4-20250514"
+TOOLS = [{
+    "name": "buscar_normativa",
+    "description": "Busca en el corpus legal",
+    "input_schema": {"type": "object", "properties": {"query": {"type": "string"}}},
+}]
+GUION = [ReglaGuion(patron="art[ií]culo", herramienta="buscar_normativa", entrada={"query": "Art. 11"})]
+
+
+def _cliente(stub):
+    return anthropic.AsyncAnthropic(
+        api_key="stub",
+        base_url="http://stub",
+        max_retries=0,
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=crear_app(stub))),
+    )
+
+
+class TestStubLLM:
+    """Tests de herramientas guionadas, streaming, fallas y latencia simuladas."""
+
+    @pytest.mark.asyncio
+    async def test_tool_use_guionado_y_respuesta_final(self):
+        """Test que la regla produce tool_use y tras el tool_result el stub cierra el turno con texto."""
+        cliente = _cliente(StubAnthropic(guion=GUION))
+        mensajes = [{"role": "user", "content": "¿Qué dice el artículo 11?"}]
+
+        primera = await cliente.messages.create(model=MODELO, max_tokens=100, tools=TOOLS, messages=mensajes)
+        [tool_use] = primera.content
+        segunda = await cliente.messages.create(model=MODELO, max_tokens=100, tools=TOOLS, messages=[
+            *mensajes,
+            {"role": "assistant", "content": [tool_use.model_dump()]},
+            {"role": "user", "content": [{"type": "tool_result", "tool_use_id": tool_use.id, "content": "Art. 11..."}]},
+        ])
+        sin_tools = await cliente.messages.create(model=MODELO, max_tokens=100, messages=mensajes)
+
+        assert primera.stop_reason == "tool_use"
+        assert (tool_use.name, tool_use.input) == ("buscar_normativa", {"query": "Art. 11"})
+        assert segunda.stop_reason == "end_turn" and segunda.content[0].text == "stub: Art. 11..."
+        assert sin_tools.stop_reason == "end_turn"
+
+    @pytest.mark.asyncio
+    async def test_streaming_con_tool_use_y_texto_en_deltas(self):
+        """Test que el SDK reconstruye tool_use y texto largo desde los eventos del stream."""
+        stub = StubAnthropic(guion=GUION, tokens_salida=60)
+        cliente = _cliente(stub)
+
+        async with cliente.messages.stream(
+            model=MODELO, max_tokens=100, tools=TOOLS,
+            messages=[{"role": "user", "content": "Artículo 11, por favor"}],
+        ) as stream:
+            con_tool = await stream.get_final_message()
+        async with cliente.messages.stream(
+            model=MODELO, max_tokens=100, messages=[{"role": "user", "content": "Hola"}],
+        ) as stream:
+            deltas = [delta async for delta in stream.text_stream]
+            con_texto = await stream.get_final_message()
+
+        assert con_tool.content[0].type == "tool_use" and con_tool.content[0].input == {"query": "Art. 11"}
+        assert len(deltas) > 1
+        assert "".join(deltas) == con_texto.content[0].text
+        assert con_texto.usage.output_tokens == pytest.approx(60, abs=2)
+
+    @pytest.mark.asyncio
+    async def test_inyeccion_de_429_y_5xx(self):
+        """Test que las tasas de falla producen los errores que el SDK espera de la API."""
+        parametros = {"model": MODELO, "max_tokens": 10, "messages": [{"role": "user", "content": "hola"}]}
+        sobrecargado = StubAnthropic(tasa_5xx=1.0, semilla=1)
+
+        with pytest.raises(anthropic.RateLimitError):
+            await _cliente(StubAnthropic(tasa_429=1.0)).messages.create(**parametros)
+        for _ in range(4):
+            with pytest.raises(anthropic.APIStatusError) as error:
+                await _cliente(sobrecargado).messages.create(**parametros)
+            assert error.value.status_code in (500, 529)
+
+        assert sobrecargado.metricas()["errores_5xx"] == 4
+        assert sobrecargado.metricas()["llamadas"] == 0
+
+    def test_distribuciones_de_latencia_reproducibles(self):
+        """Test que las distribuciones se parsean y la semilla fija la secuencia."""
+        lognormal = DistribucionLatencia.desde_texto("lognormal:800:0.5")
+        azar = random.Random(7)
+        muestras = sorted(lognormal.muestrear(azar) for _ in range(2001))
+        uniforme = DistribucionLatencia.desde_texto("uniforme:100:200")
+
+        assert DistribucionLatencia.desde_texto("fija:250").muestrear(random.Random()) == 250
+        assert 700 < muestras[1000] < 900
+        assert muestras[-1] > 2 * muestras[1000]
+        assert all(100 <= uniforme.muestrear(random.Random(s)) <= 200 for s in range(20))
+        assert [lognormal.muestrear(random.Random(3)) for _ in range(2)] == [lognormal.muestrear(random.Random(3))] * 2
+        with pytest.raises(ValueError):
+            DistribucionLatencia.desde_texto("normal:100")
+
+    @pytest.mark.asyncio
+    async def test_perplexity_contra_el_stub(self):
+        """Test que PerplexityClient obtiene contenido, citas y tokens desde /chat/completions."""
+        stub = StubAnthropic()
+        cliente = PerplexityClient(api_key="stub")
+        cliente._client = httpx.AsyncClient(
+            base_url="http://stub", transport=httpx.ASGITransport(app=crear_app(stub)),
+        )
+
+        respuesta = await cliente.buscar("plazos de evaluación de una DIA")
+
+        assert respuesta.contenido == "stub: plazos de evaluación de una DIA"
+        assert [f.url for f in respuesta.fuentes] == CITAS_PERPLEXITY
+        assert respuesta.tokens_usados > 0
+        assert stub.metricas()["por_ruta"] == {"chat_completions": 1}
@@ -0,0 +1,122 @@
+"""
+Tests de la telemetría unificada de llamadas a LLM.
+"""
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.services.llm.telemetria import (
+    get_telemetria_llm,
+    instrumentar,
+    operacion_llm,
+)
+
+MODELO = "claude-sonnet-4-20250514"
+
+
+def _respuesta(entrada=1000, salida=200, cache_lectura=0, cache_escritura=0):
+    return SimpleNamespace(
+        model=MODELO,
+        content=[SimpleNamespace(type="text", text="ok")],
+        usage=SimpleNamespace(
+            input_tokens=entrada,
+            output_tokens=salida,
+            cache_read_input_tokens=cache_lectura,
+            cache_creation_input_tokens=cache_escritura,
+        ),
+    )
+
+
+def _cliente(*efectos):
+    """Cliente asíncrono falso con messages y beta.prompt_caching.messages."""
+    mensajes = SimpleNamespace(create=AsyncMock(side_effect=list(efectos)))
+    return SimpleNamespace(
+        messages=mensajes,
+        beta=SimpleNamespace(prompt_caching=SimpleNamespace(messages=mensajes)),
+    )
+
+
+@pytest.fixture
+def telemetria():
+    telemetria = get_telemetria_llm()
+    telemetria.limpiar()
+    yield telemetria
+    telemetria.limpiar()
+
+
+class TestTelemetriaLLM:
+    """Tests del registro, la exportación y el volcado de métricas LLM."""
+
+    @pytest.mark.asyncio
+    async def test_cliente_instrumentado_registra_tokens_cache_y_costo(self, telemetria):
+        """Test que una llamada bajo beta.prompt_caching registra tokens reales, caché y costo."""
+        cliente = instrumentar(_cliente(_respuesta(cache_lectura=4000, cache_escritura=1000)), sitio="asistente.chat")
+
+        await cliente.beta.prompt_caching.messages.create(model=MODELO, max_tokens=10, messages=[])
+
+        [serie] = telemetria.instantanea()
+        assert (serie["sitio"], serie["proveedor"], serie["modelo"]) == ("asistente.chat", "anthropic", MODELO)
+        assert serie["llamadas"] == 1 and serie["reintentos"] == 0
+        assert (serie["tokens_input"], serie["tokens_output"]) == (1000, 200)
+        assert (serie["tokens_cache_lectura"], serie["tokens_cache_escritura"]) == (4000, 1000)
+        # 1K entrada + 0.2K salida + caché (4K * 0.1 + 1K * 1.25) a precios de Sonnet
+        assert serie["costo_usd"] == pytest.approx(0.003 + 0.003 + 0.003 * 1.65)
+
+    @pytest.mark.asyncio
+    async def test_operacion_cuenta_reintentos_y_refina_sitio(self, telemetria):
+        """Test que los intentos extra de una operación cuentan como reintentos con el sitio del llamador."""
+        cliente = instrumentar(
+            _cliente(ConnectionError("caído"), _respuesta()), sitio="llm.generar",
+        )
+
+        with operacion_llm("informe.resumen_ejecutivo"):
+            with pytest.raises(ConnectionError):
+                await cliente.messages.create(model=MODELO, messages=[])
+            await cliente.messages.create(model=MODELO, messages=[])
+
+        [serie] = telemetria.instantanea()
+        assert serie["sitio"] == "informe.resumen_ejecutivo"
+        assert serie["llamadas"] == 2
+        assert serie["reintentos"] == 1
+        assert serie["errores_por_tipo"] == {"ConnectionError": 1}
+
+    @pytest.mark.asyncio
+    async def test_exportacion_prometheus(self, telemetria):
+        """Test que el histograma de latencia es acumulado y termina en +Inf."""
+        telemetria.registrar("ocr.vision", "anthropic", MODELO, latencia_ms=80, tokens_input=10)
+        telemetria.registrar("ocr.vision", "anthropic", MODELO, latencia_ms=3000, error="RateLimitError")
+
+        texto = telemetria.exportar_prometheus()
+
+        etiquetas = f'sitio="ocr.vision",proveedor="anthropic",modelo="{MODELO}"'
+        assert "# TYPE llm_latencia_ms histogram" in texto
+        assert f'llm_latencia_ms_bucket{{{etiquetas},le="100"}} 1' in texto
+        assert f'llm_latencia_ms_bucket{{{etiquetas},le="5000"}} 2' in texto
+        assert f'llm_latencia_ms_bucket{{{etiquetas},le="+Inf"}} 2' in texto
+        assert f"llm_latencia_ms_count{{{etiquetas}}} 2" in texto
+        assert f'llm_errores_total{{{etiquetas},tipo="RateLimitError"}} 1' in texto
+        assert f'llm_tokens_total{{{etiquetas},tipo="input"}} 10' in texto
+
+    @pytest.mark.asyncio
+    async def test_volcado_conserva_deltas_si_falla(self, telemetria, mock_db):
+        """Test que un volcado fallido no pierde los agregados y el siguiente los persiste una vez."""
+        telemetria.registrar("clasificador.lote", "anthropic", MODELO, latencia_ms=500, tokens_input=100)
+        mock_db.execute = AsyncMock(side_effect=OSError("sin conexión"))
+
+        with pytest.raises(OSError):
+            await telemetria.volcar_rollups(mock_db)
+        mock_db.rollback.assert_awaited_once()
+
+        telemetria.registrar("clasificador.lote", "anthropic", MODELO, latencia_ms=700, tokens_input=50)
+        mock_db.execute = AsyncMock()
+        filas = await telemetria.volcar_rollups(mock_db)
+
+        assert filas == 1
+        parametros = mock_db.execute.call_args.args[1]
+        assert parametros["llamadas"] == 2
+        assert parametros["tokens_input"] == 150
+        assert sum(parametros["buckets"]) == 2
+        mock_db.commit.assert_awaited_once()
+        assert await telemetria.volcar_rollups(mock_db) == 0
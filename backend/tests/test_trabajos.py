@@ -0,0 +1,346 @@
+"""
+Tests para el worker de la cola de trabajos.
+
+Usa una cola en memoria en lugar de PostgreSQL.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, MagicMock
+
+from app.services.trabajos.base import EjecutorTrabajo
+from app.services.trabajos.cola import ColaTrabajos, Trabajo
+from app.services.trabajos.worker import WorkerTrabajos, limites_concurrencia
+
+
+class ColaMemoria:
+    """Cola de trabajos en memoria con la interfaz de ColaTrabajos."""
+
+    def __init__(self, cancelar_en_latido: bool = False):
+        self.cancelar_en_latido = cancelar_en_latido
+        self.etapas_completadas = []
+        self.resultado = None
+        self.estado = "en_proceso"
+        self.error = None
+        self.commits = 0
+
+    def sesion(self):
+        cola = self
+        db = MagicMock()
+
+        async def commit():
+            cola.commits += 1
+
+        db.commit = commit
+
+        class _Sesion:
+            async def __aenter__(self):
+                return db
+
+            async def __aexit__(self, *args):
+                return False
+
+        return _Sesion()
+
+    async def iniciar_etapa(self, trabajo_id, worker_id, etapa, progreso):
+        pass
+
+    async def completar_etapa(self, db, trabajo_id, worker_id, etapa, progreso, checkpoint):
+        self.etapas_completadas.append(etapa)
+
+    async def completar(self, db, trabajo_id, worker_id, resultado):
+        self.estado = "completado"
+        self.resultado = resultado
+
+    async def latido(self, trabajo_id, worker_id):
+        return self.cancelar_en_latido
+
+    async def fallar(self, trabajo_id, worker_id, error):
+        self.estado = "error"
+        self.error = error
+
+    async def reintentar(self, trabajo_id, worker_id, error, espera_segundos):
+        self.estado = "pendiente"
+        self.error = error
+        self.espera = espera_segundos
+
+    async def marcar_cancelado(self, trabajo_id, worker_id):
+        self.estado = "cancelado"
+
+    async def liberar(self, trabajo_id, worker_id):
+        self.estado = "pendiente"
+
+
+class EjecutorPrueba(EjecutorTrabajo):
+    """Ejecutor de tres etapas que registra lo que ejecuta."""
+
+    tipo = "prueba"
+    etapas = [("a", 30), ("b", 60), ("c", 100)]
+
+    def __init__(self, fallar_en=None, latencia=0.0, error=ValueError, reintentos=0):
+        self.fallar_en = fallar_en
+        self.error = error
+        self.reintentos = reintentos
+        self.latencia = latencia
+        self.ejecutadas = []
+        self.limpiar = AsyncMock()
+
+    async def ejecutar_etapa(self, db, trabajo, etapa, checkpoint):
+        await asyncio.sleep(self.latencia)
+        if etapa == self.fallar_en:
+            raise self.error(f"fallo en {etapa}")
+        self.ejecutadas.append((etapa, dict(checkpoint)))
+        return {etapa: True}
+
+    def construir_resultado(self, trabajo, checkpoint):
+        return {"etapas": sorted(checkpoint)}
+
+
+def _trabajo(**kwargs) -> Trabajo:
+    return Trabajo(id=1, tipo="prueba", estado="en_proceso", **kwargs)
+
+
+class TestWorkerTrabajos:
+    """Tests de WorkerTrabajos.procesar."""
+
+    @pytest.mark.asyncio
+    async def test_ejecuta_todas_las_etapas(self):
+        """Test que ejecuta las etapas en orden y completa el trabajo."""
+        cola = ColaMemoria()
+        ejecutor = EjecutorPrueba()
+        worker = WorkerTrabajos([ejecutor], cola=cola, worker_id="w1")
+
+        await worker.procesar(_trabajo(), asyncio.Event())
+
+        assert [e for e, _ in ejecutor.ejecutadas] == ["a", "b", "c"]
+        assert cola.etapas_completadas == ["a", "b", "c"]
+        assert cola.estado == "completado"
+        assert cola.resultado == {"etapas": ["a", "b", "c"]}
+        assert cola.commits == 3
+        ejecutor.limpiar.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_reanuda_desde_ultima_etapa_completada(self):
+        """Test que un trabajo reclamado tras una caída salta las etapas hechas."""
+        cola = ColaMemoria()
+        ejecutor = EjecutorPrueba()
+        worker = WorkerTrabajos([ejecutor], cola=cola, worker_id="w2")
+
+        trabajo = _trabajo(etapas_completadas=["a", "b"], checkpoint={"a": True, "b": True})
+        await worker.procesar(trabajo, asyncio.Event())
+
+        assert ejecutor.ejecutadas == [("c", {"a": True, "b": True})]
+        assert cola.estado == "completado"
+
+    @pytest.mark.asyncio
+    async def test_error_en_etapa_marca_trabajo_fallido(self):
+        """Test que una excepción en una etapa marca el trabajo como error."""
+        cola = ColaMemoria()
+        ejecutor = EjecutorPrueba(fallar_en="b")
+        worker = WorkerTrabajos([ejecutor], cola=cola, worker_id="w1")
+
+        await worker.procesar(_trabajo(), asyncio.Event())
+
+        assert cola.etapas_completadas == ["a"]
+        assert cola.estado == "error"
+        assert "fallo en b" in cola.error
+
+    @pytest.mark.asyncio
+    async def test_cancelacion_detectada_en_latido(self, monkeypatch):
+        """Test que el latido interrumpe un trabajo con cancelación solicitada."""
+        monkeypatch.setattr("app.services.trabajos.worker.settings.TRABAJOS_HEARTBEAT_SEGUNDOS", 0.01)
+        cola = ColaMemoria(cancelar_en_latido=True)
+        ejecutor = EjecutorPrueba(latencia=0.2)
+        worker = WorkerTrabajos([ejecutor], cola=cola, worker_id="w1")
+
+        await worker.procesar(_trabajo(), asyncio.Event())
+
+        assert cola.estado == "cancelado"
+        assert cola.etapas_completadas == []
+
+    @pytest.mark.asyncio
+    async def test_apagado_devuelve_trabajo_a_la_cola(self, monkeypatch):
+        """Test que al detener el worker el trabajo en curso queda pendiente."""
+        monkeypatch.setattr("app.services.trabajos.worker.settings.TRABAJOS_HEARTBEAT_SEGUNDOS", 0.01)
+        cola = ColaMemoria()
+        ejecutor = EjecutorPrueba(latencia=0.2)
+        worker = WorkerTrabajos([ejecutor], cola=cola, worker_id="w1")
+
+        detener = asyncio.Event()
+        detener.set()
+        await worker.procesar(_trabajo(), detener)
+
+        assert cola.estado == "pendiente"
+
+
+class TestReintentosYLimites:
+    """Tests de reintentos con espera y límites de concurrencia por tipo."""
+
+    @pytest.mark.asyncio
+    async def test_error_transitorio_vuelve_a_la_cola_con_espera(self, monkeypatch):
+        """Test que un error reintentable devuelve el trabajo sin limpiarlo y agota los reintentos."""
+        monkeypatch.setattr("app.services.trabajos.base.settings.TRABAJOS_BACKOFF_BASE_SEGUNDOS", 10)
+        monkeypatch.setattr("app.services.trabajos.base.settings.TRABAJOS_BACKOFF_MAX_SEGUNDOS", 25)
+        ejecutor = EjecutorPrueba(fallar_en="b", error=ConnectionError, reintentos=2)
+        worker = WorkerTrabajos([ejecutor], cola=ColaMemoria(), worker_id="w1")
+
+        cola = worker.cola
+        await worker.procesar(_trabajo(reintentos=1), asyncio.Event())
+        assert (cola.estado, cola.error) == ("pendiente", "fallo en b")
+        assert 10 <= cola.espera <= 20
+        ejecutor.limpiar.assert_not_awaited()
+
+        worker.cola = cola = ColaMemoria()
+        await worker.procesar(_trabajo(reintentos=2), asyncio.Event())
+        assert cola.estado == "error"
+        ejecutor.limpiar.assert_awaited_once()
+        assert ejecutor.espera_reintento(5) <= 25
+
+    @pytest.mark.asyncio
+    async def test_error_de_entrada_no_se_reintenta(self):
+        """Test que un ValueError falla el trabajo aunque queden reintentos."""
+        cola = ColaMemoria()
+        worker = WorkerTrabajos([EjecutorPrueba(fallar_en="a", reintentos=3)], cola=cola, worker_id="w1")
+
+        await worker.procesar(_trabajo(), asyncio.Event())
+
+        assert cola.estado == "error"
+
+    def test_limites_del_ejecutor_y_de_configuracion(self, monkeypatch):
+        """Test que la configuración reemplaza el límite del ejecutor y 0 lo quita."""
+        pesado, liviano, otro = EjecutorPrueba(), EjecutorPrueba(), EjecutorPrueba()
+        pesado.tipo, pesado.limite_concurrencia = "pesado", 2
+        liviano.tipo, otro.tipo, otro.limite_concurrencia = "liviano", "otro", 5
+        monkeypatch.setattr(
+            "app.services.trabajos.worker.settings.TRABAJOS_LIMITES_CONCURRENCIA",
+            {"liviano": 3, "otro": 0, "ajeno": 1},
+        )
+
+        assert limites_concurrencia([pesado, liviano, otro]) == {"pesado": 2, "liviano": 3}
+
+
+def _fila(**kwargs):
+    """Fila de trabajos.trabajos con los valores por defecto de un trabajo nuevo."""
+    valores = dict(
+        id=7, tipo="exportacion_eia", estado="pendiente", parametros={}, etapa_actual=None,
+        etapas_completadas=[], progreso=0, checkpoint={}, resultado=None, error=None,
+        cancelacion_solicitada=False, intentos=0, reintentos=0, clave_idempotencia="k1",
+        worker_id=None, disponible_desde=None, created_at=None, started_at=None, finished_at=None,
+    )
+    valores.update(kwargs)
+    return SimpleNamespace(**valores)
+
+
+class TestColaTrabajos:
+    """Tests del SQL de ColaTrabajos con una sesión falsa."""
+
+    def _cola(self, *filas):
+        db = MagicMock()
+        db.execute = AsyncMock(side_effect=[MagicMock(fetchone=MagicMock(return_value=f)) for f in filas])
+        db.commit = AsyncMock()
+
+        class _Sesion:
+            async def __aenter__(self):
+                return db
+
+            async def __aexit__(self, *args):
+                return False
+
+        return ColaTrabajos(session_factory=_Sesion), db
+
+    @pytest.mark.asyncio
+    async def test_encolar_con_clave_existente_retorna_el_trabajo(self):
+        """Test que si la clave está ocupada no se inserta otro trabajo."""
+        cola, db = self._cola(None, _fila(estado="completado"))
+
+        trabajo = await cola.encolar("exportacion_eia", {"proyecto_id": 1}, clave_idempotencia="k1")
+
+        assert (trabajo.id, trabajo.estado) == (7, "completado")
+        assert "ON CONFLICT (tipo, clave_idempotencia)" in str(db.execute.await_args_list[0].args[0])
+        assert db.execute.await_args_list[1].args[1]["clave"] == "k1"
+        db.commit.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_reclamar_con_limites_serializa_y_filtra_por_cupo(self):
+        """Test que con límites el reclamo toma el lock y filtra por trabajos activos del tipo."""
+        cola, db = self._cola(None, None, _fila(estado="en_proceso", intentos=1))
+
+        trabajo = await cola.reclamar("w1", ["exportacion_eia"], {"exportacion_eia": 2})
+
+        sqls = [str(c.args[0]) for c in db.execute.await_args_list]
+        assert "pg_advisory_xact_lock" in sqls[0]
+        assert "activo.tipo = t.tipo" in sqls[2] and "disponible_desde <= NOW()" in sqls[2]
+        assert db.execute.await_args_list[2].args[1]["limites"] == '{"exportacion_eia": 2}'
+        assert trabajo.estado == "en_proceso"
+
+
+class TestEndpointTrabajos:
+    """Tests de POST /trabajos."""
+
+    def _cliente(self, monkeypatch, cola):
+        from app.api.v1.endpoints import trabajos
+
+        monkeypatch.setattr(trabajos, "get_cola_trabajos", lambda: cola)
+        app = FastAPI()
+        app.include_router(trabajos.router, prefix="/trabajos")
+        return TestClient(app)
+
+    def test_valida_parametros_y_pasa_la_clave_de_idempotencia(self, monkeypatch):
+        """Test que los parámetros se normalizan por tipo y la clave llega a la cola."""
+        cola = MagicMock()
+        cola.encolar = AsyncMock(return_value=Trabajo(id=3, tipo="exportacion_eia", estado="pendiente"))
+        cliente = self._cliente(monkeypatch, cola)
+
+        respuesta = cliente.post(
+            "/trabajos",
+            json={"tipo": "exportacion_eia", "parametros": {"proyecto_id": "12", "formato": "docx"}},
+            headers={"Idempotency-Key": "export-12-docx"},
+        )
+        invalido = cliente.post("/trabajos", json={"tipo": "exportacion_eia", "parametros": {"proyecto_id": 12}})
+        ingestion = cliente.post("/trabajos", json={"tipo": "ingestion_pdf", "parametros": {}})
+
+        assert respuesta.status_code == 202 and respuesta.json()["id"] == 3
+        cola.encolar.assert_awaited_once_with(
+            "exportacion_eia", {"proyecto_id": 12, "formato": "docx", "configuracion": None}, "export-12-docx",
+        )
+        assert invalido.status_code == 400 and ingestion.status_code == 400
+
+
+class TestIndexacionIngestion:
+    """Tests de la etapa de indexación del ingestor."""
+
+    @pytest.mark.asyncio
+    async def test_embeddings_en_hilo_antes_de_insertar(self, mock_embedding_service, monkeypatch):
+        """Test que los embeddings se calculan fuera del event loop y antes del INSERT del documento."""
+        import threading
+
+        from app.services.rag import ingestor as modulo_ingestor
+        from app.services.rag.ingestor import DocumentoAIngestar, FragmentoIngestado, IngestorLegal
+
+        monkeypatch.setattr(modulo_ingestor, "get_embedding_service", lambda: mock_embedding_service)
+        db = MagicMock()
+        db.execute = AsyncMock(return_value=MagicMock(scalar=MagicMock(return_value=1)))
+        observado = {}
+
+        def embed_texts(textos):
+            observado["hilo"] = threading.current_thread()
+            observado["consultas_previas"] = db.execute.await_count
+            return [[0.1] * 384 for _ in textos]
+
+        mock_embedding_service.embed_texts.side_effect = embed_texts
+        ingestor = IngestorLegal(usar_llm=False)
+        ingestor._cache_temas = {"agua": {"id": 1}}
+
+        await ingestor.indexar_documento(
+            db,
+            DocumentoAIngestar(titulo="Ley", tipo="Ley", contenido="texto"),
+            [FragmentoIngestado(seccion="art", numero_seccion="1", contenido="texto")],
+            usar_llm=False,
+        )
+
+        assert observado["hilo"] is not threading.main_thread()
+        assert observado["consultas_previas"] == 0
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark de throughput del segmentador legal sobre la Ley 19.300.
+
+Compara SegmentadorLegal con la segmentación anterior de
+segmentar_documento (regex perezosa con lookahead sobre todo el
+documento, limpieza y división por caracteres) en el texto de la ley
+repetido 1, 4 y 16 veces, para verificar que el costo crece de forma
+lineal con el largo del documento.
+
+Ejecutar desde el contenedor del backend:
+  docker exec mineria_backend python /app/data/scripts/benchmark_segmentador.py
+"""
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+if Path("/app").exists() and Path("/app/app").exists():
+    sys.path.insert(0, "/app")
+else:
+    sys.path.insert(0, str(Path(__file__).parent.parent.parent / "backend"))
+
+from app.services.pdf import iterar_paginas
+from app.services.rag.segmentador import SegmentadorLegal
+
+DATA_BASE = Path("/app/data") if Path("/app/data").exists() else Path(__file__).parent.parent
+PDF_PATH = DATA_BASE / "legal" / "leyes" / "ley_19300_completa.pdf"
+
+# Segmentación usada por IngestorLegal.segmentar_documento antes del segmentador
+PATRON_ANTERIOR = re.compile(
+    r'(?:Artículo|ARTÍCULO|Art\.?)\s+(\d+)[°º]?[.\s-]*(.*?)(?=(?:Artículo|ARTÍCULO|Art\.?)\s+\d+|$)',
+    re.DOTALL | re.IGNORECASE,
+)
+
+
+def segmentar_anterior(contenido: str) -> int:
+    """Cuenta los fragmentos que producía la segmentación anterior."""
+    fragmentos = 0
+    for _, texto_art in PATRON_ANTERIOR.findall(contenido):
+        texto = re.sub(r'\n{3,}', '\n\n', texto_art)
+        texto = re.sub(r' {2,}', ' ', texto)
+        texto = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]', '', texto).strip()
+        if len(texto) < 50:
+            continue
+        if len(texto) <= 2000:
+            fragmentos += 1
+            continue
+        chunk = ""
+        for oracion in re.split(r'(?<=[.!?])\s+', texto):
+            if len(chunk) + len(oracion) + 1 <= 1500:
+                chunk += (" " if chunk else "") + oracion
+            else:
+                fragmentos += 1 if chunk else 0
+                chunk = oracion
+        fragmentos += 1 if chunk else 0
+    return fragmentos
+
+
+def medir(funcion, repeticiones: int) -> float:
+    """Mejor tiempo (segundos) de varias ejecuciones."""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del segmentador legal")
+    parser.add_argument("--pdf", type=Path, default=PDF_PATH, help="PDF de la ley")
+    parser.add_argument("--repeticiones", type=int, default=3, help="Ejecuciones por medición")
+    args = parser.parse_args()
+
+    if not args.pdf.exists():
+        print(f"ERROR: No se encuentra el PDF en: {args.pdf}")
+        sys.exit(1)
+
+    texto = "".join(p.texto for p in iterar_paginas(str(args.pdf)))
+    segmentador = SegmentadorLegal()
+
+    print(f"Ley 19.300: {len(texto):,} caracteres")
+    print(f"{'copias':>6} {'MB':>7} {'frag. nuevo':>11} {'frag. anterior':>14} "
+          f"{'nuevo MB/s':>11} {'anterior MB/s':>14}")
+
+    for copias in (1, 4, 16):
+        documento = texto * copias
+        mb = len(documento.encode("utf-8")) / 1e6
+
+        fragmentos = sum(1 for _ in segmentador.segmentar(documento))
+        fragmentos_anterior = segmentar_anterior(documento)
+        t_nuevo = medir(lambda: sum(1 for _ in segmentador.segmentar(documento)), args.repeticiones)
+        t_anterior = medir(lambda: segmentar_anterior(documento), args.repeticiones)
+
+        print(f"{copias:>6} {mb:>7.2f} {fragmentos:>11} {fragmentos_anterior:>14} "
+              f"{mb / t_nuevo:>11.2f} {mb / t_anterior:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -30,7 +30,7 @@ DATABASE_URL = os.getenv(
 async def cargar_documento(session: AsyncSession, doc_data: dict) -> dict:
     """Carga un documento y sus fragmentos en la base de datos."""
 
-    from app.services.rag.embeddings import get_embedding_service
+    from app.services.rag.embeddings import get_embedding_service, vector_sql
 
     embedding_service = get_embedding_service()
 
@@ -118,11 +118,12 @@ async def cargar_documento(session: AsyncSession, doc_data: dict) -> dict:
 
         # Insertar fragmentos
         for frag, embedding in zip(fragmentos_data, embeddings):
+            embedding_sql = vector_sql(embedding)
             await session.execute(
-                text("""
+                text(f"""
                     INSERT INTO legal.fragmentos
                     (documento_id, seccion, numero_seccion, contenido, temas, embedding)
-                    VALUES (:doc_id, :seccion, :num, :contenido, :temas, :embedding::vector)
+                    VALUES (:doc_id, :seccion, :num, :contenido, :temas, {embedding_sql})
                 """),
                 {
                     "doc_id": documento_id,
@@ -130,7 +131,6 @@ async def cargar_documento(session: AsyncSession, doc_data: dict) -> dict:
                     "num": frag["numero"],
                     "contenido": frag["contenido"],
                     "temas": frag["temas"],
-                    "embedding": embedding,
                 }
             )
             fragmentos_creados += 1
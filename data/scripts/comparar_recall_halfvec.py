@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Comparación de recall de la búsqueda semántica: halfvec vs float32.
+
+Se ejecuta entre las migraciones 014 y 015, cuando legal.fragmentos tiene
+ambas columnas (embedding float32 y embedding_half con índice HNSW).
+
+Para cada consulta calcula los k vecinos exactos en float32 (fuerza bruta
+en memoria) y mide el recall@k de:
+  - exacto_halfvec:   fuerza bruta con los vectores redondeados a float16
+                      (pérdida atribuible solo a la precisión)
+  - indice_float32:   el índice actual sobre la columna float32
+  - hnsw_halfvec:     el índice HNSW sobre la columna halfvec, con cada
+                      valor de --ef-search
+
+Las consultas son textos representativos y una muestra de fragmentos del
+propio corpus (excluyendo al fragmento de la respuesta).
+
+Ejecutar desde el contenedor del backend:
+  docker exec mineria_backend python /app/data/scripts/comparar_recall_halfvec.py
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+if Path("/app").exists() and Path("/app/app").exists():
+    sys.path.insert(0, "/app")
+else:
+    sys.path.insert(0, str(Path(__file__).parent.parent.parent / "backend"))
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+DATABASE_URL = os.getenv(
+    "DATABASE_URL",
+    "postgresql://mineria:mineria_dev_2024@db:5432/mineria"
+).replace("postgresql://", "postgresql+asyncpg://")
+
+CONSULTAS = [
+    "requisitos para ingresar un proyecto minero al SEIA mediante EIA",
+    "efectos adversos significativos sobre recursos naturales renovables",
+    "reasentamiento de comunidades humanas y alteración de sistemas de vida",
+    "localización próxima a áreas protegidas y glaciares",
+    "plazo de evaluación de una declaración de impacto ambiental",
+    "consulta indígena según el Convenio 169",
+    "participación ciudadana en la evaluación ambiental",
+    "permiso ambiental sectorial para depósitos de relaves",
+    "línea de base de flora y fauna",
+    "monitoreo de calidad del aire y emisiones de material particulado",
+    "derechos de aprovechamiento de aguas subterráneas",
+    "plan de cierre de faenas mineras",
+]
+
+
+def _literal(embedding: Sequence[float], tipo: str) -> str:
+    return "'[" + ",".join(str(float(v)) for v in embedding) + "]'::" + tipo
+
+
+def _parsear(vector_texto: str) -> List[float]:
+    return [float(v) for v in vector_texto.strip("[]").split(",")]
+
+
+def _normalizar(matriz: np.ndarray) -> np.ndarray:
+    normas = np.linalg.norm(matriz, axis=1, keepdims=True)
+    return matriz / np.where(normas == 0, 1, normas)
+
+
+def top_k_exacto(
+    corpus: np.ndarray,
+    consulta: np.ndarray,
+    k: int,
+    excluir: Optional[int] = None,
+) -> List[int]:
+    """Índices (filas) de los k vecinos por coseno, por fuerza bruta."""
+    similitudes = corpus @ (consulta / (np.linalg.norm(consulta) or 1))
+    if excluir is not None:
+        similitudes[excluir] = -np.inf
+    candidatos = np.argpartition(-similitudes, k)[:k]
+    return candidatos[np.argsort(-similitudes[candidatos])].tolist()
+
+
+def recall(verdad: Sequence[int], obtenidos: Sequence[int]) -> float:
+    """Fracción de los vecinos verdaderos presentes en la respuesta."""
+    return len(set(verdad) & set(obtenidos)) / len(verdad) if verdad else 1.0
+
+
+async def buscar_indice(
+    session: AsyncSession,
+    columna: str,
+    tipo: str,
+    consulta: Sequence[float],
+    k: int,
+    excluir_id: Optional[int],
+) -> List[int]:
+    """k vecinos según el índice de la columna (búsqueda aproximada)."""
+    literal = _literal(consulta, tipo)
+    result = await session.execute(
+        text(f"""
+            SELECT id FROM legal.fragmentos
+            WHERE {columna} IS NOT NULL
+            ORDER BY {columna} <=> {literal}
+            LIMIT :limite
+        """),
+        {"limite": k + (1 if excluir_id is not None else 0)},
+    )
+    ids = [row.id for row in result.fetchall() if row.id != excluir_id]
+    return ids[:k]
+
+
+async def tamano_indice(session: AsyncSession, nombre: str) -> Optional[int]:
+    result = await session.execute(
+        text("SELECT pg_relation_size(to_regclass(:nombre))"),
+        {"nombre": nombre},
+    )
+    return result.scalar()
+
+
+def _mb(valor: Optional[int]) -> str:
+    return f"{valor / 1e6:.1f} MB" if valor else "-"
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Recall halfvec vs float32")
+    parser.add_argument("-k", type=int, default=10, help="Vecinos por consulta")
+    parser.add_argument("--muestra", type=int, default=200, help="Fragmentos usados como consulta")
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[40, 100], help="Valores de hnsw.ef_search")
+    parser.add_argument("--sin-textos", action="store_true", help="No embeber las consultas de texto")
+    parser.add_argument("--semilla", type=int, default=42)
+    args = parser.parse_args()
+
+    engine = create_async_engine(DATABASE_URL)
+    sesiones = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with sesiones() as session:
+        columnas = await session.execute(text("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = 'legal' AND table_name = 'fragmentos'
+              AND column_name = 'embedding_half'
+        """))
+        if columnas.scalar() is None:
+            print("ERROR: legal.fragmentos no tiene embedding_half; aplicar primero la migración 014")
+            sys.exit(1)
+
+        print("Cargando embeddings float32...")
+        result = await session.execute(text("""
+            SELECT id, embedding::text AS embedding
+            FROM legal.fragmentos
+            WHERE embedding IS NOT NULL AND embedding_half IS NOT NULL
+            ORDER BY id
+        """))
+        filas = result.fetchall()
+        if len(filas) <= args.k:
+            print(f"ERROR: se necesitan más de {args.k} fragmentos con embedding")
+            sys.exit(1)
+
+        ids = [f.id for f in filas]
+        corpus32 = _normalizar(np.array([_parsear(f.embedding) for f in filas], dtype=np.float32))
+        corpus16 = _normalizar(corpus32.astype(np.float16).astype(np.float32))
+
+        consultas: List[Dict] = []
+        if not args.sin_textos:
+            from app.services.rag.embeddings import get_embedding_service
+            vectores = get_embedding_service().embed_texts(CONSULTAS)
+            consultas += [{"vector": np.array(v, dtype=np.float32), "excluir": None} for v in vectores]
+        random.seed(args.semilla)
+        for fila in random.sample(range(len(ids)), min(args.muestra, len(ids))):
+            consultas.append({"vector": corpus32[fila], "excluir": fila})
+
+        print(f"{len(ids):,} fragmentos, {len(consultas)} consultas, k={args.k}\n")
+
+        recalls: Dict[str, List[float]] = {"exacto_halfvec": [], "indice_float32": []}
+        latencias: Dict[str, List[float]] = {"indice_float32": []}
+        for ef in args.ef_search:
+            recalls[f"hnsw_halfvec ef={ef}"] = []
+            latencias[f"hnsw_halfvec ef={ef}"] = []
+
+        for consulta in consultas:
+            excluir = consulta["excluir"]
+            excluir_id = ids[excluir] if excluir is not None else None
+            verdad = [ids[i] for i in top_k_exacto(corpus32, consulta["vector"], args.k, excluir)]
+
+            aprox16 = [ids[i] for i in top_k_exacto(corpus16, consulta["vector"], args.k, excluir)]
+            recalls["exacto_halfvec"].append(recall(verdad, aprox16))
+
+            inicio = time.perf_counter()
+            obtenidos = await buscar_indice(session, "embedding", "vector", consulta["vector"], args.k, excluir_id)
+            latencias["indice_float32"].append(time.perf_counter() - inicio)
+            recalls["indice_float32"].append(recall(verdad, obtenidos))
+
+            for ef in args.ef_search:
+                nombre = f"hnsw_halfvec ef={ef}"
+                await session.execute(text(f"SET hnsw.ef_search = {int(ef)}"))
+                inicio = time.perf_counter()
+                obtenidos = await buscar_indice(
+                    session, "embedding_half", "halfvec", consulta["vector"], args.k, excluir_id
+                )
+                latencias[nombre].append(time.perf_counter() - inicio)
+                recalls[nombre].append(recall(verdad, obtenidos))
+
+        print(f"{'método':<24} {'recall@k':>9} {'mín':>6} {'p50 ms':>8}")
+        for nombre, valores in recalls.items():
+            p50 = f"{np.median(latencias[nombre]) * 1000:.1f}" if nombre in latencias else "-"
+            print(f"{nombre:<24} {np.mean(valores):>9.4f} {np.min(valores):>6.2f} {p50:>8}")
+
+        print("\nTamaño de índices:")
+        for nombre in ("legal.idx_fragmentos_embedding", "legal.idx_fragmentos_embedding_half"):
+            print(f"  {nombre:<40} {_mb(await tamano_indice(session, nombre))}")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -212,16 +212,11 @@ async def descargar_pdf(url: str, destino: Path, client: httpx.AsyncClient) -> b
 
 
 def extraer_texto_pdf(ruta_pdf: Path) -> str:
-    """Extrae texto de un PDF usando PyMuPDF."""
+    """Extrae texto de un PDF usando PyMuPDF (en paralelo por bloques de páginas)."""
     try:
-        import fitz  # PyMuPDF
+        from app.services.pdf import iterar_paginas
 
-        texto = ""
-        with fitz.open(str(ruta_pdf)) as doc:
-            for pagina in doc:
-                texto += pagina.get_text()
-
-        return texto.strip()
+        return "".join(p.texto for p in iterar_paginas(str(ruta_pdf))).strip()
     except Exception as e:
         logger.error(f"Error extrayendo texto de {ruta_pdf}: {e}")
         return ""
@@ -357,6 +352,7 @@ async def ingestar_documento(
     nombre_archivo: str = None
 ) -> Optional[int]:
     """Ingesta un documento al corpus RAG con vinculación de PDF."""
+    from app.services.rag.embeddings import vector_sql
 
     titulo = doc_data['nombre']
 
@@ -420,13 +416,13 @@ async def ingestar_documento(
 
     # Insertar fragmentos
     for frag, embedding in zip(fragmentos, embeddings):
-        embedding_str = "[" + ",".join(str(v) for v in embedding) + "]"
+        embedding_sql = vector_sql(embedding)
 
         await session.execute(
             text(f"""
                 INSERT INTO legal.fragmentos
                 (documento_id, seccion, numero_seccion, contenido, temas, embedding)
-                VALUES (:doc_id, :seccion, :num, :contenido, :temas, '{embedding_str}'::vector)
+                VALUES (:doc_id, :seccion, :num, :contenido, :temas, {embedding_sql})
             """),
             {
                 "doc_id": documento_id,
@@ -443,81 +439,18 @@ async def ingestar_documento(
     return documento_id
 
 
-def segmentar_texto(contenido: str, max_chars: int = 1500) -> List[Dict]:
-    """Segmenta texto en fragmentos."""
-    import re
-
-    fragmentos = []
-
-    # Intentar segmentar por secciones numeradas
-    patron = r'(\d+\.?\d*[\.\-\s]+[A-ZÁÉÍÓÚ][^\.]{10,})'
-    secciones = re.split(patron, contenido)
-
-    if len(secciones) > 3:
-        seccion_num = 0
-        for i in range(0, len(secciones), 2):
-            texto = secciones[i]
-            if i + 1 < len(secciones):
-                texto = secciones[i + 1] + texto
-
-            texto = texto.strip()
-            if len(texto) < 100:
-                continue
-
-            seccion_num += 1
-
-            # Si es muy largo, dividir
-            if len(texto) > max_chars:
-                chunks = dividir_en_chunks(texto, max_chars)
-                for j, chunk in enumerate(chunks):
-                    fragmentos.append({
-                        'seccion': f'Sección {seccion_num}' + (f'.{j+1}' if len(chunks) > 1 else ''),
-                        'numero': str(seccion_num),
-                        'contenido': chunk,
-                    })
-            else:
-                fragmentos.append({
-                    'seccion': f'Sección {seccion_num}',
-                    'numero': str(seccion_num),
-                    'contenido': texto,
-                })
-
-    # Si no hay secciones claras, dividir por chunks
-    if not fragmentos:
-        chunks = dividir_en_chunks(contenido, max_chars)
-        for i, chunk in enumerate(chunks):
-            fragmentos.append({
-                'seccion': f'Fragmento {i+1}',
-                'numero': str(i+1),
-                'contenido': chunk,
-            })
-
-    return fragmentos
-
-
-def dividir_en_chunks(texto: str, max_chars: int = 1500) -> List[str]:
-    """Divide texto largo en chunks respetando oraciones."""
-    import re
+def segmentar_texto(contenido: str) -> List[Dict]:
+    """Segmenta texto en fragmentos con el segmentador del backend."""
+    from app.services.rag.segmentador import get_segmentador
 
-    if len(texto) <= max_chars:
-        return [texto]
-
-    chunks = []
-    oraciones = re.split(r'(?<=[.!?])\s+', texto)
-    chunk_actual = ""
-
-    for oracion in oraciones:
-        if len(chunk_actual) + len(oracion) + 1 <= max_chars:
-            chunk_actual += (" " if chunk_actual else "") + oracion
-        else:
-            if chunk_actual:
-                chunks.append(chunk_actual)
-            chunk_actual = oracion
-
-    if chunk_actual:
-        chunks.append(chunk_actual)
-
-    return chunks
+    return [
+        {
+            'seccion': s.seccion,
+            'numero': s.numero_seccion,
+            'contenido': s.contenido,
+        }
+        for s in get_segmentador().segmentar(contenido)
+    ]
 
 
 async def main():
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga de extremo a extremo del asistente, el análisis de
+prefactibilidad y la ingestión de PDFs, sin gastar tokens reales.
+
+El backend y el worker se levantan apuntando al stub local de los
+proveedores LLM, que simula latencias, herramientas guionadas y fallas:
+
+  python -m tests.stub_anthropic --port 8787 --semilla 7 \\
+      --latencia lognormal:900:0.6 --ms-por-token 15 --tokens-salida 400 \\
+      --guion /app/data/scripts/guion_stub_asistente.json --tasa-429 0.02 --tasa-5xx 0.01
+  LLM_BASE_URL=http://localhost:8787 PERPLEXITY_BASE_URL=http://localhost:8787 \\
+      ANTHROPIC_API_KEY=stub PERPLEXITY_API_KEY=stub uvicorn app.main:app
+  (mismas variables) python -m app.services.trabajos.worker
+
+Luego, por escenario:
+
+  python data/scripts/prueba_carga.py --escenario asistente --concurrencia 20 --solicitudes 200
+  python data/scripts/prueba_carga.py --escenario prefactibilidad --concurrencia 10 --duracion 120
+  python data/scripts/prueba_carga.py --escenario ingestor --concurrencia 4 --solicitudes 8
+
+Reporta throughput, latencias p50/p90/p95/p99 de las solicitudes exitosas
+y errores por tipo; con --stub-url agrega los contadores del stub. En el
+escenario ingestor la latencia es hasta que el trabajo termina (no solo el
+202) y los documentos ingestados se eliminan al final. Usar una base de
+datos desechable: el asistente guarda conversaciones.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+import httpx
+
+DATA_BASE = Path("/app/data") if Path("/app/data").exists() else Path(__file__).parent.parent
+PDF_PATH = DATA_BASE / "legal" / "leyes" / "ley_19300_completa.pdf"
+
+ESTADOS_TERMINALES = {"completado", "error", "cancelado"}
+
+# Mezcla de preguntas: las que mencionan normativa o temas recientes
+# disparan herramientas con el guion de ejemplo del stub
+MENSAJES_ASISTENTE = [
+    "¿Qué dice el artículo 11 de la Ley 19.300 sobre efectos adversos?",
+    "¿Cuáles son los cambios más recientes al reglamento del SEIA?",
+    "Hola, ¿qué puedes hacer por mí?",
+    "¿Qué umbral de producción obliga a ingresar un proyecto minero al SEIA?",
+    "Resume los pasos de una DIA para una planta de relaves.",
+]
+
+PROYECTO_PRUEBA = {
+    "nombre": "Proyecto Minero Prueba de Carga",
+    "tipo_mineria": "Tajo abierto",
+    "mineral_principal": "Cobre",
+    "region": "Antofagasta",
+    "comuna": "Calama",
+    "superficie_ha": 500,
+    "uso_agua_lps": 150,
+    "vida_util_anos": 25,
+}
+
+GEOMETRIA_PRUEBA = {
+    "type": "Polygon",
+    "coordinates": [[
+        [-68.95, -22.45], [-68.90, -22.45], [-68.90, -22.50], [-68.95, -22.50], [-68.95, -22.45],
+    ]],
+}
+
+# (latencia en segundos, "ok" o tipo de error)
+Resultado = Tuple[float, str]
+Escenario = Callable[[httpx.AsyncClient, int, argparse.Namespace], Awaitable[str]]
+
+
+async def escenario_asistente(cliente: httpx.AsyncClient, i: int, args: argparse.Namespace) -> str:
+    """Un turno de chat en una sesión nueva."""
+    respuesta = await cliente.post("/asistente/chat", json={
+        "mensaje": MENSAJES_ASISTENTE[i % len(MENSAJES_ASISTENTE)],
+        "session_id": str(uuid4()),
+    })
+    return "ok" if respuesta.status_code == 200 else f"http_{respuesta.status_code}"
+
+
+async def escenario_prefactibilidad(cliente: httpx.AsyncClient, i: int, args: argparse.Namespace) -> str:
+    """Análisis completo con informe LLM."""
+    respuesta = await cliente.post("/prefactibilidad/analisis", json={
+        "proyecto": {**PROYECTO_PRUEBA, "superficie_ha": PROYECTO_PRUEBA["superficie_ha"] + i},
+        "geometria": GEOMETRIA_PRUEBA,
+        "generar_informe_llm": True,
+    })
+    if respuesta.status_code != 200:
+        return f"http_{respuesta.status_code}"
+    informe = respuesta.json().get("informe") or {}
+    return "informe_error" if "error" in informe else "ok"
+
+
+async def escenario_ingestor(cliente: httpx.AsyncClient, i: int, args: argparse.Namespace) -> str:
+    """Encola un PDF y espera a que el worker termine el trabajo."""
+    respuesta = await cliente.post(
+        "/ingestor/pdf",
+        files={"archivo": (f"prueba_carga_{i}.pdf", args.pdf_bytes, "application/pdf")},
+        data={"titulo": f"Prueba de carga {i}", "tipo": "Ley", "organismo": "Prueba de carga", "usar_llm": "true"},
+    )
+    if respuesta.status_code != 202:
+        return f"http_{respuesta.status_code}"
+
+    trabajo_id = respuesta.json()["id"]
+    while True:
+        await asyncio.sleep(args.poll_segundos)
+        trabajo = (await cliente.get(f"/ingestor/trabajos/{trabajo_id}")).json()
+        if trabajo["estado"] in ESTADOS_TERMINALES:
+            break
+
+    documento_id = (trabajo.get("resultado") or {}).get("documento_id")
+    if documento_id:
+        args.documentos_creados.append(documento_id)
+    return "ok" if trabajo["estado"] == "completado" else f"trabajo_{trabajo['estado']}"
+
+
+ESCENARIOS: Dict[str, Escenario] = {
+    "asistente": escenario_asistente,
+    "prefactibilidad": escenario_prefactibilidad,
+    "ingestor": escenario_ingestor,
+}
+
+
+def percentil(valores: List[float], p: float) -> float:
+    """Percentil por rango más cercano sobre valores ordenados."""
+    if not valores:
+        return 0.0
+    return valores[max(0, math.ceil(p / 100 * len(valores)) - 1)]
+
+
+async def ejecutar(escenario: Escenario, args: argparse.Namespace) -> Tuple[List[Resultado], float]:
+    """Ejecuta el escenario con `concurrencia` clientes hasta agotar solicitudes o duración."""
+    resultados: List[Resultado] = []
+    siguiente = 0
+    limite = time.monotonic() + args.duracion if args.duracion else None
+
+    async def cliente_virtual(cliente: httpx.AsyncClient):
+        nonlocal siguiente
+        while True:
+            if args.solicitudes and siguiente >= args.solicitudes:
+                return
+            if limite and time.monotonic() >= limite:
+                return
+            i, siguiente = siguiente, siguiente + 1
+            inicio = time.perf_counter()
+            try:
+                estado = await escenario(cliente, i, args)
+            except httpx.HTTPError as e:
+                estado = type(e).__name__
+            resultados.append((time.perf_counter() - inicio, estado))
+
+    limites = httpx.Limits(max_connections=args.concurrencia * 2)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limites) as cliente:
+        inicio = time.perf_counter()
+        await asyncio.gather(*(cliente_virtual(cliente) for _ in range(args.concurrencia)))
+        duracion = time.perf_counter() - inicio
+
+        for documento_id in args.documentos_creados:
+            await cliente.delete(f"/ingestor/documento/{documento_id}")
+
+    return resultados, duracion
+
+
+def reporte(resultados: List[Resultado], duracion: float) -> dict:
+    """Throughput, latencias de las exitosas y errores por tipo."""
+    exitosas = sorted(latencia for latencia, estado in resultados if estado == "ok")
+    return {
+        "solicitudes": len(resultados),
+        "exitosas": len(exitosas),
+        "errores": dict(Counter(estado for _, estado in resultados if estado != "ok")),
+        "duracion_s": round(duracion, 2),
+        "throughput_rps": round(len(exitosas) / duracion, 2) if duracion else 0.0,
+        "latencia_s": {
+            f"p{p}": round(percentil(exitosas, p), 3) for p in (50, 90, 95, 99)
+        } | {"max": round(exitosas[-1], 3) if exitosas else 0.0},
+    }
+
+
+def imprimir(nombre: str, datos: dict, stub: Optional[dict]):
+    print(f"\n=== Prueba de carga: {nombre} ===")
+    print(f"  Solicitudes:  {datos['solicitudes']} ({datos['exitosas']} exitosas)")
+    print(f"  Duración:     {datos['duracion_s']:.1f}s")
+    print(f"  Throughput:   {datos['throughput_rps']:.2f} solicitudes/s")
+    latencias = "  ".join(f"{k}={v:.2f}s" for k, v in datos["latencia_s"].items())
+    print(f"  Latencia:     {latencias}")
+    for tipo, cantidad in sorted(datos["errores"].items(), key=lambda x: -x[1]):
+        print(f"  Error {tipo}: {cantidad}")
+    if stub:
+        print(f"  Stub LLM:     {stub}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga contra el backend con el stub LLM")
+    parser.add_argument("--escenario", choices=sorted(ESCENARIOS), required=True)
+    parser.add_argument("--url", default="http://localhost:8000/api/v1", help="URL base de la API")
+    parser.add_argument("--concurrencia", type=int, default=10, help="Clientes virtuales simultáneos")
+    parser.add_argument("--solicitudes", type=int, default=0, help="Total de solicitudes (0 = según duración)")
+    parser.add_argument("--duracion", type=float, default=0, help="Segundos de prueba (0 = según solicitudes)")
+    parser.add_argument("--timeout", type=float, default=300, help="Timeout por solicitud en segundos")
+    parser.add_argument("--pdf", type=Path, default=PDF_PATH, help="PDF del escenario ingestor")
+    parser.add_argument("--poll-segundos", type=float, default=2.0, help="Intervalo de consulta de trabajos")
+    parser.add_argument("--stub-url", help="URL del stub LLM para incluir sus contadores")
+    parser.add_argument("--salida-json", type=Path, help="Guardar el reporte en JSON")
+    args = parser.parse_args()
+
+    if not args.solicitudes and not args.duracion:
+        args.solicitudes = args.concurrencia * 10
+    args.documentos_creados = []
+    if args.escenario == "ingestor":
+        if not args.pdf.exists():
+            print(f"ERROR: No se encuentra el PDF en: {args.pdf}")
+            sys.exit(1)
+        args.pdf_bytes = args.pdf.read_bytes()
+
+    if args.stub_url:
+        httpx.delete(f"{args.stub_url}/cache")
+
+    resultados, duracion = asyncio.run(ejecutar(ESCENARIOS[args.escenario], args))
+    datos = reporte(resultados, duracion)
+    stub = httpx.get(f"{args.stub_url}/metricas").json() if args.stub_url else None
+    imprimir(args.escenario, datos, stub)
+
+    if args.salida_json:
+        args.salida_json.write_text(json.dumps({
+            "escenario": args.escenario,
+            "concurrencia": args.concurrencia,
+            **datos,
+            "stub": stub,
+        }, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()